@@ -14,6 +14,15 @@ from flask_cors import CORS
 from .services.qobuz import QobuzDownloader
 
 _downloader: QobuzDownloader | None = None
+_job_manager = None
+_prefetcher = None
+_preview_audio = None
+_renewal_scheduler = None
+_tracer = None
+_profiler = None
+_cassette = None
+_resilience = None
+_cache_backends = None
 _app: Flask | None = None
 
 
@@ -24,6 +33,240 @@ def get_downloader() -> QobuzDownloader:
     return _downloader
 
 
+def get_prefetcher():
+    global _prefetcher
+    if _prefetcher is None:
+        from .config import PREFETCH_ENABLED, PREFETCH_TOP_N, PREFETCH_WORKERS, PREFETCH_RATE
+        from .services.prefetch import Prefetcher
+        _prefetcher = Prefetcher(get_downloader(), top_n=PREFETCH_TOP_N, workers=PREFETCH_WORKERS,
+                                 rate_per_second=PREFETCH_RATE, enabled=PREFETCH_ENABLED)
+    return _prefetcher
+
+
+def get_preview_audio_cache():
+    """Caché en disco de segmentos de preview servidos por ``/api/preview/audio``."""
+    global _preview_audio
+    if _preview_audio is None:
+        from .config import PREVIEW_AUDIO_CACHE_DIR, PREVIEW_AUDIO_CACHE_MAX_MB, PREVIEW_SEGMENT_SECONDS
+        from .services.preview_audio import PreviewAudioCache
+        _preview_audio = PreviewAudioCache(get_downloader(), PREVIEW_AUDIO_CACHE_DIR,
+                                           max_bytes=PREVIEW_AUDIO_CACHE_MAX_MB * 1024 * 1024,
+                                           segment_seconds=PREVIEW_SEGMENT_SECONDS)
+    return _preview_audio
+
+
+def get_renewal_scheduler():
+    """Planificador de renovación de credenciales (arranca su hilo si está habilitado)."""
+    global _renewal_scheduler
+    if _renewal_scheduler is None:
+        from .config import DATA_DIR, RENEWAL_SCHEDULER_ENABLED, RENEWAL_CHECK_INTERVAL, RENEWAL_THRESHOLD_DAYS
+        from .services.renewal_scheduler import RenewalScheduler
+        _renewal_scheduler = RenewalScheduler(
+            os.path.join(DATA_DIR, 'renewal_state.json'),
+            os.path.join(DATA_DIR, 'renewal.lock'),
+            interval=RENEWAL_CHECK_INTERVAL,
+            threshold_days=RENEWAL_THRESHOLD_DAYS,
+        )
+        if RENEWAL_SCHEDULER_ENABLED:
+            _renewal_scheduler.start()
+    return _renewal_scheduler
+
+
+def get_tracer():
+    """Trazas por petición (búfer de recientes y exportación OTLP/JSON opcional)."""
+    global _tracer
+    if _tracer is None:
+        from .config import TRACE_SAMPLE_RATE, TRACE_BUFFER_SIZE, TRACE_EXPORT_PATH
+        from .utils.tracing import Tracer
+        _tracer = Tracer(buffer_size=TRACE_BUFFER_SIZE, sample_rate=TRACE_SAMPLE_RATE,
+                         export_path=TRACE_EXPORT_PATH or None)
+    return _tracer
+
+
+def get_profiler():
+    """Perfilado de peticiones con cProfile (cabecera firmada o muestreo 1 de cada N)."""
+    global _profiler
+    if _profiler is None:
+        from .config import PROFILE_SECRET, PROFILE_SAMPLE_EVERY, PROFILE_DIR, PROFILE_KEEP
+        from .utils.profiling import RequestProfiler
+        _profiler = RequestProfiler(PROFILE_DIR, secret=PROFILE_SECRET, sample_every=PROFILE_SAMPLE_EVERY,
+                                    keep=PROFILE_KEEP)
+    return _profiler
+
+
+def get_cassette():
+    """Cassette de llamadas externas activa según ``HTTP_CASSETTE_MODE`` (``None`` si no hay)."""
+    global _cassette
+    if _cassette is None:
+        from .config import HTTP_CASSETTE_MODE, HTTP_CASSETTE_PATH, HTTP_CASSETTE_TIME_SCALE
+        if not HTTP_CASSETTE_MODE or HTTP_CASSETTE_MODE == 'off':
+            return None
+        from .utils.cassette import Cassette
+        from .utils.http import set_cassette
+        _cassette = Cassette(HTTP_CASSETTE_PATH, mode=HTTP_CASSETTE_MODE, time_scale=HTTP_CASSETTE_TIME_SCALE)
+        set_cassette(_cassette)
+        logging.getLogger(__name__).warning("Llamadas externas en modo %s con la cassette %s",
+                                            HTTP_CASSETTE_MODE, HTTP_CASSETTE_PATH)
+    return _cassette
+
+
+def get_resilience():
+    """Cortocircuitos, cobertura de GETs lentos y timeouts adaptativos, ya instalados en ``utils.http``."""
+    global _resilience
+    if _resilience is None:
+        from .config import (CIRCUIT_FAILURE_RATE, CIRCUIT_WINDOW, CIRCUIT_MIN_CALLS, CIRCUIT_SLOW_CALL_SECONDS,
+                             CIRCUIT_OPEN_SECONDS, HEDGE_UPSTREAMS, HEDGE_QUANTILE, HEDGE_MIN_DELAY_MS,
+                             ADAPTIVE_TIMEOUTS, TIMEOUT_QUANTILE, TIMEOUT_MULTIPLIER, TIMEOUT_MIN_SECONDS,
+                             TIMEOUT_MAX_SECONDS, TIMEOUT_CONNECT_MAX_SECONDS)
+        from .utils.http import set_resilience
+        from .utils.resilience import Resilience
+        _resilience = Resilience(failure_rate=CIRCUIT_FAILURE_RATE, window=CIRCUIT_WINDOW,
+                                 min_calls=CIRCUIT_MIN_CALLS, slow_call_seconds=CIRCUIT_SLOW_CALL_SECONDS,
+                                 open_seconds=CIRCUIT_OPEN_SECONDS, hedge_upstreams=HEDGE_UPSTREAMS,
+                                 hedge_quantile=HEDGE_QUANTILE, hedge_min_delay=HEDGE_MIN_DELAY_MS / 1000,
+                                 adaptive_timeouts=ADAPTIVE_TIMEOUTS, timeout_quantile=TIMEOUT_QUANTILE,
+                                 timeout_multiplier=TIMEOUT_MULTIPLIER, timeout_min=TIMEOUT_MIN_SECONDS,
+                                 timeout_max=TIMEOUT_MAX_SECONDS, connect_timeout_max=TIMEOUT_CONNECT_MAX_SECONDS)
+        set_resilience(_resilience)
+    return _resilience
+
+
+def get_cache_backends():
+    """Niveles compartidos de caché (SQLite, red), ya instalados para todas las ``TieredCache``."""
+    global _cache_backends
+    if _cache_backends is None:
+        from .config import CACHE_SQLITE_PATH, CACHE_URL, CACHE_KEY_PREFIX, CACHE_NETWORK_TIMEOUT
+        from .utils.shared_cache import build_backends, set_cache_backends
+        _cache_backends = build_backends(CACHE_SQLITE_PATH, CACHE_URL, timeout=CACHE_NETWORK_TIMEOUT)
+        set_cache_backends(_cache_backends, prefix=CACHE_KEY_PREFIX)
+    return _cache_backends
+
+
+def get_job_manager():
+    """Gestor de trabajos en segundo plano (se crea al primer uso de ``/api/jobs``)."""
+    global _job_manager
+    if _job_manager is None:
+        from .config import (JOBS_DB_PATH, JOB_RUNNERS, JOB_DOWNLOAD_WORKERS, JOB_STALE_SECONDS, DOWNLOAD_CACHE_DIR,
+                             DOWNLOAD_CACHE_MAX_MB, SPOTIFY_PLAYLIST_WORKERS, SPOTIFY_PLAYLIST_RATE)
+        from .services.downloads import DownloadCache
+        from .services.jobs import JobManager, JobStore
+        from .services.playlist import SpotifyPlaylistImporter
+        downloader = get_downloader()
+        _job_manager = JobManager(
+            downloader,
+            JobStore(JOBS_DB_PATH),
+            DownloadCache(DOWNLOAD_CACHE_DIR, max_bytes=DOWNLOAD_CACHE_MAX_MB * 1024 * 1024),
+            runners=JOB_RUNNERS,
+            download_workers=JOB_DOWNLOAD_WORKERS,
+            playlist_importer=SpotifyPlaylistImporter(downloader, SPOTIFY_PLAYLIST_WORKERS, SPOTIFY_PLAYLIST_RATE),
+            stale_after=JOB_STALE_SECONDS,
+        )
+        _job_manager.start()
+    return _job_manager
+
+
+def _install_request_logging(app: Flask) -> None:
+    """Logging en cola y ``request_id`` por petición (se devuelve en ``X-Request-ID``)."""
+    from flask import g, request
+    from .config import LOG_LEVEL, LOG_FORMAT, LOG_DEBUG_SAMPLE_RATE, LOG_QUEUE_SIZE
+    from .utils.logs import bind_request, clear_request, setup_logging
+    setup_logging(LOG_LEVEL, LOG_FORMAT, LOG_DEBUG_SAMPLE_RATE, LOG_QUEUE_SIZE)
+
+    @app.before_request
+    def _bind_request_id():
+        g.request_id = bind_request(request.headers.get('X-Request-ID'))
+
+    @app.after_request
+    def _echo_request_id(response):
+        if 'request_id' in g:
+            response.headers['X-Request-ID'] = g.request_id
+        return response
+
+    @app.teardown_request
+    def _clear_request_id(exc=None):
+        clear_request()
+
+
+def _install_request_metrics(app: Flask) -> None:
+    """Latencia por ruta (la plantilla de ``url_rule``, no la URL, para acotar las series)."""
+    import time
+    from flask import g, request
+    from .utils.metrics import HTTP_REQUEST_SECONDS
+
+    @app.before_request
+    def _start_timer():
+        g._request_started = time.perf_counter()
+
+    @app.after_request
+    def _observe_latency(response):
+        started = g.pop('_request_started', None)
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            HTTP_REQUEST_SECONDS.labels(request.method, route, str(response.status_code)).observe(
+                time.perf_counter() - started)
+        return response
+
+
+# Rutas que no se trazan: las consultan los propios paneles de observabilidad
+_UNTRACED_PATHS = ('/api/metrics', '/api/debug/traces', '/static/')
+
+
+def _install_request_tracing(app: Flask) -> None:
+    """Abre una traza por petición; su id se devuelve en ``X-Trace-ID``."""
+    from flask import g, request
+    tracer = get_tracer()
+
+    @app.before_request
+    def _start_trace():
+        if request.path.startswith(_UNTRACED_PATHS):
+            return
+        route = request.url_rule.rule if request.url_rule is not None else request.path
+        g._trace_token = tracer.start(f'{request.method} {route}', **{
+            'http.method': request.method, 'http.route': route, 'request_id': g.get('request_id', '')})
+
+    @app.after_request
+    def _tag_trace(response):
+        handle = g.get('_trace_token')
+        if handle is not None:
+            root = handle[1]
+            root.set_attribute('http.status_code', response.status_code)
+            response.headers['X-Trace-ID'] = root.trace.trace_id
+        return response
+
+    @app.teardown_request
+    def _finish_trace(exc=None):
+        tracer.finish(g.pop('_trace_token', None), error=f"{type(exc).__name__}: {exc}" if exc else None)
+
+
+def _install_request_profiling(app: Flask) -> None:
+    """Perfila la vista si la petición trae ``X-Profile`` firmada o le toca por muestreo."""
+    from flask import g, request
+    profiler = get_profiler()
+
+    @app.before_request
+    def _start_profile():
+        if request.path.startswith(_UNTRACED_PATHS) or request.path.startswith('/api/admin/profiles'):
+            return
+        g._profile = profiler.start(request.headers.get('X-Profile'))
+
+    @app.after_request
+    def _announce_profile(response):
+        active = g.get('_profile')
+        if active is not None:
+            # Mismo id que el archivo guardado: lo genera el servidor, nunca viene del cliente
+            response.headers['X-Profile-ID'] = active.id
+        return response
+
+    @app.teardown_request
+    def _save_profile(exc=None):
+        active = g.pop('_profile', None)
+        if active is not None:
+            route = request.url_rule.rule if request.url_rule is not None else request.path
+            handle = g.get('_trace_token')
+            profiler.stop(active, route=route, method=request.method, request_id=g.get('request_id'),
+                          trace_id=handle[1].trace.trace_id if handle is not None else None)
+
+
 def create_app() -> Flask:
     global _app
     if _app is not None:
@@ -41,6 +284,16 @@ def create_app() -> Flask:
     )
     CORS(app)
 
+    _install_request_logging(app)
+    # Antes de crear el downloader: su inicialización ya llama a Qobuz
+    get_cassette()
+    get_resilience()
+    get_cache_backends()
+    _install_request_metrics(app)
+    _install_request_tracing(app)
+    # Tras las trazas: el índice del perfil guarda el id de la traza de la petición
+    _install_request_profiling(app)
+
     # Registro de blueprints API
     from .routes.api import api_bp
     app.register_blueprint(api_bp, url_prefix='/api')
@@ -76,4 +329,6 @@ def create_app() -> Flask:
     _app = app
     return app
 
-__all__ = ["create_app", "get_downloader"]
+__all__ = ["create_app", "get_downloader", "get_job_manager", "get_prefetcher", "get_preview_audio_cache",
+           "get_renewal_scheduler", "get_tracer", "get_profiler", "get_cassette", "get_resilience",
+           "get_cache_backends"]
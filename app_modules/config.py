@@ -1,6 +1,7 @@
 import os
 import json
-from typing import Dict, Any
+import tempfile
+from typing import Dict, Any, List
 
 def _get_required_env_var(var_name: str) -> str:
     """
@@ -33,6 +34,136 @@ except ValueError as e:
 FLASK_DEBUG = os.environ.get('FLASK_ENV') == 'development'
 PORT = int(os.environ.get('PORT', 5000))
 
+# Caché de metadatos de pistas (track/get)
+TRACK_CACHE_TTL = int(os.environ.get('TRACK_CACHE_TTL', 3600))
+TRACK_CACHE_SIZE = int(os.environ.get('TRACK_CACHE_SIZE', 5000))
+PREVIEW_URL_CACHE_TTL = int(os.environ.get('PREVIEW_URL_CACHE_TTL', 600))
+
+# Caché compartida entre instancias (utils.shared_cache): además de la memoria de cada
+# proceso, un nivel SQLite en disco local (CACHE_SQLITE_PATH) y uno en red que hable RESP
+# (CACHE_URL o REDIS_URL, redis:// o rediss://). Vacíos = solo memoria. TTL de búsquedas,
+# letras de Genius y datos de Spotify (0 desactiva cada una)
+CACHE_SQLITE_PATH = os.environ.get('CACHE_SQLITE_PATH', '')
+CACHE_URL = os.environ.get('CACHE_URL') or os.environ.get('REDIS_URL', '')
+CACHE_KEY_PREFIX = os.environ.get('CACHE_KEY_PREFIX', 'musichub')
+CACHE_NETWORK_TIMEOUT = float(os.environ.get('CACHE_NETWORK_TIMEOUT', 0.25))
+SEARCH_CACHE_TTL = int(os.environ.get('SEARCH_CACHE_TTL', 300))
+LYRICS_CACHE_TTL = int(os.environ.get('LYRICS_CACHE_TTL', 24 * 3600))
+SPOTIFY_CACHE_TTL = int(os.environ.get('SPOTIFY_CACHE_TTL', 3600))
+
+# Precarga especulativa de los primeros resultados de búsqueda (desactivada por
+# defecto en Vercel: los hilos en segundo plano se congelan tras la respuesta)
+PREFETCH_ENABLED = os.environ.get('PREFETCH_ENABLED', '0' if os.environ.get('VERCEL') else '1') == '1'
+PREFETCH_TOP_N = int(os.environ.get('PREFETCH_TOP_N', 3))
+PREFETCH_WORKERS = int(os.environ.get('PREFETCH_WORKERS', 2))
+PREFETCH_RATE = float(os.environ.get('PREFETCH_RATE', 4))
+
+# Descargas de álbumes: pistas descargadas/etiquetadas en paralelo
+ALBUM_DOWNLOAD_WORKERS = int(os.environ.get('ALBUM_DOWNLOAD_WORKERS', 4))
+
+# Playlists de Spotify: hilos de mapeo y búsquedas por segundo compartidas contra Qobuz
+SPOTIFY_PLAYLIST_WORKERS = int(os.environ.get('SPOTIFY_PLAYLIST_WORKERS', 16))
+SPOTIFY_PLAYLIST_RATE = float(os.environ.get('SPOTIFY_PLAYLIST_RATE', 20))
+# Pistas de una playlist que /api/search mapea dentro de su plazo (el resto: /api/spotify/playlist)
+SEARCH_PLAYLIST_MAX_TRACKS = int(os.environ.get('SEARCH_PLAYLIST_MAX_TRACKS', 25))
+
+# Directorio de datos locales (cola de trabajos, caché de descargas)
+DATA_DIR = os.environ.get('MUSICHUB_DATA_DIR', os.path.join(tempfile.gettempdir(), 'musichub'))
+
+# Trabajos de descarga en segundo plano
+JOBS_DB_PATH = os.environ.get('JOBS_DB_PATH', os.path.join(DATA_DIR, 'jobs.sqlite3'))
+JOB_RUNNERS = int(os.environ.get('JOB_RUNNERS', 2))
+JOB_DOWNLOAD_WORKERS = int(os.environ.get('JOB_DOWNLOAD_WORKERS', 4))
+# Segundos sin latido tras los que un trabajo en curso se da por abandonado (worker caído)
+JOB_STALE_SECONDS = float(os.environ.get('JOB_STALE_SECONDS', 60))
+DOWNLOAD_CACHE_DIR = os.environ.get('DOWNLOAD_CACHE_DIR', os.path.join(DATA_DIR, 'downloads'))
+DOWNLOAD_CACHE_MAX_MB = int(os.environ.get('DOWNLOAD_CACHE_MAX_MB', 2048))
+
+# Proxy de previews: primeros N segundos de cada pista guardados en disco
+PREVIEW_AUDIO_CACHE_DIR = os.environ.get('PREVIEW_AUDIO_CACHE_DIR', os.path.join(DATA_DIR, 'previews'))
+PREVIEW_AUDIO_CACHE_MAX_MB = int(os.environ.get('PREVIEW_AUDIO_CACHE_MAX_MB', 256))
+PREVIEW_SEGMENT_SECONDS = int(os.environ.get('PREVIEW_SEGMENT_SECONDS', 30))
+
+# Pool de cuentas de Qobuz: QOBUZ_ACCOUNTS es una lista JSON de objetos
+# {"name", "token", "app_id", "app_secret", "weight"}; QOBUZ_TOKEN es siempre la principal
+QOBUZ_CREDENTIAL_COOLDOWN = int(os.environ.get('QOBUZ_CREDENTIAL_COOLDOWN', 300))
+
+# Información de usuario/suscripción (token-info): TTL de la caché en memoria
+USER_INFO_CACHE_TTL = int(os.environ.get('USER_INFO_CACHE_TTL', 600))
+
+# Renovación automática en segundo plano (desactivada por defecto en Vercel, donde los
+# hilos se congelan tras cada respuesta: allí cada petición lanza una pasada puntual)
+RENEWAL_SCHEDULER_ENABLED = os.environ.get('RENEWAL_SCHEDULER_ENABLED', '0' if os.environ.get('VERCEL') else '1') == '1'
+RENEWAL_CHECK_INTERVAL = int(os.environ.get('RENEWAL_CHECK_INTERVAL', 6 * 3600))
+RENEWAL_THRESHOLD_DAYS = int(os.environ.get('RENEWAL_THRESHOLD_DAYS', 7))
+
+# Logging: nivel, formato (text/json), fracción de peticiones con detalle DEBUG y
+# tamaño de la cola del handler no bloqueante (lo que no quepa se descarta)
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text')
+LOG_DEBUG_SAMPLE_RATE = float(os.environ.get('LOG_DEBUG_SAMPLE_RATE', 0.01))
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))
+
+# Trazas por petición: fracción de peticiones trazadas (0 desactiva), trazas recientes
+# en memoria (/api/debug/traces) y archivo opcional de exportación OTLP/JSON
+TRACE_SAMPLE_RATE = float(os.environ.get('TRACE_SAMPLE_RATE', 1.0))
+TRACE_BUFFER_SIZE = int(os.environ.get('TRACE_BUFFER_SIZE', 100))
+TRACE_EXPORT_PATH = os.environ.get('TRACE_EXPORT_PATH', '')
+
+# Plazo por petición (/search, /download, /preview): segundos (0 desactiva), máximo de
+# llamadas externas (0 = sin tope) y segundos reservados para la etapa imprescindible
+# cuando se decide si hacer una opcional. Por debajo de la duración máxima de Vercel
+REQUEST_DEADLINE_SECONDS = float(os.environ.get('REQUEST_DEADLINE_SECONDS', 9))
+REQUEST_CALL_BUDGET = int(os.environ.get('REQUEST_CALL_BUDGET', 40))
+REQUEST_DEADLINE_RESERVE = float(os.environ.get('REQUEST_DEADLINE_RESERVE', 2))
+
+# Cortocircuitos por upstream: se abren si en las últimas CIRCUIT_WINDOW llamadas (con al
+# menos CIRCUIT_MIN_CALLS) la fracción de fallos o de llamadas más lentas que
+# CIRCUIT_SLOW_CALL_SECONDS llega a CIRCUIT_FAILURE_RATE, y prueban de nuevo tras
+# CIRCUIT_OPEN_SECONDS. Cobertura: segundo intento de los GET de HEDGE_UPSTREAMS cuando el
+# primero supera el percentil HEDGE_QUANTILE observado (vacío desactiva)
+CIRCUIT_FAILURE_RATE = float(os.environ.get('CIRCUIT_FAILURE_RATE', 0.5))
+CIRCUIT_WINDOW = int(os.environ.get('CIRCUIT_WINDOW', 20))
+CIRCUIT_MIN_CALLS = int(os.environ.get('CIRCUIT_MIN_CALLS', 10))
+CIRCUIT_SLOW_CALL_SECONDS = float(os.environ.get('CIRCUIT_SLOW_CALL_SECONDS', 5))
+CIRCUIT_OPEN_SECONDS = float(os.environ.get('CIRCUIT_OPEN_SECONDS', 30))
+HEDGE_UPSTREAMS = [u.strip() for u in os.environ.get(
+    'HEDGE_UPSTREAMS', 'qobuz.track/search,qobuz.track/get,genius.api').split(',') if u.strip()]
+HEDGE_QUANTILE = float(os.environ.get('HEDGE_QUANTILE', 0.95))
+HEDGE_MIN_DELAY_MS = float(os.environ.get('HEDGE_MIN_DELAY_MS', 50))
+
+# Timeouts adaptativos: lectura = percentil TIMEOUT_QUANTILE de las latencias recientes de
+# cada upstream x TIMEOUT_MULTIPLIER, entre TIMEOUT_MIN_SECONDS y TIMEOUT_MAX_SECONDS
+# (conexión como máximo TIMEOUT_CONNECT_MAX_SECONDS). Sin muestras se usa el de la llamada
+ADAPTIVE_TIMEOUTS = os.environ.get('ADAPTIVE_TIMEOUTS', '1') == '1'
+TIMEOUT_QUANTILE = float(os.environ.get('TIMEOUT_QUANTILE', 0.99))
+TIMEOUT_MULTIPLIER = float(os.environ.get('TIMEOUT_MULTIPLIER', 3))
+TIMEOUT_MIN_SECONDS = float(os.environ.get('TIMEOUT_MIN_SECONDS', 1))
+TIMEOUT_MAX_SECONDS = float(os.environ.get('TIMEOUT_MAX_SECONDS', 30))
+TIMEOUT_CONNECT_MAX_SECONDS = float(os.environ.get('TIMEOUT_CONNECT_MAX_SECONDS', 3.05))
+
+# Token para los endpoints de administración (/api/admin/*); sin él quedan desactivados
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN', '')
+
+# Perfilado bajo demanda: cabecera X-Profile firmada con PROFILE_SECRET (por defecto
+# ADMIN_TOKEN) o una de cada PROFILE_SAMPLE_EVERY peticiones (0 desactiva el muestreo)
+PROFILE_SECRET = os.environ.get('PROFILE_SECRET', ADMIN_TOKEN)
+PROFILE_SAMPLE_EVERY = int(os.environ.get('PROFILE_SAMPLE_EVERY', 0))
+PROFILE_DIR = os.environ.get('PROFILE_DIR', os.path.join(DATA_DIR, 'profiles'))
+PROFILE_KEEP = int(os.environ.get('PROFILE_KEEP', 50))
+
+# Grabación/reproducción de llamadas externas: HTTP_CASSETTE_MODE=record guarda cada
+# respuesta (con secretos seudonimizados) y =replay las sirve sin red, esperando el
+# tiempo original por HTTP_CASSETTE_TIME_SCALE (0 = sin espera)
+HTTP_CASSETTE_MODE = os.environ.get('HTTP_CASSETTE_MODE', '').strip().lower()
+HTTP_CASSETTE_PATH = os.environ.get('HTTP_CASSETTE_PATH', os.path.join(DATA_DIR, 'cassettes', 'upstream.jsonl.gz'))
+HTTP_CASSETTE_TIME_SCALE = float(os.environ.get('HTTP_CASSETTE_TIME_SCALE', 1.0))
+
+# Credenciales instaladas en caliente (renovación o /api/admin/credentials). Tienen
+# prioridad sobre las variables de entorno leídas al arrancar; el diccionario se
+# sustituye entero para que los lectores nunca vean una mezcla de dos juegos
+_live_credentials: Dict[str, str] = {}
+
 # Archivo donde guardar credenciales actualizadas
 CREDENTIALS_FILE = os.path.join(os.path.dirname(__file__), '..', 'qobuz_credentials.json')
 
@@ -95,29 +226,61 @@ def update_qobuz_credentials(new_credentials: Dict[str, str]) -> bool:
         print(f"Error updating Qobuz credentials: {e}")
         return False
 
+def load_qobuz_accounts() -> List[Dict[str, Any]]:
+    """
+    Cuentas adicionales del pool: variable QOBUZ_ACCOUNTS o clave ``qobuz_pool`` del archivo
+    """
+    accounts: List[Dict[str, Any]] = []
+    raw = os.environ.get('QOBUZ_ACCOUNTS')
+    if raw:
+        try:
+            parsed = json.loads(raw)
+            if isinstance(parsed, list):
+                accounts.extend(a for a in parsed if isinstance(a, dict))
+        except ValueError as e:
+            print(f"QOBUZ_ACCOUNTS no es JSON válido: {e}")
+    pool = load_credentials().get('qobuz_pool', [])
+    if isinstance(pool, list):
+        accounts.extend(a for a in pool if isinstance(a, dict))
+    return accounts
+
+def set_live_credentials(credentials: Dict[str, str]) -> None:
+    """
+    Registra las credenciales instaladas en caliente en el proceso actual; sustituyen
+    por completo al juego anterior (un campo ausente o ``None`` queda vacío, no se
+    hereda del token anterior)
+    """
+    global _live_credentials
+    _live_credentials = {k: str(v) for k, v in credentials.items() if v}
+
+def _current_credential(field: str, default: str) -> str:
+    # Con un juego instalado en caliente no se mezcla con las variables de entorno
+    live = _live_credentials
+    return live.get(field, '') if live else default
+
 def get_current_token() -> str:
     """
-    Obtiene el token actual desde variables de entorno
+    Obtiene el token actual (instalado en caliente o de variables de entorno)
     """
-    return QOBUZ_TOKEN
+    return _current_credential('token', QOBUZ_TOKEN)
 
 def get_current_user_id() -> str:
     """
-    Obtiene el User ID actual desde variables de entorno
+    Obtiene el User ID actual (instalado en caliente o de variables de entorno)
     """
-    return QOBUZ_USER_ID
+    return _current_credential('user_id', QOBUZ_USER_ID)
 
 def get_current_app_id() -> str:
     """
-    Obtiene el App ID actual desde variables de entorno
+    Obtiene el App ID actual (instalado en caliente o de variables de entorno)
     """
-    return QOBUZ_APP_ID
+    return _current_credential('app_id', QOBUZ_APP_ID)
 
 def get_current_app_secret() -> str:
     """
-    Obtiene el App Secret actual desde variables de entorno
+    Obtiene el App Secret actual (instalado en caliente o de variables de entorno)
     """
-    return QOBUZ_APP_SECRET
+    return _current_credential('app_secret', QOBUZ_APP_SECRET)
 
 def get_genius_token() -> str:
     """
@@ -130,7 +293,25 @@ CURRENT_QOBUZ_TOKEN = QOBUZ_TOKEN
 
 __all__ = [
     "QOBUZ_TOKEN", "QOBUZ_USER_ID", "QOBUZ_APP_ID", "QOBUZ_APP_SECRET", 
-    "CURRENT_QOBUZ_TOKEN", "GENIUS_TOKEN", "FLASK_DEBUG", "PORT", 
+    "CURRENT_QOBUZ_TOKEN", "GENIUS_TOKEN", "FLASK_DEBUG", "PORT", "ALBUM_DOWNLOAD_WORKERS",
+    "TRACK_CACHE_TTL", "TRACK_CACHE_SIZE", "PREVIEW_URL_CACHE_TTL", "CACHE_SQLITE_PATH", "CACHE_URL",
+    "CACHE_KEY_PREFIX", "CACHE_NETWORK_TIMEOUT", "SEARCH_CACHE_TTL", "LYRICS_CACHE_TTL", "SPOTIFY_CACHE_TTL",
+    "PREFETCH_ENABLED",
+    "PREFETCH_TOP_N", "PREFETCH_WORKERS", "PREFETCH_RATE",
+    "SPOTIFY_PLAYLIST_WORKERS", "SPOTIFY_PLAYLIST_RATE", "SEARCH_PLAYLIST_MAX_TRACKS", "DATA_DIR", "JOBS_DB_PATH",
+    "JOB_RUNNERS", "JOB_DOWNLOAD_WORKERS", "JOB_STALE_SECONDS", "DOWNLOAD_CACHE_DIR", "DOWNLOAD_CACHE_MAX_MB",
+    "PREVIEW_AUDIO_CACHE_DIR", "PREVIEW_AUDIO_CACHE_MAX_MB", "PREVIEW_SEGMENT_SECONDS",
+    "QOBUZ_CREDENTIAL_COOLDOWN", "USER_INFO_CACHE_TTL", "ADMIN_TOKEN", "load_qobuz_accounts",
+    "set_live_credentials", "RENEWAL_SCHEDULER_ENABLED", "RENEWAL_CHECK_INTERVAL", "RENEWAL_THRESHOLD_DAYS",
+    "LOG_LEVEL", "LOG_FORMAT", "LOG_DEBUG_SAMPLE_RATE", "LOG_QUEUE_SIZE",
+    "TRACE_SAMPLE_RATE", "TRACE_BUFFER_SIZE", "TRACE_EXPORT_PATH",
+    "REQUEST_DEADLINE_SECONDS", "REQUEST_CALL_BUDGET", "REQUEST_DEADLINE_RESERVE",
+    "CIRCUIT_FAILURE_RATE", "CIRCUIT_WINDOW", "CIRCUIT_MIN_CALLS", "CIRCUIT_SLOW_CALL_SECONDS",
+    "CIRCUIT_OPEN_SECONDS", "HEDGE_UPSTREAMS", "HEDGE_QUANTILE", "HEDGE_MIN_DELAY_MS",
+    "ADAPTIVE_TIMEOUTS", "TIMEOUT_QUANTILE", "TIMEOUT_MULTIPLIER", "TIMEOUT_MIN_SECONDS", "TIMEOUT_MAX_SECONDS",
+    "TIMEOUT_CONNECT_MAX_SECONDS",
+    "PROFILE_SECRET", "PROFILE_SAMPLE_EVERY", "PROFILE_DIR", "PROFILE_KEEP",
+    "HTTP_CASSETTE_MODE", "HTTP_CASSETTE_PATH", "HTTP_CASSETTE_TIME_SCALE",
     "update_qobuz_credentials", "get_current_token", "get_current_user_id",
     "get_current_app_id", "get_current_app_secret", "get_genius_token",
     "load_credentials"
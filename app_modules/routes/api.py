@@ -4,15 +4,26 @@ Endpoints principales extraídos del monolito original. Se busca mantener compat
 con la semántica previa mientras se simplifica la implementación. Falta todavía portar
 funcionalidades avanzadas (lyrics, locale forcing, matching extendido)."""
 from __future__ import annotations
-from flask import Blueprint, request, jsonify, send_file
-import os, tempfile, time, hashlib, logging
+from flask import Blueprint, request, jsonify, send_file, Response, stream_with_context
+import os, tempfile, time, hashlib, logging, json
 from datetime import datetime
-import requests
-from ..app_factory import get_downloader
-from ..config import FLASK_DEBUG
-from ..utils.metadata import add_metadata_to_file
+from urllib.parse import quote
+from ..app_factory import (get_downloader, get_job_manager, get_prefetcher, get_preview_audio_cache,
+                           get_renewal_scheduler, get_tracer, get_profiler, get_cassette,
+                           get_resilience, get_cache_backends)
+from ..config import (FLASK_DEBUG, ALBUM_DOWNLOAD_WORKERS, SPOTIFY_PLAYLIST_WORKERS, SPOTIFY_PLAYLIST_RATE,
+                      SEARCH_PLAYLIST_MAX_TRACKS)
+from ..utils.metadata import add_metadata_to_file, build_track_metadata, get_cover_url
 from ..utils.token import get_token_info, format_token_info_display
-from ..services.auto_renewal import check_and_renew_if_needed, QobuzCredentialRenewer
+from ..services.album import AlbumDownloader
+from ..services.playlist import SpotifyPlaylistImporter
+from ..services.tracks import Track
+from ..utils.zipstream import ZipStream
+from ..utils.auth import require_admin
+from ..utils.deadline import current_budget, optional_stage, with_deadline
+from ..utils.http import upstream_get
+from ..utils.logs import capture_logs, current_request_id, stats as logging_stats
+from ..utils.metrics import PROXIED_BYTES, REGISTRY, cache_families, executor_families
 
 api_bp = Blueprint('api', __name__)
 logger = logging.getLogger(__name__)
@@ -20,6 +31,41 @@ if not logger.handlers:
     logging.basicConfig(level=logging.INFO)
 
 downloader = get_downloader()
+prefetcher = get_prefetcher()
+renewal_scheduler = get_renewal_scheduler()
+
+
+def _counted(kind: str, chunks):
+    """Reemite ``chunks`` contando los bytes servidos en ``musichub_proxied_bytes_total``."""
+    counter = PROXIED_BYTES.labels(kind)
+    for chunk in chunks:
+        counter.inc(len(chunk))
+        yield chunk
+
+
+def _count_response(kind: str, response):
+    if response.content_length:
+        PROXIED_BYTES.labels(kind).inc(response.content_length)
+    return response
+
+
+def _out_of_time():
+    """504 si la petición agotó su plazo o sus llamadas (``None`` si no): así un fallo por
+    falta de tiempo no se confunde con una pista inexistente."""
+    budget = current_budget()
+    if budget is None or not budget.partial:
+        return None
+    return jsonify({'success': False, 'error': 'Tiempo agotado consultando servicios externos',
+                    'deadline': budget.summary()}), 504
+
+
+def _playlist_importer() -> SpotifyPlaylistImporter:
+    return SpotifyPlaylistImporter(downloader, max_workers=SPOTIFY_PLAYLIST_WORKERS, rate_per_second=SPOTIFY_PLAYLIST_RATE)
+
+
+def _playlist_item(mapped: Track) -> dict:
+    """Formato de resultado de búsqueda para una pista de playlist ya mapeada a Qobuz."""
+    return mapped.result(mapped_from_spotify=True)
 
 @api_bp.route('/test')
 def api_test():
@@ -30,13 +76,15 @@ def api_test():
 def debug_env():
     """Endpoint para verificar variables de entorno en producción"""
     import os
-    from ..config import GENIUS_TOKEN, QOBUZ_TOKEN
-    
+    from ..config import get_current_token, get_genius_token
+    # Valores vigentes (incluidas las credenciales renovadas en caliente), no los del arranque
+    genius_token, qobuz_token = get_genius_token(), get_current_token()
+
     return jsonify({
-        "genius_token_configured": bool(GENIUS_TOKEN and GENIUS_TOKEN != "tu_token_de_genius_aqui"),
-        "genius_token_preview": GENIUS_TOKEN[:20] + "..." if GENIUS_TOKEN else "NO_SET",
-        "qobuz_token_configured": bool(QOBUZ_TOKEN),
-        "qobuz_token_preview": QOBUZ_TOKEN[:20] + "..." if QOBUZ_TOKEN else "NO_SET",
+        "genius_token_configured": bool(genius_token and genius_token != "tu_token_de_genius_aqui"),
+        "genius_token_preview": genius_token[:20] + "..." if genius_token else "NO_SET",
+        "qobuz_token_configured": bool(qobuz_token),
+        "qobuz_token_preview": qobuz_token[:20] + "..." if qobuz_token else "NO_SET",
         "env_genius": bool(os.environ.get('GENIUS_TOKEN')),
         "env_qobuz": bool(os.environ.get('QOBUZ_TOKEN')),
         "flask_env": os.environ.get('FLASK_ENV', 'not_set')
@@ -47,134 +95,54 @@ def debug_lyrics_test():
     """Endpoint para probar la funcionalidad de búsqueda por letras"""
     import traceback
     import datetime
-    import io
-    import sys
-    
+    import urllib.parse
+    from ..config import GENIUS_TOKEN
+
     debug_info = []
-    
-    timestamp = datetime.datetime.now().isoformat()
-    debug_info.append(f"[DEBUG] Timestamp del deployment: {timestamp}")
-    
+    results: list[dict] = []
+    test_phrase = "y si te digo que es para toda la vida pero no como esos"
+    debug_info.append(f"[DEBUG] Timestamp del deployment: {datetime.datetime.now().isoformat()}")
+    debug_info.append(f"[DEBUG] Request ID: {current_request_id()}")
+
     try:
-        test_phrase = "y si te digo que es para toda la vida pero no como esos"
         debug_info.append(f"[DEBUG] Iniciando test de búsqueda por letras con: '{test_phrase}'")
-        
-        # Verificar configuración antes de la búsqueda
-        from ..config import GENIUS_TOKEN
         debug_info.append(f"[DEBUG] Token disponible: {bool(GENIUS_TOKEN)}")
-        debug_info.append(f"[DEBUG] Token preview: {GENIUS_TOKEN[:20]}..." if GENIUS_TOKEN else "[DEBUG] No token")
-        
-        debug_info.append("[DEBUG] ⚠️ VERSIÓN CON LOGGING DETALLADO ACTIVADA")
-        
-        # Capturar todos los prints durante la búsqueda
-        old_stdout = sys.stdout
-        captured_output = io.StringIO()
-        sys.stdout = captured_output
-        
-        try:
-            # Intentar la búsqueda
-            debug_info.append("[DEBUG] 🚀 Iniciando búsqueda con captura de logs...")
-            results = downloader.search_by_lyrics(test_phrase, limit=1)
-            debug_info.append(f"[DEBUG] Búsqueda completada, resultados: {len(results)}")
-            
-            # Restaurar stdout y capturar lo que se imprimió
-            sys.stdout = old_stdout
-            captured_logs = captured_output.getvalue()
-            
-            if captured_logs:
-                debug_info.append("[DEBUG] 📝 Logs capturados durante la búsqueda:")
-                for line in captured_logs.strip().split('\n'):
-                    if line.strip():
-                        debug_info.append(f"  {line}")
-            else:
-                debug_info.append("[DEBUG] ❌ No se capturaron logs de la búsqueda")
-                
-        except Exception as search_error:
-            sys.stdout = old_stdout
-            debug_info.append(f"[DEBUG] 💥 Error durante la búsqueda: {str(search_error)}")
-            debug_info.append(f"[DEBUG] 📋 Traceback: {traceback.format_exc()}")
-            
-        # Si no hay resultados, intentar búsqueda simple
-        if not results:
-            debug_info.append("[DEBUG] Sin resultados, intentando búsqueda simple...")
+
+        # Registros de esta petición (DEBUG incluido) en un búfer propio: las peticiones
+        # concurrentes no se mezclan ni se toca sys.stdout
+        with capture_logs() as captured:
             try:
-                # Probar directamente la API de Genius
-                import requests
-                import urllib.parse
-                
-                headers = {
-                    'Authorization': f'Bearer {GENIUS_TOKEN}',
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-                }
-                
-                encoded_query = urllib.parse.quote("Robleis POV")
-                api_url = f"https://api.genius.com/search?q={encoded_query}"
-                
-                debug_info.append(f"[DEBUG] Probando API directa: {api_url}")
-                response = requests.get(api_url, headers=headers, timeout=5)
-                debug_info.append(f"[DEBUG] Response status: {response.status_code}")
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    hits = data.get('response', {}).get('hits', [])
-                    debug_info.append(f"[DEBUG] API responde OK, hits: {len(hits)}")
-                else:
-                    debug_info.append(f"[DEBUG] API error: {response.text[:200]}")
-                    
-            except Exception as e:
-                debug_info.append(f"[DEBUG] Error en test directo: {str(e)}")
-        
-        return jsonify({
-            "success": True,
-            "test_phrase": test_phrase,
-            "results_count": len(results),
-            "results": results[:1] if results else [],
-            "debug_info": debug_info,
-            "message": "Test de búsqueda por letras completado"
-        })
-        
-    except Exception as e:
-        debug_info.append(f"[DEBUG] Error general: {str(e)}")
-        debug_info.append(f"[DEBUG] Traceback: {traceback.format_exc()}")
-        
-        return jsonify({
-            "success": False,
-            "error": str(e),
-            "test_phrase": test_phrase,
-            "debug_info": debug_info,
-            "traceback": traceback.format_exc()
-        }), 500
-        
-        # Si no hay resultados, intentar una búsqueda más simple
+                results = downloader.search_by_lyrics(test_phrase, limit=1)
+                debug_info.append(f"[DEBUG] Búsqueda completada, resultados: {len(results)}")
+            except Exception as search_error:
+                debug_info.append(f"[DEBUG] Error durante la búsqueda: {str(search_error)}")
+                debug_info.append(f"[DEBUG] Traceback: {traceback.format_exc()}")
+        if captured:
+            debug_info.append("[DEBUG] Logs capturados durante la búsqueda:")
+            debug_info.extend(f"  {line}" for line in captured)
+        else:
+            debug_info.append("[DEBUG] No se capturaron logs de la búsqueda")
+
+        # Si no hay resultados, probar directamente la API de Genius
         if not results:
             debug_info.append("[DEBUG] Sin resultados, intentando búsqueda simple...")
             try:
-                # Probar directamente la API de Genius
-                import requests
-                import urllib.parse
-                
                 headers = {
                     'Authorization': f'Bearer {GENIUS_TOKEN}',
                     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
                 }
-                
-                encoded_query = urllib.parse.quote("Robleis POV")
-                api_url = f"https://api.genius.com/search?q={encoded_query}"
-                
+                api_url = f"https://api.genius.com/search?q={urllib.parse.quote('Robleis POV')}"
                 debug_info.append(f"[DEBUG] Probando API directa: {api_url}")
-                response = requests.get(api_url, headers=headers, timeout=5)
+                response = upstream_get('genius.api', api_url, headers=headers, timeout=5)
                 debug_info.append(f"[DEBUG] Response status: {response.status_code}")
-                
                 if response.status_code == 200:
-                    data = response.json()
-                    hits = data.get('response', {}).get('hits', [])
+                    hits = response.json().get('response', {}).get('hits', [])
                     debug_info.append(f"[DEBUG] API responde OK, hits: {len(hits)}")
                 else:
                     debug_info.append(f"[DEBUG] API error: {response.text[:200]}")
-                    
             except Exception as e:
                 debug_info.append(f"[DEBUG] Error en test directo: {str(e)}")
-        
+
         return jsonify({
             "success": True,
             "test_phrase": test_phrase,
@@ -183,11 +151,10 @@ def debug_lyrics_test():
             "debug_info": debug_info,
             "message": "Test de búsqueda por letras completado"
         })
-        
+
     except Exception as e:
         debug_info.append(f"[DEBUG] Error general: {str(e)}")
         debug_info.append(f"[DEBUG] Traceback: {traceback.format_exc()}")
-        
         return jsonify({
             "success": False,
             "error": str(e),
@@ -196,6 +163,65 @@ def debug_lyrics_test():
             "traceback": traceback.format_exc()
         }), 500
 
+@api_bp.route('/stats')
+def stats():
+    """Estadísticas internas de cachés y precarga (para ajustar PREFETCH_TOP_N, TTLs, etc.)."""
+    cassette = get_cassette()
+    return jsonify({
+        'success': True,
+        'cassette': cassette.stats() if cassette else None,
+        'resilience': get_resilience().stats(),
+        'prefetch': prefetcher.stats(),
+        'formats': downloader.formats.stats(),
+        'credentials': downloader.pool.stats(),
+        'logging': logging_stats(),
+        'caches': {
+            'track': downloader.track_cache.stats(),
+            'search': downloader.search_cache.stats(),
+            'lyrics': downloader.lyrics_cache.stats(),
+            'spotify': downloader.spotify.cache.stats(),
+            'preview_url': downloader.preview_cache.stats(),
+            'preview_audio': get_preview_audio_cache().stats(),
+            'user_info': downloader.user_info_cache.stats(),
+        },
+        'cache_backends': [backend.stats() for backend in get_cache_backends()],
+    })
+
+def _collect_metrics():
+    """Valores que ya llevan las cachés, el pool y los ejecutores, leídos al exponer."""
+    yield from cache_families({
+        'track': downloader.track_cache.stats(),
+        'search': downloader.search_cache.stats(),
+        'lyrics': downloader.lyrics_cache.stats(),
+        'spotify': downloader.spotify.cache.stats(),
+        'preview_url': downloader.preview_cache.stats(),
+        'preview_audio': get_preview_audio_cache().stats(),
+        'user_info': downloader.user_info_cache.stats(),
+    })
+    accounts = downloader.pool.stats()['accounts']
+    yield ('musichub_credential_in_flight', 'gauge', 'Peticiones en curso por credencial de Qobuz',
+           [({'account': a['name']}, a['in_flight']) for a in accounts])
+    yield ('musichub_credential_healthy', 'gauge', 'Credencial disponible (1) o expulsada (0)',
+           [({'account': a['name']}, 1 if a['healthy'] else 0) for a in accounts])
+    yield ('musichub_credential_requests_total', 'counter', 'Peticiones atendidas por credencial',
+           [({'account': a['name']}, a['requests']) for a in accounts])
+    yield from executor_families({'qobuz_io': downloader.io_pool_stats()})
+    yield ('musichub_prefetch_pending', 'gauge', 'Precargas encoladas o en curso',
+           [({}, prefetcher.stats()['pending'])])
+
+
+REGISTRY.register_collector('api', _collect_metrics)
+
+
+@api_bp.route('/metrics')
+def metrics():
+    """Métricas en formato de exposición de Prometheus (latencias, cachés, pools, bytes)."""
+    try:
+        return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+    except Exception as e:
+        logger.exception("Error en /metrics")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @api_bp.route('/token-info')
 def token_info():
     try:
@@ -214,6 +240,7 @@ def token_info_display():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @api_bp.route('/search', methods=['POST'])
+@with_deadline
 def search():
     try:
         data = request.get_json() or {}
@@ -226,76 +253,31 @@ def search():
         
         results: list[dict] = []
         lyrics_results: list[dict] = []
+        playlist_info = None
         
         if source == 'qobuz':
             # Primero buscar por letra si hay modo lyrics
             if mode == 'lyrics':
-                print(f"[API DEBUG] Iniciando búsqueda por letras con frase: '{query}'")
-                lyrics_results = downloader.search_by_lyrics(query, limit=1)
-                print(f"[API DEBUG] Resultados de búsqueda por letras: {len(lyrics_results)} encontrados")
+                # Etapa opcional: no puede gastar el tiempo reservado a la búsqueda normal
+                with optional_stage():
+                    lyrics_results = downloader.search_by_lyrics(query, limit=1)
                 logger.info("/search LYRICS mode: frase='%s' -> lyrics_results=%d", query, len(lyrics_results))
                 
-                for i, t in enumerate(lyrics_results):
-                    print(f"[API DEBUG] Procesando resultado {i+1}: {t.get('title')} - {t.get('performer', {}).get('name', 'Unknown')}")
-                    
-                    # Construir información del álbum con artista
-                    album_info = t.get('album', {})
-                    album_title = album_info.get('title', 'Unknown')
-                    album_artist = album_info.get('artist', {}).get('name', '') if album_info.get('artist') else ''
-                    
-                    # Formatear álbum con artista si está disponible
-                    if album_artist and album_artist != t.get('performer', {}).get('name', ''):
-                        album_display = f"{album_title} - {album_artist}"
-                    else:
-                        album_display = album_title
-                    
-                    item = {
-                        'id': t.get('id'),
-                        'title': t.get('title'),
-                        'artist': t.get('performer', {}).get('name', 'Unknown'),
-                        'album': album_display,
-                        'duration': t.get('duration', 0),
-                        'cover': t.get('album', {}).get('image', {}).get('small', ''),
-                        'source': t.get('source') or 'qobuz'
-                    }
-                    for extra in ['found_by_lyrics','genius_match','genius_url','matched_fragment','lyrics_fragment']:
-                        if t.get(extra):
-                            item[extra] = t.get(extra)
+                # ``search_by_lyrics`` ya devuelve resultados proyectados con sus marcas
+                for i, item in enumerate(lyrics_results):
+                    logger.debug("/search LYRICS item %d: %s - %s", i + 1, item['title'], item['artist'])
                     results.append(item)
                     
                 if lyrics_results:
-                    print(f"[API DEBUG] Primer resultado por letras: '{results[0]['title']}' source={results[0].get('source')} genius={results[0].get('genius_match')}")
-                    logger.info("/search LYRICS first item: title='%s' source=%s genius=%s", results[0]['title'], results[0].get('source'), results[0].get('genius_match'))
-                else:
-                    print("[API DEBUG] ❌ No se encontraron resultados por letras")
+                    logger.debug("/search LYRICS first item: title='%s' source=%s genius=%s", results[0]['title'], results[0].get('source'), results[0].get('genius_match'))
             
             # Luego búsqueda normal
             tracks = downloader.search_tracks_with_locale(query, limit=15, force_latin=True)
             for t in tracks:
+                item = t.result()
                 # Evitar duplicados con resultados por letra
-                if any((existing.get('id') and existing.get('id') == t.get('id')) or (existing.get('title') == t.get('title') and existing.get('artist') == (t.get('performer', {}) or {}).get('name', 'Unknown')) for existing in results):
+                if any((existing.get('id') and existing.get('id') == item['id']) or (existing.get('title') == item['title'] and existing.get('artist') == item['artist']) for existing in results):
                     continue
-                
-                # Construir información del álbum con artista
-                album_info = t.get('album', {})
-                album_title = album_info.get('title', 'Unknown')
-                album_artist = album_info.get('artist', {}).get('name', '') if album_info.get('artist') else ''
-                
-                # Formatear álbum con artista si está disponible
-                if album_artist and album_artist != t.get('performer', {}).get('name', ''):
-                    album_display = f"{album_title} - {album_artist}"
-                else:
-                    album_display = album_title
-                
-                item = {
-                    'id': t.get('id'),
-                    'title': t.get('title'),
-                    'artist': t.get('performer', {}).get('name', 'Unknown'),
-                    'album': album_display,
-                    'duration': t.get('duration', 0),
-                    'cover': t.get('album', {}).get('image', {}).get('small', ''),
-                    'source': 'qobuz'
-                }
                 results.append(item)
 
         elif source == 'spotify':
@@ -306,27 +288,7 @@ def search():
                     if sp_info:
                         mapped = downloader.search_track_from_spotify_info(sp_info)
                         if mapped:
-                            # Construir información del álbum con artista
-                            album_info = mapped.get('album', {})
-                            album_title = album_info.get('title', 'Unknown')
-                            album_artist = album_info.get('artist', {}).get('name', '') if album_info.get('artist') else ''
-                            
-                            # Formatear álbum con artista si está disponible
-                            if album_artist and album_artist != mapped.get('performer', {}).get('name', ''):
-                                album_display = f"{album_title} - {album_artist}"
-                            else:
-                                album_display = album_title
-                            
-                            results.append({
-                                'id': mapped.get('id'),
-                                'title': mapped.get('title'),
-                                'artist': mapped.get('performer', {}).get('name','Unknown'),
-                                'album': album_display,
-                                'duration': mapped.get('duration',0),
-                                'cover': mapped.get('album', {}).get('image', {}).get('small',''),
-                                'source': 'qobuz',
-                                'mapped_from_spotify': True
-                            })
+                            results.append(mapped.result(mapped_from_spotify=True))
                         else:
                             # Fallback: buscar directamente usando título + artista si se obtuvo info
                             artist = sp_info.get('artist','')
@@ -334,50 +296,23 @@ def search():
                             simple_query = f"{title} {artist}".strip()
                             if simple_query:
                                 for t in downloader.search_tracks_with_locale(simple_query, limit=10, force_latin=True):
-                                    # Construir información del álbum con artista
-                                    album_info = t.get('album', {})
-                                    album_title = album_info.get('title', 'Unknown')
-                                    album_artist = album_info.get('artist', {}).get('name', '') if album_info.get('artist') else ''
-                                    
-                                    # Formatear álbum con artista si está disponible
-                                    if album_artist and album_artist != t.get('performer', {}).get('name', ''):
-                                        album_display = f"{album_title} - {album_artist}"
-                                    else:
-                                        album_display = album_title
-                                    
-                                    results.append({
-                                        'id': t.get('id'),
-                                        'title': t.get('title'),
-                                        'artist': t.get('performer', {}).get('name','Unknown'),
-                                        'album': album_display,
-                                        'duration': t.get('duration',0),
-                                        'cover': t.get('album', {}).get('image', {}).get('small',''),
-                                        'source': 'qobuz',
-                                        'spotify_fallback': True
-                                    })
+                                    results.append(t.result(spotify_fallback=True))
+                elif t_type == 'playlist' and s_id:
+                    importer = _playlist_importer()
+                    playlist = importer.load(s_id)
+                    if playlist:
+                        # Dentro del plazo de /search solo se mapean las primeras pistas; la
+                        # playlist completa se sigue en /spotify/playlist (NDJSON)
+                        head = playlist['tracks'][:SEARCH_PLAYLIST_MAX_TRACKS]
+                        for entry in importer.map_all(head):
+                            if entry['match']:
+                                results.append(_playlist_item(entry['match']))
+                        playlist_info = {'id': s_id, 'name': playlist['name'], 'total': len(playlist['tracks']),
+                                         'mapped': len(head), 'truncated': len(head) < len(playlist['tracks']),
+                                         'stream_url': '/api/spotify/playlist'}
             else:
                 tracks = downloader.search_tracks_with_locale(query, limit=15, force_latin=True)
-                for track in tracks:
-                    # Construir información del álbum con artista
-                    album_info = track.get('album', {})
-                    album_title = album_info.get('title', 'Unknown')
-                    album_artist = album_info.get('artist', {}).get('name', '') if album_info.get('artist') else ''
-                    
-                    # Formatear álbum con artista si está disponible
-                    if album_artist and album_artist != track.get('performer', {}).get('name', ''):
-                        album_display = f"{album_title} - {album_artist}"
-                    else:
-                        album_display = album_title
-                    
-                    results.append({
-                        'id': track.get('id'),
-                        'title': track.get('title'),
-                        'artist': track.get('performer', {}).get('name', 'Unknown'),
-                        'album': album_display,
-                        'duration': track.get('duration', 0),
-                        'cover': track.get('album', {}).get('image', {}).get('small', ''),
-                        'source': 'qobuz'
-                    })
+                results.extend(track.result() for track in tracks)
         # Poner resultados por letra primero y, si existen, limitar a mostrar solo uno de lyrics
         if results:
             lyrics_items = [r for r in results if r.get('found_by_lyrics')]
@@ -402,7 +337,16 @@ def search():
         except Exception:
             pass
 
+        prefetcher.schedule([r.get('id') for r in results if r.get('source') != 'genius'])
+
         payload = {'success': True, 'results': results, 'total': len(results)}
+        if playlist_info:
+            payload['playlist'] = playlist_info
+        budget = current_budget()
+        if budget is not None and budget.partial:
+            # Lo que se pudo reunir dentro del plazo; ``skipped`` dice qué se omitió
+            payload.update({'partial': True, 'skipped': list(budget.skipped)})
+            logger.warning("/search parcial q='%s': %s", query, budget.summary())
         if FLASK_DEBUG:
             try:
                 payload['debug'] = {
@@ -418,7 +362,64 @@ def search():
         logger.exception("Error en /search")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+def _compact_track(t: dict) -> dict:
+    """Metadatos mínimos de una pista para que la UI prerenderice detalles y calidades."""
+    return Track.from_qobuz(t).compact()
+
+@api_bp.route('/tracks/batch', methods=['POST'])
+def tracks_batch():
+    """Metadatos compactos de muchas pistas en una sola petición (``track/get`` en paralelo y cacheado)."""
+    try:
+        data = request.get_json() or {}
+        track_ids = data.get('track_ids') or []
+        if not isinstance(track_ids, list) or not track_ids:
+            return jsonify({'success': False, 'error': 'track_ids requerido (lista)'}), 400
+        if len(track_ids) > 100:
+            return jsonify({'success': False, 'error': 'Máximo 100 track_ids por petición'}), 400
+        infos = downloader.get_tracks_info_batch(track_ids)
+        tracks = [_compact_track(info) for info in infos.values() if info]
+        not_found = [tid for tid, info in infos.items() if not info]
+        return jsonify({'success': True, 'tracks': tracks, 'not_found': not_found})
+    except Exception as e:
+        logger.exception("Error en /tracks/batch")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@api_bp.route('/spotify/playlist', methods=['POST'])
+def spotify_playlist():
+    """Mapea una playlist de Spotify a Qobuz emitiendo NDJSON a medida que se resuelve cada pista.
+
+    Líneas: ``{"type": "playlist", ...}``, una ``{"type": "track", ...}`` por pista
+    (en orden de finalización, con ``index`` original) y ``{"type": "done", ...}``.
+    """
+    try:
+        data = request.get_json() or {}
+        url = data.get('url') or data.get('query', '')
+        t_type, s_id = downloader.spotify.extract_spotify_id(url)
+        if t_type != 'playlist' or not s_id:
+            return jsonify({'success': False, 'error': 'URL de playlist de Spotify no válida'}), 400
+        importer = _playlist_importer()
+        playlist = importer.load(s_id)
+        if not playlist:
+            return jsonify({'success': False, 'error': 'No se pudo leer la playlist'}), 404
+
+        def generate():
+            started = time.time()
+            matched = 0
+            yield json.dumps({'type': 'playlist', 'id': s_id, 'name': playlist['name'], 'owner': playlist['owner'], 'total': len(playlist['tracks'])}, ensure_ascii=False) + '\n'
+            for entry in importer.iter_mapped(playlist['tracks']):
+                item = _playlist_item(entry['match']) if entry['match'] else None
+                matched += 1 if item else 0
+                sp = entry['spotify']
+                yield json.dumps({'type': 'track', 'index': entry['index'], 'spotify': {'name': sp.get('name'), 'artist': sp.get('artist'), 'duration': sp.get('duration')}, 'result': item}, ensure_ascii=False) + '\n'
+            yield json.dumps({'type': 'done', 'matched': matched, 'total': len(playlist['tracks']), 'elapsed': round(time.time() - started, 3)}) + '\n'
+
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    except Exception as e:
+        logger.exception("Error en /spotify/playlist")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @api_bp.route('/download', methods=['POST'])
+@with_deadline
 def download():
     try:
         data = request.get_json() or {}
@@ -426,13 +427,16 @@ def download():
         quality = data.get('quality', '6')
         if not track_id:
             return jsonify({'success': False, 'error': 'Track ID requerido'}), 400
+        prefetcher.record_use(track_id)
         track_info = downloader.get_track_info(track_id)
         if not track_info:
-            return jsonify({'success': False, 'error': 'Track no encontrado'}), 404
-        download_url = downloader.get_track_url(track_id, quality)
-        if download_url:
-            return jsonify({'success': True,'download_url': download_url,'quality': downloader.quality_map.get(quality, {}).get('name',''),'track_info': {'title': track_info.get('title'),'artist': track_info.get('performer', {}).get('name'),'album': track_info.get('album', {}).get('title')}})
-        return jsonify({'success': False,'error': 'No se pudo obtener enlace de descarga'}), 400
+            return _out_of_time() or (jsonify({'success': False, 'error': 'Track no encontrado'}), 404)
+        # Formato elegido según lo que ofrece la pista (una sola llamada a getFileUrl)
+        resolved = downloader.resolve_download(track_id, quality)
+        if resolved:
+            delivered = {k: resolved.get(k) for k in ('format_id', 'name', 'ext', 'bit_depth', 'sampling_rate', 'mime_type')}
+            return jsonify({'success': True,'download_url': resolved['url'],'quality': resolved['name'],'requested_quality': str(quality),'format': delivered,'track_info': {'title': track_info.get('title'),'artist': track_info.get('performer', {}).get('name'),'album': track_info.get('album', {}).get('title')}})
+        return _out_of_time() or (jsonify({'success': False,'error': 'No se pudo obtener enlace de descarga'}), 400)
     except Exception as e:
         logger.exception("Error en /download")
         return jsonify({'success': False,'error': str(e)}), 500
@@ -445,10 +449,10 @@ def proxy_download():
         track_id = request.args.get('track_id')
         if not url:
             return jsonify({'success': False,'error': 'URL requerida'}), 400
-        response = requests.get(url, stream=True, timeout=30)
+        response = upstream_get('qobuz.cdn', url, stream=True, timeout=30)
         response.raise_for_status()
         temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(filename)[1])
-        for chunk in response.iter_content(chunk_size=8192):
+        for chunk in _counted('proxy_download', response.iter_content(chunk_size=8192)):
             if chunk:
                 temp_file.write(chunk)
         temp_file.close()
@@ -456,43 +460,9 @@ def proxy_download():
             try:
                 t_info = downloader.get_track_info(track_id)
                 if t_info:
-                    album_info = t_info.get('album', {})
-                    images = album_info.get('image', {}) if isinstance(album_info, dict) else {}
-                    cover_url = images.get('large') or images.get('small')
-                    performer = t_info.get('performer', {})
-                    artist_name = performer.get('name', '') if isinstance(performer, dict) else ''
-                    
-                    # Obtener artista del álbum
-                    album_artist_info = album_info.get('artist', {}) if isinstance(album_info, dict) else {}
-                    album_artist_name = album_artist_info.get('name', '') if isinstance(album_artist_info, dict) else ''
-                    
-                    # Obtener género
-                    genre_info = album_info.get('genre', {}) if isinstance(album_info, dict) else {}
-                    genre_name = genre_info.get('name', '') if isinstance(genre_info, dict) else ''
-                    
-                    # Obtener año
-                    released_at = album_info.get('released_at', '') if isinstance(album_info, dict) else ''
-                    year = ''
-                    if isinstance(released_at, int):
-                        try:
-                            from datetime import datetime
-                            year = str(datetime.fromtimestamp(released_at).year)
-                        except Exception:
-                            pass
-                    elif isinstance(released_at, str) and len(released_at) >= 4:
-                        year = released_at[:4]
-                    
+                    cover_url = get_cover_url(t_info.get('album', {}))
                     # Construir metadatos completos
-                    metadata = {
-                        'title': t_info.get('title', ''),
-                        'artist': artist_name,
-                        'album': album_info.get('title', '') if isinstance(album_info, dict) else '',
-                        'album_artist': album_artist_name,
-                        'year': year,
-                        'track_number': str(t_info.get('track_number', '')) if t_info.get('track_number') else '',
-                        'disc_number': str(t_info.get('media_number', '')) if t_info.get('media_number') else '',
-                        'genre': genre_name
-                    }
+                    metadata = build_track_metadata(t_info)
                     add_metadata_to_file(temp_file.name, metadata, cover_url)
             except Exception:
                 pass
@@ -501,50 +471,167 @@ def proxy_download():
         logger.exception("Error en /proxy-download")
         return jsonify({'success': False,'error': str(e)}), 500
 
+@api_bp.route('/album/download')
+def album_download():
+    """Descarga un álbum completo como ZIP (stored) emitido mientras se descargan las pistas."""
+    try:
+        album_id = request.args.get('album_id')
+        quality = request.args.get('quality', '6')
+        if not album_id:
+            return jsonify({'success': False,'error': 'Album ID requerido'}), 400
+        album_downloader = AlbumDownloader(downloader, max_workers=ALBUM_DOWNLOAD_WORKERS)
+        prepared = album_downloader.prepare(album_id, quality)
+        if not prepared:
+            return jsonify({'success': False,'error': 'Álbum no encontrado'}), 404
+        if not prepared['tracks']:
+            return jsonify({'success': False,'error': 'El álbum no tiene pistas disponibles'}), 404
+        filename = album_downloader.archive_name(prepared)
+        headers = {'Content-Disposition': f"attachment; filename*=UTF-8''{quote(filename)}"}
+        return Response(stream_with_context(_counted('album_zip', album_downloader.iter_zip(prepared))), mimetype='application/zip', headers=headers)
+    except Exception as e:
+        logger.exception("Error en /album/download")
+        return jsonify({'success': False,'error': str(e)}), 500
+
 @api_bp.route('/preview', methods=['POST'])
+@with_deadline
 def get_preview():
     try:
         data = request.get_json() or {}
         track_id = data.get('track_id')
         if not track_id:
             return jsonify({'success': False,'error': 'Track ID requerido'}), 400
+        prefetcher.record_use(track_id)
+        # Primero los metadatos: un id desconocido no llega a pedir getFileUrl
         track_info = downloader.get_track_info(track_id)
         if not track_info:
-            return jsonify({'success': False,'error': 'Track no encontrado'}), 404
-        preview_url = None
-        # Intento directo
-        for field in ['preview_url', 'preview', 'sample_url', 'stream_url']:
-            if field in track_info and track_info[field]:
-                preview_url = track_info[field]; break
-        if not preview_url:
-            ts = str(int(time.time()))
-            try:
-                hash_string = f"trackgetFileUrlformat_id5intentstreamtrack_id{track_id}{ts}{downloader.app_secret}"
-                sig = hashlib.md5(hash_string.encode('utf-8')).hexdigest()
-                params = {'request_ts': ts,'request_sig': sig,'track_id': track_id,'format_id': '5','intent': 'stream','sample': 'true','app_id': downloader.app_id,'user_auth_token': downloader.token}
-                r = downloader.session.get(f"{downloader.base_url}/track/getFileUrl", params=params, timeout=10)
-                if r.status_code == 200:
-                    preview_url = r.json().get('url')
-            except Exception:
-                pass
-        if not preview_url:
-            stream_url = downloader.get_track_url(track_id, '5')
-            if stream_url:
-                preview_url = stream_url
+            return _out_of_time() or (jsonify({'success': False,'error': 'Track no encontrado'}), 404)
+        preview_url = downloader.resolve_preview_url(track_id, track_info)
         if preview_url:
-            return jsonify({'success': True,'preview_url': preview_url,'track_info': {'title': track_info.get('title', 'Unknown'),'artist': track_info.get('performer', {}).get('name', 'Unknown'),'album': track_info.get('album', {}).get('title', 'Unknown'),'cover': track_info.get('album', {}).get('image', {}).get('small', '')}})
-        return jsonify({'success': False,'error': 'Preview no disponible'}), 404
+            stream_url = f"/api/preview/audio/{quote(str(track_id))}"
+            return jsonify({'success': True,'preview_url': preview_url,'stream_url': stream_url,'track_info': {'title': track_info.get('title', 'Unknown'),'artist': track_info.get('performer', {}).get('name', 'Unknown'),'album': track_info.get('album', {}).get('title', 'Unknown'),'cover': track_info.get('album', {}).get('image', {}).get('small', '')}})
+        return _out_of_time() or (jsonify({'success': False,'error': 'Preview no disponible'}), 404)
     except Exception as e:
         logger.exception("Error en /preview")
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@api_bp.route('/preview/audio/<track_id>')
+def preview_audio(track_id):
+    """Audio de la preview servido desde la caché en disco (admite ``Range``)."""
+    try:
+        path = get_preview_audio_cache().get_segment(track_id)
+        if not path:
+            return jsonify({'success': False, 'error': 'Preview no disponible'}), 404
+        # conditional=True: respuestas 206 a peticiones Range y validación por ETag
+        response = send_file(path, mimetype='audio/mpeg', conditional=True, max_age=86400)
+        response.headers['Accept-Ranges'] = 'bytes'
+        return _count_response('preview_audio', response)
+    except Exception as e:
+        logger.exception("Error en /preview/audio")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@api_bp.route('/jobs', methods=['POST'])
+def submit_job():
+    """Encola una descarga larga (pista, álbum o playlist) y devuelve el trabajo creado."""
+    try:
+        data = request.get_json() or {}
+        kind = data.get('type', 'track')
+        quality = str(data.get('quality', '6'))
+        required = {'track': 'track_id', 'album': 'album_id', 'playlist': 'url'}
+        field = required.get(kind)
+        if not field:
+            return jsonify({'success': False, 'error': f'Tipo de trabajo no soportado: {kind}'}), 400
+        if not data.get(field):
+            return jsonify({'success': False, 'error': f'{field} requerido'}), 400
+        job = get_job_manager().submit(kind, {field: data[field], 'quality': quality})
+        return jsonify({'success': True, 'job': job}), 202
+    except Exception as e:
+        logger.exception("Error en POST /jobs")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@api_bp.route('/jobs', methods=['GET'])
+def list_jobs():
+    try:
+        limit = min(int(request.args.get('limit', 50)), 200)
+        return jsonify({'success': True, 'jobs': get_job_manager().list(limit)})
+    except Exception as e:
+        logger.exception("Error en GET /jobs")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@api_bp.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = get_job_manager().get(job_id)
+    if not job:
+        return jsonify({'success': False, 'error': 'Trabajo no encontrado'}), 404
+    return jsonify({'success': True, 'job': job})
+
+@api_bp.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    job = get_job_manager().cancel(job_id)
+    if not job:
+        return jsonify({'success': False, 'error': 'Trabajo no encontrado'}), 404
+    return jsonify({'success': True, 'job': job})
+
+@api_bp.route('/jobs/<job_id>/result')
+def job_result(job_id):
+    """Entrega el archivo del trabajo (o un ZIP en streaming si hay varias pistas)."""
+    try:
+        manager = get_job_manager()
+        job = manager.get(job_id)
+        if not job:
+            return jsonify({'success': False, 'error': 'Trabajo no encontrado'}), 404
+        files = manager.result_files(job_id)
+        if files is None:
+            return jsonify({'success': False, 'error': f"Trabajo en estado '{job['status']}'", 'job': job}), 409
+        if not files:
+            return jsonify({'success': False, 'error': 'Los archivos ya no están en caché; vuelve a enviar el trabajo'}), 410
+        if len(files) == 1 and job['type'] == 'track':
+            path, filename = files[0]
+            return _count_response('job_result', send_file(path, as_attachment=True, download_name=filename,
+                                                          mimetype='application/octet-stream'))
+
+        def generate():
+            stream = ZipStream()
+            for path, filename in files:
+                yield from stream.add_file(path, filename)
+            yield from stream.close()
+
+        headers = {'Content-Disposition': f"attachment; filename*=UTF-8''{quote(manager.archive_name(job_id))}"}
+        return Response(stream_with_context(_counted('job_result', generate())), mimetype='application/zip', headers=headers)
+    except Exception as e:
+        logger.exception("Error en /jobs/result")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@api_bp.route('/preview/batch', methods=['POST'])
+def preview_batch():
+    """URLs de preview de una página completa de resultados (para precarga en la UI)."""
+    try:
+        data = request.get_json() or {}
+        track_ids = data.get('track_ids') or []
+        if not isinstance(track_ids, list) or not track_ids:
+            return jsonify({'success': False, 'error': 'track_ids requerido (lista)'}), 400
+        if len(track_ids) > 50:
+            return jsonify({'success': False, 'error': 'Máximo 50 track_ids por petición'}), 400
+        return jsonify({'success': True, 'previews': downloader.resolve_preview_urls(track_ids)})
+    except Exception as e:
+        logger.exception("Error en /preview/batch")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
 @api_bp.route('/auto-renewal/check')
 def check_auto_renewal():
-    """Verifica si es necesario renovar las credenciales"""
+    """Programa una verificación de renovación y devuelve el último resultado conocido"""
     try:
-        result = check_and_renew_if_needed()
-        return jsonify(result)
+        scheduler_status = renewal_scheduler.request_check()
+        return jsonify({
+            'success': True,
+            'scheduled': True,
+            'message': 'Verificación de renovación programada',
+            'scheduler': scheduler_status,
+            'timestamp': datetime.now().isoformat()
+        }), 202
     except Exception as e:
         logger.exception("Error en auto-renewal check")
         return jsonify({
@@ -556,11 +643,17 @@ def check_auto_renewal():
 
 @api_bp.route('/auto-renewal/force', methods=['POST'])
 def force_auto_renewal():
-    """Fuerza la renovación de credenciales"""
+    """Programa una renovación forzada; el resumen se consulta en /auto-renewal/status y el
+    resultado completo (con las credenciales) en /auto-renewal/result, solo administradores"""
     try:
-        renewer = QobuzCredentialRenewer()
-        result = renewer.perform_renewal()
-        return jsonify(result)
+        scheduler_status = renewal_scheduler.request_check(force=True)
+        return jsonify({
+            'success': True,
+            'scheduled': True,
+            'message': 'Renovación en curso',
+            'scheduler': scheduler_status,
+            'timestamp': datetime.now().isoformat()
+        }), 202
     except Exception as e:
         logger.exception("Error en force auto-renewal")
         return jsonify({
@@ -594,6 +687,7 @@ def auto_renewal_status():
             'is_vercel': vercel_info['is_vercel'],
             'vercel_env': vercel_info['vercel_env'],
             'has_env_vars': vercel_info['has_qobuz_token'],
+            'scheduler': renewal_scheduler.status(),
             'timestamp': datetime.now().isoformat()
         }
         
@@ -614,6 +708,136 @@ def auto_renewal_status():
         }), 500
 
 
+@api_bp.route('/auto-renewal/result')
+@require_admin
+def auto_renewal_result():
+    """Último resultado completo de la renovación en este proceso (incluye las credenciales nuevas)."""
+    result = renewal_scheduler.last_full_result()
+    if result is None:
+        return jsonify({'success': False, 'error': 'Sin renovaciones en este proceso'}), 404
+    return jsonify({'success': True, 'result': result})
+
+
+@api_bp.route('/debug/traces')
+@require_admin
+def debug_traces():
+    """Trazas recientes (las más nuevas primero); ``min_ms`` filtra las lentas."""
+    try:
+        limit = min(int(request.args.get('limit', 20)), 200)
+        min_ms = float(request.args.get('min_ms', 0))
+        return jsonify({'success': True, 'traces': get_tracer().recent(limit=limit, min_ms=min_ms)})
+    except ValueError:
+        return jsonify({'success': False, 'error': 'limit y min_ms deben ser numéricos'}), 400
+
+
+@api_bp.route('/debug/traces/<trace_id>')
+@require_admin
+def debug_trace(trace_id):
+    """Spans de una traza con su desplazamiento y duración (para vista en cascada).
+
+    Con ``format=otlp`` se devuelve en el mismo formato OTLP/JSON que la exportación a archivo.
+    """
+    tracer = get_tracer()
+    trace = tracer.get(trace_id)
+    if trace is None:
+        return jsonify({'success': False, 'error': 'Traza no encontrada'}), 404
+    if request.args.get('format') == 'otlp':
+        return jsonify(tracer.get_otlp(trace_id))
+    return jsonify({'success': True, 'trace': trace})
+
+
+def _limit_arg(default: int, maximum: int) -> int:
+    value = request.args.get('limit', '')
+    return min(int(value), maximum) if value.isdigit() else default
+
+
+@api_bp.route('/admin/profiles')
+@require_admin
+def admin_profiles():
+    """Perfiles guardados y funciones más caras sumando todos ellos."""
+    profiler = get_profiler()
+    sort = request.args.get('sort', 'tottime')
+    limit = _limit_arg(default=30, maximum=200)
+    return jsonify({'success': True, 'profiler': profiler.stats(), 'profiles': profiler.list(),
+                    'top': profiler.top_overall(sort=sort, limit=limit)})
+
+
+@api_bp.route('/admin/profiles/<profile_id>')
+@require_admin
+def admin_profile(profile_id):
+    """Funciones más caras de un perfil (``sort``: tottime, cumulative o ncalls)."""
+    sort = request.args.get('sort', 'tottime')
+    limit = _limit_arg(default=30, maximum=200)
+    top = get_profiler().top(profile_id, sort=sort, limit=limit)
+    if top is None:
+        return jsonify({'success': False, 'error': 'Perfil no encontrado'}), 404
+    return jsonify({'success': True, 'id': profile_id, 'top': top})
+
+
+@api_bp.route('/admin/profiles/<profile_id>/download')
+@require_admin
+def admin_profile_download(profile_id):
+    """Archivo ``.prof`` (pstats) para abrirlo con snakeviz, pstats, etc."""
+    profiler = get_profiler()
+    if not any(p['id'] == profile_id for p in profiler.list()):
+        return jsonify({'success': False, 'error': 'Perfil no encontrado'}), 404
+    return send_file(os.path.join(profiler.directory, f'{profile_id}.prof'), as_attachment=True,
+                     download_name=f'{profile_id}.prof', mimetype='application/octet-stream')
+
+
+@api_bp.route('/admin/profiles/token', methods=['POST'])
+@require_admin
+def admin_profile_token():
+    """Genera un valor de ``X-Profile`` válido durante ``ttl`` segundos (máx. 1 h)."""
+    from ..config import PROFILE_SECRET
+    from ..utils.profiling import sign_profile_token
+    if not PROFILE_SECRET:
+        return jsonify({'success': False, 'error': 'PROFILE_SECRET no configurado'}), 400
+    data = request.get_json(silent=True) or {}
+    try:
+        ttl = min(max(float(data.get('ttl', 300)), 1), 3600)
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'error': 'ttl debe ser numérico'}), 400
+    return jsonify({'success': True, 'header': 'X-Profile', 'value': sign_profile_token(PROFILE_SECRET, ttl), 'ttl': ttl})
+
+
+@api_bp.route('/admin/credentials', methods=['GET'])
+@require_admin
+def admin_credentials_status():
+    """Versión de credenciales en uso y estado del pool (tokens enmascarados)."""
+    return jsonify({'success': True, 'credentials': downloader.pool.stats()})
+
+
+@api_bp.route('/admin/credentials', methods=['POST'])
+@require_admin
+def admin_install_credentials():
+    """Instala credenciales nuevas en caliente, sin reiniciar el proceso.
+
+    Body: ``token`` (obligatorio), ``app_id``, ``app_secret``, ``user_id``; ``validate``
+    (por defecto ``true``) comprueba el token antes de instalarlo y ``persist`` (por
+    defecto ``true``) lo guarda además en ``qobuz_credentials.json``.
+    """
+    try:
+        data = request.get_json() or {}
+        if not data.get('token'):
+            return jsonify({'success': False, 'error': 'token requerido'}), 400
+        credentials = {k: str(data[k]) for k in ('token', 'app_id', 'app_secret', 'user_id') if data.get(k)}
+        if data.get('validate', True):
+            user = downloader.get_user_info(credentials['token'], app_id=credentials.get('app_id'), use_cache=False)
+            if not user:
+                return jsonify({'success': False, 'error': 'El token no es válido'}), 400
+            credentials.setdefault('user_id', str(user.get('id', '')))
+        installed = downloader.install_credentials(credentials)
+        persisted = False
+        if data.get('persist', True) and not os.environ.get('VERCEL'):
+            from ..config import update_qobuz_credentials
+            persisted = update_qobuz_credentials(credentials)
+        return jsonify({'success': True, 'installed': installed, 'persisted': persisted})
+    except Exception as e:
+        logger.exception("Error instalando credenciales")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
 @api_bp.route('/vercel/environment')
 def vercel_environment():
     """Información del entorno de Vercel"""
@@ -0,0 +1,136 @@
+"""Descarga de álbumes completos de Qobuz como ZIP en streaming"""
+from __future__ import annotations
+import os
+import re
+import tempfile
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+from .downloads import download_to_file
+from ..utils.metadata import add_metadata_to_file, build_track_metadata, fetch_cover, get_cover_url
+from ..utils.zipstream import ZipStream
+
+logger = logging.getLogger(__name__)
+
+_INVALID_FILENAME_CHARS = re.compile(r'[<>:"/\\|?*\x00-\x1f]')
+
+
+def safe_filename(name: str, fallback: str = 'track') -> str:
+    """Elimina caracteres no válidos en nombres de archivo de Windows/Linux."""
+    name = _INVALID_FILENAME_CHARS.sub('_', name or '').strip().rstrip('.')
+    return name[:150] or fallback
+
+
+def _discard_result(fut: Future) -> None:
+    """Borra el archivo temporal de una descarga que ya no se va a usar."""
+    if fut.cancelled() or fut.exception() is not None:
+        return
+    try:
+        os.remove(fut.result())
+    except OSError:
+        pass
+
+
+class AlbumDownloader:
+    """Descarga y etiqueta las pistas de un álbum con un pool acotado y emite un ZIP.
+
+    - Las URLs de todas las pistas se resuelven en paralelo antes de empezar.
+    - El registro de ``album/get`` y la portada se obtienen una sola vez.
+    - Cada pista se descarga a un temporal propio que se borra al escribirse en el ZIP;
+      como mucho hay ``2 * max_workers`` pistas en disco a la vez.
+    """
+
+    def __init__(self, downloader, max_workers: int = 4, chunk_size: int = 64 * 1024):
+        self.downloader = downloader
+        self.max_workers = max(1, max_workers)
+        self.chunk_size = chunk_size
+
+    def prepare(self, album_id: str, quality: str = '6') -> Optional[Dict[str, Any]]:
+        album = self.downloader.get_album_info(album_id)
+        if not album:
+            return None
+        tracks: List[Dict[str, Any]] = (album.get('tracks') or {}).get('items') or []
+        urls = self.downloader.get_track_urls([t.get('id') for t in tracks], quality)
+        cover_data = fetch_cover(get_cover_url(album))
+        return {'album': album, 'tracks': tracks, 'urls': urls, 'cover_data': cover_data, 'quality': quality}
+
+    def archive_name(self, prepared: Dict[str, Any]) -> str:
+        album = prepared['album']
+        artist = (album.get('artist') or {}).get('name', '')
+        title = album.get('title', 'album')
+        name = f"{artist} - {title}" if artist else title
+        return safe_filename(name, 'album') + '.zip'
+
+    def _extension(self, quality: str) -> str:
+        return self.downloader.quality_map.get(quality, {}).get('ext', '.flac')
+
+    def _track_arcname(self, prepared: Dict[str, Any], track: Dict[str, Any]) -> str:
+        album = prepared['album']
+        number = int(track.get('track_number') or 0)
+        performer = (track.get('performer') or {}).get('name', '')
+        title = track.get('title', '')
+        if track.get('version'):
+            title = f"{title} ({track['version']})"
+        name = safe_filename(f"{number:02d}. {performer} - {title}" if performer else f"{number:02d}. {title}")
+        name += self._extension(prepared['quality'])
+        if int(album.get('media_count') or 1) > 1:
+            name = f"Disc {int(track.get('media_number') or 1)}/{name}"
+        return name
+
+    def _download_track(self, prepared: Dict[str, Any], track: Dict[str, Any]) -> str:
+        url = prepared['urls'].get(str(track.get('id')))
+        if not url:
+            raise ValueError('No se pudo obtener enlace de descarga')
+        fd, path = tempfile.mkstemp(suffix=self._extension(prepared['quality']))
+        os.close(fd)
+        try:
+            download_to_file(url, path, self.chunk_size)
+            metadata = build_track_metadata(track, prepared['album'])
+            add_metadata_to_file(path, metadata, cover_data=prepared['cover_data'])
+            return path
+        except Exception:
+            os.remove(path)
+            raise
+
+    def iter_zip(self, prepared: Dict[str, Any]) -> Iterator[bytes]:
+        """Genera el ZIP en orden de pista mientras las siguientes siguen descargándose."""
+        stream = ZipStream(self.chunk_size)
+        tracks = iter(prepared['tracks'])
+        pending: Deque[Tuple[Dict[str, Any], Future]] = deque()
+        errors: List[str] = []
+        pool = ThreadPoolExecutor(max_workers=self.max_workers)
+
+        def submit_next() -> None:
+            track = next(tracks, None)
+            if track is not None:
+                pending.append((track, pool.submit(self._download_track, prepared, track)))
+
+        try:
+            for _ in range(self.max_workers * 2):
+                submit_next()
+            while pending:
+                track, fut = pending.popleft()
+                submit_next()
+                try:
+                    path = fut.result()
+                except Exception as e:
+                    logger.warning("Pista %s omitida del álbum: %s", track.get('id'), e)
+                    errors.append(f"{track.get('track_number', '')}. {track.get('title', '')}: {e}")
+                    continue
+                try:
+                    yield from stream.add_file(path, self._track_arcname(prepared, track))
+                finally:
+                    os.remove(path)
+            if errors:
+                yield from stream.add_bytes('ERRORES.txt', '\n'.join(errors).encode('utf-8'))
+            yield from stream.close()
+        finally:
+            # Cliente desconectado o error: no dejar temporales huérfanos
+            for _, fut in pending:
+                if not fut.cancel():
+                    fut.add_done_callback(_discard_result)
+            pool.shutdown(wait=False)
+
+
+__all__ = ["AlbumDownloader", "safe_filename"]
@@ -9,65 +9,168 @@ import json
 import base64
 import os
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from bs4 import BeautifulSoup
 import time
 import logging
+from ..utils.cache import TTLCache
+from ..utils.http import upstream_get
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Patrones con etiqueta (campo, prioridad, expresión). Se combinan en una sola
+# alternancia precompilada que recorre el texto una única vez; a igualdad de posición
+# gana la primera alternativa. Las de app_id capturan además un secreto hexadecimal
+# pegado al número.
+_CREDENTIAL_PATTERNS = [
+    ('app_id', 0, r'app_id[\s:=]+(\d{9})(?:[^a-zA-Z0-9]*([a-f0-9]{32}))?'),
+    ('app_id', 1, r'app[_\s]*id[:\s=]+["\']?(\d{8,12})["\']?(?:[^a-zA-Z0-9]*([a-f0-9]{32}))?'),
+    ('app_secret', 0, r'app_secret[\s:=]+([a-f0-9]{32})'),
+    ('app_secret', 1, r'app[_\s]*secret[:\s=]+["\']?([a-zA-Z0-9+/=_-]{20,100})["\']?'),
+    ('token', 0, r'Token\s+➠([a-zA-Z0-9+/=_\-]{50,}?)(?=User|Email|\s|$)'),
+    ('token', 1, r'token[:\s=]+["\']?([a-zA-Z0-9+/=_\-]{50,200})["\']?'),
+    ('user_id', 0, r'User\s+ID\s+➠\s+(\d+)'),
+    ('user_id', 1, r'user[_\s]*id[:\s=]+["\']?(\d{6,})["\']?'),
+    ('user_id', 2, r'userid[:\s=]+["\']?(\d{6,})["\']?'),
+]
+# Patrones sin etiqueta, de último recurso. Cada uno recorre el texto por separado:
+# dentro de la alternancia consumirían texto que corresponde a las etiquetas (un token
+# genérico se tragaría ``user_auth_token=``). El token genérico descarta un ``clave=``
+# delante y solo admite ``=`` como relleno final de base64.
+_FALLBACK_PATTERNS = [
+    ('token', 2, r'(?:[a-zA-Z_]\w*=)?([a-zA-Z0-9+/_\-]{80,150}={0,2})'),
+    ('app_id', 2, r'(\d{9})(?:[^a-zA-Z0-9]*([a-f0-9]{32}))?'),
+]
+# app_id por defecto tras el que suele publicarse el secreto
+_KNOWN_APP_ID = '798273057'
+_WHITESPACE_RE = re.compile(r'[\n\r\t]+')
+_RENTRY_RE = re.compile(r'(?:https://)?rentry\.org/[\w\-]+')
+
+# Páginas descargadas (arldeemix/rentry) con su ETag/Last-Modified para revalidar
+_page_cache = TTLCache(maxsize=64, ttl=24 * 3600)
+_session = requests.Session()
+
+
+class CredentialExtractor:
+    """Extrae app_id/app_secret/token/user_id de un texto: una pasada para todas las
+    etiquetas y otra por cada patrón de último recurso."""
+
+    def __init__(self, patterns=_CREDENTIAL_PATTERNS, fallbacks=_FALLBACK_PATTERNS):
+        self._passes = [self._compile(patterns)] + [self._compile([fallback]) for fallback in fallbacks]
+
+    @staticmethod
+    def _compile(patterns) -> Tuple[re.Pattern, Dict[str, tuple]]:
+        parts = []
+        alternatives: Dict[str, tuple] = {}
+        group = 0
+        for i, (field, priority, pattern) in enumerate(patterns):
+            inner = re.compile(pattern).groups
+            parts.append(f'(?P<p{i}>{pattern})')
+            alternatives[f'p{i}'] = (field, priority, group + 1, inner)
+            group += 1 + inner
+        return re.compile('|'.join(parts), re.IGNORECASE), alternatives
+
+    def candidates(self, text: str) -> Dict[str, List[tuple]]:
+        """Coincidencias por campo como ``(prioridad, valor)`` en orden de aparición."""
+        found: Dict[str, List[tuple]] = {'app_id': [], 'app_secret': [], 'token': [], 'user_id': [], 'id_secret': []}
+        text = _WHITESPACE_RE.sub(' ', text)
+        for regex, alternatives in self._passes:
+            for match in regex.finditer(text):
+                field, priority, outer, inner = alternatives[match.lastgroup]
+                values = [match.group(outer + k + 1) for k in range(inner)]
+                found[field].append((priority, values[0].strip()))
+                if field == 'app_id' and len(values) > 1 and values[1]:
+                    found['id_secret'].append((values[0], values[1]))
+        for field in ('app_id', 'app_secret', 'token', 'user_id'):
+            found[field].sort(key=lambda c: c[0])  # estable: conserva el orden de aparición
+        return found
+
+    def extract(self, text: str) -> Dict[str, str]:
+        found = self.candidates(text)
+        credentials: Dict[str, str] = {}
+        app_id = next((v for _, v in found['app_id'] if len(v) >= 8), None)
+        if app_id:
+            credentials['app_id'] = app_id
+        secret = next((v for _, v in found['app_secret'] if len(v) >= 20 and v != app_id), None)
+        if not secret:
+            secret = next((s for i, s in found['id_secret'] if i in (_KNOWN_APP_ID, app_id)), None)
+        if secret:
+            credentials['app_secret'] = secret
+        token = next((v for _, v in found['token'] if len(v) >= 50 and v not in (app_id, secret)), None)
+        if token:
+            credentials['token'] = token
+        user_id = next((v for _, v in found['user_id'] if len(v) >= 6), None)
+        if user_id:
+            credentials['user_id'] = user_id
+        return credentials
+
+
+_extractor = CredentialExtractor()
+
+
 class ArlDeemixScraper:
-    def __init__(self):
+    def __init__(self, max_workers: int = 8):
         self.base_url = 'https://www.arldeemix.com/2024/12/qobuzdownloaderx-arl-premium-nueva.html'
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
+        self.max_workers = max_workers
     
-    def extract_from_arldeemix(self) -> Optional[Dict[str, str]]:
+    def fetch(self, url: str, timeout: float = 10) -> str:
+        """
+        Descarga una página revalidando con ETag/Last-Modified si ya está en caché
+        """
+        cached = _page_cache.get(url)
+        headers = dict(self.headers)
+        if cached:
+            if cached.get('etag'):
+                headers['If-None-Match'] = cached['etag']
+            if cached.get('last_modified'):
+                headers['If-Modified-Since'] = cached['last_modified']
+        response = upstream_get('renewal.page', url, session=_session, headers=headers, timeout=timeout)
+        if response.status_code == 304 and cached:
+            logger.info(f"Sin cambios (304): {url}")
+            return cached['text']
+        response.raise_for_status()
+        etag, last_modified = response.headers.get('ETag'), response.headers.get('Last-Modified')
+        if etag or last_modified:
+            _page_cache.set(url, {'etag': etag, 'last_modified': last_modified, 'text': response.text})
+        return response.text
+    
+    def find_rentry_links(self, html: str) -> Tuple[List[str], str]:
+        """
+        Enlaces a rentry.org (atributos href y texto) y texto visible de la página
+        """
+        soup = BeautifulSoup(html, 'html.parser')
+        content_text = soup.get_text()
+        links = [a['href'] for a in soup.find_all('a', href=True) if 'rentry.org' in a['href']]
+        # El HTML incluye tanto los href como el texto visible: una sola búsqueda
+        for match in _RENTRY_RE.findall(html):
+            links.append(match if match.startswith('http') else f'https://{match}')
+        return list(dict.fromkeys(links)), content_text
+    
+    def extract_from_arldeemix(self, validate: Optional[Callable[[str], bool]] = None) -> Optional[Dict[str, str]]:
         """
         Extrae credenciales específicamente de la página arldeemix
+
+        Las páginas de rentry se descargan en paralelo y, con ``validate``, cada token
+        candidato se valida en cuanto aparece; se devuelve el primero válido.
         """
         try:
             logger.info("Obteniendo página de arldeemix...")
-            response = requests.get(self.base_url, headers=self.headers, timeout=15)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Buscar enlaces a rentry.org en el contenido
-            rentry_links = []
-            
-            # Buscar en enlaces directos
-            for link in soup.find_all('a', href=True):
-                href = link['href']
-                if 'rentry.org' in href:
-                    rentry_links.append(href)
-            
-            # Buscar en el texto del contenido
-            content_text = soup.get_text()
-            rentry_matches = re.findall(r'https://rentry\.org/[\w\-]+', content_text)
-            rentry_links.extend(rentry_matches)
-            
-            # También buscar patrones específicos en el HTML
-            html_text = str(soup)
-            more_rentry = re.findall(r'rentry\.org/[\w\-]+', html_text)
-            for match in more_rentry:
-                if not match.startswith('http'):
-                    rentry_links.append(f'https://{match}')
-            
+            rentry_links, content_text = self.find_rentry_links(self.fetch(self.base_url, timeout=15))
             logger.info(f"Enlaces encontrados: {rentry_links}")
             
-            # Probar cada enlace de rentry
-            for link in set(rentry_links):  # usar set para evitar duplicados
-                credentials = self.extract_from_rentry(link)
-                if credentials:
-                    return credentials
+            credentials = self._first_valid(rentry_links, validate)
+            if credentials:
+                return credentials
             
             # Si no hay enlaces de rentry, buscar directamente en el contenido
             credentials = self.extract_credentials_from_text(content_text)
-            if credentials:
+            if credentials and (validate is None or 'token' not in credentials or validate(credentials['token'])):
                 return credentials
                 
         except Exception as e:
@@ -75,6 +178,38 @@ class ArlDeemixScraper:
         
         return None
     
+    def _first_valid(self, links: List[str], validate: Optional[Callable[[str], bool]]) -> Optional[Dict[str, str]]:
+        if not links:
+            return None
+        pool = ThreadPoolExecutor(max_workers=min(self.max_workers, len(links)), thread_name_prefix='rentry')
+        try:
+            pending = {pool.submit(self.extract_from_rentry, link): 'fetch' for link in links}
+            seen_tokens = set()
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    kind = pending.pop(future)
+                    credentials = future.result()
+                    if not credentials:
+                        continue
+                    if kind == 'validate' or validate is None or 'token' not in credentials:
+                        return credentials
+                    if credentials['token'] not in seen_tokens:
+                        seen_tokens.add(credentials['token'])
+                        pending[pool.submit(self._validated, credentials, validate)] = 'validate'
+            return None
+        finally:
+            # No esperar a las descargas/validaciones que ya no hacen falta
+            pool.shutdown(wait=False, cancel_futures=True)
+    
+    @staticmethod
+    def _validated(credentials: Dict[str, str], validate: Callable[[str], bool]) -> Optional[Dict[str, str]]:
+        try:
+            return credentials if validate(credentials['token']) else None
+        except Exception as e:
+            logger.warning(f"Error validando token: {e}")
+            return None
+    
     def extract_from_rentry(self, url: str) -> Optional[Dict[str, str]]:
         """
         Extrae credenciales de una página rentry
@@ -86,11 +221,7 @@ class ArlDeemixScraper:
                 raw_url = url.replace('rentry.org/', 'rentry.org/raw/')
             
             logger.info(f"Obteniendo contenido de: {raw_url}")
-            response = requests.get(raw_url, headers=self.headers, timeout=10)
-            response.raise_for_status()
-            
-            content = response.text
-            credentials = self.extract_credentials_from_text(content)
+            credentials = self.extract_credentials_from_text(self.fetch(raw_url))
             
             if credentials:
                 logger.info(f"Credenciales encontradas en {url}")
@@ -99,10 +230,7 @@ class ArlDeemixScraper:
             # Si no encuentra en raw, probar la URL normal
             if raw_url != url:
                 logger.info(f"Probando URL normal: {url}")
-                response = requests.get(url, headers=self.headers, timeout=10)
-                response.raise_for_status()
-                
-                soup = BeautifulSoup(response.text, 'html.parser')
+                soup = BeautifulSoup(self.fetch(url), 'html.parser')
                 
                 # Buscar en elementos de código
                 for code_elem in soup.find_all(['code', 'pre', 'textarea']):
@@ -124,87 +252,7 @@ class ArlDeemixScraper:
         """
         Extrae credenciales usando patrones regex específicos para Qobuz
         """
-        # Limpiar el texto
-        clean_text = re.sub(r'[\n\r\t]+', ' ', text)
-        
-        credentials = {}
-        
-        # Buscar app_id con patrón específico encontrado
-        app_id_patterns = [
-            r'app_id[\s:=]+(\d{9})',  # Patrón específico encontrado
-            r'app[_\s]*id[:\s=]+["\']?(\d{8,12})["\']?',
-            r'(\d{9})'  # Cualquier número de 9 dígitos
-        ]
-        
-        for pattern in app_id_patterns:
-            matches = re.findall(pattern, clean_text, re.IGNORECASE)
-            if matches:
-                # Usar el primer match válido
-                app_id = matches[0] if isinstance(matches[0], str) else str(matches[0])
-                if len(app_id) >= 8:
-                    credentials['app_id'] = app_id
-                    logger.info(f"Encontrado app_id: {app_id}")
-                    break
-        
-        # Buscar app_secret con patrón específico encontrado
-        secret_patterns = [
-            r'app_secret[\s:=]+([a-f0-9]{32})',  # Patrón hexadecimal específico
-            r'app[_\s]*secret[:\s=]+["\']?([a-zA-Z0-9+/=_-]{20,100})["\']?',
-            # Buscar después del app_id conocido
-            rf'798273057[^a-zA-Z0-9]*([a-f0-9]{{32}})',
-            rf'{credentials.get("app_id", "798273057")}[^a-zA-Z0-9]*([a-f0-9]{{32}})' if 'app_id' in credentials else None
-        ]
-        
-        for pattern in secret_patterns:
-            if pattern is None:
-                continue
-            matches = re.findall(pattern, clean_text, re.IGNORECASE)
-            if matches:
-                secret = matches[0] if isinstance(matches[0], str) else str(matches[0])
-                if len(secret) >= 20 and secret != credentials.get('app_id'):
-                    credentials['app_secret'] = secret
-                    logger.info(f"Encontrado app_secret: {secret[:15]}...")
-                    break
-        
-        # Buscar token - strings muy largos base64-like
-        token_patterns = [
-            r'Token\s+➠([a-zA-Z0-9+/=_\-]{50,}?)(?=User|Email|\s|$)',  # Patrón específico con límite
-            r'token[:\s=]+["\']?([a-zA-Z0-9+/=_\-]{50,200})["\']?',
-            r'([a-zA-Z0-9+/=_\-]{80,150})'  # Cualquier string muy largo pero limitado
-        ]
-        
-        for pattern in token_patterns:
-            matches = re.findall(pattern, clean_text, re.IGNORECASE)
-            if matches:
-                for match in matches:
-                    token = match.strip() if isinstance(match, str) else str(match).strip()
-                    # Verificar que no sea igual a otros campos y sea suficientemente largo
-                    if (len(token) >= 50 and 
-                        token != credentials.get('app_id') and 
-                        token != credentials.get('app_secret')):
-                        credentials['token'] = token
-                        logger.info(f"Encontrado token: {token[:25]}...")
-                        break
-            if 'token' in credentials:
-                break
-        
-        # Buscar user_id
-        user_id_patterns = [
-            r'User\s+ID\s+➠\s+(\d+)',  # Patrón específico encontrado
-            r'user[_\s]*id[:\s=]+["\']?(\d{6,})["\']?',
-            r'userid[:\s=]+["\']?(\d{6,})["\']?'
-        ]
-        
-        for pattern in user_id_patterns:
-            matches = re.findall(pattern, clean_text, re.IGNORECASE)
-            if matches:
-                user_id = matches[0] if isinstance(matches[0], str) else str(matches[0])
-                if len(user_id) >= 6:
-                    credentials['user_id'] = user_id
-                    logger.info(f"Encontrado user_id: {user_id}")
-                    break
-        
-        # Debug: mostrar todo lo que encontramos
+        credentials = _extractor.extract(text)
         logger.info(f"Credenciales extraídas: {list(credentials.keys())}")
         
         # Validar que tenemos al menos app_id y app_secret
@@ -216,7 +264,7 @@ class ArlDeemixScraper:
         if 'token' in credentials and len(credentials['token']) >= 50:
             return credentials
         
-        logger.warning(f"Credenciales incompletas: {credentials}")
+        logger.warning(f"Credenciales incompletas: {list(credentials.keys())}")
         return None
 
 
@@ -242,7 +290,7 @@ class QobuzCredentialRenewer:
         try:
             from ..utils.token import get_downloader
             downloader = get_downloader()
-            user_info = downloader.get_user_info(token)
+            user_info = downloader.get_user_info(token, use_cache=False)
             return user_info is not None
         except Exception as e:
             logger.error(f"Error validating token: {e}")
@@ -257,25 +305,17 @@ class QobuzCredentialRenewer:
         """
         logger.info("Buscando nuevas credenciales en arldeemix...")
         
-        credentials = self.scraper.extract_from_arldeemix()
+        # Los tokens candidatos se validan en paralelo mientras llegan las páginas
+        validate = None if skip_validation else self.validate_token
+        credentials = self.scraper.extract_from_arldeemix(validate=validate)
         
         if credentials and ('token' in credentials or ('app_id' in credentials and 'app_secret' in credentials)):
-            logger.info("Credenciales encontradas, validando...")
-            
-            # Validar el token si está disponible y no se omite la validación
-            if 'token' in credentials and not skip_validation:
-                if self.validate_token(credentials['token']):
-                    logger.info("Token válido encontrado!")
-                    return credentials
-                else:
-                    logger.warning("Token encontrado pero no válido")
-            elif 'token' in credentials and skip_validation:
-                logger.info("Token encontrado (validación omitida)")
-                return credentials
+            if 'token' in credentials:
+                logger.info("Token encontrado (validación omitida)" if skip_validation else "Token válido encontrado!")
             else:
                 # Si solo tenemos app_id y app_secret, aceptar (se puede generar token después)
                 logger.info("App ID y Secret encontrados")
-                return credentials
+            return credentials
         
         logger.warning("No se encontraron credenciales válidas")
         return None
@@ -298,6 +338,21 @@ class QobuzCredentialRenewer:
                 logger.error(f"Error updating config: {e}")
                 return False
     
+    def install_live(self, credentials: Dict[str, str]) -> Optional[int]:
+        """
+        Instala las credenciales en el downloader en ejecución (sin reiniciar)
+        """
+        if not credentials.get('token'):
+            return None
+        try:
+            from ..app_factory import get_downloader
+            installed = get_downloader().install_credentials(credentials)
+            logger.info(f"Credenciales instaladas en caliente (versión {installed['version']})")
+            return installed['version']
+        except Exception as e:
+            logger.error(f"Error instalando credenciales en caliente: {e}")
+            return None
+
     def perform_renewal(self) -> Dict[str, Any]:
         """
         Realiza el proceso completo de renovación
@@ -319,6 +374,9 @@ class QobuzCredentialRenewer:
                 result['message'] = 'No se encontraron nuevas credenciales válidas en arldeemix.com'
                 return result
             
+            # Los procesos en marcha pasan a usarlas ya; el archivo/las variables las conservan
+            result['credentials_version'] = self.install_live(new_credentials)
+
             # En Vercel, preparar instrucciones para el usuario
             if self.is_vercel:
                 result['success'] = True
@@ -350,7 +408,7 @@ class QobuzCredentialRenewer:
         return result
 
 
-def check_and_renew_if_needed() -> Dict[str, Any]:
+def check_and_renew_if_needed(threshold_days: int = 7) -> Dict[str, Any]:
     """
     Función principal que verifica si es necesario renovar y lo hace automáticamente
     """
@@ -371,7 +429,7 @@ def check_and_renew_if_needed() -> Dict[str, Any]:
         
         renewer = QobuzCredentialRenewer()
         
-        if renewer.should_renew(dias_restantes):
+        if renewer.should_renew(dias_restantes, threshold_days):
             logger.info(f"Token expira en {dias_restantes} días, iniciando renovación automática...")
             return renewer.perform_renewal()
         else:
@@ -0,0 +1,178 @@
+"""Pool de credenciales de Qobuz con reparto de carga y expulsión temporal"""
+from __future__ import annotations
+import itertools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Estados HTTP que indican que la cuenta (no la petición) tiene un problema
+EJECT_STATUSES = (401, 429)
+
+
+class Credential:
+    """Un juego token/app_id/app_secret y su estado de salud dentro del pool."""
+
+    __slots__ = ('name', 'token', 'app_id', 'app_secret', 'weight', 'user_id', 'in_flight',
+                 'ejected_until', 'eject_reason', 'requests', 'failures', 'ejections')
+
+    def __init__(self, name: str, token: str, app_id: Optional[str] = None, app_secret: Optional[str] = None,
+                 weight: float = 1.0, user_id: Optional[str] = None):
+        self.name = name
+        self.token = token
+        self.app_id = app_id
+        self.app_secret = app_secret
+        self.weight = max(float(weight), 0.01)
+        self.user_id = user_id
+        self.in_flight = 0
+        self.ejected_until = 0.0
+        self.eject_reason: Optional[str] = None
+        self.requests = 0
+        self.failures = 0
+        self.ejections = 0
+
+    def available(self, now: float) -> bool:
+        return self.ejected_until <= now
+
+    def describe(self, now: float) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'token': f"{self.token[:6]}…" if self.token else '',
+            'app_id': self.app_id,
+            'weight': self.weight,
+            'healthy': self.available(now),
+            'in_flight': self.in_flight,
+            'requests': self.requests,
+            'failures': self.failures,
+            'ejections': self.ejections,
+            'eject_reason': self.eject_reason if not self.available(now) else None,
+            'readmit_in': max(0, int(self.ejected_until - now)),
+        }
+
+
+class CredentialPool:
+    """Reparte las peticiones entre las credenciales sanas.
+
+    Se elige la de menor carga relativa (``in_flight / weight``); los empates se
+    resuelven por turno rotatorio para no cargar siempre la primera. Un 401 o 429 expulsa
+    la credencial durante ``cooldown`` segundos (o lo que indique ``Retry-After``); pasado
+    ese tiempo vuelve a recibir tráfico y, si falla otra vez, se expulsa de nuevo. Si no
+    queda ninguna sana se usa la que antes se readmitirá, para no dejar el servicio caído.
+
+    La lista de credenciales es una instantánea inmutable con número de ``version``:
+    ``replace`` instala otra nueva de forma atómica. Las peticiones en vuelo conservan
+    el objeto ``Credential`` que obtuvieron y terminan con él.
+    """
+
+    def __init__(self, credentials: List[Credential], cooldown: float = 300.0):
+        if not credentials:
+            raise ValueError("El pool necesita al menos una credencial")
+        self.cooldown = cooldown
+        self._credentials = tuple(credentials)
+        self._lock = threading.Lock()
+        self._turn = itertools.count()
+        self.version = 1
+
+    @property
+    def credentials(self) -> List[Credential]:
+        return list(self._credentials)
+
+    def get(self, name: str) -> Optional[Credential]:
+        return next((c for c in self._credentials if c.name == name), None)
+
+    def add(self, credential: Credential) -> int:
+        with self._lock:
+            self._credentials = self._credentials + (credential,)
+            self.version += 1
+            return self.version
+
+    def replace(self, credential: Credential) -> int:
+        """Sustituye (o añade) la credencial con el mismo nombre y devuelve la nueva versión."""
+        with self._lock:
+            current = self.get(credential.name)
+            if current is None:
+                self._credentials = self._credentials + (credential,)
+            else:
+                # Misma posición para no alterar el orden del turno rotatorio
+                self._credentials = tuple(credential if c is current else c for c in self._credentials)
+            self.version += 1
+            return self.version
+
+    def _pick(self, exclude: Optional[set] = None) -> Credential:
+        now = time.monotonic()
+        candidates = [c for c in self._credentials if not exclude or c.name not in exclude] or self._credentials
+        healthy = [c for c in candidates if c.available(now)]
+        if not healthy:
+            return min(candidates, key=lambda c: c.ejected_until)
+        lowest = min(c.in_flight / c.weight for c in healthy)
+        tied = [c for c in healthy if c.in_flight / c.weight == lowest]
+        if len(tied) == 1:
+            return tied[0]
+        # Turno rotatorio ponderado: cada credencial aparece ``weight`` veces en el ciclo
+        slots = [c for c in tied for _ in range(max(1, round(c.weight)))]
+        return slots[next(self._turn) % len(slots)]
+
+    @contextmanager
+    def acquire(self, exclude: Optional[set] = None) -> Iterator[Credential]:
+        """Reserva la credencial menos cargada mientras dura la petición."""
+        with self._lock:
+            credential = self._pick(exclude)
+            credential.in_flight += 1
+            credential.requests += 1
+        try:
+            yield credential
+        finally:
+            with self._lock:
+                credential.in_flight -= 1
+
+    def report(self, credential: Credential, status_code: Optional[int], retry_after: Optional[str] = None) -> bool:
+        """Registra el resultado de una petición; devuelve ``True`` si la credencial se expulsó."""
+        if status_code not in EJECT_STATUSES:
+            return False
+        cooldown = self.cooldown
+        if status_code == 429 and retry_after and str(retry_after).isdigit():
+            cooldown = float(retry_after)
+        self.eject(credential, f"HTTP {status_code}", cooldown)
+        return True
+
+    def eject(self, credential: Credential, reason: str, cooldown: Optional[float] = None) -> None:
+        with self._lock:
+            credential.failures += 1
+            credential.ejections += 1
+            credential.eject_reason = reason
+            credential.ejected_until = time.monotonic() + (self.cooldown if cooldown is None else cooldown)
+        logger.warning("Credencial %s expulsada del pool (%s)", credential.name, reason)
+
+    def readmit(self, credential: Credential) -> None:
+        with self._lock:
+            credential.ejected_until = 0.0
+            credential.eject_reason = None
+
+    def health_check(self, check: Callable[[Credential], Optional[Dict[str, Any]]]) -> Dict[str, bool]:
+        """Valida cada credencial con ``check`` (p.ej. ``get_user_info``) y expulsa las inválidas."""
+        result: Dict[str, bool] = {}
+        for credential in self.credentials:
+            try:
+                user = check(credential)
+            except Exception:
+                user = None
+            if user:
+                credential.user_id = str(user.get('id', credential.user_id or ''))
+                self.readmit(credential)
+            else:
+                self.eject(credential, 'health check')
+            result[credential.name] = bool(user)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            accounts = [c.describe(now) for c in self._credentials]
+        return {'version': self.version, 'size': len(accounts), 'healthy': sum(1 for a in accounts if a['healthy']),
+                'cooldown': self.cooldown, 'accounts': accounts}
+
+
+__all__ = ["Credential", "CredentialPool", "EJECT_STATUSES"]
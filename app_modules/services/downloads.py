@@ -0,0 +1,95 @@
+"""Descarga de archivos de audio a disco y caché local de pistas ya etiquetadas"""
+from __future__ import annotations
+import os
+import threading
+from typing import Callable, Optional
+from ..utils.http import upstream_get
+
+
+class DownloadCancelled(Exception):
+    """La descarga se interrumpió porque se solicitó su cancelación."""
+
+
+def download_to_file(url: str, path: str, chunk_size: int = 64 * 1024,
+                     on_chunk: Optional[Callable[[int, Optional[int]], None]] = None,
+                     should_stop: Optional[Callable[[], bool]] = None,
+                     max_bytes: Optional[int] = None) -> int:
+    """Descarga ``url`` en ``path`` por trozos y devuelve los bytes escritos.
+
+    ``on_chunk(n, total)`` recibe el tamaño de cada trozo y el ``Content-Length``
+    (si se conoce); ``should_stop`` permite abortar entre trozos. Con ``max_bytes`` solo
+    se pide (cabecera ``Range``) y se guarda el comienzo del archivo.
+    """
+    written = 0
+    headers = {'Range': f'bytes=0-{max_bytes - 1}'} if max_bytes else None
+    with open(path, 'wb') as f, upstream_get('qobuz.cdn', url, stream=True, timeout=30, headers=headers) as resp:
+        resp.raise_for_status()
+        total = resp.headers.get('Content-Length')
+        total = int(total) if total and total.isdigit() else None
+        for chunk in resp.iter_content(chunk_size=chunk_size):
+            if should_stop is not None and should_stop():
+                raise DownloadCancelled()
+            if chunk:
+                if max_bytes is not None:
+                    # El servidor puede ignorar Range y responder 200 con el archivo entero
+                    chunk = chunk[:max_bytes - written]
+                f.write(chunk)
+                written += len(chunk)
+                if on_chunk is not None:
+                    on_chunk(len(chunk), total)
+                if max_bytes is not None and written >= max_bytes:
+                    break
+    return written
+
+
+class DownloadCache:
+    """Caché en disco de pistas descargadas y etiquetadas, por ``(track_id, calidad)``.
+
+    Se acota por tamaño total expulsando los archivos usados hace más tiempo.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 2 * 1024 ** 3):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, track_id: str, quality: str, ext: str) -> str:
+        return os.path.join(self.directory, f"{track_id}_{quality}{ext}")
+
+    def get(self, track_id: str, quality: str, ext: str) -> Optional[str]:
+        path = self.path_for(track_id, quality, ext)
+        if os.path.exists(path):
+            try:
+                os.utime(path)  # marca de uso reciente para la expulsión LRU
+            except OSError:
+                pass
+            return path
+        return None
+
+    def put(self, track_id: str, quality: str, ext: str, tmp_path: str) -> str:
+        """Mueve un temporal ya etiquetado a la caché (reemplazo atómico)."""
+        path = self.path_for(track_id, quality, ext)
+        os.replace(tmp_path, path)
+        self._evict()
+        return path
+
+    def _evict(self) -> None:
+        with self._lock:
+            try:
+                entries = [e for e in os.scandir(self.directory) if e.is_file() and not e.name.endswith('.part')]
+            except OSError:
+                return
+            total = sum(e.stat().st_size for e in entries)
+            for entry in sorted(entries, key=lambda e: e.stat().st_mtime):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    size = entry.stat().st_size
+                    os.remove(entry.path)
+                    total -= size
+                except OSError:
+                    continue
+
+
+__all__ = ["download_to_file", "DownloadCache", "DownloadCancelled"]
@@ -0,0 +1,95 @@
+"""Selección del formato de descarga a partir de los metadatos de la pista"""
+from __future__ import annotations
+import threading
+from typing import Any, Dict, List, Optional
+
+# Formatos de Qobuz de mayor a menor calidad: (bits, kHz máximos que cubre)
+FORMAT_LADDER: List[str] = ['27', '7', '6', '5']
+FORMAT_SPECS: Dict[str, Dict[str, Any]] = {
+    '27': {'bit_depth': 24, 'max_sampling_rate': 192.0},
+    '7': {'bit_depth': 24, 'max_sampling_rate': 96.0},
+    '6': {'bit_depth': 16, 'max_sampling_rate': 44.1},
+    '5': {'bit_depth': None, 'max_sampling_rate': None},
+}
+
+
+def _as_float(value: Any) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def best_format(track_info: Optional[Dict[str, Any]], ceiling: str = '27') -> str:
+    """Mejor ``format_id`` que la pista ofrece realmente sin superar ``ceiling``.
+
+    Usa ``maximum_bit_depth``/``maximum_sampling_rate``/``hires_streamable`` de ``track/get``:
+    pedir 27 o 7 para una pista en 16-bit hace que Qobuz rebaje la calidad (o falle) y el
+    cliente reintente. Sin metadatos suficientes se devuelve ``ceiling`` tal cual.
+    """
+    ceiling = str(ceiling)
+    if ceiling not in FORMAT_SPECS:
+        ceiling = '6'
+    if not track_info:
+        return ceiling
+    bit_depth = _as_float(track_info.get('maximum_bit_depth'))
+    rate = _as_float(track_info.get('maximum_sampling_rate'))
+    if bit_depth is None:
+        return ceiling
+    hires = bit_depth >= 24 and track_info.get('hires_streamable', track_info.get('hires', True)) is not False
+    for fmt in FORMAT_LADDER[FORMAT_LADDER.index(ceiling):]:
+        if fmt in ('27', '7'):
+            if not hires:
+                continue
+            # 27 solo aporta algo si la pista supera los 96 kHz
+            if fmt == '27' and rate is not None and rate <= FORMAT_SPECS['7']['max_sampling_rate']:
+                continue
+        return fmt
+    return '5'
+
+
+class FormatSelector:
+    """Elige el formato por pista y cuenta las llamadas a ``getFileUrl`` que se ahorran."""
+
+    def __init__(self, quality_map: Dict[str, Dict[str, str]]):
+        self.quality_map = quality_map
+        self._lock = threading.Lock()
+        self._counters: Dict[str, int] = {'resolved': 0, 'downgraded': 0, 'avoided_retries': 0,
+                                          'fallback_calls': 0, 'failed': 0}
+
+    def count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self._counters[name] += n
+
+    def select(self, track_info: Optional[Dict[str, Any]], ceiling: str) -> str:
+        fmt = best_format(track_info, ceiling)
+        requested = str(ceiling) if str(ceiling) in FORMAT_SPECS else '6'
+        if fmt != requested:
+            # Cada escalón saltado era una llamada fallida o rebajada seguida de reintento
+            skipped = FORMAT_LADDER.index(fmt) - FORMAT_LADDER.index(requested)
+            with self._lock:
+                self._counters['downgraded'] += 1
+                self._counters['avoided_retries'] += skipped
+        return fmt
+
+    def describe(self, fmt: str, file_info: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Formato entregado; ``file_info`` (respuesta de ``getFileUrl``) manda si la trae."""
+        file_info = file_info or {}
+        delivered = str(file_info.get('format_id') or fmt)
+        spec = FORMAT_SPECS.get(delivered, {})
+        quality = self.quality_map.get(delivered, {})
+        return {
+            'format_id': delivered,
+            'name': quality.get('name', ''),
+            'ext': quality.get('ext', '.flac'),
+            'bit_depth': file_info.get('bit_depth', spec.get('bit_depth')),
+            'sampling_rate': file_info.get('sampling_rate', spec.get('max_sampling_rate')),
+            'mime_type': file_info.get('mime_type'),
+        }
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counters)
+
+
+__all__ = ["FORMAT_LADDER", "FORMAT_SPECS", "best_format", "FormatSelector"]
@@ -0,0 +1,453 @@
+"""Cola persistente de trabajos de descarga en segundo plano.
+
+Los álbumes, playlists y archivos Hi-Res tardan más de lo que permite una petición
+síncrona en entornos serverless. Aquí se encolan como trabajos (SQLite), se procesan
+con un pool acotado de descargas y se consulta su progreso mediante ``/api/jobs``.
+
+Varios workers pueden compartir la misma base de datos: cada trabajo en curso guarda
+su dueño y un latido periódico, un trabajo solo se ejecuta si se reclama atómicamente
+(``queued`` → ``running``) y solo vuelven a la cola los que llevan ``stale_after``
+segundos sin latido (su worker murió).
+"""
+from __future__ import annotations
+import json
+import logging
+import os
+import queue
+import socket
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Tuple
+from .album import safe_filename
+from .downloads import DownloadCache, DownloadCancelled, download_to_file
+from ..utils.metadata import add_metadata_to_file, build_track_metadata, fetch_cover, get_cover_url
+
+logger = logging.getLogger(__name__)
+
+JOB_KINDS = ('track', 'album', 'playlist')
+FINISHED_STATUSES = ('completed', 'failed', 'cancelled')
+
+_COLUMNS = ('id', 'kind', 'params', 'status', 'items_total', 'items_done', 'bytes_done', 'bytes_total',
+            'result', 'error', 'created_at', 'started_at', 'finished_at', 'cancel_requested', 'owner',
+            'heartbeat_at')
+
+
+class JobStore:
+    """Persistencia de trabajos en SQLite (sobrevive a reinicios del proceso)."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS jobs ('
+                ' id TEXT PRIMARY KEY, kind TEXT NOT NULL, params TEXT NOT NULL, status TEXT NOT NULL,'
+                ' items_total INTEGER DEFAULT 0, items_done INTEGER DEFAULT 0,'
+                ' bytes_done INTEGER DEFAULT 0, bytes_total INTEGER DEFAULT 0,'
+                ' result TEXT, error TEXT, created_at REAL, started_at REAL, finished_at REAL,'
+                ' cancel_requested INTEGER DEFAULT 0, owner TEXT, heartbeat_at REAL)'
+            )
+            # Bases creadas antes de registrar dueño y latido
+            existing = {r['name'] for r in self._conn.execute('PRAGMA table_info(jobs)')}
+            for column, kind in (('owner', 'TEXT'), ('heartbeat_at', 'REAL')):
+                if column not in existing:
+                    self._conn.execute(f'ALTER TABLE jobs ADD COLUMN {column} {kind}')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status)')
+
+    @staticmethod
+    def _row_to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        job['params'] = json.loads(job['params'] or '{}')
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        job['cancel_requested'] = bool(job['cancel_requested'])
+        return job
+
+    def create(self, kind: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute('INSERT INTO jobs (id, kind, params, status, created_at) VALUES (?, ?, ?, ?, ?)',
+                               (job_id, kind, json.dumps(params), 'queued', time.time()))
+        return self.get(job_id)
+
+    def update(self, job_id: str, **fields: Any) -> None:
+        if 'result' in fields and fields['result'] is not None:
+            fields['result'] = json.dumps(fields['result'], ensure_ascii=False)
+        names = [k for k in fields if k in _COLUMNS and k != 'id']
+        if not names:
+            return
+        sql = f"UPDATE jobs SET {', '.join(f'{k} = ?' for k in names)} WHERE id = ?"
+        with self._lock:
+            self._conn.execute(sql, [fields[k] for k in names] + [job_id])
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return self._row_to_dict(row) if row else None
+
+    def list(self, limit: int = 50) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute('SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?', (limit,)).fetchall()
+        return [self._row_to_dict(r) for r in rows]
+
+    def queued_ids(self) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute("SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at").fetchall()
+        return [r['id'] for r in rows]
+
+    def claim(self, job_id: str, owner: str) -> bool:
+        """Pasa un trabajo de ``queued`` a ``running`` a nombre de ``owner``; ``False`` si otro se adelantó."""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = 'running', owner = ?, heartbeat_at = ?, started_at = ?, error = NULL "
+                "WHERE id = ? AND status = 'queued'", (owner, now, now, job_id))
+        return cursor.rowcount == 1
+
+    def heartbeat(self, owner: str) -> List[str]:
+        """Renueva el latido de los trabajos en curso de ``owner`` y devuelve los que piden cancelación."""
+        with self._lock:
+            self._conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE owner = ? AND status = 'running'",
+                               (time.time(), owner))
+            rows = self._conn.execute("SELECT id FROM jobs WHERE owner = ? AND status = 'running' "
+                                      "AND cancel_requested = 1", (owner,)).fetchall()
+        return [r['id'] for r in rows]
+
+    def recover_stale(self, stale_after: float) -> List[str]:
+        """Trabajos ``running`` sin latido desde hace ``stale_after`` segundos (su worker murió):
+        los que pedían cancelación se cancelan y el resto vuelve a la cola. Devuelve estos últimos."""
+        now = time.time()
+        limit = now - stale_after
+        stale = "status = 'running' AND (heartbeat_at IS NULL OR heartbeat_at < ?)"
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                self._conn.execute(f"UPDATE jobs SET status = 'cancelled', owner = NULL, finished_at = ? "
+                                   f"WHERE {stale} AND cancel_requested = 1", (now, limit))
+                rows = self._conn.execute(f'SELECT id FROM jobs WHERE {stale} ORDER BY created_at', (limit,)).fetchall()
+                self._conn.execute(f"UPDATE jobs SET status = 'queued', owner = NULL WHERE {stale}", (limit,))
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+        return [r['id'] for r in rows]
+
+
+class _LiveProgress:
+    """Progreso en memoria de un trabajo en curso (se vuelca a SQLite con moderación)."""
+
+    def __init__(self, items_total: int):
+        self.lock = threading.Lock()
+        self.items_total = items_total
+        self.items_done = 0
+        self.bytes_done = 0
+        self.partial: Dict[str, Tuple[int, Optional[int]]] = {}
+        self.last_flush = 0.0
+
+    def fraction(self) -> float:
+        with self.lock:
+            if not self.items_total:
+                return 0.0
+            inflight = sum(done / total for done, total in self.partial.values() if total)
+            return min(1.0, (self.items_done + inflight) / self.items_total)
+
+    def bytes_total(self) -> int:
+        with self.lock:
+            return self.bytes_done + sum(total - done for done, total in self.partial.values() if total)
+
+
+class JobManager:
+    """Orquesta trabajos: ``runners`` hilos toman trabajos de la cola y reparten las
+    descargas de pistas en un pool compartido de ``download_workers`` hilos.
+
+    Cada ``heartbeat_interval`` segundos renueva el latido de sus trabajos, recoge las
+    cancelaciones pedidas desde otros workers y reencola los trabajos abandonados.
+    """
+
+    def __init__(self, downloader, store: JobStore, cache: DownloadCache, runners: int = 2,
+                 download_workers: int = 4, playlist_importer=None, chunk_size: int = 64 * 1024,
+                 stale_after: float = 60.0, heartbeat_interval: Optional[float] = None):
+        self.downloader = downloader
+        self.store = store
+        self.cache = cache
+        self.runners = max(1, runners)
+        self.chunk_size = chunk_size
+        self.playlist_importer = playlist_importer
+        self.stale_after = stale_after
+        self.heartbeat_interval = heartbeat_interval or max(stale_after / 4, 0.05)
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._pool = ThreadPoolExecutor(max_workers=max(1, download_workers), thread_name_prefix='job-dl')
+        self._queue: 'queue.Queue[str]' = queue.Queue()
+        self._live: Dict[str, _LiveProgress] = {}
+        self._cancelled: set = set()
+        self._lock = threading.Lock()
+        self._started = False
+
+    # --- Ciclo de vida ---
+    def start(self) -> None:
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        # Trabajos pendientes y los que dejó a medias un worker caído; otros workers vivos
+        # pueden encolar los mismos ids, pero solo uno los reclama en ``_run``
+        self._requeue_stale()
+        for job_id in self.store.queued_ids():
+            self._queue.put(job_id)
+        for i in range(self.runners):
+            threading.Thread(target=self._runner_loop, name=f'job-runner-{i}', daemon=True).start()
+        threading.Thread(target=self._heartbeat_loop, name='job-heartbeat', daemon=True).start()
+
+    def submit(self, kind: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Tipo de trabajo no soportado: {kind}")
+        self.start()
+        job = self.store.create(kind, params)
+        self._queue.put(job['id'])
+        return self.describe(job)
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self.store.get(job_id)
+        if not job:
+            return None
+        if job['status'] == 'queued':
+            self.store.update(job_id, status='cancelled', cancel_requested=1, finished_at=time.time())
+        elif job['status'] == 'running':
+            self.store.update(job_id, cancel_requested=1)
+            with self._lock:
+                self._cancelled.add(job_id)
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self.store.get(job_id)
+        return self.describe(job) if job else None
+
+    def list(self, limit: int = 50) -> List[Dict[str, Any]]:
+        return [self.describe(j) for j in self.store.list(limit)]
+
+    def describe(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        """Estado público del trabajo con progreso, bytes y ETA."""
+        live = self._live.get(job['id'])
+        if live is not None and job['status'] == 'running':
+            progress = live.fraction()
+            bytes_done, bytes_total = live.bytes_done, live.bytes_total()
+            items_done = live.items_done
+        else:
+            items_done = job['items_done']
+            bytes_done, bytes_total = job['bytes_done'], job['bytes_total']
+            progress = 1.0 if job['status'] == 'completed' else (items_done / job['items_total'] if job['items_total'] else 0.0)
+        eta = None
+        if job['status'] == 'running' and job['started_at'] and progress > 0:
+            elapsed = time.time() - job['started_at']
+            eta = round(elapsed * (1 - progress) / progress, 1)
+        result = job['result'] or {}
+        return {
+            'id': job['id'],
+            'type': job['kind'],
+            'params': job['params'],
+            'status': job['status'],
+            'progress': round(progress, 4),
+            'items_total': job['items_total'],
+            'items_done': items_done,
+            'bytes_done': bytes_done,
+            'bytes_total': bytes_total,
+            'eta_seconds': eta,
+            'error': job['error'],
+            'files': [{k: f[k] for k in ('track_id', 'filename', 'size', 'cached')} for f in result.get('files', [])],
+            'failed': result.get('failed', []),
+            'created_at': job['created_at'],
+            'started_at': job['started_at'],
+            'finished_at': job['finished_at'],
+        }
+
+    def result_files(self, job_id: str) -> Optional[List[Tuple[str, str]]]:
+        """Lista ``(ruta, nombre)`` de los archivos de un trabajo completado que siguen en disco."""
+        job = self.store.get(job_id)
+        if not job or job['status'] != 'completed':
+            return None
+        files = (job['result'] or {}).get('files', [])
+        return [(f['path'], f['filename']) for f in files if os.path.exists(f['path'])]
+
+    def archive_name(self, job_id: str) -> str:
+        job = self.store.get(job_id) or {}
+        title = (job.get('result') or {}).get('title') or f"musichub-{job_id[:8]}"
+        return safe_filename(title, 'musichub') + '.zip'
+
+    # --- Ejecución ---
+    def _requeue_stale(self) -> List[str]:
+        job_ids = self.store.recover_stale(self.stale_after)
+        if job_ids:
+            logger.warning("Reencolados %d trabajos abandonados por otro worker", len(job_ids))
+        for job_id in job_ids:
+            self._queue.put(job_id)
+        return job_ids
+
+    def _heartbeat_loop(self) -> None:
+        while True:
+            time.sleep(self.heartbeat_interval)
+            try:
+                cancelled = self.store.heartbeat(self.owner)
+                if cancelled:
+                    with self._lock:
+                        self._cancelled.update(cancelled)
+                self._requeue_stale()
+            except Exception:
+                logger.exception("Error en el latido de trabajos")
+
+    def _runner_loop(self) -> None:
+        while True:
+            job_id = self._queue.get()
+            try:
+                self._run(job_id)
+            except Exception:
+                logger.exception("Error inesperado ejecutando el trabajo %s", job_id)
+            finally:
+                self._queue.task_done()
+
+    def _is_cancelled(self, job_id: str) -> bool:
+        return job_id in self._cancelled
+
+    def _collect_tracks(self, job: Dict[str, Any]) -> Tuple[str, List[Tuple[Dict[str, Any], Dict[str, Any]]]]:
+        """Devuelve ``(título, [(pista, álbum)])`` según el tipo de trabajo."""
+        params = job['params']
+        if job['kind'] == 'track':
+            track = self.downloader.get_track_info(str(params.get('track_id')))
+            if not track:
+                raise ValueError('Track no encontrado')
+            performer = (track.get('performer') or {}).get('name', '')
+            return f"{performer} - {track.get('title', '')}", [(track, track.get('album') or {})]
+        if job['kind'] == 'album':
+            album = self.downloader.get_album_info(str(params.get('album_id')))
+            if not album:
+                raise ValueError('Álbum no encontrado')
+            artist = (album.get('artist') or {}).get('name', '')
+            tracks = (album.get('tracks') or {}).get('items') or []
+            return f"{artist} - {album.get('title', '')}", [(t, album) for t in tracks]
+        # playlist
+        importer = self.playlist_importer
+        t_type, s_id = self.downloader.spotify.extract_spotify_id(params.get('url', ''))
+        if importer is None or t_type != 'playlist' or not s_id:
+            raise ValueError('URL de playlist de Spotify no válida')
+        playlist = importer.load(s_id)
+        if not playlist:
+            raise ValueError('No se pudo leer la playlist')
+        # El mapeo solo guarda ``Track``: el etiquetado necesita el JSON completo de ``track/get``
+        matched = [e['match'] for e in importer.map_all(playlist['tracks']) if e['match']]
+        infos = self.downloader.get_tracks_info_batch([str(t.id) for t in matched])
+        tracks = [t for t in infos.values() if t]
+        return playlist.get('name') or 'playlist', [(t, t.get('album') or {}) for t in tracks]
+
+    def _cover_for(self, album: Dict[str, Any], covers: Dict[Any, Optional[bytes]], lock: threading.Lock) -> Optional[bytes]:
+        key = album.get('id') or get_cover_url(album)
+        with lock:
+            if key in covers:
+                return covers[key]
+        data = fetch_cover(get_cover_url(album))
+        with lock:
+            covers[key] = data
+        return data
+
+    def _fetch_track(self, job_id: str, quality: str, track: Dict[str, Any], album: Dict[str, Any],
+                     live: _LiveProgress, covers: Dict[Any, Optional[bytes]], covers_lock: threading.Lock) -> Dict[str, Any]:
+        track_id = str(track.get('id'))
+        ext = self.downloader.quality_map.get(quality, {}).get('ext', '.flac')
+        performer = (track.get('performer') or {}).get('name', '')
+        filename = safe_filename(f"{performer} - {track.get('title', '')}" if performer else track.get('title', '')) + ext
+
+        cached = self.cache.get(track_id, quality, ext)
+        if cached:
+            size = os.path.getsize(cached)
+            with live.lock:
+                live.bytes_done += size
+            return {'track_id': track_id, 'filename': filename, 'path': cached, 'size': size, 'cached': True}
+
+        url = self.downloader._get_file_url(track_id, quality)
+        if not url:
+            raise ValueError('No se pudo obtener enlace de descarga')
+        fd, tmp_path = tempfile.mkstemp(suffix='.part', dir=self.cache.directory)
+        os.close(fd)
+
+        def on_chunk(n: int, total: Optional[int]) -> None:
+            with live.lock:
+                done, _ = live.partial.get(track_id, (0, total))
+                live.partial[track_id] = (done + n, total)
+                live.bytes_done += n
+            self._flush(job_id, live)
+
+        try:
+            size = download_to_file(url, tmp_path, self.chunk_size, on_chunk=on_chunk,
+                                    should_stop=lambda: self._is_cancelled(job_id))
+            add_metadata_to_file(tmp_path, build_track_metadata(track, album),
+                                 cover_data=self._cover_for(album, covers, covers_lock))
+            path = self.cache.put(track_id, quality, ext, tmp_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        finally:
+            with live.lock:
+                live.partial.pop(track_id, None)
+        return {'track_id': track_id, 'filename': filename, 'path': path, 'size': size, 'cached': False}
+
+    def _flush(self, job_id: str, live: _LiveProgress, force: bool = False) -> None:
+        now = time.time()
+        if not force and now - live.last_flush < 1.0:
+            return
+        live.last_flush = now
+        self.store.update(job_id, items_done=live.items_done, bytes_done=live.bytes_done, bytes_total=live.bytes_total())
+
+    def _run(self, job_id: str) -> None:
+        if not self.store.claim(job_id, self.owner):
+            return  # cancelado, terminado o reclamado por otro worker
+        job = self.store.get(job_id)
+        quality = str(job['params'].get('quality', '6'))
+        try:
+            title, items = self._collect_tracks(job)
+            live = _LiveProgress(len(items))
+            self._live[job_id] = live
+            self.store.update(job_id, items_total=len(items))
+            covers: Dict[Any, Optional[bytes]] = {}
+            covers_lock = threading.Lock()
+            futures = {self._pool.submit(self._fetch_track, job_id, quality, t, a, live, covers, covers_lock): t
+                       for t, a in items}
+            files, failed = [], []
+            for fut in futures:
+                track = futures[fut]
+                wait([fut])
+                if self._is_cancelled(job_id):
+                    for other in futures:
+                        other.cancel()
+                    raise DownloadCancelled()
+                try:
+                    files.append(fut.result())
+                except DownloadCancelled:
+                    raise
+                except Exception as e:
+                    failed.append({'track_id': str(track.get('id')), 'title': track.get('title', ''), 'error': str(e)})
+                with live.lock:
+                    live.items_done += 1
+                self._flush(job_id, live)
+            self._flush(job_id, live, force=True)
+            status = 'completed' if files else 'failed'
+            error = None if files else 'No se pudo descargar ninguna pista'
+            self.store.update(job_id, status=status, error=error, finished_at=time.time(),
+                              result={'title': title, 'files': files, 'failed': failed})
+        except DownloadCancelled:
+            self.store.update(job_id, status='cancelled', finished_at=time.time())
+        except Exception as e:
+            logger.warning("Trabajo %s fallido: %s", job_id, e)
+            self.store.update(job_id, status='failed', error=str(e), finished_at=time.time())
+        finally:
+            self._live.pop(job_id, None)
+            with self._lock:
+                self._cancelled.discard(job_id)
+
+
+__all__ = ["JobManager", "JobStore", "JOB_KINDS", "FINISHED_STATUSES"]
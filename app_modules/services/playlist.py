@@ -0,0 +1,57 @@
+"""Importación de playlists de Spotify mapeando cada pista a Qobuz en paralelo"""
+from __future__ import annotations
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, Iterator, List, Optional
+from ..utils.logs import submit_in_context
+from ..utils.ratelimit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+
+class SpotifyPlaylistImporter:
+    """Lee una playlist del embed de Spotify y mapea sus pistas a Qobuz.
+
+    Todas las pistas se procesan en un pool de ``max_workers`` hilos que comparten un
+    único presupuesto de ``rate_per_second`` búsquedas en Qobuz, de modo que una playlist
+    grande no dispara ráfagas ilimitadas contra la API.
+    """
+
+    def __init__(self, downloader, max_workers: int = 16, rate_per_second: float = 20.0):
+        self.downloader = downloader
+        self.max_workers = max(1, max_workers)
+        self.rate_per_second = rate_per_second
+
+    def load(self, playlist_id: str) -> Optional[Dict[str, Any]]:
+        return self.downloader.spotify.get_playlist_tracks_by_scraping(playlist_id)
+
+    def _map_one(self, sp_info: Dict[str, Any], limiter: TokenBucket) -> Optional[Dict[str, Any]]:
+        return self.downloader.search_track_from_spotify_info(sp_info, rate_limiter=limiter, fallback_best_match=True)
+
+    def iter_mapped(self, tracks: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Emite ``{'index', 'spotify', 'match'}`` en cuanto se resuelve cada pista."""
+        if not tracks:
+            return
+        limiter = TokenBucket(self.rate_per_second, burst=self.max_workers)
+        pool = ThreadPoolExecutor(max_workers=min(self.max_workers, len(tracks)))
+        futures = {submit_in_context(pool, self._map_one, t, limiter): i for i, t in enumerate(tracks)}
+        try:
+            for fut in as_completed(futures):
+                index = futures[fut]
+                try:
+                    match = fut.result()
+                except Exception as e:
+                    logger.warning("Error mapeando pista %d de la playlist: %s", index, e)
+                    match = None
+                yield {'index': index, 'spotify': tracks[index], 'match': match}
+        finally:
+            for fut in futures:
+                fut.cancel()
+            pool.shutdown(wait=False)
+
+    def map_all(self, tracks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Versión no incremental: resultados en el orden original de la playlist."""
+        return sorted(self.iter_mapped(tracks), key=lambda r: r['index'])
+
+
+__all__ = ["SpotifyPlaylistImporter"]
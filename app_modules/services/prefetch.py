@@ -0,0 +1,132 @@
+"""Precarga especulativa de metadatos y URLs de preview de los primeros resultados"""
+from __future__ import annotations
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+from ..utils.cache import TTLCache
+from ..utils.ratelimit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+
+class Prefetcher:
+    """Calienta ``track_cache`` y ``preview_cache`` para los ``top_n`` primeros resultados.
+
+    Trabaja con prioridad baja: pool propio y pequeño, presupuesto propio de peticiones
+    por segundo y cola acotada. Si no hay presupuesto o la cola está llena la precarga
+    se descarta en lugar de competir con las peticiones de usuarios.
+
+    Para poder ajustar ``top_n`` se recuerda la posición de cada resultado de las últimas
+    búsquedas y, cuando el usuario pide preview/descarga, se cuenta como acierto (estaba
+    precargado) o fallo por posición.
+    """
+
+    def __init__(self, downloader, top_n: int = 3, workers: int = 2, rate_per_second: float = 4.0,
+                 max_pending: int = 32, enabled: bool = True):
+        self.downloader = downloader
+        self.top_n = top_n
+        self.enabled = enabled
+        self.max_pending = max_pending
+        self._budget = TokenBucket(rate_per_second, burst=max(1, top_n * 2))
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='prefetch') if enabled else None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._inflight: set = set()
+        # track_id -> posición en la última búsqueda que lo devolvió
+        self._ranks = TTLCache(maxsize=5000, ttl=1800)
+        self._prefetched = TTLCache(maxsize=5000, ttl=1800)
+        self._counters: Dict[str, int] = {'scheduled': 0, 'completed': 0, 'failed': 0,
+                                          'skipped_budget': 0, 'skipped_queue': 0, 'skipped_cached': 0}
+        self._hits_by_rank: Dict[int, int] = {}
+        self._misses_by_rank: Dict[int, int] = {}
+        self._uses: Dict[str, int] = {'hits': 0, 'misses': 0, 'unranked': 0}
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    def schedule(self, track_ids: List[Any]) -> None:
+        """Registra las posiciones de una página de resultados y precarga las ``top_n`` primeras."""
+        ids = [str(t) for t in track_ids if t]
+        for rank, tid in enumerate(ids, start=1):
+            self._ranks.set(tid, rank)
+        if not self.enabled:
+            return
+        accepted = []
+        for tid in ids[:self.top_n]:
+            if tid in self.downloader.preview_cache:
+                self._count('skipped_cached')
+                continue
+            with self._lock:
+                if tid in self._inflight:
+                    continue
+                if self._pending >= self.max_pending:
+                    self._counters['skipped_queue'] += 1
+                    continue
+                if not self._budget.try_acquire():
+                    self._counters['skipped_budget'] += 1
+                    continue
+                self._pending += 1
+                self._inflight.add(tid)
+                self._counters['scheduled'] += 1
+            accepted.append(tid)
+        if accepted:
+            self._pool.submit(self._warm, accepted)
+
+    def _warm(self, track_ids: List[str]) -> None:
+        """Una sola tarea por página: metadatos y previews en lote."""
+        try:
+            infos = self.downloader.get_tracks_info_batch(track_ids)
+            previews = self.downloader.resolve_preview_urls([t for t in track_ids if infos.get(t)])
+            for tid in track_ids:
+                if infos.get(tid) and previews.get(tid):
+                    self._prefetched.set(tid, True)
+                    self._count('completed')
+                else:
+                    self._count('failed')
+        except Exception as e:
+            logger.debug("Prefetch de %s fallido: %s", track_ids, e)
+            for _ in track_ids:
+                self._count('failed')
+        finally:
+            with self._lock:
+                self._pending -= len(track_ids)
+                self._inflight.difference_update(track_ids)
+
+    def record_use(self, track_id: Any) -> None:
+        """Llamar cuando el usuario pide preview o descarga de una pista."""
+        tid = str(track_id)
+        rank: Optional[int] = self._ranks.get(tid)
+        hit = self._prefetched.get(tid) is not None
+        with self._lock:
+            if rank is None:
+                self._uses['unranked'] += 1
+                return
+            if hit:
+                self._uses['hits'] += 1
+                self._hits_by_rank[rank] = self._hits_by_rank.get(rank, 0) + 1
+            else:
+                self._uses['misses'] += 1
+                self._misses_by_rank[rank] = self._misses_by_rank.get(rank, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            uses = dict(self._uses)
+            ranked = uses['hits'] + uses['misses']
+            completed = self._counters['completed']
+            return {
+                'enabled': self.enabled,
+                'top_n': self.top_n,
+                'pending': self._pending,
+                'counters': dict(self._counters),
+                'uses': uses,
+                'hit_rate': round(uses['hits'] / ranked, 4) if ranked else 0.0,
+                # Fracción de precargas que el usuario llegó a usar
+                'precision': round(uses['hits'] / completed, 4) if completed else 0.0,
+                'hits_by_rank': dict(sorted(self._hits_by_rank.items())),
+                'misses_by_rank': dict(sorted(self._misses_by_rank.items())),
+            }
+
+
+__all__ = ["Prefetcher"]
@@ -0,0 +1,113 @@
+"""Proxy de audio de previews con caché en disco del comienzo de cada pista"""
+from __future__ import annotations
+import logging
+import os
+import threading
+import uuid
+from typing import Any, Dict, Optional
+import requests
+from .downloads import DownloadCache, download_to_file
+
+logger = logging.getLogger(__name__)
+
+# Las previews (muestra o stream completo con format_id=5) son MP3 a 320 kbps
+MP3_BYTES_PER_SECOND = 320_000 // 8
+# Margen para la cabecera ID3 (incluye la carátula incrustada)
+ID3_HEADER_SLACK = 64 * 1024
+
+
+class PreviewAudioCache:
+    """Guarda en disco los primeros ``segment_seconds`` de cada preview y los sirve localmente.
+
+    Las URLs de Qobuz caducan y cada reproducción volvía al CDN; así la repetición (del
+    mismo usuario o de otro) es una lectura local. Cada pista se descarga una sola vez
+    aunque lleguen varias peticiones simultáneas; el tamaño total se acota expulsando
+    los segmentos usados hace más tiempo (ver ``DownloadCache``).
+    """
+
+    QUALITY_TAG = 'preview'
+    EXT = '.mp3'
+
+    def __init__(self, downloader, directory: str, max_bytes: int = 256 * 1024 ** 2, segment_seconds: int = 30):
+        self.downloader = downloader
+        self.cache = DownloadCache(directory, max_bytes=max_bytes)
+        self.segment_bytes = segment_seconds * MP3_BYTES_PER_SECOND + ID3_HEADER_SLACK
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, threading.Event] = {}
+        self._counters: Dict[str, int] = {'hits': 0, 'misses': 0, 'failed': 0, 'url_refreshed': 0, 'bytes_fetched': 0}
+
+    def _count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self._counters[name] += n
+
+    def get_segment(self, track_id: Any) -> Optional[str]:
+        """Ruta local del segmento de preview; lo descarga si no está en disco."""
+        track_id = str(track_id)
+        while True:
+            path = self.cache.get(track_id, self.QUALITY_TAG, self.EXT)
+            if path:
+                self._count('hits')
+                return path
+            with self._lock:
+                event = self._inflight.get(track_id)
+                owner = event is None
+                if owner:
+                    event = self._inflight[track_id] = threading.Event()
+            if not owner:
+                # Otra petición ya lo está descargando: esperar y volver a mirar la caché
+                event.wait(timeout=60)
+                path = self.cache.get(track_id, self.QUALITY_TAG, self.EXT)
+                if path:
+                    self._count('hits')
+                return path
+            try:
+                self._count('misses')
+                return self._fetch(track_id)
+            finally:
+                with self._lock:
+                    self._inflight.pop(track_id, None)
+                event.set()
+
+    def _fetch(self, track_id: str) -> Optional[str]:
+        tmp_path = self.cache.path_for(track_id, self.QUALITY_TAG, f'.{uuid.uuid4().hex}.part')
+        try:
+            for attempt in range(2):
+                url = self.downloader.resolve_preview_url(track_id)
+                if not url:
+                    self._count('failed')
+                    return None
+                try:
+                    written = download_to_file(url, tmp_path, max_bytes=self.segment_bytes)
+                except requests.HTTPError as e:
+                    status = e.response.status_code if e.response is not None else None
+                    if attempt == 0 and status in (401, 403, 404, 410):
+                        # URL firmada caducada: se descarta de la caché y se resuelve otra
+                        self.downloader.preview_cache.delete(track_id)
+                        self._count('url_refreshed')
+                        continue
+                    raise
+                self._count('bytes_fetched', written)
+                return self.cache.put(track_id, self.QUALITY_TAG, self.EXT, tmp_path)
+            self._count('failed')
+            return None
+        except Exception as e:
+            logger.warning("No se pudo cachear la preview de %s: %s", track_id, e)
+            self._count('failed')
+            return None
+        finally:
+            if os.path.exists(tmp_path):
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+        served = counters['hits'] + counters['misses']
+        counters['hit_ratio'] = round(counters['hits'] / served, 4) if served else 0.0
+        counters['segment_bytes'] = self.segment_bytes
+        return counters
+
+
+__all__ = ["PreviewAudioCache"]
@@ -1,21 +1,51 @@
 """Servicio principal para interacción con la API de Qobuz"""
 from __future__ import annotations
 import time
+import threading
 import hashlib
 import re
 import json
+import logging
 from typing import List, Dict, Any, Optional
 import unicodedata
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from bs4 import BeautifulSoup
 import requests
+from requests.adapters import HTTPAdapter
 from .spotify import SpotifyHandler
-from ..config import QOBUZ_TOKEN, GENIUS_TOKEN
+from .formats import FORMAT_LADDER, FormatSelector
+from .tracks import Track
+from .credentials import Credential, CredentialPool
+from ..utils.cache import SWRCache, TTLCache
+from ..utils.deadline import has_time_for
+from ..utils.http import upstream_get
+from ..utils.logs import debug_enabled, submit_in_context
+from ..utils.metrics import CountingExecutor
+from ..utils.ratelimit import TokenBucket
+from ..utils.shared_cache import TieredCache
+from ..utils.tracing import span, trace_methods
+from ..config import (QOBUZ_TOKEN, GENIUS_TOKEN, TRACK_CACHE_TTL, TRACK_CACHE_SIZE, PREVIEW_URL_CACHE_TTL,
+                      SEARCH_CACHE_TTL, LYRICS_CACHE_TTL, QOBUZ_CREDENTIAL_COOLDOWN, USER_INFO_CACHE_TTL,
+                      load_qobuz_accounts, set_live_credentials)
 
+logger = logging.getLogger(__name__)
+
+# Segundos estimados de cada etapa opcional: dentro del plazo de la petición solo se
+# empiezan si caben sin tocar la reserva (ver ``utils.deadline``)
+LYRICS_CANDIDATE_SECONDS = 2.0   # pausa + página de Genius + búsqueda en Qobuz
+GENIUS_SCRAPING_SECONDS = 3.0
+SPOTIFY_QUERY_SECONDS = 1.0
+
+@trace_methods('qobuz')
 class QobuzDownloader:
     base_url = "https://www.qobuz.com/api.json/0.2"
 
     def __init__(self):
         self.session = requests.Session()
+        # Pool de conexiones amplio: álbumes y lotes hacen varias peticiones en paralelo
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=32)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
         self.session.headers.update({'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36', 'Accept': 'application/json', 'Accept-Language': 'en-US,en;q=0.9'})
         self.token = QOBUZ_TOKEN
         self.app_id: Optional[str] = None
@@ -28,7 +58,29 @@ class QobuzDownloader:
             '27': {'name': 'FLAC 24-bit/192kHz', 'ext': '.flac'}
         }
         self.spotify = SpotifyHandler()
+        # Formato por pista según sus metadatos (evita pedir calidades que no existen)
+        self.formats = FormatSelector(self.quality_map)
+        # Respuestas de track/get: las consultan search, preview, download y proxy-download.
+        # Búsquedas y letras de Genius también: todas compartibles entre instancias
+        self.track_cache = TieredCache('track', ttl=TRACK_CACHE_TTL, maxsize=TRACK_CACHE_SIZE)
+        # (versión 2: filas de ``Track`` en lugar del JSON de ``track/search``)
+        self.search_cache = TieredCache('search', ttl=SEARCH_CACHE_TTL, maxsize=1000, version=2)
+        self.lyrics_cache = TieredCache('lyrics', ttl=LYRICS_CACHE_TTL, maxsize=500)
+        # URLs firmadas de preview: caducan en Qobuz, se guardan poco tiempo
+        self.preview_cache = TTLCache(maxsize=TRACK_CACHE_SIZE, ttl=PREVIEW_URL_CACHE_TTL)
+        # Hilos para lanzar en paralelo variantes de una misma petición (p.ej. previews)
+        # (contado: la ocupación sale en /api/metrics sin leer el interior del ejecutor)
+        self._io_pool = CountingExecutor(ThreadPoolExecutor(max_workers=16, thread_name_prefix='qobuz-io'),
+                                         max_workers=16)
+        # Datos de usuario/suscripción: se sirven de memoria y se refrescan antes de caducar
+        # (pool propio: la recarga a su vez usa ``_io_pool`` para lanzar las dos peticiones)
+        self.user_info_cache = SWRCache(ttl=USER_INFO_CACHE_TTL,
+                                        executor=ThreadPoolExecutor(max_workers=1, thread_name_prefix='user-info'))
         self.initialize_qobuz_session()
+        # Cuentas adicionales (QOBUZ_ACCOUNTS) para repartir carga y sobrevivir a un token caído
+        self.pool = self._build_pool()
+        if len(self.pool.credentials) > 1:
+            threading.Thread(target=self.check_credentials, name='qobuz-pool-check', daemon=True).start()
 
     # --- Inicialización ---
     def initialize_qobuz_session(self) -> bool:
@@ -42,10 +94,80 @@ class QobuzDownloader:
         except Exception:
             return False
 
+    def _build_pool(self) -> CredentialPool:
+        primary = Credential('primary', self.token, self.app_id, self.app_secret, user_id=self.user_id)
+        credentials = [primary]
+        for i, account in enumerate(load_qobuz_accounts(), start=1):
+            token = account.get('token')
+            if not token or token == self.token:
+                continue
+            credentials.append(Credential(
+                account.get('name') or f'account-{i}', token,
+                app_id=account.get('app_id') or self.app_id,
+                app_secret=account.get('app_secret') or self.app_secret,
+                weight=account.get('weight', 1.0),
+                user_id=account.get('user_id'),
+            ))
+        return CredentialPool(credentials, cooldown=QOBUZ_CREDENTIAL_COOLDOWN)
+
+    def check_credentials(self) -> Dict[str, bool]:
+        """Valida todas las cuentas del pool con ``get_user_info`` y expulsa las que fallen."""
+        return self.pool.health_check(lambda c: self.get_user_info(c.token, app_id=c.app_id, use_cache=False))
+
+    def io_pool_stats(self) -> Dict[str, int]:
+        """Ocupación del pool de E/S: enviadas, en cola, en marcha y tamaño máximo."""
+        return self._io_pool.stats()
+
+    def install_credentials(self, credentials: Dict[str, Any]) -> Dict[str, Any]:
+        """Instala en caliente un nuevo juego de credenciales principal y devuelve su versión.
+
+        Las peticiones que ya tenían la credencial anterior terminan con ella; las nuevas
+        usan la nueva. Solo se invalida lo que depende del token: las URLs firmadas de
+        preview y la información de usuario del token anterior (los metadatos de pistas
+        y las cachés en disco no cambian).
+        """
+        current = self.pool.get('primary')
+        token = credentials.get('token') or self.token
+        app_id = str(credentials.get('app_id') or self.app_id or '')
+        app_secret = credentials.get('app_secret')
+        if not app_secret:
+            app_secret = self.app_secret if app_id == self.app_id else self.get_app_secret(app_id, token)
+        user_id = credentials.get('user_id') or (self.user_id if token == self.token else None)
+        weight = current.weight if current is not None else 1.0
+        version = self.pool.replace(Credential('primary', token, app_id, app_secret, weight=weight, user_id=user_id))
+        old_token, old_app_id = self.token, self.app_id
+        self.token, self.app_id, self.app_secret, self.user_id = token, app_id, app_secret, user_id
+        set_live_credentials({'token': token, 'app_id': app_id, 'app_secret': app_secret, 'user_id': user_id})
+        if token != old_token or app_id != old_app_id:
+            self.preview_cache.clear()
+            self.user_info_cache.invalidate((old_token, old_app_id))
+        return {'version': version, 'app_id': app_id, 'user_id': user_id, 'token_preview': f"{token[:20]}..."}
+
+    def _api_get(self, endpoint: str, params: Optional[Dict[str, Any]] = None, timeout: float = 10,
+                 sign=None) -> Optional[requests.Response]:
+        """GET autenticado a la API de Qobuz usando una credencial del pool.
+
+        Añade ``app_id``/``user_auth_token`` de la credencial elegida (o los parámetros
+        firmados que devuelva ``sign(credential)``). Si la respuesta es 401/429 la
+        credencial se expulsa y se reintenta una vez con otra.
+        """
+        tried: set = set()
+        response = None
+        for _ in range(min(2, len(self.pool.credentials))):
+            with self.pool.acquire(exclude=tried) as credential:
+                tried.add(credential.name)
+                query = dict(params or {})
+                query.update(sign(credential) if sign else {'app_id': credential.app_id, 'user_auth_token': credential.token})
+                response = upstream_get(f'qobuz.{endpoint}', f'{self.base_url}/{endpoint}', session=self.session,
+                                        params=query, timeout=timeout)
+                if not self.pool.report(credential, response.status_code, response.headers.get('Retry-After')):
+                    return response
+        return response
+
     def get_app_id(self) -> str:
         try:
             url = "https://www.qobuz.com/api.json/0.2/app/config"
-            response = self.session.get(url, timeout=10)
+            response = upstream_get('qobuz.app/config', url, session=self.session, timeout=10)
             if response.status_code == 200:
                 data = response.json()
                 if 'app' in data and 'id' in data['app']:
@@ -61,7 +183,8 @@ class QobuzDownloader:
     def test_app_id(self, app_id: str) -> bool:
         try:
             params = {'query': 'test', 'type': 'tracks', 'limit': 1, 'app_id': app_id}
-            response = self.session.get(f"{self.base_url}/catalog/search", params=params, timeout=5)
+            response = upstream_get('qobuz.catalog/search', f"{self.base_url}/catalog/search", session=self.session,
+                                    params=params, timeout=5)
             return response.status_code == 200
         except Exception:
             return False
@@ -70,7 +193,7 @@ class QobuzDownloader:
         try:
             url = f"{self.base_url}/app/getSecret"
             params = {'app_id': app_id, 'user_auth_token': user_auth_token}
-            response = self.session.get(url, params=params, timeout=10)
+            response = upstream_get('qobuz.app/getSecret', url, session=self.session, params=params, timeout=10)
             if response.status_code == 200:
                 data = response.json()
                 if 'app_secret' in data:
@@ -79,33 +202,60 @@ class QobuzDownloader:
         except Exception:
             return "abb21364945c0583309667d13ca3d93a"
 
-    def get_user_info(self, user_auth_token: str) -> Optional[Dict[str, Any]]:
+    def _request_user_info(self, endpoint: str, user_auth_token: str, app_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        params = {'user_auth_token': user_auth_token, 'app_id': app_id or self.app_id}
+        response = upstream_get(f'qobuz.{endpoint}', f"{self.base_url}/{endpoint}", session=self.session,
+                                params=params, timeout=10)
+        if response.status_code == 200:
+            data = response.json()
+            user_data = data.get('user', data)
+            if 'id' in user_data or 'email' in user_data:
+                return user_data
+        return None
+
+    def _fetch_user_info(self, user_auth_token: str, app_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Lanza ``user/login`` y ``user/info`` a la vez y se queda con la primera respuesta válida."""
+        futures = [submit_in_context(self._io_pool, self._request_user_info, endpoint, user_auth_token, app_id)
+                   for endpoint in ('user/login', 'user/info')]
+        for future in as_completed(futures):
+            try:
+                user_data = future.result()
+            except Exception:
+                continue
+            if user_data:
+                return user_data
+        return None
+
+    def get_user_info(self, user_auth_token: str, app_id: Optional[str] = None,
+                      use_cache: bool = True) -> Optional[Dict[str, Any]]:
+        """Usuario y suscripción del token; desde caché salvo ``use_cache=False``."""
         try:
-            endpoints = [f"{self.base_url}/user/login", f"{self.base_url}/user/info"]
-            for endpoint in endpoints:
-                try:
-                    params = {'user_auth_token': user_auth_token, 'app_id': self.app_id}
-                    response = self.session.get(endpoint, params=params, timeout=10)
-                    if response.status_code == 200:
-                        data = response.json()
-                        user_data = data.get('user', data)
-                        if 'id' in user_data or 'email' in user_data:
-                            return user_data
-                except Exception:
-                    continue
-            return None
+            if not use_cache:
+                return self._fetch_user_info(user_auth_token, app_id)
+            return self.user_info_cache.get((user_auth_token, app_id or self.app_id),
+                                            lambda: self._fetch_user_info(user_auth_token, app_id))
         except Exception:
             return None
 
     # --- Búsquedas ---
-    def search_tracks(self, query: str, limit: int = 15) -> List[Dict[str, Any]]:
+    def _search_items(self, params: Dict[str, Any]) -> List[Track]:
+        """Pistas de ``track/search`` con ``params``, desde ``search_cache`` si están.
+
+        El JSON se reduce a ``Track`` al recibirlo: la caché guarda sus filas, no las pistas
+        anidadas de Qobuz.
+        """
+        def load() -> Optional[List[List[Any]]]:
+            r = self._api_get('track/search', params)
+            if r is None or r.status_code != 200:
+                return None  # los fallos no se cachean
+            return [Track.from_qobuz(t).as_row() for t in r.json().get('tracks', {}).get('items', [])]
+
+        key = json.dumps(params, sort_keys=True, ensure_ascii=False)
+        return [Track.from_row(row) for row in self.search_cache.get_or_set(key, load) or []]
+
+    def search_tracks(self, query: str, limit: int = 15) -> List[Track]:
         try:
-            params = {'query': query, 'type': 'track', 'limit': limit, 'app_id': self.app_id, 'user_auth_token': self.token}
-            r = self.session.get(f'{self.base_url}/track/search', params=params, timeout=10)
-            if r.status_code == 200:
-                data = r.json()
-                return data.get('tracks', {}).get('items', [])
-            return []
+            return self._search_items({'query': query, 'type': 'track', 'limit': limit})
         except Exception:
             return []
 
@@ -119,20 +269,16 @@ class QobuzDownloader:
                 return True
         return False
 
-    def search_tracks_with_locale(self, query: str, limit: int = 15, force_latin: bool = True) -> List[Dict[str, Any]]:
+    def search_tracks_with_locale(self, query: str, limit: int = 15, force_latin: bool = True) -> List[Track]:
         try:
-            params = {'query': query, 'type': 'track', 'limit': limit, 'app_id': self.app_id, 'user_auth_token': self.token}
+            params = {'query': query, 'type': 'track', 'limit': limit}
             if force_latin:
                 params.update({'locale': 'en_US', 'country': 'US', 'language': 'en'})
-            r = self.session.get(f'{self.base_url}/track/search', params=params, timeout=10)
-            if r.status_code == 200:
-                data = r.json()
-                return data.get('tracks', {}).get('items', [])
-            return []
+            return self._search_items(params)
         except Exception:
             return []
 
-    def search_with_similarity(self, query: str, limit: int = 5) -> List[Dict[str, Any]]:
+    def search_with_similarity(self, query: str, limit: int = 5) -> List[Track]:
         """Busca en Qobuz y ordena resultados por similitud con la consulta.
 
         Se usa para mapear resultados validados por Genius a pistas de Qobuz.
@@ -144,7 +290,7 @@ class QobuzDownloader:
             for force in (True, False):
                 trs = self.search_tracks_with_locale(query, limit=30, force_latin=force)
                 for t in trs:
-                    tid = t.get('id')
+                    tid = t.id
                     if tid in seen_ids:
                         continue
                     seen_ids.add(tid)
@@ -153,7 +299,7 @@ class QobuzDownloader:
             if not raw_tracks:
                 trs = self.search_tracks(query, limit=30)
                 for t in trs:
-                    tid = t.get('id')
+                    tid = t.id
                     if tid in seen_ids:
                         continue
                     seen_ids.add(tid)
@@ -174,8 +320,8 @@ class QobuzDownloader:
 
             scored = []
             for t in raw_tracks:
-                title = (t.get('title') or '')
-                artist = (t.get('performer', {}) or {}).get('name', '')
+                title = t.title or ''
+                artist = t.artist or ''
                 cand_clean = self._clean_lyrics_text(f"{title} {artist}")
                 c_tokens = cand_clean.split()
                 score = jaccard(q_tokens, c_tokens)
@@ -202,9 +348,9 @@ class QobuzDownloader:
             attempts = [ {'locale': 'en_US', 'country': 'US'}, {'locale': 'en_GB', 'country': 'GB'}, {'locale': 'en_CA', 'country': 'CA'}, {} ]
             for cfg in attempts:
                 try:
-                    params = {'track_id': track_id, 'app_id': self.app_id, 'user_auth_token': self.token}
+                    params = {'track_id': track_id}
                     params.update(cfg)
-                    r = self.session.get(f'{self.base_url}/track/get', params=params, timeout=8)
+                    r = self._api_get('track/get', params, timeout=8)
                     if r.status_code == 200:
                         data = r.json()
                         title = data.get('title', '')
@@ -218,9 +364,30 @@ class QobuzDownloader:
             return track_info
 
     def get_track_info(self, track_id: str) -> Optional[Dict[str, Any]]:
+        def load() -> Optional[Dict[str, Any]]:
+            r = self._api_get('track/get', {'track_id': track_id})
+            return r.json() if r is not None and r.status_code == 200 else None
+
+        try:
+            return self.track_cache.get_or_set(str(track_id), load)
+        except Exception:
+            return None
+
+    def get_tracks_info_batch(self, track_ids: List[str], max_workers: int = 8) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Resuelve varios ``track/get`` a la vez: los cacheados al instante y el resto en paralelo."""
+        ids = list(dict.fromkeys(str(t) for t in track_ids if t))
+        result: Dict[str, Optional[Dict[str, Any]]] = {}
+        result.update(self.track_cache.get_many(ids))
+        missing = [tid for tid in ids if tid not in result]
+        if missing:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(missing))) as pool:
+                result.update(zip(missing, pool.map(self.get_track_info, missing)))
+        return {tid: result.get(tid) for tid in ids}
+
+    def get_album_info(self, album_id: str) -> Optional[Dict[str, Any]]:
+        """Obtiene el álbum con su lista de pistas (``album/get``)."""
         try:
-            params = {'track_id': track_id, 'app_id': self.app_id, 'user_auth_token': self.token}
-            r = self.session.get(f'{self.base_url}/track/get', params=params, timeout=10)
+            r = self._api_get('album/get', {'album_id': album_id, 'limit': 500})
             if r.status_code == 200:
                 return r.json()
             return None
@@ -228,30 +395,134 @@ class QobuzDownloader:
             return None
 
     # --- Descarga ---
-    def get_track_url(self, track_id: str, quality: str = '6') -> Optional[str]:
+    @staticmethod
+    def _sign_file_url_params(track_id: str, quality: str, credential: Credential) -> Dict[str, Any]:
+        """Parámetros firmados de ``track/getFileUrl`` (``sample`` no forma parte de la firma)."""
+        unix_timestamp = int(time.time())
+        ts = str(unix_timestamp)
+        hash_string = f"trackgetFileUrlformat_id{quality}intentstreamtrack_id{track_id}{ts}{credential.app_secret}"
+        sig = hashlib.md5(hash_string.encode('utf-8')).hexdigest()
+        return {'request_ts': ts, 'request_sig': sig, 'track_id': track_id, 'format_id': quality, 'intent': 'stream', 'app_id': credential.app_id, 'user_auth_token': credential.token}
+
+    def _request_file_info(self, track_id: str, quality: str, sample: bool = False) -> Optional[Dict[str, Any]]:
+        """Respuesta completa de ``getFileUrl`` (url, format_id, bit_depth, sampling_rate...).
+
+        La firma depende del ``app_secret``, así que se calcula con la credencial que
+        el pool asigne a la petición.
+        """
         try:
-            track_info = self.get_track_info(track_id)
-            if not track_info:
-                return None
-            unix_timestamp = int(time.time())
-            ts = str(unix_timestamp)
-            hash_string = f"trackgetFileUrlformat_id{quality}intentstreamtrack_id{track_id}{ts}{self.app_secret}"
-            sig = hashlib.md5(hash_string.encode('utf-8')).hexdigest()
-            params = {'request_ts': ts, 'request_sig': sig, 'track_id': track_id, 'format_id': quality, 'intent': 'stream', 'app_id': self.app_id, 'user_auth_token': self.token}
-            url = f"{self.base_url}/track/getFileUrl"
-            r = self.session.get(url, params=params, timeout=10)
+            params = {'sample': 'true'} if sample else None
+            r = self._api_get('track/getFileUrl', params,
+                              sign=lambda credential: self._sign_file_url_params(track_id, quality, credential))
             if r.status_code == 200:
                 data = r.json()
-                return data.get('url')
+                return data if data.get('url') else None
+            return None
+        except Exception:
+            return None
+
+    def _get_file_url(self, track_id: str, quality: str = '6', sample: bool = False) -> Optional[str]:
+        """Firma y solicita ``track/getFileUrl`` sin volver a consultar ``track/get``."""
+        info = self._request_file_info(track_id, quality, sample)
+        return info.get('url') if info else None
+
+    def resolve_download(self, track_id: str, quality: str = '27') -> Optional[Dict[str, Any]]:
+        """Enlace de descarga en el mejor formato que ofrece la pista, hasta ``quality``.
+
+        El formato se elige con los metadatos cacheados de ``track/get`` para hacer una
+        sola llamada a ``getFileUrl``; solo si esa falla se prueba el escalón inferior.
+        Devuelve ``{'url', 'requested', 'format_id', 'name', 'ext', 'bit_depth', ...}``.
+        """
+        track_info = self.get_track_info(track_id)
+        if not track_info:
             return None
+        fmt = self.formats.select(track_info, quality)
+        candidates = FORMAT_LADDER[FORMAT_LADDER.index(fmt):][:2]
+        for i, candidate in enumerate(candidates):
+            if i:
+                self.formats.count('fallback_calls')
+            file_info = self._request_file_info(track_id, candidate)
+            if file_info:
+                self.formats.count('resolved')
+                return dict(self.formats.describe(candidate, file_info), url=file_info['url'], requested=str(quality))
+        self.formats.count('failed')
+        return None
+
+    def get_track_url(self, track_id: str, quality: str = '6') -> Optional[str]:
+        try:
+            resolved = self.resolve_download(track_id, quality)
+            return resolved['url'] if resolved else None
         except Exception:
             return None
 
+    def get_track_urls(self, track_ids: List[str], quality: str = '6', max_workers: int = 8) -> Dict[str, Optional[str]]:
+        """Resuelve en paralelo las URLs de varias pistas ya conocidas (p.ej. de ``album/get``)."""
+        ids = [str(t) for t in track_ids if t]
+        if not ids:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(ids))) as pool:
+            urls = pool.map(lambda tid: self._get_file_url(tid, quality), ids)
+            return dict(zip(ids, urls))
+
+    @staticmethod
+    def _direct_preview_url(track_info: Optional[Dict[str, Any]]) -> Optional[str]:
+        if not track_info:
+            return None
+        for field in ['preview_url', 'preview', 'sample_url', 'stream_url']:
+            if track_info.get(field):
+                return track_info[field]
+        return None
+
+    def resolve_preview_url(self, track_id: str, track_info: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """URL de preview con el mínimo de llamadas.
+
+        Preferencia: campo directo de ``track/get`` > muestra (``sample=true``) > stream MP3
+        completo. Si ``track_info`` no se pasa ni está en caché, ``track/get`` y la muestra
+        se piden a la vez; un id desconocido (``track/get`` vacío) no lanza nada más y la
+        muestra se cancela si aún no salió. El stream completo solo se pide si no hay
+        muestra. El resultado queda en ``preview_cache``.
+        """
+        track_id = str(track_id)
+        cached = self.preview_cache.get(track_id)
+        if cached:
+            return cached
+        if track_info is None:
+            track_info = self.track_cache.get(track_id)
+        preview_url = self._direct_preview_url(track_info)
+        if not preview_url:
+            sample = None
+            if track_info is None:
+                sample = submit_in_context(self._io_pool, self._get_file_url, track_id, '5', True)
+                track_info = self.get_track_info(track_id)
+                if not track_info:
+                    sample.cancel()
+                    return None
+                preview_url = self._direct_preview_url(track_info)
+            if not preview_url:
+                preview_url = (sample.result() if sample is not None else self._get_file_url(track_id, '5', True)) \
+                    or self._get_file_url(track_id, '5')
+        if preview_url:
+            self.preview_cache.set(track_id, preview_url)
+        return preview_url
+
+    def resolve_preview_urls(self, track_ids: List[str], max_workers: int = 8) -> Dict[str, Optional[str]]:
+        """Versión por lotes para precargar las previews de una página de resultados."""
+        ids = list(dict.fromkeys(str(t) for t in track_ids if t))
+        if not ids:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(ids))) as pool:
+            return dict(zip(ids, pool.map(self.resolve_preview_url, ids)))
+
     # --- Matching desde Spotify ---
-    def search_track_from_spotify_info(self, spotify_info: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    def search_track_from_spotify_info(self, spotify_info: Dict[str, Any], rate_limiter: Optional[TokenBucket] = None,
+                                       fallback_best_match: bool = False) -> Optional[Track]:
         """
         Busca una canción en Qobuz basándose en información de Spotify.
         Ahora utiliza coincidencia EXACTA de título como en la búsqueda por letras.
+
+        ``rate_limiter`` sustituye la pausa fija entre queries por un presupuesto compartido
+        (mapeo de playlists en paralelo). Con ``fallback_best_match`` se puntúan todas las
+        pistas vistas con ``find_best_match`` si no hubo coincidencia exacta.
         """
         import unicodedata, re as _re
         
@@ -265,7 +536,7 @@ class QobuzDownloader:
         artist = norm(spotify_info.get('artist', ''))
         title = norm(spotify_info.get('name', ''))
         
-        print(f"[SPOTIFY] 🔍 Buscando match exacto para: '{title}' - '{artist}'")
+        logger.debug('[SPOTIFY] Buscando match exacto para: %r - %r', title, artist)
         
         # Estrategias de búsqueda ordenadas por precisión
         base_queries = []
@@ -296,35 +567,50 @@ class QobuzDownloader:
                 queries.append(q); seen.add(q.lower())
         
         # Buscar con cada query y aplicar coincidencia exacta
+        seen_tracks: Dict[Any, Track] = {}
         for i, query in enumerate(queries):
-            print(f"[SPOTIFY] 📡 Query {i+1}/{len(queries)}: '{query}'")
+            if i and not has_time_for('spotify.query', SPOTIFY_QUERY_SECONDS):
+                logger.debug('[SPOTIFY] Sin tiempo para más queries (%s/%s)', i, len(queries))
+                break
+            if rate_limiter is not None:
+                rate_limiter.acquire()
+            logger.debug('[SPOTIFY] Query %s/%s: %r', i+1, len(queries), query)
             tracks = self.search_tracks_with_locale(query, limit=30, force_latin=True)
-            print(f"[SPOTIFY] 📊 Encontrados {len(tracks)} tracks en Qobuz")
+            logger.debug('[SPOTIFY] Encontrados %s tracks en Qobuz', len(tracks))
             
             if tracks:
+                for track in tracks:
+                    seen_tracks.setdefault(track.id, track)
                 # COINCIDENCIA EXACTA: Buscar título Y artista exactos (insensible a mayúsculas)
                 exact_match = None
                 for track in tracks:
-                    q_title = (track.get('title') or '').strip()
-                    q_artist = (track.get('performer', {}).get('name') or '').strip()
+                    q_title = (track.title or '').strip()
+                    q_artist = (track.artist or '').strip()
                     
                     if q_title.lower() == title.strip().lower() and q_artist.lower() == artist.strip().lower():
                         exact_match = track
-                        print(f"[SPOTIFY] 🎯 Match exacto encontrado: '{q_title}' por '{q_artist}'")
+                        logger.debug('[SPOTIFY] Match exacto encontrado: %r por %r', q_title, q_artist)
                         break
                 
                 if exact_match:
-                    print(f"[SPOTIFY] ✅ Mapeo exacto exitoso para Spotify")
+                    logger.debug('[SPOTIFY] Mapeo exacto exitoso para Spotify')
                     return exact_match
                 else:
-                    print(f"[SPOTIFY] ❌ Sin match exacto de título y artista en esta query")
+                    logger.debug('[SPOTIFY] Sin match exacto de título y artista en esta query')
             
-            time.sleep(0.25)
+            if rate_limiter is None:
+                time.sleep(0.25)
         
-        print(f"[SPOTIFY] ❌ Sin match exacto encontrado para '{title}' - '{artist}'")
+        if fallback_best_match and seen_tracks:
+            best = self.find_best_match(list(seen_tracks.values()), spotify_info)
+            if best:
+                logger.debug('[SPOTIFY] Mejor coincidencia aproximada: %r', best.title)
+                return best
+        
+        logger.debug('[SPOTIFY] Sin match exacto encontrado para %r - %r', title, artist)
         return None
 
-    def find_best_match(self, qobuz_tracks: List[Dict[str, Any]], spotify_info: Dict[str, Any]):
+    def find_best_match(self, qobuz_tracks: List[Track], spotify_info: Dict[str, Any]) -> Optional[Track]:
         def clean(s: str) -> str:
             import unicodedata
             s = unicodedata.normalize('NFKD', s)
@@ -338,9 +624,9 @@ class QobuzDownloader:
         for t in qobuz_tracks:
             try:
                 score = 0
-                q_title = clean(t.get('title', ''))
-                q_artist = clean(t.get('performer', {}).get('name', ''))
-                q_duration = t.get('duration', 0)
+                q_title = clean(t.title or '')
+                q_artist = clean(t.artist or '')
+                q_duration = t.duration or 0
                 if s_title == q_title:
                     score += 50
                 elif s_title and q_title and (s_title in q_title or q_title in s_title):
@@ -361,7 +647,7 @@ class QobuzDownloader:
                         score += 5
                     elif diff <= 30:
                         score += 2
-                if t.get('streamable', False):
+                if t.streamable:
                     score += 2
                 if score > best_score:
                     best_score = score; best_track = t
@@ -407,7 +693,10 @@ class QobuzDownloader:
             return text or ''
 
     def _fetch_genius_lyrics(self, url: str) -> str:
-        """Obtiene la letra completa de una página de Genius"""
+        """Obtiene la letra completa de una página de Genius (desde ``lyrics_cache`` si está)"""
+        return self.lyrics_cache.get_or_set(url, lambda: self._download_genius_lyrics(url) or None) or ''
+
+    def _download_genius_lyrics(self, url: str) -> str:
         try:
             # Headers más convincentes para evitar bloqueo
             headers = {
@@ -426,100 +715,103 @@ class QobuzDownloader:
                 'Sec-GPC': '1'
             }
             
-            print(f"[FETCH] Descargando letras de: {url}")
+            logger.debug('[FETCH] Descargando letras de: %s', url)
             
             # Agregar delay para parecer más humano
-            import time
-            time.sleep(0.5)
+            with span('genius.delay'):
+                time.sleep(0.5)
             
-            r = self.session.get(url, headers=headers, timeout=10)
-            print(f"[FETCH] HTTP {r.status_code} - Headers enviados: User-Agent, Accept, etc.")
+            r = upstream_get('genius.page', url, session=self.session, headers=headers, timeout=10)
+            logger.debug('[FETCH] HTTP %s - Headers enviados: User-Agent, Accept, etc.', r.status_code)
             
             if r.status_code != 200:
-                print(f"[FETCH] Error HTTP {r.status_code}")
+                logger.warning('[FETCH] Error HTTP %s', r.status_code)
                 if r.status_code == 403:
-                    print(f"[FETCH] ⛔ Genius está bloqueando requests desde Vercel")
-                    print(f"[FETCH] 💡 Esto es normal en entornos serverless")
+                    # Habitual en entornos serverless: Genius bloquea sus rangos de IP
+                    logger.warning('[FETCH] Genius está bloqueando requests desde Vercel')
                 return ''
             
-            html = r.text
-            soup = BeautifulSoup(html, 'html.parser')
-            
-            parts: List[str] = []
-            
-            # Método 1: Contenedores modernos con data-lyrics-container="true"
-            containers = soup.find_all(attrs={'data-lyrics-container': 'true'})
-            if containers:
-                print(f"[FETCH] Encontrados {len(containers)} contenedores modernos")
-                for container in containers:
-                    # Preservar saltos de línea
-                    for br in container.find_all('br'):
+            return self._parse_genius_lyrics_html(r.text)
+
+        except Exception as e:
+            logger.warning('[FETCH] Error obteniendo letras de %s: %s', url, e)
+            return ''
+
+    def _parse_genius_lyrics_html(self, html: str) -> str:
+        """Extrae el texto de las letras del HTML de una página de Genius."""
+        soup = BeautifulSoup(html, 'html.parser')
+        
+        parts: List[str] = []
+        
+        # Método 1: Contenedores modernos con data-lyrics-container="true"
+        containers = soup.find_all(attrs={'data-lyrics-container': 'true'})
+        if containers:
+            logger.debug('[FETCH] Encontrados %s contenedores modernos', len(containers))
+            for container in containers:
+                # Preservar saltos de línea
+                for br in container.find_all('br'):
+                    br.replace_with('\n')
+                
+                text = container.get_text(separator='\n', strip=True)
+                if text:
+                    parts.append(text)
+        
+        # Método 2: Contenedores con clase específica de letras
+        if not parts:
+            lyrics_divs = soup.find_all('div', class_=re.compile(r'.*[Ll]yrics.*'))
+            if lyrics_divs:
+                logger.debug('[FETCH] Encontrados %s divs de letras por clase', len(lyrics_divs))
+                for div in lyrics_divs:
+                    for br in div.find_all('br'):
                         br.replace_with('\n')
-                    
-                    text = container.get_text(separator='\n', strip=True)
-                    if text:
+                    text = div.get_text(separator='\n', strip=True)
+                    if text and len(text) > 50:  # Solo textos sustanciales
                         parts.append(text)
-            
-            # Método 2: Contenedores con clase específica de letras
-            if not parts:
-                lyrics_divs = soup.find_all('div', class_=re.compile(r'.*[Ll]yrics.*'))
-                if lyrics_divs:
-                    print(f"[FETCH] Encontrados {len(lyrics_divs)} divs de letras por clase")
-                    for div in lyrics_divs:
-                        for br in div.find_all('br'):
-                            br.replace_with('\n')
-                        text = div.get_text(separator='\n', strip=True)
-                        if text and len(text) > 50:  # Solo textos sustanciales
-                            parts.append(text)
-            
-            # Método 3: Fallback - buscar divs con mucho texto
-            if not parts:
-                all_divs = soup.find_all('div')
-                print(f"[FETCH] Fallback: analizando {len(all_divs)} divs")
-                for div in all_divs:
-                    text = div.get_text(strip=True)
-                    # Si el div tiene mucho texto y parece contener letras
-                    if len(text) > 200 and '\n' in text and not div.find('script'):
-                        for br in div.find_all('br'):
-                            br.replace_with('\n')
-                        clean_text = div.get_text(separator='\n', strip=True)
-                        parts.append(clean_text)
-                        break
-            
-            if parts:
-                lyrics = '\n'.join(parts)
-                print(f"[FETCH] Letras extraídas: {len(lyrics)} caracteres")
-                return lyrics
-            else:
-                print("[FETCH] No se encontraron letras")
-                return ''
-                
-        except Exception as e:
-            print(f"[FETCH] Error obteniendo letras de {url}: {e}")
+        
+        # Método 3: Fallback - buscar divs con mucho texto
+        if not parts:
+            all_divs = soup.find_all('div')
+            logger.debug('[FETCH] Fallback: analizando %s divs', len(all_divs))
+            for div in all_divs:
+                text = div.get_text(strip=True)
+                # Si el div tiene mucho texto y parece contener letras
+                if len(text) > 200 and '\n' in text and not div.find('script'):
+                    for br in div.find_all('br'):
+                        br.replace_with('\n')
+                    clean_text = div.get_text(separator='\n', strip=True)
+                    parts.append(clean_text)
+                    break
+        
+        if parts:
+            lyrics = '\n'.join(parts)
+            logger.debug('[FETCH] Letras extraídas: %s caracteres', len(lyrics))
+            return lyrics
+        else:
+            logger.debug('[FETCH] No se encontraron letras')
             return ''
 
     def search_lyrics_genius(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
         """Busca canciones en Genius usando múltiples métodos"""
         try:
-            print(f"[GENIUS] Iniciando búsqueda: '{query[:50]}...'")
+            logger.debug("[GENIUS] Iniciando búsqueda: '%s...'", query[:50])
             
             # Método 1: Intentar API oficial de Genius si está disponible
             songs = self._try_genius_api(query, limit)
             if songs:
-                print(f"[GENIUS] API exitosa: {len(songs)} resultados")
+                logger.debug('[GENIUS] API exitosa: %s resultados', len(songs))
                 return songs
             
             # Método 2: Scraping web como fallback
             songs = self._try_genius_scraping(query, limit)
             if songs:
-                print(f"[GENIUS] Scraping exitoso: {len(songs)} resultados")
+                logger.debug('[GENIUS] Scraping exitoso: %s resultados', len(songs))
                 return songs
             
-            print("[GENIUS] No se encontraron resultados")
+            logger.debug('[GENIUS] No se encontraron resultados')
             return []
             
         except Exception as e:
-            print(f"[GENIUS] Error general: {e}")
+            logger.warning('[GENIUS] Error general: %s', e)
             return []
     
     def _try_genius_api(self, query: str, limit: int) -> List[Dict[str, Any]]:
@@ -531,10 +823,9 @@ class QobuzDownloader:
             genius_token = GENIUS_TOKEN
             
             if not genius_token or genius_token == "tu_token_de_genius_aqui":
-                print("[GENIUS API] ❌ Token de Genius no configurado correctamente")
+                logger.warning('[GENIUS API] Token de Genius no configurado correctamente')
                 return []
                 
-            print(f"[GENIUS API] ✅ Usando token: {genius_token[:20]}...")
             
             headers = {
                 'Authorization': f'Bearer {genius_token}',
@@ -546,21 +837,21 @@ class QobuzDownloader:
             encoded_query = urllib.parse.quote(query)
             api_url = f"https://api.genius.com/search?q={encoded_query}"
             
-            print(f"[GENIUS API] 🔍 Buscando en: {api_url}")
+            logger.debug('[GENIUS API] Buscando en: %s', api_url)
             
-            response = self.session.get(api_url, headers=headers, timeout=10)
-            print(f"[GENIUS API] 📡 Response status: {response.status_code}")
+            response = upstream_get('genius.api', api_url, session=self.session, headers=headers, timeout=10)
+            logger.debug('[GENIUS API] Response status: %s', response.status_code)
             
             if response.status_code != 200:
-                print(f"[GENIUS API] ❌ Error {response.status_code}: {response.text[:500]}")
+                logger.warning('[GENIUS API] Error %s: %s', response.status_code, response.text[:500])
                 return []
             
             data = response.json()
             hits = data.get('response', {}).get('hits', [])
-            print(f"[GENIUS API] 📊 Encontradas {len(hits)} canciones")
+            logger.debug('[GENIUS API] Encontradas %s canciones', len(hits))
             
             if not hits:
-                print("[GENIUS API] ⚠️ Sin resultados de la API")
+                logger.debug('[GENIUS API] Sin resultados de la API')
                 return []
             
             # Procesar resultados
@@ -571,7 +862,7 @@ class QobuzDownloader:
                 artist = song.get('primary_artist', {}).get('name', '')
                 url = song.get('url', '')
                 
-                print(f"[GENIUS API] 🎵 Canción encontrada: '{title}' - '{artist}'")
+                logger.debug('[GENIUS API] Canción encontrada: %r - %r', title, artist)
                 
                 if title and artist:
                     results.append({
@@ -582,34 +873,27 @@ class QobuzDownloader:
                         'source': 'genius_api'
                     })
             
-            print(f"[GENIUS API] ✅ Retornando {len(results)} resultados procesados")
+            logger.debug('[GENIUS API] Retornando %s resultados procesados', len(results))
             return results
             
         except Exception as e:
-            print(f"[GENIUS API] 💥 Error en _try_genius_api: {str(e)}")
-            import traceback
-            print(f"[GENIUS API] 📋 Traceback: {traceback.format_exc()}")
+            logger.warning('[GENIUS API] Error en _try_genius_api: %s', e, exc_info=True)
             return []
-            print(f"[GENIUS API] Headers: {headers}")
-            
-            resp = self.session.get(api_url, headers=headers, timeout=15)
-            print(f"[GENIUS API] Respuesta recibida - Status: {resp.status_code}")
+            resp = upstream_get('genius.api', api_url, session=self.session, headers=headers, timeout=15)
+            logger.debug('[GENIUS API] Respuesta recibida - Status: %s', resp.status_code)
             
             if resp.status_code != 200:
-                print(f"[GENIUS API] Error HTTP: {resp.status_code}")
-                print(f"[GENIUS API] Respuesta: {resp.text[:200]}...")
+                logger.warning('[GENIUS API] Error HTTP: %s', resp.status_code)
+                logger.debug('[GENIUS API] Respuesta: %s...', resp.text[:200])
                 return []
             
             data = resp.json()
-            print(f"[GENIUS API] JSON parseado exitosamente - Keys: {list(data.keys())}")
-            
             if 'response' not in data or 'hits' not in data['response']:
-                print("[GENIUS API] Estructura de respuesta inesperada")
-                print(f"[GENIUS API] Data completa: {data}")
+                logger.warning('[GENIUS API] Estructura de respuesta inesperada (claves: %s)', list(data.keys()))
                 return []
             
             hits = data['response']['hits']
-            print(f"[GENIUS API] Encontrados {len(hits)} hits")
+            logger.debug('[GENIUS API] Encontrados %s hits', len(hits))
             
             songs = []
             for hit in hits[:limit]:
@@ -631,16 +915,16 @@ class QobuzDownloader:
                             'found_by_lyrics': True
                         }
                         songs.append(song_data)
-                        print(f"[GENIUS API] ✓ {title} - {artist}")
+                        logger.debug('[GENIUS API] %s - %s', title, artist)
                 
                 except Exception as e:
-                    print(f"[GENIUS API] Error procesando hit: {e}")
+                    logger.warning('[GENIUS API] Error procesando hit: %s', e)
                     continue
             
             return songs
                 
         except Exception as e:
-            print(f"[GENIUS API] Error general: {e}")
+            logger.warning('[GENIUS API] Error general: %s', e)
             return []
     
     def _try_genius_scraping(self, query: str, limit: int) -> List[Dict[str, Any]]:
@@ -656,7 +940,7 @@ class QobuzDownloader:
             else:
                 search_query = query
             
-            print(f"[GENIUS SCRAPING] Buscando: '{search_query}'")
+            logger.debug('[GENIUS SCRAPING] Buscando: %r', search_query)
             
             url = f"https://genius.com/search?q={urllib.parse.quote_plus(search_query)}"
             
@@ -664,7 +948,7 @@ class QobuzDownloader:
                 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
             }
             
-            resp = self.session.get(url, headers=headers, timeout=15)
+            resp = upstream_get('genius.search_page', url, session=self.session, headers=headers, timeout=15)
             if resp.status_code != 200:
                 return []
             
@@ -695,7 +979,7 @@ class QobuzDownloader:
             return songs
             
         except Exception as e:
-            print(f"[GENIUS SCRAPING] Error: {e}")
+            logger.warning('[GENIUS SCRAPING] Error: %s', e)
             return []
 
     def search_by_lyrics(self, query: str, limit: int = 1) -> List[Dict[str, Any]]:
@@ -705,40 +989,39 @@ class QobuzDownloader:
         - Descarga la letra y verifica que el fragmento LIMPIO esté contenido
         - Intenta mapear a Qobuz con una búsqueda simple por "<title> <artist>"
         - Si no hay match en Qobuz, devuelve un resultado tipo 'genius' (id=None)
+
+        Los elementos ya vienen en el formato de resultado de ``/api/search`` (``Track.result``).
         """
         try:
-            print(f"[LYRICS] 🎤 Iniciando búsqueda por letras: '{query}'")
+            logger.debug('[LYRICS] Iniciando búsqueda por letras: %r', query)
 
             # Limpiar sólo para verificación de inclusión
             clean_query = self._clean_lyrics_text(query)
             tokens = clean_query.split()
-            print(f"[LYRICS] ✂️ Frase limpia: '{clean_query}' | tokens: {len(tokens)}")
+            logger.debug('[LYRICS] Frase limpia: %r | tokens: %s', clean_query, len(tokens))
             
             if len(tokens) < 3:
-                print(f"[LYRICS] ❌ Muy pocos tokens ({len(tokens)}), se necesitan al menos 3")
+                logger.debug('[LYRICS] Muy pocos tokens (%s), se necesitan al menos 3', len(tokens))
                 return []
 
-            print(f"[LYRICS] 🔍 Llamando a _search_genius_for_lyrics...")
+            logger.debug('[LYRICS] Llamando a _search_genius_for_lyrics...')
             results = self._search_genius_for_lyrics(original_query=query, clean_query=clean_query, limit=limit)
-            print(f"[LYRICS] 📊 _search_genius_for_lyrics retornó {len(results)} resultados")
+            logger.debug('[LYRICS] _search_genius_for_lyrics retornó %s resultados', len(results))
 
             # Marcar metadatos si hay resultados
             for i, result in enumerate(results):
                 result['found_by_lyrics'] = True
                 result['lyrics_fragment'] = query[:100]
                 result['matched_fragment'] = query[:100]
-                print(f"[LYRICS] 🏷️ Resultado {i+1}: '{result.get('title')}' por '{result.get('performer', {}).get('name')}'")
+                logger.debug('[LYRICS] Resultado %s: %r por %r', i+1, result.get('title'), result.get('artist'))
 
-            print(f"[LYRICS] ✅ Retornando {len(results)} resultados finales")
-            if results:
-                try:
-                    print("[LYRICS] Títulos:", [f"{r.get('title')} ({r.get('source')})" for r in results])
-                except Exception:
-                    pass
+            logger.info('[LYRICS] Retornando %s resultados finales', len(results))
+            if results and debug_enabled():
+                logger.debug('[LYRICS] Títulos: %s', [f"{r.get('title')} ({r.get('source')})" for r in results])
             return results[:limit]
 
         except Exception as e:
-            print(f"[LYRICS] Error en search_by_lyrics: {e}")
+            logger.warning('[LYRICS] Error en search_by_lyrics: %s', e)
             return []
     
     def _search_genius_for_lyrics(self, original_query: str, clean_query: str, limit: int) -> List[Dict[str, Any]]:
@@ -746,142 +1029,126 @@ class QobuzDownloader:
         en las letras y mapea a Qobuz con una búsqueda directa por título + artista.
         """
         try:
-            print(f"[LYRICS] 🔍 Iniciando _search_genius_for_lyrics con: '{original_query}'")
+            logger.debug('[LYRICS] Iniciando _search_genius_for_lyrics con: %r', original_query)
             
             # 1) Candidatos desde API oficial; si falla, scraping
-            print("[LYRICS] 📡 Buscando candidatos en Genius API...")
+            logger.debug('[LYRICS] Buscando candidatos en Genius API...')
             candidates = self._search_genius_api(original_query, limit=10)
-            print(f"[LYRICS] 📊 API devolvió {len(candidates)} candidatos")
+            logger.debug('[LYRICS] API devolvió %s candidatos', len(candidates))
             
-            if not candidates:
-                print("[LYRICS] 🌐 API falló, intentando scraping...")
+            if not candidates and has_time_for('genius.scraping', GENIUS_SCRAPING_SECONDS):
+                logger.debug('[LYRICS] API falló, intentando scraping...')
                 candidates = self._try_genius_scraping(original_query, limit=10)
-                print(f"[LYRICS] 🕷️ Scraping devolvió {len(candidates)} candidatos")
+                logger.debug('[LYRICS] Scraping devolvió %s candidatos', len(candidates))
                 
-            print(f"[LYRICS] 📋 Total candidatos Genius: {len(candidates)}")
-            try:
-                print("[LYRICS] 🎵 Top candidatos:", [c.get('title') for c in candidates[:3]])
-            except Exception:
-                pass
+            logger.debug('[LYRICS] Total candidatos Genius: %s', len(candidates))
+            if debug_enabled():
+                logger.debug('[LYRICS] Top candidatos: %s', [c.get('title') for c in candidates[:3]])
 
             if not candidates:
-                print("[LYRICS] ❌ Sin candidatos de Genius, saliendo")
+                logger.debug('[LYRICS] Sin candidatos de Genius, saliendo')
                 return []
 
             results: List[Dict[str, Any]] = []
             for i, cand in enumerate(candidates[:5]):
+                if not has_time_for('lyrics.candidate', LYRICS_CANDIDATE_SECONDS):
+                    logger.debug('[LYRICS] Sin tiempo para más candidatos (%s/5 revisados)', i)
+                    break
                 try:
                     title = cand.get('title') or ''
                     artist = cand.get('artist') or ''
                     url = cand.get('url') or ''
                     
-                    print(f"[LYRICS] 🔎 Procesando candidato {i+1}/5: '{title}' - '{artist}'")
+                    logger.debug('[LYRICS] Procesando candidato %s/5: %r - %r', i+1, title, artist)
                     
                     if not (title and url):
-                        print(f"[LYRICS] ⚠️ Candidato {i+1} incompleto (título={bool(title)}, url={bool(url)})")
+                        logger.debug('[LYRICS] Candidato %s incompleto (título=%s, url=%s)', i+1, bool(title), bool(url))
                         continue
 
                     # 2) Descargar letras y validar fragmento
-                    print(f"[LYRICS] 📥 Descargando letras de: {url}")
+                    logger.debug('[LYRICS] Descargando letras de: %s', url)
                     lyrics = self._fetch_genius_lyrics(url)
                     
                     if not lyrics:
-                        print(f"[LYRICS] ❌ No se pudieron descargar letras para '{title}'")
-                        print(f"[LYRICS] 🔄 Intentando mapeo directo sin verificación de letras...")
+                        logger.debug('[LYRICS] No se pudieron descargar letras para %r', title)
+                        logger.debug('[LYRICS] Intentando mapeo directo sin verificación de letras...')
                         
                         # FALLBACK: Mapear directamente sin verificar letras
                         # Esto es útil cuando Genius bloquea requests en Vercel
                         q_query = f"{title} {artist}".strip()
-                        print(f"[LYRICS] 🔍 Mapeo directo en Qobuz: '{q_query}'")
+                        logger.debug('[LYRICS] Mapeo directo en Qobuz: %r', q_query)
                         
                         q_tracks = self.search_tracks_with_locale(q_query, limit=5, force_latin=True) or []
-                        print(f"[LYRICS] 📊 Qobuz encontró {len(q_tracks)} tracks")
+                        logger.debug('[LYRICS] Qobuz encontró %s tracks', len(q_tracks))
                         
                         # Mapeo por título exacto
                         mapped = None
                         for tr in q_tracks:
-                            q_title = (tr.get('title') or '').strip()
+                            q_title = (tr.title or '').strip()
                             if q_title == title.strip():
                                 mapped = tr
-                                print(f"[LYRICS] 🎯 Match directo encontrado: '{q_title}'")
+                                logger.debug('[LYRICS] Match directo encontrado: %r', q_title)
                                 break
                         
                         if mapped:
-                            print(f"[LYRICS] ✅ Mapeo directo exitoso: '{mapped.get('title')}'")
-                            m = mapped.copy()
-                            m['genius_match'] = True
-                            m['genius_url'] = url
-                            m['source'] = 'qobuz'
-                            m['lyrics_verified'] = False  # Indicar que no se verificaron letras
-                            results.append(m)
+                            logger.debug('[LYRICS] Mapeo directo exitoso: %r', mapped.title)
+                            # ``lyrics_verified``: el fragmento no se comprobó en las letras
+                            results.append(mapped.result('qobuz', genius_match=True, genius_url=url,
+                                                         lyrics_verified=False))
                             break  # Solo necesitamos uno
                         else:
-                            print(f"[LYRICS] ❌ Sin mapeo directo para '{title}'")
+                            logger.debug('[LYRICS] Sin mapeo directo para %r', title)
                         
                         continue
                         
-                    print(f"[LYRICS] ✅ Letras descargadas: {len(lyrics)} caracteres")
+                    logger.debug('[LYRICS] Letras descargadas: %s caracteres', len(lyrics))
                     
                     cl = self._clean_lyrics_text(lyrics)
-                    print(f"[LYRICS] ✂️ Letras limpiadas: {len(cl)} caracteres")
+                    logger.debug('[LYRICS] Letras limpiadas: %s caracteres', len(cl))
                     
                     if clean_query not in cl:
-                        print(f"[LYRICS] ❌ Fragmento '{clean_query[:30]}...' no encontrado en letras")
+                        logger.debug("[LYRICS] Fragmento '%s...' no encontrado en letras", clean_query[:30])
                         continue
 
-                    print(f"[LYRICS] ✅ Fragmento confirmado en: {title} - {artist}")                    # 3) Intentar mapear a Qobuz con coincidencia EXACTA de título
+                    logger.debug('[LYRICS] Fragmento confirmado en: %s - %s', title, artist)
+                    # 3) Intentar mapear a Qobuz con coincidencia EXACTA de título
                     q_query = f"{title} {artist}".strip()
-                    print(f"[LYRICS] 🔍 Buscando en Qobuz: '{q_query}'")
+                    logger.debug('[LYRICS] Buscando en Qobuz: %r', q_query)
                     
                     q_tracks = self.search_tracks_with_locale(q_query, limit=5, force_latin=True) or []
-                    print(f"[LYRICS] 📊 Qobuz encontró {len(q_tracks)} tracks")
+                    logger.debug('[LYRICS] Qobuz encontró %s tracks', len(q_tracks))
                     
-                    try:
-                        print(f"[LYRICS] 🎼 Candidatos Qobuz:", [t.get('title') for t in q_tracks])
-                    except Exception:
-                        pass
+                    if debug_enabled():
+                        logger.debug('[LYRICS] Candidatos Qobuz: %s', [t.title for t in q_tracks])
 
                     # Coincidencia exacta de título
                     mapped = None
                     for tr in q_tracks:
-                        q_title = (tr.get('title') or '').strip()
+                        q_title = (tr.title or '').strip()
                         if q_title == title.strip():
                             mapped = tr
-                            print(f"[LYRICS] 🎯 Match exacto encontrado: '{q_title}'")
+                            logger.debug('[LYRICS] Match exacto encontrado: %r', q_title)
                             break
 
                     if mapped:
-                        print(f"[LYRICS] ✅ Mapeo exitoso: '{mapped.get('title')}'")
-                        m = mapped.copy()
-                        m['genius_match'] = True
-                        m['genius_url'] = url
-                        m['source'] = 'qobuz'
-                        results.append(m)
+                        logger.debug('[LYRICS] Mapeo exitoso: %r', mapped.title)
+                        results.append(mapped.result('qobuz', genius_match=True, genius_url=url))
                     else:
-                        print("[LYRICS] ✗ Sin match exacto en Qobuz; devolviendo resultado de Genius")
-                        results.append({
-                            'id': None,
-                            'title': title,
-                            'performer': {'name': artist},
-                            'album': {},
-                            'duration': 0,
-                            'cover': '',
-                            'source': 'genius',
-                            'genius_match': True,
-                            'genius_url': url,
-                        })
+                        logger.debug('[LYRICS] Sin match exacto en Qobuz; devolviendo resultado de Genius')
+                        results.append(Track(None, title, artist).result('genius', genius_match=True,
+                                                                         genius_url=url))
 
                     if len(results) >= limit:
                         break
 
                 except Exception as e:
-                    print(f"[LYRICS] Error verificando candidato Genius: {e}")
+                    logger.warning('[LYRICS] Error verificando candidato Genius: %s', e)
                     continue
 
             return results
 
         except Exception as e:
-            print(f"[LYRICS] Error en búsqueda Genius (simple): {e}")
+            logger.warning('[LYRICS] Error en búsqueda Genius (simple): %s', e)
             return []
 
     def _search_genius_api(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
@@ -893,10 +1160,9 @@ class QobuzDownloader:
             genius_token = GENIUS_TOKEN
             
             if not genius_token or genius_token == "tu_token_de_genius_aqui":
-                print("[GENIUS API] ❌ Token de Genius no configurado correctamente")
+                logger.warning('[GENIUS API] Token de Genius no configurado correctamente')
                 return []
                 
-            print(f"[GENIUS API] ✅ Usando token: {genius_token[:20]}...")
             
             headers = {
                 'Authorization': f'Bearer {genius_token}',
@@ -907,18 +1173,18 @@ class QobuzDownloader:
             encoded_query = urllib.parse.quote(query)
             api_url = f"https://api.genius.com/search?q={encoded_query}"
             
-            print(f"[GENIUS API] Buscando: {api_url}")
+            logger.debug('[GENIUS API] Buscando: %s', api_url)
             
-            response = self.session.get(api_url, headers=headers, timeout=10)
+            response = upstream_get('genius.api', api_url, session=self.session, headers=headers, timeout=10)
             
             if response.status_code != 200:
-                print(f"[GENIUS API] Error {response.status_code}: {response.text}")
+                logger.warning('[GENIUS API] Error %s: %s', response.status_code, response.text)
                 return []
             
             data = response.json()
             
             if 'response' not in data or 'hits' not in data['response']:
-                print("[GENIUS API] Formato de respuesta inesperado")
+                logger.debug('[GENIUS API] Formato de respuesta inesperado')
                 return []
             
             hits = data['response']['hits']
@@ -942,14 +1208,14 @@ class QobuzDownloader:
                         })
                         
                 except Exception as e:
-                    print(f"[GENIUS API] Error procesando hit: {e}")
+                    logger.warning('[GENIUS API] Error procesando hit: %s', e)
                     continue
             
-            print(f"[GENIUS API] Encontradas {len(songs)} canciones")
+            logger.debug('[GENIUS API] Encontradas %s canciones', len(songs))
             return songs
             
         except Exception as e:
-            print(f"[GENIUS API] Error: {e}")
+            logger.warning('[GENIUS API] Error: %s', e)
             return []
     
     def _search_by_keywords(self, clean_query: str, limit: int) -> List[Dict[str, Any]]:
@@ -979,25 +1245,25 @@ class QobuzDownloader:
                 search_strategies.append(' '.join(significant_words[:2]))
                 search_strategies.append(' '.join(significant_words[-2:]))
             
-            print(f"[KEYWORDS] Probando {len(search_strategies)} estrategias")
+            logger.debug('[KEYWORDS] Probando %s estrategias', len(search_strategies))
             
             results = []
             seen_ids = set()
             
             for strategy in search_strategies[:5]:  # Máximo 5 estrategias
                 try:
-                    print(f"[KEYWORDS] Buscando: '{strategy}'")
+                    logger.debug('[KEYWORDS] Buscando: %r', strategy)
                     
                     tracks = self.search_tracks_with_locale(strategy, limit=5, force_latin=True)
                     
                     for track in tracks:
-                        track_id = track.get('id')
+                        track_id = track.id
                         if track_id not in seen_ids:
                             seen_ids.add(track_id)
                             
                             # Calcular relevancia basada en coincidencias
-                            title = track.get('title', '').lower()
-                            artist = track.get('performer', {}).get('name', '').lower()
+                            title = (track.title or '').lower()
+                            artist = (track.artist or '').lower()
                             
                             score = 0
                             for word in significant_words:
@@ -1008,9 +1274,8 @@ class QobuzDownloader:
                             
                             # Solo incluir si tiene cierta relevancia
                             if score >= 3:
-                                track['keyword_score'] = score
-                                results.append(track)
-                                print(f"[KEYWORDS] Agregado: {title} (score: {score})")
+                                results.append(track.result(keyword_score=score))
+                                logger.debug('[KEYWORDS] Agregado: %s (score: %s)', title, score)
                                 
                                 if len(results) >= limit:
                                     break
@@ -1019,7 +1284,7 @@ class QobuzDownloader:
                         break
                         
                 except Exception as e:
-                    print(f"[KEYWORDS] Error con estrategia '{strategy}': {e}")
+                    logger.warning('[KEYWORDS] Error con estrategia %r: %s', strategy, e)
                     continue
             
             # Ordenar por puntuación
@@ -1028,7 +1293,7 @@ class QobuzDownloader:
             return results[:limit]
             
         except Exception as e:
-            print(f"[KEYWORDS] Error: {e}")
+            logger.warning('[KEYWORDS] Error: %s', e)
             return []
 
 __all__ = ["QobuzDownloader"]
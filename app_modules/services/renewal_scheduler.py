@@ -0,0 +1,274 @@
+"""Planificador en segundo plano de la renovación automática de credenciales"""
+from __future__ import annotations
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos, solo entre hilos
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Campos del resultado de una renovación que se guardan en el estado compartido y se
+# muestran sin autenticar; el resto (instrucciones de Vercel, datos para localStorage)
+# lleva el token y el secreto completos y solo se sirve a administradores.
+_PUBLIC_RESULT_FIELDS = ('success', 'message', 'timestamp', 'days_remaining', 'is_vercel', 'credentials_version')
+
+
+def _mask(value: Any) -> str:
+    value = str(value or '')
+    return f"{value[:6]}…" if value and value != 'No disponible' else value
+
+
+def public_result(result: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Resumen sin credenciales de un resultado de ``perform_renewal``/``check_and_renew_if_needed``."""
+    if not isinstance(result, dict):
+        return None
+    summary = {k: result[k] for k in _PUBLIC_RESULT_FIELDS if k in result}
+    new_credentials = result.get('new_credentials')
+    if isinstance(new_credentials, dict):
+        summary['new_credentials'] = {
+            'app_id': new_credentials.get('app_id'),
+            'user_id': new_credentials.get('user_id'),
+            'token_preview': _mask(new_credentials.get('token_preview') or new_credentials.get('token')),
+        }
+    return summary
+
+
+class _LeaderLock:
+    """Cerrojo no bloqueante sobre un archivo: solo un proceso (worker) renueva a la vez."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd: Optional[int] = None
+        self._thread_lock = threading.Lock()
+
+    def acquire(self) -> bool:
+        if not self._thread_lock.acquire(blocking=False):
+            return False
+        if fcntl is None:
+            return True
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            fcntl.flock(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            self._close()
+            self._thread_lock.release()
+            return False
+
+    def release(self) -> None:
+        if fcntl is not None and self._fd is not None:
+            try:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            except OSError:
+                pass
+        self._close()
+        self._thread_lock.release()
+
+    def _close(self) -> None:
+        if self._fd is not None:
+            try:
+                os.close(self._fd)
+            except OSError:
+                pass
+            self._fd = None
+
+
+class RenewalScheduler:
+    """Comprueba la caducidad del token cada ``interval`` segundos y renueva con antelación.
+
+    El scraping de arldeemix/rentry y la validación de tokens ocurren aquí, nunca dentro
+    de una petición HTTP: los endpoints solo leen el estado guardado y piden una
+    comprobación. Con varios workers el estado se comparte en ``state_path`` y el
+    cerrojo de ``lock_path`` garantiza que solo uno de ellos haga el trabajo; los demás
+    instalan en caliente las credenciales que el líder haya renovado.
+    """
+
+    def __init__(self, state_path: str, lock_path: str, interval: float = 6 * 3600, threshold_days: int = 7,
+                 initial_delay: float = 30.0, poll_interval: float = 60.0,
+                 check: Optional[Callable[[int], Dict[str, Any]]] = None,
+                 renew: Optional[Callable[[], Dict[str, Any]]] = None,
+                 install: Optional[Callable[[], Optional[int]]] = None):
+        self.state_path = state_path
+        self.interval = interval
+        self.threshold_days = threshold_days
+        self.initial_delay = initial_delay
+        self.poll_interval = min(poll_interval, interval)
+        self._check = check or _default_check
+        self._renew = renew or _default_renew
+        self._install = install or _default_install
+        self._leader = _LeaderLock(lock_path)
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._pending_force = False
+        self._pending_check = False
+        self._running = False
+        self._seen_renewal: Optional[str] = None
+        self._state: Dict[str, Any] = {}
+        self._state_mtime = 0
+        self._last_full_result: Optional[Dict[str, Any]] = None
+
+    # --- Estado compartido ---
+    def _read_state(self) -> Dict[str, Any]:
+        try:
+            mtime = os.stat(self.state_path).st_mtime_ns
+        except OSError:
+            return dict(self._state)
+        if mtime != self._state_mtime:
+            try:
+                with open(self.state_path, 'r', encoding='utf-8') as f:
+                    self._state = json.load(f)
+                self._state_mtime = mtime
+            except (OSError, ValueError):
+                pass
+        return dict(self._state)
+
+    def _write_state(self, **fields: Any) -> None:
+        state = self._read_state()
+        state.update(fields)
+        os.makedirs(os.path.dirname(self.state_path) or '.', exist_ok=True)
+        tmp_path = f"{self.state_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False, default=str)
+        os.replace(tmp_path, self.state_path)
+        self._state = state
+
+    # --- API pública ---
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._loop, name='renewal-scheduler', daemon=True)
+            self._thread.start()
+
+    def request_check(self, force: bool = False) -> Dict[str, Any]:
+        """Pide una comprobación (o renovación forzada) sin esperar a que termine."""
+        with self._lock:
+            self._pending_check = True
+            self._pending_force = self._pending_force or force
+            loop_running = self._thread is not None
+        if loop_running:
+            self._wake.set()
+        else:
+            # Sin bucle (p.ej. Vercel): ejecución puntual en un hilo aparte
+            threading.Thread(target=self.run_once, name='renewal-once', daemon=True).start()
+        return self.status()
+
+    def status(self) -> Dict[str, Any]:
+        """Estado público: nunca incluye tokens ni secretos (ver ``public_result``)."""
+        state = self._read_state()
+        if 'last_result' in state:
+            state['last_result'] = public_result(state['last_result'])
+        # ``running_pid`` lo deja el líder (quizá otro worker); se ignora si es muy antiguo
+        other_running = state.get('running_pid') is not None and time.time() - state.get('started_at_ts', 0) < 600
+        with self._lock:
+            state['running'] = self._running or other_running
+            state['pending'] = self._pending_check
+            state['scheduled'] = self._thread is not None
+        state['interval'] = self.interval
+        state['threshold_days'] = self.threshold_days
+        return state
+
+    def last_full_result(self) -> Optional[Dict[str, Any]]:
+        """Último resultado completo de este proceso (con credenciales): solo para administradores."""
+        with self._lock:
+            return dict(self._last_full_result) if self._last_full_result is not None else None
+
+    # --- Trabajo ---
+    def _due(self) -> bool:
+        return time.time() - self._read_state().get('last_check_ts', 0) >= self.interval
+
+    def _loop(self) -> None:
+        self._wake.wait(self.initial_delay)
+        while True:
+            if self._wake.is_set() or self._pending_check or self._due():
+                self.run_once()
+            else:
+                self._follow()
+            self._wake.wait(self.poll_interval)
+
+    def run_once(self) -> Optional[Dict[str, Any]]:
+        """Una pasada: comprueba y renueva si hace falta (solo el líder)."""
+        with self._lock:
+            force, requested = self._pending_force, self._pending_check
+            self._pending_force = self._pending_check = False
+            self._wake.clear()
+            self._running = True
+        try:
+            if not self._leader.acquire():
+                self._follow()
+                return None
+            try:
+                if not requested and not self._due():
+                    # Otro worker acaba de comprobar; basta con recoger lo que haya renovado
+                    self._follow()
+                    return None
+                return self._run(force)
+            finally:
+                self._leader.release()
+        finally:
+            with self._lock:
+                self._running = False
+
+    def _run(self, force: bool) -> Dict[str, Any]:
+        self._write_state(running_pid=os.getpid(), started_at_ts=time.time())
+        started = time.time()
+        try:
+            result = self._renew() if force else self._check(self.threshold_days)
+        except Exception as e:
+            logger.exception("Error en la renovación programada")
+            result = {'success': False, 'message': f'Error verificando renovación: {e}'}
+        with self._lock:
+            self._last_full_result = result
+        fields: Dict[str, Any] = {
+            'last_check': datetime.now().isoformat(),
+            'last_check_ts': time.time(),
+            'last_duration': round(time.time() - started, 2),
+            'last_forced': force,
+            'last_result': public_result(result),
+            'running_pid': None,
+        }
+        if result.get('new_credentials'):
+            fields['last_renewal'] = fields['last_check']
+            self._seen_renewal = fields['last_renewal']
+        self._write_state(**fields)
+        return result
+
+    def _follow(self) -> None:
+        """Instala en caliente las credenciales que haya renovado otro worker."""
+        renewed_at = self._read_state().get('last_renewal')
+        if renewed_at and renewed_at != self._seen_renewal:
+            self._seen_renewal = renewed_at
+            try:
+                self._install()
+            except Exception as e:
+                logger.warning("No se pudieron instalar las credenciales renovadas: %s", e)
+
+
+def _default_check(threshold_days: int) -> Dict[str, Any]:
+    from .auto_renewal import check_and_renew_if_needed
+    return check_and_renew_if_needed(threshold_days)
+
+
+def _default_renew() -> Dict[str, Any]:
+    from .auto_renewal import QobuzCredentialRenewer
+    return QobuzCredentialRenewer().perform_renewal()
+
+
+def _default_install() -> Optional[int]:
+    from ..config import load_credentials
+    from .auto_renewal import QobuzCredentialRenewer
+    credentials = load_credentials().get('qobuz', {})
+    return QobuzCredentialRenewer().install_live(credentials) if credentials else None
+
+
+__all__ = ["RenewalScheduler", "public_result"]
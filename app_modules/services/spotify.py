@@ -2,14 +2,25 @@
 from __future__ import annotations
 import re
 import json
-import requests
+import logging
 from dataclasses import dataclass
 from typing import Optional, Tuple, Dict, Any
+from ..utils.deadline import has_time_for
+from ..utils.http import upstream_get
+from ..utils.shared_cache import TieredCache
+from ..utils.tracing import trace_methods
+from ..config import SPOTIFY_CACHE_TTL
+
+logger = logging.getLogger(__name__)
 
 HEADERS = {
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
     'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8'
 }
+# Cada URL de respaldo cuesta hasta tres llamadas (página, embed, oEmbed)
+FALLBACK_URL_SECONDS = 1.5
+# Las playlists cambian: se cachean menos tiempo que las pistas
+PLAYLIST_CACHE_TTL = 600
 
 @dataclass
 class SpotifyTrackInfo:
@@ -18,7 +29,12 @@ class SpotifyTrackInfo:
     album: str = ''
     duration: int = 0
 
+@trace_methods('spotify')
 class SpotifyHandler:
+    def __init__(self):
+        # Pistas y playlists ya leídas del embed, compartibles entre instancias
+        self.cache = TieredCache('spotify', ttl=SPOTIFY_CACHE_TTL, maxsize=1000)
+
     def extract_spotify_id(self, url: str) -> Tuple[Optional[str], Optional[str]]:
         try:
             if '?' in url:
@@ -40,35 +56,44 @@ class SpotifyHandler:
         except Exception:
             return None, None
 
+    def _fetch_embed_entity(self, kind: str, spotify_id: str) -> Optional[Dict[str, Any]]:
+        """Devuelve la entidad del JSON ``__NEXT_DATA__`` de la página embed."""
+        embed_url = f"https://open.spotify.com/embed/{kind}/{spotify_id}"
+        embed_response = upstream_get('spotify.embed', embed_url, headers=HEADERS, timeout=15)
+        if embed_response.status_code != 200:
+            return None
+        next_data_match = re.search(r'<script id="__NEXT_DATA__" type="application/json">(.*?)</script>', embed_response.text)
+        if not next_data_match:
+            return None
+        next_data = json.loads(next_data_match.group(1))
+        entity = next_data.get('props', {}).get('pageProps', {}).get('state', {}).get('data', {}).get('entity', {})
+        return entity if entity.get('type') == kind else None
+
     def get_track_info_by_scraping(self, track_id: str) -> Optional[Dict[str, Any]]:
+        return self.cache.get_or_set(f'track:{track_id}', lambda: self._scrape_track_info(track_id))
+
+    def _scrape_track_info(self, track_id: str) -> Optional[Dict[str, Any]]:
         # Intento 1: __NEXT_DATA__ JSON del embed (MÁS CONFIABLE)
         try:
-            embed_url = f"https://open.spotify.com/embed/track/{track_id}"
-            embed_response = requests.get(embed_url, headers=HEADERS, timeout=15)
-            if embed_response.status_code == 200:
-                embed_html = embed_response.text
-                next_data_match = re.search(r'<script id="__NEXT_DATA__" type="application/json">(.*?)</script>', embed_html)
-                if next_data_match:
-                    next_data = json.loads(next_data_match.group(1))
-                    entity = next_data.get('props', {}).get('pageProps', {}).get('state', {}).get('data', {}).get('entity', {})
-                    if entity.get('type') == 'track':
-                        title = entity.get('name', '')
-                        artists_list = entity.get('artists', [])
-                        if artists_list and isinstance(artists_list, list):
-                            artist = artists_list[0].get('name', '')
-                            all_artists = [a.get('name', '') for a in artists_list if a.get('name')]
-                            duration_ms = entity.get('duration', 0)
-                            if title and artist:
-                                print(f"[SPOTIFY] ✅ Found via embed: '{title}' by '{artist}'")
-                                return {
-                                    'name': title, 
-                                    'artist': artist, 
-                                    'album': '', 
-                                    'duration': int(duration_ms/1000) if duration_ms else 0, 
-                                    'artists': all_artists
-                                }
+            entity = self._fetch_embed_entity('track', track_id)
+            if entity:
+                title = entity.get('name', '')
+                artists_list = entity.get('artists', [])
+                if artists_list and isinstance(artists_list, list):
+                    artist = artists_list[0].get('name', '')
+                    all_artists = [a.get('name', '') for a in artists_list if a.get('name')]
+                    duration_ms = entity.get('duration', 0)
+                    if title and artist:
+                        logger.debug('[SPOTIFY] Found via embed: %r by %r', title, artist)
+                        return {
+                            'name': title, 
+                            'artist': artist, 
+                            'album': '', 
+                            'duration': int(duration_ms/1000) if duration_ms else 0, 
+                            'artists': all_artists
+                        }
         except Exception as e:
-            print(f"[SPOTIFY] ❌ Embed parsing failed: {e}")
+            logger.debug('[SPOTIFY] Embed parsing failed: %s', e)
             pass
 
         # Fallback: Métodos anteriores
@@ -78,8 +103,10 @@ class SpotifyHandler:
             f"https://spotify.com/track/{track_id}"
         ]
         for url in urls:
+            if not has_time_for('spotify.fallback', FALLBACK_URL_SECONDS):
+                break
             try:
-                response = requests.get(url, headers=HEADERS, timeout=15)
+                response = upstream_get('spotify.page', url, headers=HEADERS, timeout=15)
                 response.raise_for_status()
                 html = response.text
                 # Intento 2: Bloque JavaScript con Spotify.Entity que contiene JSON completo
@@ -153,7 +180,7 @@ class SpotifyHandler:
                 # Intento 3: __NEXT_DATA__ JSON del embed (más confiable)
                 try:
                     embed_url = f"https://open.spotify.com/embed/track/{track_id}"
-                    embed_response = requests.get(embed_url, headers=HEADERS, timeout=15)
+                    embed_response = upstream_get('spotify.embed', embed_url, headers=HEADERS, timeout=15)
                     if embed_response.status_code == 200:
                         embed_html = embed_response.text
                         next_data_match = re.search(r'<script id="__NEXT_DATA__" type="application/json">(.*?)</script>', embed_html)
@@ -168,7 +195,7 @@ class SpotifyHandler:
                                     all_artists = [a.get('name', '') for a in artists_list if a.get('name')]
                                     duration_ms = entity.get('duration', 0)
                                     if title and artist:
-                                        print(f"[SPOTIFY] ✅ Found via embed: '{title}' by '{artist}'")
+                                        logger.debug('[SPOTIFY] Found via embed: %r by %r', title, artist)
                                         return {
                                             'name': title, 
                                             'artist': artist, 
@@ -177,13 +204,13 @@ class SpotifyHandler:
                                             'artists': all_artists
                                         }
                 except Exception as e:
-                    print(f"[SPOTIFY] ❌ Embed parsing failed: {e}")
+                    logger.debug('[SPOTIFY] Embed parsing failed: %s', e)
                     pass
                 
                 # Intento 4: oEmbed de Spotify (estable y ligero)
                 try:
                     oembed_url = f"https://open.spotify.com/oembed?url=https://open.spotify.com/track/{track_id}"
-                    oresp = requests.get(oembed_url, headers=HEADERS, timeout=10)
+                    oresp = upstream_get('spotify.oembed', oembed_url, headers=HEADERS, timeout=10)
                     if oresp.status_code == 200:
                         meta = oresp.json()
                         # title suele venir como "Artist - Track" o "Track"
@@ -206,4 +233,39 @@ class SpotifyHandler:
                 continue
         return None
 
+    def get_playlist_tracks_by_scraping(self, playlist_id: str) -> Optional[Dict[str, Any]]:
+        """Lee la lista de pistas de una playlist desde el embed (``__NEXT_DATA__``).
+
+        Devuelve ``{'name', 'owner', 'tracks'}`` donde cada pista tiene el mismo formato
+        que ``get_track_info_by_scraping`` para poder mapearla a Qobuz igual que un track.
+        """
+        return self.cache.get_or_set(f'playlist:{playlist_id}', lambda: self._scrape_playlist(playlist_id),
+                                     ttl=min(SPOTIFY_CACHE_TTL, PLAYLIST_CACHE_TTL))
+
+    def _scrape_playlist(self, playlist_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            entity = self._fetch_embed_entity('playlist', playlist_id)
+            if not entity:
+                return None
+            tracks = []
+            for item in entity.get('trackList') or []:
+                title = (item.get('title') or '').strip()
+                artists = [a.strip() for a in (item.get('subtitle') or '').split(',') if a.strip()]
+                if not title or not artists:
+                    continue
+                duration_ms = item.get('duration', 0)
+                uri = item.get('uri') or ''
+                tracks.append({
+                    'name': title,
+                    'artist': artists[0],
+                    'album': '',
+                    'duration': int(duration_ms/1000) if duration_ms else 0,
+                    'artists': artists,
+                    'spotify_id': uri.split(':')[-1] if uri else None
+                })
+            return {'name': entity.get('name', ''), 'owner': entity.get('subtitle', ''), 'tracks': tracks}
+        except Exception as e:
+            logger.warning('[SPOTIFY] Playlist embed parsing failed: %s', e)
+            return None
+
 __all__ = ["SpotifyHandler", "SpotifyTrackInfo"]
@@ -0,0 +1,117 @@
+"""Modelo compacto de pista de Qobuz y su proyección a la API.
+
+Cada pista de ``track/search`` o ``track/get`` trae objetos anidados (álbum con imágenes
+y género, intérprete, compositor, sello, derechos...) de los que los resultados de
+búsqueda usan unos pocos campos. Las búsquedas extraen ``Track`` una sola vez al recibir
+la respuesta: ``search_cache`` guarda sus filas (``as_row``) y la búsqueda por letra,
+Spotify y las playlists trabajan con ``Track``, que guarda solo esos campos en
+``__slots__`` (sin ``__dict__`` por instancia). ``Track.result`` es la única proyección al
+formato de ``/api/search``. Solo el etiquetado de los trabajos necesita el JSON completo
+y lo pide con ``track/get``. ``benchmarks/tracks.py`` mide memoria y rendimiento.
+"""
+from __future__ import annotations
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+
+class Track:
+    """Pista con solo lo que muestran los resultados y la ficha compacta."""
+
+    __slots__ = ('id', 'title', 'artist', 'album', 'album_artist', 'duration', 'cover',
+                 'maximum_bit_depth', 'maximum_sampling_rate', 'streamable')
+
+    def __init__(self, id: Any, title: Optional[str], artist: Optional[str] = None, album: Optional[str] = None,
+                 album_artist: str = '', duration: Any = 0, cover: str = '', maximum_bit_depth: Any = None,
+                 maximum_sampling_rate: Any = None, streamable: bool = False):
+        self.id = id
+        self.title = title
+        self.artist = artist
+        self.album = album
+        self.album_artist = album_artist
+        self.duration = duration
+        self.cover = cover
+        self.maximum_bit_depth = maximum_bit_depth
+        self.maximum_sampling_rate = maximum_sampling_rate
+        self.streamable = streamable
+
+    @classmethod
+    def from_qobuz(cls, data: Dict[str, Any]) -> 'Track':
+        """Extrae los campos de una pista de la API de Qobuz (``None`` = campo ausente)."""
+        album = data.get('album') or {}
+        return cls(
+            data.get('id'),
+            data.get('title'),
+            (data.get('performer') or {}).get('name'),
+            album.get('title'),
+            (album.get('artist') or {}).get('name', ''),
+            data.get('duration', 0),
+            (album.get('image') or {}).get('small', ''),
+            data.get('maximum_bit_depth'),
+            data.get('maximum_sampling_rate'),
+            bool(data.get('streamable', False)),
+        )
+
+    @classmethod
+    def from_row(cls, row: Sequence[Any]) -> 'Track':
+        """Inversa de ``as_row`` (la fila puede volver de JSON como lista)."""
+        return cls(*row)
+
+    def as_row(self) -> List[Any]:
+        """Campos en el orden de ``__slots__``: la forma serializable que guardan las cachés."""
+        return [getattr(self, name) for name in self.__slots__]
+
+    @property
+    def artist_name(self) -> str:
+        return self.artist if self.artist is not None else 'Unknown'
+
+    @property
+    def album_display(self) -> str:
+        """Título del álbum, con su artista si no es el intérprete de la pista."""
+        title = self.album if self.album is not None else 'Unknown'
+        if self.album_artist and self.album_artist != (self.artist or ''):
+            return f'{title} - {self.album_artist}'
+        return title
+
+    def result(self, source: str = 'qobuz', **extra: Any) -> Dict[str, Any]:
+        """Resultado de ``/api/search``; ``extra`` añade marcas (``found_by_lyrics``...)."""
+        item = {
+            'id': self.id,
+            'title': self.title,
+            'artist': self.artist_name,
+            'album': self.album_display,
+            'duration': self.duration,
+            'cover': self.cover,
+            'source': source,
+        }
+        item.update(extra)
+        return item
+
+    def compact(self) -> Dict[str, Any]:
+        """Ficha de ``/api/tracks/batch``: lo que la UI necesita para prerenderizar calidades."""
+        return {
+            'id': self.id,
+            'title': self.title,
+            'artist': self.artist_name,
+            'album': self.album if self.album is not None else '',
+            'duration': self.duration,
+            'cover': self.cover,
+            'maximum_bit_depth': self.maximum_bit_depth,
+            'maximum_sampling_rate': self.maximum_sampling_rate,
+        }
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Track):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self) -> str:
+        return f'Track(id={self.id!r}, title={self.title!r}, artist={self.artist!r})'
+
+
+def track_result(track: Union[Track, Dict[str, Any]], source: str = 'qobuz', **extra: Any) -> Dict[str, Any]:
+    """Proyección común de una pista (``Track`` o JSON de Qobuz) a resultado de búsqueda."""
+    if not isinstance(track, Track):
+        track = Track.from_qobuz(track)
+    return track.result(source, **extra)
+
+
+__all__ = ["Track", "track_result"]
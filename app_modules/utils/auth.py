@@ -0,0 +1,34 @@
+"""Autenticación de los endpoints de administración"""
+from __future__ import annotations
+import hmac
+from functools import wraps
+from typing import Callable, Optional
+from flask import jsonify, request
+
+
+def _request_admin_token() -> Optional[str]:
+    header = request.headers.get('Authorization', '')
+    if header.lower().startswith('bearer '):
+        return header[7:].strip()
+    return request.headers.get('X-Admin-Token')
+
+
+def require_admin(view: Callable) -> Callable:
+    """Exige ``ADMIN_TOKEN`` en ``Authorization: Bearer`` o ``X-Admin-Token``.
+
+    Si ``ADMIN_TOKEN`` no está configurado los endpoints quedan desactivados (403).
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        from .. import config
+        expected = config.ADMIN_TOKEN
+        if not expected:
+            return jsonify({'success': False, 'error': 'Administración desactivada (ADMIN_TOKEN no configurado)'}), 403
+        provided = _request_admin_token() or ''
+        if not hmac.compare_digest(provided.encode('utf-8'), expected.encode('utf-8')):
+            return jsonify({'success': False, 'error': 'No autorizado'}), 401
+        return view(*args, **kwargs)
+    return wrapper
+
+
+__all__ = ["require_admin"]
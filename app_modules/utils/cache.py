@@ -0,0 +1,198 @@
+"""Caché en memoria con expiración (TTL) y política LRU, segura entre hilos"""
+from __future__ import annotations
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Diccionario acotado a ``maxsize`` entradas que expiran tras ``ttl`` segundos.
+
+    Lleva contadores de aciertos/fallos para poder medir la efectividad de la caché.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: 'OrderedDict[Hashable, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            value, expires_at = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_many(self, keys: Iterable[Hashable]) -> Dict[Hashable, Any]:
+        """Los valores vigentes de ``keys`` (misma interfaz que ``TieredCache``)."""
+        found = {}
+        for key in keys:
+            value = self.get(key, _MISSING)
+            if value is not _MISSING:
+                found[key] = value
+        return found
+
+    def get_or_set(self, key: Hashable, loader: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        """Valor guardado o el de ``loader()``, que se guarda salvo que sea ``None``."""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = loader()
+            if value is not None:
+                self.set(key, value, ttl)
+        return value
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            item = self._data.get(key)
+            return item is not None and item[1] >= time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class SWRCache:
+    """Caché *stale-while-revalidate* para registros caros de obtener y muy consultados.
+
+    Hasta ``refresh_after`` segundos el valor se sirve tal cual; entre ``refresh_after`` y
+    ``ttl`` se sirve el valor guardado y se refresca en segundo plano (una sola recarga por
+    clave). Pasado ``ttl`` la carga es síncrona, pero las peticiones concurrentes de la
+    misma clave esperan a una única carga. Los ``None`` (fallos) se guardan solo
+    ``negative_ttl`` segundos.
+    """
+
+    def __init__(self, ttl: float = 600.0, refresh_after: Optional[float] = None, negative_ttl: float = 30.0,
+                 executor=None, maxsize: int = 256):
+        self.ttl = ttl
+        self.refresh_after = ttl * 0.8 if refresh_after is None else refresh_after
+        self.negative_ttl = negative_ttl
+        self.maxsize = maxsize
+        self._executor = executor
+        self._data: 'OrderedDict[Hashable, tuple]' = OrderedDict()
+        self._inflight: Dict[Hashable, threading.Event] = {}
+        self._lock = threading.Lock()
+        self._counters: Dict[str, int] = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'refreshes': 0, 'load_errors': 0}
+
+    def _store(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._data[key] = (value, time.monotonic())
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def _load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        try:
+            value = loader()
+        except Exception as e:
+            logger.debug("Carga de %r fallida: %s", key, e)
+            with self._lock:
+                self._counters['load_errors'] += 1
+            value = None
+        self._store(key, value)
+        return value
+
+    def _refresh(self, key: Hashable, loader: Callable[[], Any], event: threading.Event) -> None:
+        try:
+            self._load(key, loader)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            event.set()
+
+    def get(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                value, loaded_at = item
+                age = now - loaded_at
+                ttl = self.ttl if value is not None else self.negative_ttl
+                if age < min(self.refresh_after, ttl):
+                    self._counters['hits'] += 1
+                    return value
+                if age < ttl and value is not None:
+                    self._counters['stale_hits'] += 1
+                    if key not in self._inflight and self._executor is not None:
+                        event = self._inflight[key] = threading.Event()
+                        self._counters['refreshes'] += 1
+                        self._executor.submit(self._refresh, key, loader, event)
+                    return value
+            self._counters['misses'] += 1
+            event = self._inflight.get(key)
+            owner = event is None
+            if owner:
+                event = self._inflight[key] = threading.Event()
+        if not owner:
+            event.wait(timeout=30)
+            with self._lock:
+                item = self._data.get(key)
+            return item[0] if item else None
+        try:
+            return self._load(key, loader)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            event.set()
+
+    def peek(self, key: Hashable) -> Any:
+        """Valor guardado (aunque esté caducado) sin cargar ni contar como acceso."""
+        with self._lock:
+            item = self._data.get(key)
+            return item[0] if item else None
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._counters)
+            stats['size'] = len(self._data)
+        served = stats['hits'] + stats['stale_hits'] + stats['misses']
+        stats['hit_ratio'] = round((stats['hits'] + stats['stale_hits']) / served, 4) if served else 0.0
+        return stats
+
+
+__all__ = ["TTLCache", "SWRCache"]
@@ -0,0 +1,260 @@
+"""Grabación y reproducción de las llamadas a servicios externos (*cassettes*).
+
+En modo ``record`` cada llamada que pasa por ``utils.http`` se guarda —petición, estado,
+cabeceras útiles, cuerpo y tiempo de respuesta— en un archivo JSON Lines (con gzip si
+termina en ``.gz``). Los cuerpos se guardan una sola vez por contenido, así que cien
+descargas del mismo audio ocupan lo que una.
+
+En modo ``replay`` no se sale a la red: cada petición recibe la respuesta grabada con su
+misma clave (método, upstream, URL sin secretos ni firmas volátiles y ``Range``) tras esperar el
+tiempo original multiplicado por ``time_scale`` (0 = sin espera). Las repeticiones
+recorren en orden las respuestas grabadas para esa clave. Una petición que no está en
+la cassette lanza ``CassetteMiss`` (un ``requests.ConnectionError``), como un fallo de red.
+
+Antes de escribir se seudonimizan los secretos: parámetros y campos conocidos (token,
+app_secret, firmas, email...) y cualquier cadena con forma de token (32+ caracteres con
+letras y dígitos, p.ej. credenciales en páginas de rentry). El seudónimo es un HMAC con
+una sal propia de la cassette, conserva la longitud y no se vuelve a transformar, así que
+una URL firmada que llega en una respuesta y se pide después sigue casando al reproducirla.
+"""
+from __future__ import annotations
+import base64
+import gzip
+import hashlib
+import hmac
+import io
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+from typing import Any, Callable, Dict, List
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.models import PreparedRequest
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+logger = logging.getLogger(__name__)
+
+MODES = ('record', 'replay')
+FORMAT_VERSION = 1
+
+# Parámetros y campos JSON cuyo valor nunca se escribe tal cual
+SECRET_PARAMS = ('user_auth_token', 'app_secret', 'request_sig', 'hmac', 'token', 'access_token', 'password')
+SECRET_FIELDS = ('user_auth_token', 'app_secret', 'accessToken', 'access_token', 'token', 'email',
+                 'password', 'secret')
+# Cambian en cada llamada aunque la petición sea la misma: fuera de la clave
+VOLATILE_PARAMS = ('request_ts', 'request_sig')
+# Cabeceras de respuesta que se conservan (el resto no influye en la app)
+KEPT_HEADERS = ('Content-Type', 'Content-Range', 'Accept-Ranges', 'Retry-After', 'ETag', 'Last-Modified',
+                'Location', 'Content-Disposition')
+
+_TOKEN_RE = re.compile(r'(?<![A-Za-z0-9_-])[A-Za-z0-9_-]{32,}(?![A-Za-z0-9_-])')
+_FIELD_RE = re.compile(r'("(?:%s)"\s*:\s*")([^"\\]+)(")' % '|'.join(map(re.escape, SECRET_FIELDS)))
+_PARAM_RE = re.compile(r'([?&](?:%s)=)([^&"\'\s<>]+)' % '|'.join(map(re.escape, SECRET_PARAMS)))
+_TEXT_TYPES = ('text/', 'json', 'javascript', 'xml', 'x-www-form-urlencoded')
+
+
+class CassetteMiss(requests.ConnectionError):
+    """La petición no está grabada en la cassette que se reproduce."""
+
+
+def _open(path: str, mode: str):
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+class Cassette:
+    """Grabadora/reproductora que ``utils.http.set_cassette`` intercala en cada llamada."""
+
+    def __init__(self, path: str, mode: str = 'replay', time_scale: float = 1.0):
+        if mode not in MODES:
+            raise ValueError(f"Modo de cassette desconocido: {mode!r} (usa {' o '.join(MODES)})")
+        self.path = path
+        self.mode = mode
+        self.time_scale = max(0.0, float(time_scale))
+        self._lock = threading.Lock()
+        self._salt = b''
+        self._bodies: Dict[str, bytes] = {}
+        self._calls: Dict[str, List[Dict[str, Any]]] = {}
+        self._cursor: Counter = Counter()
+        self._counters: Counter = Counter()
+        self._file = None
+        if os.path.exists(path):
+            self._load()
+        elif mode == 'replay':
+            raise FileNotFoundError(f"No existe la cassette {path}")
+        if mode == 'record':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._file = _open(path, 'a')
+            if not self._salt:
+                self._salt = os.urandom(16)
+                self._write({'cassette': FORMAT_VERSION, 'salt': self._salt.hex(), 'created': time.time()})
+
+    # --- Archivo ---
+    def _load(self) -> None:
+        with _open(self.path, 'r') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                if 'cassette' in entry:
+                    self._salt = self._salt or bytes.fromhex(entry['salt'])
+                elif 'call' in entry:
+                    self._calls.setdefault(entry['call'], []).append(entry)
+                elif 'body' in entry:
+                    self._bodies[entry['body']] = (base64.b64decode(entry['data']) if entry.get('base64')
+                                                   else entry['data'].encode('utf-8'))
+
+    def _write(self, entry: Dict[str, Any]) -> None:
+        self._file.write(json.dumps(entry, ensure_ascii=False, separators=(',', ':')) + '\n')
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    # --- Seudonimización ---
+    def _pseudonym(self, value: str) -> str:
+        """Hex de la misma longitud; los 8 últimos caracteres comprueban el resto.
+
+        La comprobación hace la operación idempotente: al reproducir, la app pide URLs
+        que ya llevan seudónimos (vienen de respuestas grabadas) y no deben cambiar.
+        """
+        if not value or self._is_pseudonym(value):
+            return value
+        digest = hmac.new(self._salt, value.encode('utf-8'), hashlib.sha256).hexdigest()
+        if len(value) <= 8:
+            return digest[:len(value)]
+        body = (digest * (len(value) // len(digest) + 1))[:len(value) - 8]
+        return body + self._check(body)
+
+    def _check(self, body: str) -> str:
+        return hmac.new(self._salt, body.encode('ascii'), hashlib.sha256).hexdigest()[:8]
+
+    def _is_pseudonym(self, value: str) -> bool:
+        return (len(value) > 8 and all(c in '0123456789abcdef' for c in value)
+                and hmac.compare_digest(value[-8:], self._check(value[:-8])))
+
+    def _scrub_token(self, match: 're.Match') -> str:
+        value = match.group(0)
+        has_letter = any(c.isalpha() for c in value)
+        has_digit = any(c.isdigit() for c in value)
+        return self._pseudonym(value) if has_letter and has_digit else value
+
+    def redact_text(self, text: str) -> str:
+        text = _FIELD_RE.sub(lambda m: m.group(1) + self._pseudonym(m.group(2)) + m.group(3), text)
+        text = _PARAM_RE.sub(lambda m: m.group(1) + self._pseudonym(m.group(2)), text)
+        return _TOKEN_RE.sub(self._scrub_token, text)
+
+    def redact_url(self, url: str, for_key: bool = False) -> str:
+        """URL sin secretos; ``for_key`` quita además lo que no identifica la petición.
+
+        En la clave los secretos valen ``*``: así una cassette grabada con una cuenta se
+        reproduce con cualquier otra.
+        """
+        parts = urlsplit(url)
+        query = []
+        for key, value in parse_qsl(parts.query, keep_blank_values=True):
+            if for_key and key in VOLATILE_PARAMS:
+                continue
+            if key in SECRET_PARAMS:
+                value = '*' if for_key else self._pseudonym(value)
+            query.append((key, value))
+        if for_key:
+            query.sort()
+        redacted = urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query, safe='*'), ''))
+        return _TOKEN_RE.sub(self._scrub_token, redacted)
+
+    # --- Claves ---
+    def key(self, method: str, upstream: str, url: str, kwargs: Dict[str, Any]) -> str:
+        if kwargs.get('params'):
+            prepared = PreparedRequest()
+            prepared.prepare_url(url, kwargs['params'])
+            url = prepared.url
+        key = f'{method.upper()} {upstream} {self.redact_url(url, for_key=True)}'
+        headers = kwargs.get('headers') or {}
+        byte_range = headers.get('Range') or headers.get('range')
+        return f'{key} range={byte_range}' if byte_range else key
+
+    # --- Llamadas ---
+    def request(self, method: str, upstream: str, url: str, kwargs: Dict[str, Any],
+                send: Callable[[], requests.Response]) -> requests.Response:
+        key = self.key(method, upstream, url, kwargs)
+        if self.mode == 'replay':
+            return self._replay(key, url)
+        started = time.perf_counter()
+        response = send()
+        elapsed = time.perf_counter() - started
+        try:
+            self._record(key, upstream, method, url, response, elapsed)
+        except Exception as e:  # grabar nunca debe romper la petición real
+            logger.warning("No se pudo grabar %s en la cassette: %s", key, e)
+        return response
+
+    def _record(self, key: str, upstream: str, method: str, url: str, response: requests.Response,
+                elapsed: float) -> None:
+        body = response.content  # con stream=True queda en memoria y la app la sigue leyendo igual
+        content_type = response.headers.get('Content-Type', '')
+        textual = any(t in content_type for t in _TEXT_TYPES)
+        if textual:
+            body = self.redact_text(body.decode(response.encoding or 'utf-8', errors='replace')).encode('utf-8')
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        headers = {h: response.headers[h] for h in KEPT_HEADERS if h in response.headers}
+        if textual and response.encoding:
+            headers['Content-Type'] = re.sub(r';\s*charset=[^;]+', '', content_type) + '; charset=utf-8'
+        call = {'call': key, 'upstream': upstream, 'method': method.upper(), 'url': self.redact_url(url),
+                'status': response.status_code, 'reason': response.reason, 'headers': headers,
+                'body': digest, 'elapsed_ms': round(elapsed * 1000, 3)}
+        with self._lock:
+            if self._file is None:
+                return
+            if digest not in self._bodies:
+                self._bodies[digest] = body
+                if textual:
+                    self._write({'body': digest, 'data': body.decode('utf-8')})
+                else:
+                    self._write({'body': digest, 'base64': True, 'data': base64.b64encode(body).decode('ascii')})
+            self._write(call)
+            self._file.flush()
+            self._calls.setdefault(key, []).append(call)
+            self._counters['recorded'] += 1
+
+    def _replay(self, key: str, url: str) -> requests.Response:
+        with self._lock:
+            calls = self._calls.get(key)
+            if not calls:
+                self._counters['misses'] += 1
+                raise CassetteMiss(f"Petición no grabada en la cassette: {key}")
+            call = calls[self._cursor[key] % len(calls)]
+            self._cursor[key] += 1
+            self._counters['replayed'] += 1
+        delay = call['elapsed_ms'] / 1000 * self.time_scale
+        if delay > 0:
+            time.sleep(delay)
+        body = self._bodies.get(call['body'], b'')
+        response = requests.Response()
+        response.status_code = call['status']
+        response.reason = call.get('reason') or ''
+        response.headers = CaseInsensitiveDict(call.get('headers') or {})
+        response.headers['Content-Length'] = str(len(body))
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.raw = io.BytesIO(body)
+        response.url = url
+        response.elapsed = timedelta(milliseconds=call['elapsed_ms'])
+        return response
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'mode': self.mode, 'path': self.path, 'time_scale': self.time_scale,
+                    'keys': len(self._calls), 'bodies': len(self._bodies), **self._counters}
+
+
+__all__ = ["Cassette", "CassetteMiss", "MODES", "SECRET_PARAMS", "SECRET_FIELDS"]
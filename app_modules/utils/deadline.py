@@ -0,0 +1,157 @@
+"""Plazo y presupuesto de llamadas externas de una petición.
+
+Vercel corta la función al cumplir su duración máxima, y una búsqueda por letra puede
+encadenar la búsqueda en Genius, cinco páginas de letras, cinco búsquedas en Qobuz y la
+búsqueda normal, cada una con 10-15 s de timeout. ``with_deadline`` abre un ``Budget``
+para la vista (segundos y número máximo de llamadas) que viaja en una ``ContextVar``
+—``submit_in_context`` lo lleva a los hilos trabajadores— y ``utils.http`` lo aplica a
+todas las llamadas:
+
+- el timeout de cada llamada se recorta a lo que queda de plazo;
+- sin plazo o sin llamadas disponibles la llamada no se hace y se lanza
+  ``BudgetExhausted`` (un ``requests.Timeout``, que los servicios ya tratan como fallo).
+
+Las etapas opcionales (más páginas de Genius, estrategias de respaldo de Spotify...)
+preguntan antes con ``has_time_for``, que deja ``reserve`` segundos para lo
+imprescindible; dentro de ``optional_stage`` los timeouts tampoco tocan esa reserva. Lo omitido queda en ``Budget.skipped`` y la ruta devuelve lo que tenga
+marcado como parcial en lugar de agotar el tiempo.
+
+``requests`` aplica el timeout a cada operación de socket, no a la llamada entera: el
+plazo es un objetivo, no un corte exacto.
+"""
+from __future__ import annotations
+import contextvars
+import functools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, List, Optional
+
+import requests
+
+from .metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# Por debajo de esto una llamada no llega ni a conectar: mejor no hacerla
+MIN_CALL_SECONDS = 0.05
+
+DEADLINE_SKIPS = REGISTRY.counter(
+    'musichub_deadline_skips_total', 'Llamadas y etapas omitidas por falta de plazo o de presupuesto',
+    ('kind', 'name'))
+
+
+class BudgetExhausted(requests.Timeout):
+    """No queda plazo o presupuesto de llamadas para esta petición."""
+
+
+class Budget:
+    """Plazo (``seconds``) y número de llamadas (``max_calls``, ``None`` = sin límite)."""
+
+    def __init__(self, seconds: float, max_calls: Optional[int] = None, reserve: float = 0.0):
+        self.seconds = seconds
+        self.max_calls = max_calls
+        self.reserve = reserve
+        self.expires_at = time.monotonic() + seconds
+        self.calls = 0
+        self.skipped: List[str] = []
+        self._lock = threading.Lock()
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def partial(self) -> bool:
+        return bool(self.skipped)
+
+    def _skip(self, kind: str, name: str) -> None:
+        DEADLINE_SKIPS.labels(kind, name).inc()
+        with self._lock:
+            if name not in self.skipped:
+                self.skipped.append(name)
+
+    def allows(self, stage: str, seconds: float) -> bool:
+        """¿Caben ``seconds`` más para ``stage`` sin tocar la reserva ni el cupo de llamadas?"""
+        calls_left = self.max_calls is None or self.calls < self.max_calls
+        if calls_left and self.remaining() - self.reserve >= seconds:
+            return True
+        logger.debug('Sin tiempo para %s (quedan %.2f s, %s llamadas)', stage, self.remaining(), self.calls)
+        self._skip('stage', stage)
+        return False
+
+    def admit(self, upstream: str, timeout: Any) -> Any:
+        """Cuenta una llamada y devuelve su timeout recortado, o lanza ``BudgetExhausted``."""
+        remaining = self.remaining() - (self.reserve if _optional.get() else 0.0)
+        with self._lock:
+            over_calls = self.max_calls is not None and self.calls >= self.max_calls
+            if not over_calls and remaining >= MIN_CALL_SECONDS:
+                self.calls += 1
+        if over_calls or remaining < MIN_CALL_SECONDS:
+            self._skip('call', upstream)
+            reason = f'{self.max_calls} llamadas' if over_calls else f'{self.seconds:.1f} s'
+            raise BudgetExhausted(f'Presupuesto de la petición agotado ({reason}): {upstream}')
+        if timeout is None:
+            return remaining
+        if isinstance(timeout, tuple):
+            return tuple(remaining if t is None else min(t, remaining) for t in timeout)
+        return min(timeout, remaining)
+
+    def summary(self) -> dict:
+        return {'deadline_s': self.seconds, 'remaining_s': round(self.remaining(), 3), 'calls': self.calls,
+                'max_calls': self.max_calls, 'skipped': list(self.skipped)}
+
+
+_budget: contextvars.ContextVar[Optional[Budget]] = contextvars.ContextVar('musichub_budget', default=None)
+_optional: contextvars.ContextVar[bool] = contextvars.ContextVar('musichub_optional_stage', default=False)
+
+
+def current_budget() -> Optional[Budget]:
+    return _budget.get()
+
+
+def has_time_for(stage: str, seconds: float) -> bool:
+    """``True`` fuera de un presupuesto; dentro, si la etapa opcional cabe en el plazo."""
+    budget = _budget.get()
+    return budget is None or budget.allows(stage, seconds)
+
+
+@contextmanager
+def optional_stage() -> Iterator[None]:
+    """Las llamadas de este bloque solo pueden usar el plazo que sobra tras la reserva."""
+    token = _optional.set(True)
+    try:
+        yield
+    finally:
+        _optional.reset(token)
+
+
+@contextmanager
+def request_budget(seconds: float, max_calls: Optional[int] = None, reserve: float = 0.0) -> Iterator[Budget]:
+    budget = Budget(seconds, max_calls, reserve)
+    token = _budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _budget.reset(token)
+
+
+def with_deadline(view: Callable) -> Callable:
+    """Ejecuta la vista dentro de un ``Budget`` con ``REQUEST_DEADLINE_SECONDS``,
+    ``REQUEST_CALL_BUDGET`` y ``REQUEST_DEADLINE_RESERVE``.
+
+    Un plazo <= 0 desactiva el presupuesto y un límite de llamadas <= 0 lo deja sin tope.
+    """
+    @functools.wraps(view)
+    def wrapper(*args: Any, **kwargs: Any):
+        from .. import config
+        if config.REQUEST_DEADLINE_SECONDS <= 0:
+            return view(*args, **kwargs)
+        max_calls = config.REQUEST_CALL_BUDGET if config.REQUEST_CALL_BUDGET > 0 else None
+        with request_budget(config.REQUEST_DEADLINE_SECONDS, max_calls, config.REQUEST_DEADLINE_RESERVE):
+            return view(*args, **kwargs)
+    return wrapper
+
+
+__all__ = ["Budget", "BudgetExhausted", "DEADLINE_SKIPS", "current_budget", "has_time_for", "optional_stage",
+           "request_budget", "with_deadline"]
@@ -0,0 +1,110 @@
+"""Capa común para las llamadas HTTP a servicios externos (Qobuz, Genius, Spotify...).
+
+Todas las peticiones salientes pasan por ``upstream_get``/``upstream_request`` con un
+nombre de *upstream* estable (``qobuz.track/search``, ``genius.api``...), lo que permite
+medir su latencia por servicio y estado sin repetir el cronometraje en cada sitio.
+
+``set_url_overrides`` redirige prefijos de URL a otro destino (los benchmarks apuntan
+Qobuz, Genius y Spotify a servidores locales); sin sustituciones no se toca la URL.
+``set_cassette`` intercala una ``utils.cassette.Cassette`` que graba o reproduce las
+llamadas; la clave de grabación usa siempre la URL original, no la redirigida.
+
+``set_resilience`` añade cortocircuitos por upstream, cobertura de GETs lentos y
+timeouts adaptados a las latencias observadas (``utils.resilience``); va por dentro de
+la cassette, que solo ve la llamada lógica. El timeout de cada llamada es el valor de
+partida mientras no hay muestras de ese upstream.
+
+Dentro de un presupuesto de petición (``utils.deadline``) el timeout de cada llamada se
+recorta al plazo restante, y sin plazo o sin llamadas disponibles no se llega a llamar.
+"""
+from __future__ import annotations
+import time
+from typing import Any, Dict, Optional
+import requests
+from .deadline import current_budget
+from .metrics import UPSTREAM_REQUEST_SECONDS
+from .resilience import CircuitOpen
+from .tracing import SPAN_KIND_CLIENT, span
+
+# Prefijo original -> prefijo sustituto; se reemplaza entero, nunca se modifica
+_url_overrides: Dict[str, str] = {}
+_cassette: Optional[Any] = None
+_resilience: Optional[Any] = None
+
+
+def set_url_overrides(overrides: Optional[Dict[str, str]]) -> None:
+    """Redirige las URLs que empiezan por cada clave al prefijo indicado (``None`` las quita)."""
+    global _url_overrides
+    _url_overrides = dict(overrides or {})
+
+
+def set_cassette(cassette: Optional[Any]) -> None:
+    """Graba/reproduce las llamadas con ``cassette`` (``None`` vuelve a la red)."""
+    global _cassette
+    _cassette = cassette
+
+
+def set_resilience(resilience: Optional[Any]) -> None:
+    """Protege las llamadas con ``resilience`` (``None`` las deja pasar sin más)."""
+    global _resilience
+    _resilience = resilience
+
+
+def _rewrite_url(url: str) -> str:
+    for prefix, target in _url_overrides.items():
+        if url.startswith(prefix):
+            return target + url[len(prefix):]
+    return url
+
+
+def upstream_request(method: str, upstream: str, url: str, session: Optional[Any] = None, **kwargs: Any):
+    """Ejecuta la petición con ``session`` (o ``requests``) y registra su duración.
+
+    La etiqueta ``status`` es el código HTTP, ``error`` si no hubo respuesta (timeout,
+    conexión rechazada...) o ``circuit_open`` si el cortocircuito la evitó. Con ``stream=True`` se mide hasta recibir las cabeceras.
+    Lanza ``BudgetExhausted`` sin llamar si la petición en curso agotó su presupuesto.
+    """
+    resilience = _resilience
+    if resilience is not None:
+        kwargs['timeout'] = resilience.timeout_for(upstream, kwargs.get('timeout'), stream=bool(kwargs.get('stream')))
+    budget = current_budget()
+    if budget is not None:
+        kwargs['timeout'] = budget.admit(upstream, kwargs.get('timeout'))
+    client = session if session is not None else requests
+
+    def send():
+        if resilience is None:
+            return _send(client, method, url, kwargs)
+        # Solo los GET completos son idempotentes y baratos de repetir
+        hedge = method.upper() == 'GET' and not kwargs.get('stream')
+        return resilience.call(upstream, lambda: _send(client, method, url, kwargs), hedge=hedge)
+
+    started = time.perf_counter()
+    status = 'error'
+    # Sin query string ni ``params``: ahí viajan tokens y firmas (Qobuz, URLs del CDN)
+    with span(f'http {upstream}', SPAN_KIND_CLIENT, **{'http.method': method, 'http.url': url.split('?', 1)[0]}) as current:
+        try:
+            cassette = _cassette
+            response = cassette.request(method, upstream, url, kwargs, send) if cassette is not None else send()
+            status = str(getattr(response, 'status_code', 'error'))
+            return response
+        except CircuitOpen:
+            status = 'circuit_open'
+            raise
+        finally:
+            UPSTREAM_REQUEST_SECONDS.labels(upstream, status).observe(time.perf_counter() - started)
+            if current is not None:
+                current.set_attribute('http.status_code', status)
+
+
+def _send(client: Any, method: str, url: str, kwargs: Dict[str, Any]):
+    if _url_overrides:
+        url = _rewrite_url(url)
+    return getattr(client, method.lower())(url, **kwargs)
+
+
+def upstream_get(upstream: str, url: str, session: Optional[Any] = None, **kwargs: Any):
+    return upstream_request('GET', upstream, url, session=session, **kwargs)
+
+
+__all__ = ["upstream_get", "upstream_request", "set_url_overrides", "set_cassette", "set_resilience"]
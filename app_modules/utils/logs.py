@@ -0,0 +1,174 @@
+"""Logging estructurado y no bloqueante con identificador de petición y muestreo.
+
+Los registros se encolan (``QueueHandler``) y un hilo aparte los escribe, de modo que
+el camino de la petición nunca espera a stdout/stderr; si la cola se llena se descartan
+y se cuentan. Cada petición lleva un ``request_id`` (cabecera ``X-Request-ID`` o uno
+nuevo) que se añade a todos sus registros. El detalle de nivel DEBUG solo se emite para
+la fracción ``debug_sample_rate`` de peticiones, o mientras ``capture_logs`` guarda los
+registros de la petición actual en un búfer circular en memoria.
+"""
+from __future__ import annotations
+import atexit
+import contextvars
+import json
+import logging
+import queue
+import random
+import re
+import sys
+import threading
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Callable, Deque, Iterator, Optional
+
+_request_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar('request_id', default=None)
+_sampled: contextvars.ContextVar[bool] = contextvars.ContextVar('log_sampled', default=False)
+_capture: contextvars.ContextVar[Optional[Deque[str]]] = contextvars.ContextVar('log_capture', default=None)
+
+_VALID_REQUEST_ID = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+# Atributos propios de LogRecord: el resto son campos pasados con ``extra=``
+_RECORD_FIELDS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'request_id'}
+
+_state = {'level': logging.INFO, 'sample_rate': 0.0, 'listener': None, 'handler': None}
+_setup_lock = threading.Lock()
+
+
+def bind_request(request_id: Optional[str] = None) -> str:
+    """Asocia un ``request_id`` (el recibido si es válido) al contexto actual y decide el muestreo."""
+    if not request_id or not _VALID_REQUEST_ID.match(request_id):
+        request_id = uuid.uuid4().hex[:16]
+    _request_id.set(request_id)
+    rate = _state['sample_rate']
+    _sampled.set(rate > 0 and (rate >= 1 or random.random() < rate))
+    return request_id
+
+
+def clear_request() -> None:
+    _request_id.set(None)
+    _sampled.set(False)
+
+
+def current_request_id() -> Optional[str]:
+    return _request_id.get()
+
+
+def debug_enabled() -> bool:
+    """``True`` si el detalle DEBUG de esta petición se va a emitir o capturar.
+
+    Sirve para no construir listas o cadenas caras que luego se descartarían.
+    """
+    return _state['level'] <= logging.DEBUG or _sampled.get() or _capture.get() is not None
+
+
+def submit_in_context(executor, fn: Callable, *args: Any, **kwargs: Any):
+    """``executor.submit`` conservando el ``request_id`` y la captura en el hilo trabajador."""
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+@contextmanager
+def capture_logs(maxlen: int = 500) -> Iterator[Deque[str]]:
+    """Guarda (con DEBUG incluido) los registros de este contexto en un búfer circular."""
+    buffer: Deque[str] = deque(maxlen=maxlen)
+    token = _capture.set(buffer)
+    try:
+        yield buffer
+    finally:
+        _capture.reset(token)
+
+
+class ContextFilter(logging.Filter):
+    """Añade ``request_id`` y descarta lo que esté por debajo del nivel salvo si se muestrea."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = _request_id.get() or '-'
+        return record.levelno >= _state['level'] or _sampled.get()
+
+
+class _CaptureHandler(logging.Handler):
+    def emit(self, record: logging.LogRecord) -> None:
+        buffer = _capture.get()
+        if buffer is not None:
+            buffer.append(self.format(record))
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """``QueueHandler`` que nunca espera: con la cola llena el registro se descarta."""
+
+    def __init__(self, log_queue: 'queue.Queue'):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class StructuredFormatter(logging.Formatter):
+    """Una línea por registro: ``text`` (clave=valor) o ``json``; los ``extra=`` van como campos."""
+
+    def __init__(self, fmt: str = 'text'):
+        super().__init__()
+        self.json = fmt == 'json'
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = {k: v for k, v in record.__dict__.items() if k not in _RECORD_FIELDS}
+        message = record.getMessage()
+        if record.exc_info:
+            fields['exc'] = self.formatException(record.exc_info)
+        ts = datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds')
+        request_id = getattr(record, 'request_id', '-')
+        if self.json:
+            return json.dumps({'ts': ts, 'level': record.levelname, 'logger': record.name, 'request_id': request_id,
+                               'msg': message, **fields}, ensure_ascii=False, default=str)
+        extra = ''.join(f' {k}={v!r}' for k, v in fields.items() if k != 'exc')
+        line = f'{ts} {record.levelname} {record.name} [{request_id}] {message}{extra}'
+        return f"{line}\n{fields['exc']}" if 'exc' in fields else line
+
+
+def setup_logging(level: str = 'INFO', fmt: str = 'text', debug_sample_rate: float = 0.0,
+                  queue_size: int = 10000, stream=None, logger_name: str = 'app_modules') -> logging.Logger:
+    """Configura el logger de la aplicación (idempotente: una segunda llamada solo ajusta niveles)."""
+    _state['level'] = logging.getLevelName(str(level).upper()) if isinstance(level, str) else int(level)
+    if not isinstance(_state['level'], int):
+        _state['level'] = logging.INFO
+    _state['sample_rate'] = max(0.0, float(debug_sample_rate))
+    app_logger = logging.getLogger(logger_name)
+    # El logger deja pasar DEBUG: el filtro decide qué se emite y la captura lo ve todo
+    app_logger.setLevel(logging.DEBUG)
+    with _setup_lock:
+        if _state['listener'] is not None:
+            return app_logger
+        output = logging.StreamHandler(stream or sys.stderr)
+        output.setFormatter(StructuredFormatter(fmt))
+        handler = NonBlockingQueueHandler(queue.Queue(maxsize=queue_size))
+        handler.addFilter(ContextFilter())
+        capture = _CaptureHandler()
+        capture.setFormatter(logging.Formatter('%(levelname)s %(name)s: %(message)s'))
+        app_logger.addHandler(handler)
+        app_logger.addHandler(capture)
+        # Sin propagar: el handler raíz (basicConfig, gunicorn) escribiría de forma síncrona
+        app_logger.propagate = False
+        listener = QueueListener(handler.queue, output, respect_handler_level=False)
+        listener.start()
+        atexit.register(listener.stop)
+        _state['listener'], _state['handler'] = listener, handler
+    return app_logger
+
+
+def stats() -> dict:
+    handler = _state['handler']
+    return {
+        'level': logging.getLevelName(_state['level']),
+        'debug_sample_rate': _state['sample_rate'],
+        'queued': handler.queue.qsize() if handler else 0,
+        'dropped': handler.dropped if handler else 0,
+    }
+
+
+__all__ = ["bind_request", "clear_request", "current_request_id", "debug_enabled", "submit_in_context",
+           "capture_logs", "ContextFilter", "NonBlockingQueueHandler", "StructuredFormatter", "setup_logging", "stats"]
@@ -1,6 +1,7 @@
 """Funciones relacionadas con metadatos de archivos de audio"""
+from datetime import datetime
 from typing import Dict, Optional
-import requests
+from .http import upstream_get
 
 try:
     from mutagen.flac import FLAC
@@ -13,10 +14,76 @@ except ImportError:  # pragma: no cover
     print("Mutagen no disponible - funcionalidad de metadatos deshabilitada")
 
 
-def add_metadata_to_file(file_path: str, track_info: Dict, cover_url: Optional[str] = None) -> bool:
+def fetch_cover(cover_url: Optional[str]) -> Optional[bytes]:
+    """Descarga la portada una sola vez para reutilizarla en varias pistas."""
+    if not cover_url:
+        return None
+    try:
+        resp = upstream_get('qobuz.cover', cover_url, timeout=10)
+        if resp.status_code == 200:
+            return resp.content
+    except Exception:
+        pass
+    return None
+
+
+def build_track_metadata(t_info: Dict, album_info: Optional[Dict] = None) -> Dict[str, str]:
+    """Construye el diccionario de metadatos a partir de la respuesta de ``track/get``.
+
+    ``album_info`` permite reutilizar un registro de ``album/get`` cuando las pistas
+    vienen de un álbum (los items de ``album/get`` no incluyen el álbum anidado).
+    """
+    if album_info is None:
+        album_info = t_info.get('album', {})
+    if not isinstance(album_info, dict):
+        album_info = {}
+    performer = t_info.get('performer', {})
+    artist_name = performer.get('name', '') if isinstance(performer, dict) else ''
+
+    # Obtener artista del álbum
+    album_artist_info = album_info.get('artist', {})
+    album_artist_name = album_artist_info.get('name', '') if isinstance(album_artist_info, dict) else ''
+
+    # Obtener género
+    genre_info = album_info.get('genre', {})
+    genre_name = genre_info.get('name', '') if isinstance(genre_info, dict) else ''
+
+    # Obtener año
+    released_at = album_info.get('released_at', '')
+    year = ''
+    if isinstance(released_at, int):
+        try:
+            year = str(datetime.fromtimestamp(released_at).year)
+        except Exception:
+            pass
+    elif isinstance(released_at, str) and len(released_at) >= 4:
+        year = released_at[:4]
+
+    return {
+        'title': t_info.get('title', ''),
+        'artist': artist_name,
+        'album': album_info.get('title', ''),
+        'album_artist': album_artist_name,
+        'year': year,
+        'track_number': str(t_info.get('track_number', '')) if t_info.get('track_number') else '',
+        'disc_number': str(t_info.get('media_number', '')) if t_info.get('media_number') else '',
+        'genre': genre_name
+    }
+
+
+def get_cover_url(album_info: Optional[Dict]) -> Optional[str]:
+    images = album_info.get('image', {}) if isinstance(album_info, dict) else {}
+    if not isinstance(images, dict):
+        return None
+    return images.get('large') or images.get('small')
+
+
+def add_metadata_to_file(file_path: str, track_info: Dict, cover_url: Optional[str] = None,
+                         cover_data: Optional[bytes] = None) -> bool:
     """Agregar metadatos básicos al archivo de audio si mutagen está disponible.
 
     track_info keys esperados: title, artist, album, album_artist, year, track_number, disc_number, genre
+    Si se pasa ``cover_data`` se usa directamente y no se descarga ``cover_url``.
     """
     if not MUTAGEN_AVAILABLE:
         return True
@@ -35,14 +102,8 @@ def add_metadata_to_file(file_path: str, track_info: Dict, cover_url: Optional[s
         disc_number = track_info.get('disc_number', '')
         genre = track_info.get('genre', '')
 
-        cover_data = None
-        if cover_url:
-            try:
-                resp = requests.get(cover_url, timeout=10)
-                if resp.status_code == 200:
-                    cover_data = resp.content
-            except Exception:
-                pass
+        if cover_data is None:
+            cover_data = fetch_cover(cover_url)
 
         if isinstance(audio_file, MP3):
             if audio_file.tags is None:
@@ -93,4 +154,4 @@ def add_metadata_to_file(file_path: str, track_info: Dict, cover_url: Optional[s
     except Exception:
         return False
 
-__all__ = ["add_metadata_to_file", "MUTAGEN_AVAILABLE"]
+__all__ = ["add_metadata_to_file", "build_track_metadata", "fetch_cover", "get_cover_url", "MUTAGEN_AVAILABLE"]
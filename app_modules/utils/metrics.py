@@ -0,0 +1,311 @@
+"""Registro de métricas en proceso con salida en formato de exposición de Prometheus.
+
+Contadores e histogramas con etiquetas fijas por métrica: cada combinación de valores
+se resuelve una vez (``labels``) y la observación es una búsqueda binaria y dos sumas
+bajo un cerrojo propio, de modo que el coste en el camino caliente es de unos pocos
+microsegundos. Los valores que ya viven en otros objetos (cachés, pools) no se copian:
+se leen al generar la salida mediante *collectors*.
+"""
+from __future__ import annotations
+import bisect
+import logging
+import math
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Segundos: de 5 ms a 30 s cubre tanto la API de Qobuz como descargas del CDN
+DEFAULT_BUCKETS: Tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# (nombre, tipo, ayuda, [(etiquetas, valor), ...]) tal como lo devuelve un collector
+Family = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _CounterChild:
+    __slots__ = ('_lock', 'value')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class _HistogramChild:
+    __slots__ = ('_lock', '_bounds', 'counts', 'sum', 'count')
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self._lock = threading.Lock()
+        self._bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        i = bisect.bisect_left(self._bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self) -> Tuple[List[int], float, int]:
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        """Serie para esos valores de etiqueta (se crea la primera vez)."""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} espera etiquetas {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _items(self) -> List[Tuple[Tuple[str, ...], Any]]:
+        with self._lock:
+            return sorted(self._children.items())
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def value(self, *values: str) -> float:
+        child = self._children.get(values)
+        return child.value if child else 0.0
+
+    def render(self) -> List[str]:
+        return [f'{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}'
+                for values, child in self._items()]
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(float(b) for b in buckets if b != math.inf))
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def counts(self) -> Dict[Tuple[str, ...], int]:
+        """Número de observaciones de cada serie (por valores de etiqueta)."""
+        return {values: child.snapshot()[2] for values, child in self._items()}
+
+    def render(self) -> List[str]:
+        lines: List[str] = []
+        for values, child in self._items():
+            counts, total, count = child.snapshot()
+            cumulative = 0
+            for bound, n in zip(self.buckets + (math.inf,), counts):
+                cumulative += n
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}')
+            labels = _format_labels(self.labelnames, values)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+
+class MetricsRegistry:
+    """Conjunto de métricas y *collectors* que se exponen juntos en ``/api/metrics``."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: Dict[str, Callable[[], Iterable[Family]]] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, documentation: str, labelnames: Sequence[str], **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"La métrica {name} ya existe con otro tipo o etiquetas")
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def register_collector(self, key: str, collector: Callable[[], Iterable[Family]]) -> None:
+        """Registra (o sustituye) una función que devuelve familias calculadas al vuelo."""
+        with self._lock:
+            self._collectors[key] = collector
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.render())
+        for collector in collectors:
+            try:
+                families = list(collector())
+            except Exception:
+                logger.exception("Error en un collector de métricas")
+                continue
+            for name, kind, documentation, samples in families:
+                lines.append(f'# HELP {name} {documentation}')
+                lines.append(f'# TYPE {name} {kind}')
+                for labels, value in samples:
+                    lines.append(f'{name}{_format_labels(list(labels), list(labels.values()))} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    'musichub_http_request_duration_seconds', 'Latencia de las peticiones HTTP por ruta',
+    ('method', 'route', 'status'))
+UPSTREAM_REQUEST_SECONDS = REGISTRY.histogram(
+    'musichub_upstream_request_duration_seconds', 'Latencia de las llamadas a servicios externos',
+    ('upstream', 'status'))
+PROXIED_BYTES = REGISTRY.counter(
+    'musichub_proxied_bytes_total', 'Bytes de audio servidos a los clientes a través del servidor',
+    ('kind',))
+
+
+class CountingExecutor:
+    """Envuelve un ejecutor y cuenta lo enviado, lo que espera hilo libre y lo que está en marcha.
+
+    Los ejecutores de ``concurrent.futures`` no exponen su ocupación; en lugar de leer sus
+    atributos internos se cuenta en cada ``submit`` (``submit_in_context`` lo usa igual).
+    """
+
+    def __init__(self, executor, max_workers: int) -> None:
+        self._executor = executor
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._submitted = self._queued = self._active = 0
+
+    def submit(self, fn: Callable, *args: Any, **kwargs: Any):
+        def run():
+            with self._lock:
+                self._queued -= 1
+                self._active += 1
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._active -= 1
+
+        with self._lock:
+            self._submitted += 1
+            self._queued += 1
+        try:
+            future = self._executor.submit(run)
+        except Exception:
+            with self._lock:
+                self._queued -= 1
+            raise
+        future.add_done_callback(self._on_done)
+        return future
+
+    def _on_done(self, future) -> None:
+        # Una tarea cancelada nunca llegó a ejecutarse: deja de contar como encolada
+        if future.cancelled():
+            with self._lock:
+                self._queued -= 1
+
+    def shutdown(self, wait: bool = True, **kwargs: Any) -> None:
+        self._executor.shutdown(wait=wait, **kwargs)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'submitted': self._submitted, 'queued': self._queued, 'active': self._active,
+                    'max_workers': self.max_workers}
+
+
+def executor_families(pools: Dict[str, Dict[str, int]]) -> List[Family]:
+    """Familias de ocupación a partir de los ``stats()`` de cada ``CountingExecutor``."""
+    def values(key: str) -> List[Tuple[Dict[str, str], float]]:
+        return [({'pool': name}, stats[key]) for name, stats in pools.items()]
+    return [
+        ('musichub_executor_submitted_total', 'counter', 'Tareas enviadas al pool de ejecución',
+         values('submitted')),
+        ('musichub_executor_active', 'gauge', 'Tareas ejecutándose en el pool', values('active')),
+        ('musichub_executor_queue_depth', 'gauge', 'Tareas esperando hilo libre', values('queued')),
+        ('musichub_executor_max_workers', 'gauge', 'Tamaño máximo del pool de ejecución',
+         values('max_workers')),
+    ]
+
+
+def cache_families(caches: Dict[str, Optional[Dict[str, Any]]]) -> List[Family]:
+    """Familias de aciertos/fallos/tamaño a partir de los ``stats()`` de cada caché."""
+    hits: List[Tuple[Dict[str, str], float]] = []
+    misses: List[Tuple[Dict[str, str], float]] = []
+    ratio: List[Tuple[Dict[str, str], float]] = []
+    size: List[Tuple[Dict[str, str], float]] = []
+    for name, stats in caches.items():
+        if not stats:
+            continue
+        labels = {'cache': name}
+        hits.append((labels, stats.get('hits', 0) + stats.get('stale_hits', 0)))
+        misses.append((labels, stats.get('misses', 0)))
+        ratio.append((labels, stats.get('hit_ratio', 0.0)))
+        if 'size' in stats:
+            size.append((labels, stats['size']))
+    return [
+        ('musichub_cache_hits_total', 'counter', 'Aciertos de caché', hits),
+        ('musichub_cache_misses_total', 'counter', 'Fallos de caché', misses),
+        ('musichub_cache_hit_ratio', 'gauge', 'Proporción de aciertos de caché', ratio),
+        ('musichub_cache_entries', 'gauge', 'Entradas guardadas en la caché', size),
+    ]
+
+
+__all__ = ["DEFAULT_BUCKETS", "Counter", "Histogram", "MetricsRegistry", "REGISTRY", "HTTP_REQUEST_SECONDS",
+           "UPSTREAM_REQUEST_SECONDS", "PROXIED_BYTES", "CountingExecutor", "cache_families", "executor_families"]
@@ -0,0 +1,176 @@
+"""Perfilado bajo demanda de peticiones reales con cProfile.
+
+Una petición se perfila si trae una cabecera ``X-Profile`` firmada (``<caduca>.<hmac>``,
+ver ``sign_profile_token``) o si le toca por muestreo (una de cada ``sample_every``).
+Solo hay un perfil activo a la vez: en Python 3.12+ cProfile es global al proceso y,
+además, así el coste queda acotado. cProfile mide el hilo de la petición; lo que se
+ejecuta en pools de hilos aparece como espera en ``Future.result``.
+
+Cada perfil se guarda en ``directory`` como ``<id>.prof`` (formato ``pstats``), con el
+id de la traza si la hay, y se conservan los ``keep`` más recientes.
+"""
+from __future__ import annotations
+import cProfile
+import hashlib
+import hmac
+import io
+import itertools
+import logging
+import os
+import pstats
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SORT_KEYS = ('cumulative', 'tottime', 'ncalls')
+
+
+def sign_profile_token(secret: str, ttl: float = 300.0, now: Optional[float] = None) -> str:
+    """Valor para ``X-Profile`` válido durante ``ttl`` segundos."""
+    expires = str(int((now if now is not None else time.time()) + ttl))
+    signature = hmac.new(secret.encode('utf-8'), expires.encode('ascii'), hashlib.sha256).hexdigest()
+    return f'{expires}.{signature}'
+
+
+def verify_profile_token(secret: str, token: Optional[str], now: Optional[float] = None) -> bool:
+    if not secret or not token or '.' not in token:
+        return False
+    expires, signature = token.split('.', 1)
+    if not expires.isdigit() or int(expires) < (now if now is not None else time.time()):
+        return False
+    expected = hmac.new(secret.encode('utf-8'), expires.encode('ascii'), hashlib.sha256).hexdigest()
+    return hmac.compare_digest(signature.encode('utf-8'), expected.encode('utf-8'))
+
+
+class ActiveProfile:
+    """Perfil en curso; ``id`` (aleatorio, generado en el servidor) es el nombre del archivo."""
+
+    __slots__ = ('id', 'profile', 'started', 'reason')
+
+    def __init__(self, reason: str):
+        self.id = os.urandom(8).hex()
+        self.profile = cProfile.Profile()
+        self.started = time.perf_counter()
+        self.reason = reason
+
+
+class RequestProfiler:
+    """Decide qué peticiones se perfilan, guarda los perfiles y resume sus funciones más caras."""
+
+    def __init__(self, directory: str, secret: str = '', sample_every: int = 0, keep: int = 50):
+        self.directory = directory
+        self.secret = secret
+        self.sample_every = max(0, int(sample_every))
+        self.keep = keep
+        self._turn = itertools.count(1)
+        self._busy = threading.Lock()
+        self._lock = threading.Lock()
+        self._index: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self.skipped_busy = 0
+
+    def _reason(self, header: Optional[str]) -> Optional[str]:
+        if header and verify_profile_token(self.secret, header):
+            return 'header'
+        if self.sample_every and next(self._turn) % self.sample_every == 0:
+            return 'sample'
+        return None
+
+    def start(self, header: Optional[str] = None) -> Optional[ActiveProfile]:
+        reason = self._reason(header)
+        if reason is None:
+            return None
+        if not self._busy.acquire(blocking=False):
+            self.skipped_busy += 1
+            return None
+        active = ActiveProfile(reason)
+        try:
+            active.profile.enable()
+        except ValueError:  # otro perfilador (p.ej. un depurador) ya está activo
+            self._busy.release()
+            return None
+        return active
+
+    def stop(self, active: Optional[ActiveProfile], **info: Any) -> Optional[Dict[str, Any]]:
+        """Detiene el perfil y lo guarda como ``<active.id>.prof``; devuelve su entrada del índice."""
+        if active is None:
+            return None
+        try:
+            active.profile.disable()
+        finally:
+            self._busy.release()
+        profile_id = active.id
+        entry = {
+            'id': profile_id,
+            'reason': active.reason,
+            'duration_ms': round((time.perf_counter() - active.started) * 1000, 3),
+            'created': time.time(),
+            **info,
+        }
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            active.profile.dump_stats(self._path(profile_id))
+        except OSError as e:
+            logger.warning("No se pudo guardar el perfil %s: %s", profile_id, e)
+            return None
+        with self._lock:
+            self._index[profile_id] = entry
+            while len(self._index) > self.keep:
+                old_id, _ = self._index.popitem(last=False)
+                try:
+                    os.remove(self._path(old_id))
+                except OSError:
+                    pass
+        return entry
+
+    def _path(self, profile_id: str) -> str:
+        return os.path.join(self.directory, f'{profile_id}.prof')
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(reversed(self._index.values()))
+
+    def top(self, profile_id: str, sort: str = 'tottime', limit: int = 30) -> Optional[List[Dict[str, Any]]]:
+        """Funciones más caras de un perfil guardado."""
+        with self._lock:
+            if profile_id not in self._index:
+                return None
+        return self._top([self._path(profile_id)], sort, limit)
+
+    def top_overall(self, sort: str = 'tottime', limit: int = 30) -> List[Dict[str, Any]]:
+        """Funciones más caras sumando todos los perfiles guardados (detecta regresiones)."""
+        with self._lock:
+            paths = [self._path(pid) for pid in self._index]
+        return self._top(paths, sort, limit) if paths else []
+
+    @staticmethod
+    def _top(paths: List[str], sort: str, limit: int) -> List[Dict[str, Any]]:
+        sort = sort if sort in SORT_KEYS else 'tottime'
+        existing = [p for p in paths if os.path.exists(p)]
+        if not existing:
+            return []
+        stats = pstats.Stats(*existing, stream=io.StringIO())
+        rows = []
+        for (filename, line, name), (cc, ncalls, tottime, cumtime, _) in stats.stats.items():
+            rows.append({
+                'function': f'{name} ({os.path.basename(filename)}:{line})' if line else name,
+                'file': filename,
+                'ncalls': ncalls,
+                'primitive_calls': cc,
+                'tottime_ms': round(tottime * 1000, 3),
+                'cumtime_ms': round(cumtime * 1000, 3),
+            })
+        key = {'tottime': 'tottime_ms', 'cumulative': 'cumtime_ms', 'ncalls': 'ncalls'}[sort]
+        rows.sort(key=lambda r: r[key], reverse=True)
+        return rows[:limit]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stored = len(self._index)
+        return {'sample_every': self.sample_every, 'signed_header': bool(self.secret), 'stored': stored,
+                'keep': self.keep, 'skipped_busy': self.skipped_busy}
+
+
+__all__ = ["RequestProfiler", "sign_profile_token", "verify_profile_token", "SORT_KEYS"]
@@ -0,0 +1,51 @@
+"""Limitador de tasa compartido entre hilos (token bucket)"""
+from __future__ import annotations
+import threading
+import time
+
+
+class TokenBucket:
+    """Presupuesto de peticiones por segundo compartido por varios workers.
+
+    ``rate`` fichas por segundo con ráfagas de hasta ``burst``. ``acquire`` bloquea
+    hasta que haya ficha disponible (o hasta ``timeout``) y devuelve si la obtuvo.
+    """
+
+    def __init__(self, rate: float, burst: int | None = None):
+        self.rate = max(float(rate), 0.001)
+        self.capacity = float(burst if burst is not None else max(1, int(rate)))
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens: float = 1.0, timeout: float | None = None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return True
+                wait = (tokens - self._tokens) / self.rate
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+
+__all__ = ["TokenBucket"]
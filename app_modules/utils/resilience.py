@@ -0,0 +1,311 @@
+"""Cortocircuitos y peticiones de cobertura (*hedging*) para los servicios externos.
+
+Cuando Qobuz o Genius se degradan, cada petición esperaba el timeout entero (10-15 s)
+en cada llamada y los hilos se iban quedando bloqueados. ``Resilience`` se intercala en
+``utils.http`` (``set_resilience``) y, por cada upstream (``qobuz.track/search``,
+``genius.api``...):
+
+- Un ``CircuitBreaker`` mira las últimas ``window`` llamadas. Cuenta como mala la que
+  falla (excepción o 5xx) y también la que tarda más de ``slow_call_seconds``. Si al
+  menos ``min_calls`` llamadas dan una proporción de malas >= ``failure_rate``, el
+  circuito se abre. Abierto, rechaza las llamadas al instante con ``CircuitOpen`` (un
+  ``requests.ConnectionError``) y así los servicios pasan a sus respaldos. Pasados
+  ``open_seconds`` deja pasar una sola llamada de prueba: si sale bien se cierra y si no
+  vuelve a abrirse.
+- En los GET idempotentes de ``hedge_upstreams`` la llamada sale en un hilo aparte. Si
+  no ha respondido cuando supera el p95 observado (una ventana deslizante de latencias),
+  se lanza un segundo intento y se usa la primera respuesta. La otra se cierra al llegar.
+  Con el pool ocupado, o sin muestras suficientes para el p95, no se hace cobertura.
+- Los timeouts se adaptan a cada upstream (``timeout_for``). La lectura es el p99 de sus
+  latencias recientes por ``timeout_multiplier``, acotada a ``[timeout_min, timeout_max]``;
+  la conexión es esa misma cifra con un tope de ``connect_timeout_max``. Así un endpoint
+  que responde en 200 ms falla en un segundo, no en diez. Sin muestras suficientes se
+  usa el timeout de la llamada. En respuestas con ``stream=True`` la lectura nunca baja
+  del timeout pedido: lo medido es la espera de las cabeceras, y un CDN lento pero sano
+  no debe cortarse a mitad de una descarga. Los timeouts también cuentan como muestra
+  (con lo que tardaron), así que un upstream que se vuelve lento amplía su timeout en
+  lugar de fallar siempre.
+
+Los 4xx no cuentan como fallo: son problemas de la petición o de la credencial, no de
+salud del servicio, y ya los gestiona el pool de credenciales.
+"""
+from __future__ import annotations
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional
+
+import requests
+
+from .logs import submit_in_context
+from .metrics import REGISTRY
+
+CIRCUIT_REJECTIONS = REGISTRY.counter(
+    'musichub_circuit_rejections_total', 'Llamadas rechazadas sin salir por tener el circuito abierto', ('upstream',))
+CIRCUIT_TRANSITIONS = REGISTRY.counter(
+    'musichub_circuit_transitions_total', 'Cambios de estado de los cortocircuitos', ('upstream', 'state'))
+HEDGED_REQUESTS = REGISTRY.counter(
+    'musichub_hedged_requests_total', 'Segundos intentos lanzados al superar el p95, por intento ganador',
+    ('upstream', 'winner'))
+
+
+class CircuitOpen(requests.ConnectionError):
+    """El circuito del upstream está abierto: la llamada no se hace."""
+
+
+class LatencyWindow:
+    """Últimas ``size`` latencias (segundos) de un upstream, con percentiles bajo demanda."""
+
+    def __init__(self, size: int = 200):
+        self._values: Deque[float] = deque(maxlen=size)
+        self._sorted: List[float] = []
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self._values.append(seconds)
+            self._dirty = True
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def quantile(self, q: float, min_samples: int = 1) -> Optional[float]:
+        """Percentil ``q`` (0-1) por rango más cercano; ``None`` con menos de ``min_samples``."""
+        with self._lock:
+            if len(self._values) < max(1, min_samples):
+                return None
+            if self._dirty:  # la cobertura y el timeout piden percentiles en cada llamada
+                self._sorted, self._dirty = sorted(self._values), False
+            ordered = self._sorted
+        return ordered[min(len(ordered) - 1, max(0, int(round(q * len(ordered) + 0.5)) - 1))]
+
+
+class CircuitBreaker:
+    """Estado ``closed`` -> ``open`` -> ``half_open`` -> ``closed`` de un upstream."""
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, name: str, failure_rate: float = 0.5, window: int = 20, min_calls: int = 10,
+                 slow_call_seconds: float = 5.0, open_seconds: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self._clock = clock
+        self._outcomes: Deque[bool] = deque(maxlen=window)  # True = llamada mala
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        self.rejected = 0
+        self.opened = 0
+
+    def _transition(self, state: str) -> None:
+        self.state = state
+        CIRCUIT_TRANSITIONS.labels(self.name, state).inc()
+        if state == self.OPEN:
+            self._opened_at = self._clock()
+            self.opened += 1
+        self._outcomes.clear()
+        self._probing = False
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.OPEN and self._clock() - self._opened_at >= self.open_seconds:
+                self._transition(self.HALF_OPEN)
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True  # una sola llamada de prueba a la vez
+                return True
+            self.rejected += 1
+        CIRCUIT_REJECTIONS.labels(self.name).inc()
+        return False
+
+    def record(self, ok: bool, elapsed: float) -> None:
+        bad = not ok or elapsed > self.slow_call_seconds
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._transition(self.OPEN if bad else self.CLOSED)
+            elif self.state == self.CLOSED:
+                self._outcomes.append(bad)
+                if len(self._outcomes) >= self.min_calls and \
+                        sum(self._outcomes) / len(self._outcomes) >= self.failure_rate:
+                    self._transition(self.OPEN)
+            # Abierto: resultados de llamadas que empezaron antes de abrirse; no cuentan
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            calls = len(self._outcomes)
+            return {'state': self.state, 'calls': calls,
+                    'bad_rate': round(sum(self._outcomes) / calls, 3) if calls else 0.0,
+                    'opened': self.opened, 'rejected': self.rejected}
+
+
+class Resilience:
+    """Cortocircuitos por upstream y cobertura de GETs idempotentes (ver el docstring del módulo)."""
+
+    def __init__(self, failure_rate: float = 0.5, window: int = 20, min_calls: int = 10,
+                 slow_call_seconds: float = 5.0, open_seconds: float = 30.0,
+                 hedge_upstreams: Iterable[str] = (), hedge_quantile: float = 0.95,
+                 hedge_min_delay: float = 0.05, hedge_min_samples: int = 20, hedge_workers: int = 16,
+                 adaptive_timeouts: bool = True, timeout_quantile: float = 0.99, timeout_multiplier: float = 3.0,
+                 timeout_min: float = 1.0, timeout_max: float = 30.0, connect_timeout_max: float = 3.05,
+                 timeout_min_samples: int = 20, clock: Callable[[], float] = time.monotonic):
+        self._breaker_args = dict(failure_rate=failure_rate, window=window, min_calls=min_calls,
+                                  slow_call_seconds=slow_call_seconds, open_seconds=open_seconds, clock=clock)
+        self.hedge_upstreams = frozenset(hedge_upstreams)
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_min_samples = hedge_min_samples
+        self.adaptive_timeouts = adaptive_timeouts
+        self.timeout_quantile = timeout_quantile
+        self.timeout_multiplier = timeout_multiplier
+        self.timeout_min = timeout_min
+        self.timeout_max = timeout_max
+        self.connect_timeout_max = connect_timeout_max
+        self.timeout_min_samples = timeout_min_samples
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._latencies: Dict[str, LatencyWindow] = {}
+        self._lock = threading.Lock()
+        self._workers = max(2, hedge_workers)
+        self._pool = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix='hedge') \
+            if self.hedge_upstreams else None
+        self._in_flight = 0
+
+    def breaker(self, upstream: str) -> CircuitBreaker:
+        breaker = self._breakers.get(upstream)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.setdefault(upstream, CircuitBreaker(upstream, **self._breaker_args))
+        return breaker
+
+    def latency(self, upstream: str) -> LatencyWindow:
+        window = self._latencies.get(upstream)
+        if window is None:
+            with self._lock:
+                window = self._latencies.setdefault(upstream, LatencyWindow())
+        return window
+
+    def hedge_delay(self, upstream: str) -> Optional[float]:
+        """Espera antes del segundo intento (``None`` = sin cobertura para este upstream)."""
+        if upstream not in self.hedge_upstreams:
+            return None
+        p = self.latency(upstream).quantile(self.hedge_quantile, self.hedge_min_samples)
+        return None if p is None else max(self.hedge_min_delay, p)
+
+    def timeout_for(self, upstream: str, timeout: Any, stream: bool = False) -> Any:
+        """Timeout ``(conexión, lectura)`` derivado de las latencias de ``upstream``.
+
+        Devuelve ``timeout`` tal cual si la adaptación está desactivada o aún no hay
+        ``timeout_min_samples`` muestras.
+        """
+        if not self.adaptive_timeouts:
+            return timeout
+        p = self.latency(upstream).quantile(self.timeout_quantile, self.timeout_min_samples)
+        if p is None:
+            return timeout
+        read = min(self.timeout_max, max(self.timeout_min, p * self.timeout_multiplier))
+        connect = min(read, self.connect_timeout_max)
+        requested = timeout[1] if isinstance(timeout, tuple) else timeout
+        if stream and requested is not None:
+            read = max(read, requested)
+        return connect, read
+
+    # --- Llamadas ---
+    def call(self, upstream: str, send: Callable[[], requests.Response], hedge: bool = True) -> requests.Response:
+        """``send()`` protegido por el circuito de ``upstream`` y, si procede, con cobertura."""
+        breaker = self.breaker(upstream)
+        if not breaker.allow():
+            raise CircuitOpen(f'Circuito abierto para {upstream}: llamada evitada')
+        started = time.perf_counter()
+        try:
+            delay = self.hedge_delay(upstream) if hedge else None
+            response = self._hedged(upstream, send, delay) if delay is not None else self._attempt(upstream, send)
+        except Exception:
+            breaker.record(False, time.perf_counter() - started)
+            raise
+        breaker.record(response.status_code < 500, time.perf_counter() - started)
+        return response
+
+    def _attempt(self, upstream: str, send: Callable[[], requests.Response]) -> requests.Response:
+        started = time.perf_counter()
+        try:
+            response = send()
+        except requests.Timeout:
+            # Muestra censurada: sin ella un upstream más lento que su timeout no lo ampliaría nunca
+            self.latency(upstream).observe(time.perf_counter() - started)
+            raise
+        if response.status_code < 500:
+            self.latency(upstream).observe(time.perf_counter() - started)
+        return response
+
+    def _reserve(self) -> bool:
+        with self._lock:
+            if self._in_flight >= self._workers:
+                return False
+            self._in_flight += 1
+            return True
+
+    def _release(self, _future=None) -> None:
+        with self._lock:
+            self._in_flight -= 1
+
+    def _submit(self, upstream: str, send: Callable[[], requests.Response]):
+        future = submit_in_context(self._pool, self._attempt, upstream, send)
+        future.add_done_callback(self._release)
+        return future
+
+    def _hedged(self, upstream: str, send: Callable[[], requests.Response], delay: float) -> requests.Response:
+        if not self._reserve():  # pool lleno: sin cobertura antes que hacer cola
+            return self._attempt(upstream, send)
+        first = self._submit(upstream, send)
+        try:
+            return first.result(timeout=delay)
+        except FutureTimeout:
+            pass
+        if not self._reserve():
+            return first.result()
+        second = self._submit(upstream, send)
+        pending = {first, second}
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = future.exception()
+                    continue
+                HEDGED_REQUESTS.labels(upstream, 'first' if future is first else 'hedge').inc()
+                for other in pending:
+                    other.add_done_callback(_close_response)
+                return future.result()
+        HEDGED_REQUESTS.labels(upstream, 'none').inc()
+        raise error
+
+    def stats(self) -> Dict[str, Any]:
+        hedge_delays = {}
+        for upstream in sorted(self.hedge_upstreams):
+            delay = self.hedge_delay(upstream)
+            hedge_delays[upstream] = round(delay * 1000, 1) if delay is not None else None
+        timeouts = {}
+        for upstream in sorted(self._latencies):
+            adapted = self.timeout_for(upstream, None)
+            if adapted is not None:
+                timeouts[upstream] = [round(t, 3) for t in adapted]
+        return {'breakers': {name: b.stats() for name, b in sorted(self._breakers.items())},
+                'hedge_delay_ms': hedge_delays, 'timeouts_s': timeouts}
+
+
+def _close_response(future) -> None:
+    """Cierra la respuesta del intento perdedor para devolver su conexión al pool."""
+    if future.exception() is None:
+        future.result().close()
+
+
+__all__ = ["CircuitBreaker", "CircuitOpen", "LatencyWindow", "Resilience", "CIRCUIT_REJECTIONS",
+           "CIRCUIT_TRANSITIONS", "HEDGED_REQUESTS"]
@@ -0,0 +1,634 @@
+"""Caché por niveles compartible entre instancias.
+
+En Vercel/Azure cada instancia arranca con la memoria vacía: lo cacheado en proceso se
+pierde en cada arranque en frío y no lo ven las demás instancias. ``TieredCache`` pone
+delante de la carga real varios niveles, del más rápido al más compartido:
+
+1. memoria (``TTLCache`` propia de cada caché, LRU con TTL, objetos sin serializar);
+2. disco local (``SQLiteBackend``): sobrevive a reinicios del proceso y lo comparten
+   los workers de la misma máquina;
+3. red (``RespBackend``): cualquier servidor que hable RESP (Redis, Valkey, Upstash,
+   Vercel KV...), compartido por todas las instancias.
+
+Los niveles 2 y 3 se configuran una vez por proceso (``set_cache_backends``) y guardan
+bytes: JSON con la hora de caducidad (comprimido con zlib si es grande), bajo claves
+``<prefijo>:<espacio>:v<versión>:<clave>``. Un acierto en un nivel inferior rellena los
+superiores con el TTL que le queda. Un nivel que falla cuenta como fallo de caché, nunca
+como error de la petición.
+
+``get_or_set`` evita la estampida al caducar una clave muy pedida: en el proceso una
+sola carga por clave (las demás esperan su resultado) y, entre instancias, un candado
+con TTL en el nivel más compartido; quien no lo consigue espera a que aparezca el valor
+y solo carga por su cuenta si no llega a tiempo. ``None`` no se guarda: los fallos de
+carga se reintentan en la siguiente petición.
+
+Solo para datos públicos (metadatos, búsquedas, letras): nada ligado a un token.
+"""
+from __future__ import annotations
+import hashlib
+import json
+import logging
+import os
+import socket
+import sqlite3
+import ssl
+import threading
+import time
+import zlib
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+from urllib.parse import unquote, urlsplit
+
+from .cache import TTLCache
+from .metrics import REGISTRY
+from .resilience import CircuitBreaker
+
+logger = logging.getLogger(__name__)
+
+# Claves más largas se guardan por su hash (las búsquedas pueden ser frases enteras)
+MAX_KEY_LENGTH = 120
+# A partir de este tamaño el valor serializado se comprime (nivel rápido)
+COMPRESS_MIN_BYTES = 1024
+_LOCK_POLL_SECONDS = 0.05
+# Borra el candado solo si sigue siendo el nuestro: si la carga tardó más que su TTL,
+# el candado pudo caducar y pasar a otra instancia
+COMPARE_AND_DELETE_SCRIPT = ("if redis.call('get', KEYS[1]) == ARGV[1] then "
+                             "return redis.call('del', KEYS[1]) end return 0")
+_MISSING = object()
+
+CACHE_REQUESTS = REGISTRY.counter(
+    'musichub_shared_cache_requests_total', 'Consultas a las cachés por nivel: memory, sqlite, resp o miss',
+    ('namespace', 'result'))
+CACHE_ERRORS = REGISTRY.counter(
+    'musichub_shared_cache_errors_total', 'Errores de un nivel de caché (se tratan como fallo de caché)',
+    ('backend', 'op'))
+
+
+class CacheError(Exception):
+    """Un nivel de caché no responde o responde algo inesperado."""
+
+
+class CacheBackend:
+    """Nivel compartido: guarda bytes con TTL bajo claves de texto.
+
+    ``add`` es un *set-if-absent* atómico y ``delete_if`` un borrado atómico condicionado
+    al valor (juntos forman el candado entre instancias); ``get_many`` puede devolver
+    solo las claves encontradas.
+    """
+
+    name = 'backend'
+
+    def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, bytes]:
+        found = {}
+        for key in keys:
+            value = self.get(key)
+            if value is not None:
+                found[key] = value
+        return found
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        raise NotImplementedError
+
+    def add(self, key: str, value: bytes, ttl: float) -> bool:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def delete_if(self, key: str, value: bytes) -> bool:
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        return {'backend': self.name}
+
+
+class SQLiteBackend(CacheBackend):
+    """Tabla SQLite en disco local; una conexión por hilo y modo WAL para lectores concurrentes.
+
+    La caducidad usa la hora de pared para que la compartan varios procesos. Cada
+    ``prune_every`` escrituras se borran las caducadas y, si hay más de ``max_entries``,
+    las que antes caducan.
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, path: str, max_entries: int = 100000, prune_every: int = 500):
+        self.path = path
+        self.max_entries = max_entries
+        self.prune_every = prune_every
+        self._local = threading.local()
+        self._writes = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connection() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB NOT NULL, '
+                         'expires_at REAL NOT NULL)')
+            conn.execute('CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires_at)')
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[bytes]:
+        row = self._connection().execute('SELECT value FROM cache WHERE key = ? AND expires_at > ?',
+                                         (key, time.time())).fetchone()
+        return bytes(row[0]) if row else None
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, bytes]:
+        if not keys:
+            return {}
+        marks = ','.join('?' * len(keys))
+        rows = self._connection().execute(f'SELECT key, value FROM cache WHERE key IN ({marks}) AND expires_at > ?',
+                                          (*keys, time.time())).fetchall()
+        return {key: bytes(value) for key, value in rows}
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        self._connection().execute('INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)',
+                                   (key, sqlite3.Binary(value), time.time() + ttl))
+        self._wrote()
+
+    def add(self, key: str, value: bytes, ttl: float) -> bool:
+        now = time.time()
+        conn = self._connection()
+        conn.execute('DELETE FROM cache WHERE key = ? AND expires_at <= ?', (key, now))
+        cursor = conn.execute('INSERT OR IGNORE INTO cache (key, value, expires_at) VALUES (?, ?, ?)',
+                              (key, sqlite3.Binary(value), now + ttl))
+        return cursor.rowcount == 1
+
+    def delete(self, key: str) -> None:
+        self._connection().execute('DELETE FROM cache WHERE key = ?', (key,))
+
+    def delete_if(self, key: str, value: bytes) -> bool:
+        cursor = self._connection().execute('DELETE FROM cache WHERE key = ? AND value = ?',
+                                            (key, sqlite3.Binary(value)))
+        return cursor.rowcount == 1
+
+    def _wrote(self) -> None:
+        with self._lock:
+            self._writes += 1
+            due = self._writes % self.prune_every == 0
+        if due:
+            self.prune()
+
+    def prune(self) -> int:
+        """Borra lo caducado y lo que sobre de ``max_entries``; devuelve cuántas filas quitó."""
+        conn = self._connection()
+        removed = conn.execute('DELETE FROM cache WHERE expires_at <= ?', (time.time(),)).rowcount
+        excess = conn.execute('SELECT COUNT(*) FROM cache').fetchone()[0] - self.max_entries
+        if excess > 0:
+            removed += conn.execute('DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY expires_at '
+                                    'LIMIT ?)', (excess,)).rowcount
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        entries = self._connection().execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        return {'backend': self.name, 'path': self.path, 'entries': entries, 'max_entries': self.max_entries}
+
+
+class RespError(CacheError):
+    """El servidor respondió con un error RESP (``-ERR ...``)."""
+
+
+class _RespConnection:
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self.reader = sock.makefile('rb')
+
+    def execute(self, args: Sequence[Any]) -> Any:
+        self.sock.sendall(encode_command(args))
+        return read_reply(self.reader)
+
+    def close(self) -> None:
+        try:
+            self.reader.close()
+            self.sock.close()
+        except OSError:
+            pass
+
+
+def encode_command(args: Sequence[Any]) -> bytes:
+    """Comando RESP: array de cadenas *bulk*."""
+    parts = [b'*%d\r\n' % len(args)]
+    for arg in args:
+        data = arg if isinstance(arg, bytes) else str(arg).encode('utf-8')
+        parts.append(b'$%d\r\n%s\r\n' % (len(data), data))
+    return b''.join(parts)
+
+
+def read_reply(reader) -> Any:
+    """Lee una respuesta RESP2 completa de ``reader`` (un fichero binario del socket)."""
+    line = reader.readline()
+    if not line.endswith(b'\r\n'):
+        raise ConnectionError('Conexión cerrada por el servidor de caché')
+    kind, rest = line[:1], line[1:-2]
+    if kind == b'+':
+        return rest.decode('utf-8')
+    if kind == b'-':
+        raise RespError(rest.decode('utf-8', 'replace'))
+    if kind == b':':
+        return int(rest)
+    if kind == b'$':
+        size = int(rest)
+        if size < 0:
+            return None
+        data = reader.read(size + 2)
+        if len(data) != size + 2:
+            raise ConnectionError('Respuesta RESP incompleta')
+        return data[:-2]
+    if kind == b'*':
+        size = int(rest)
+        return None if size < 0 else [read_reply(reader) for _ in range(size)]
+    raise CacheError(f'Respuesta RESP desconocida: {line[:20]!r}')
+
+
+class RespBackend(CacheBackend):
+    """Cliente RESP mínimo (``GET``/``MGET``/``SET PX [NX]``/``DEL``/``EVAL``) con pool de conexiones.
+
+    ``url`` es ``redis://[usuario:clave@]host:puerto/db`` o ``rediss://`` para TLS. Los
+    timeouts son cortos (una caché lenta es peor que ninguna) y un ``CircuitBreaker``
+    deja de intentarlo un rato cuando el servidor no responde.
+    """
+
+    name = 'resp'
+
+    def __init__(self, url: str, timeout: float = 0.25, pool_size: int = 8,
+                 breaker: Optional[CircuitBreaker] = None):
+        parts = urlsplit(url)
+        if parts.scheme not in ('redis', 'rediss'):
+            raise ValueError(f'URL de caché no soportada: {parts.scheme}://')
+        self.host = parts.hostname or 'localhost'
+        self.port = parts.port or 6379
+        self.username = unquote(parts.username) if parts.username else None
+        self.password = unquote(parts.password) if parts.password else None
+        self.db = int(parts.path.lstrip('/') or 0)
+        self.tls = parts.scheme == 'rediss'
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.breaker = breaker or CircuitBreaker('cache.resp', failure_rate=0.5, window=10, min_calls=3,
+                                                 slow_call_seconds=max(timeout, 0.05), open_seconds=10)
+        self._idle: List[_RespConnection] = []
+        self._lock = threading.Lock()
+
+    def _connect(self) -> _RespConnection:
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if self.tls:
+            sock = ssl.create_default_context().wrap_socket(sock, server_hostname=self.host)
+        conn = _RespConnection(sock)
+        try:
+            if self.password:
+                conn.execute(('AUTH', self.username, self.password) if self.username else ('AUTH', self.password))
+            if self.db:
+                conn.execute(('SELECT', self.db))
+        except Exception:
+            conn.close()
+            raise
+        return conn
+
+    def command(self, *args: Any) -> Any:
+        if not self.breaker.allow():
+            raise CacheError(f'Caché {self.host}:{self.port} no disponible (circuito abierto)')
+        started = time.perf_counter()
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+        try:
+            if conn is None:
+                conn = self._connect()
+            reply = conn.execute(args)
+        except RespError:
+            self._release(conn)
+            self.breaker.record(True, time.perf_counter() - started)
+            raise
+        except (OSError, ValueError, CacheError) as e:
+            if conn is not None:
+                conn.close()
+            self.breaker.record(False, time.perf_counter() - started)
+            raise CacheError(f'Caché {self.host}:{self.port}: {e}') from e
+        self._release(conn)
+        self.breaker.record(True, time.perf_counter() - started)
+        return reply
+
+    def _release(self, conn: _RespConnection) -> None:
+        with self._lock:
+            if len(self._idle) < self.pool_size:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.command('GET', key)
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, bytes]:
+        if not keys:
+            return {}
+        values = self.command('MGET', *keys)
+        return {key: value for key, value in zip(keys, values) if value is not None}
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        self.command('SET', key, value, 'PX', max(1, int(ttl * 1000)))
+
+    def add(self, key: str, value: bytes, ttl: float) -> bool:
+        return self.command('SET', key, value, 'PX', max(1, int(ttl * 1000)), 'NX') is not None
+
+    def delete(self, key: str) -> None:
+        self.command('DEL', key)
+
+    def delete_if(self, key: str, value: bytes) -> bool:
+        return self.command('EVAL', COMPARE_AND_DELETE_SCRIPT, 1, key, value) == 1
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {'backend': self.name, 'server': f'{self.host}:{self.port}', 'tls': self.tls,
+                'idle_connections': len(self._idle), 'circuit': self.breaker.stats()}
+
+
+_backends: List[CacheBackend] = []
+_prefix = 'musichub'
+
+
+def set_cache_backends(backends: Iterable[CacheBackend], prefix: str = 'musichub') -> None:
+    """Niveles compartidos (del más rápido al más compartido) de todas las ``TieredCache``."""
+    global _backends, _prefix
+    _backends, _prefix = list(backends), prefix
+
+
+def cache_backends() -> List[CacheBackend]:
+    return list(_backends)
+
+
+def build_backends(sqlite_path: str = '', url: str = '', timeout: float = 0.25) -> List[CacheBackend]:
+    """Niveles según la configuración; uno que no se puede abrir se omite con un aviso."""
+    backends: List[CacheBackend] = []
+    if sqlite_path:
+        try:
+            backends.append(SQLiteBackend(sqlite_path))
+        except (OSError, sqlite3.Error) as e:
+            logger.warning('Caché SQLite %s desactivada: %s', sqlite_path, e)
+    if url:
+        try:
+            backends.append(RespBackend(url, timeout=timeout))
+        except ValueError as e:
+            logger.warning('Caché en red desactivada: %s', e)
+    return backends
+
+
+def encode_value(value: Any, expires_at: float) -> bytes:
+    data = json.dumps({'e': round(expires_at, 3), 'v': value}, ensure_ascii=False,
+                      separators=(',', ':')).encode('utf-8')
+    if len(data) >= COMPRESS_MIN_BYTES:
+        return b'z' + zlib.compress(data, 1)
+    return b'j' + data
+
+
+def decode_value(blob: bytes) -> Tuple[Any, float]:
+    """``(valor, caducidad en hora de pared)``; lanza ``ValueError`` si no es un valor nuestro."""
+    kind, data = blob[:1], blob[1:]
+    if kind == b'z':
+        data = zlib.decompress(data)
+    elif kind != b'j':
+        raise ValueError(f'Formato de valor desconocido: {kind!r}')
+    envelope = json.loads(data)
+    return envelope['v'], float(envelope['e'])
+
+
+class TieredCache:
+    """Caché de un espacio de nombres: memoria propia + niveles compartidos del proceso.
+
+    Misma interfaz básica que ``TTLCache`` (``get``/``set``/``delete``/``stats``) más
+    ``get_many`` y ``get_or_set``. Con ``ttl <= 0`` la caché está desactivada y
+    ``get_or_set`` llama siempre a la carga. ``version`` forma parte de la clave:
+    subirla invalida lo guardado con un formato anterior.
+    """
+
+    def __init__(self, namespace: str, ttl: float, maxsize: int = 1024, version: int = 1,
+                 backends: Optional[Sequence[CacheBackend]] = None, lock_seconds: float = 5.0,
+                 lock_wait: float = 2.0):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.version = version
+        self.lock_seconds = lock_seconds
+        self.lock_wait = lock_wait
+        self.memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._backends = list(backends) if backends is not None else None
+        self._inflight: Dict[Hashable, threading.Event] = {}
+        self._lock = threading.Lock()
+        self._counters: Dict[str, int] = {'misses': 0, 'loads': 0, 'waits': 0, 'lock_timeouts': 0, 'errors': 0}
+        self._hits: Dict[str, int] = {'memory': 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def backends(self) -> List[CacheBackend]:
+        return list(self._backends) if self._backends is not None else cache_backends()
+
+    def full_key(self, key: Hashable) -> str:
+        raw = str(key)
+        if len(raw) > MAX_KEY_LENGTH:
+            raw = hashlib.sha1(raw.encode('utf-8')).hexdigest()
+        return f'{_prefix}:{self.namespace}:v{self.version}:{raw}'
+
+    def _count(self, result: str) -> None:
+        CACHE_REQUESTS.labels(self.namespace, result).inc()
+        with self._lock:
+            if result == 'miss':
+                self._counters['misses'] += 1
+            else:
+                self._hits[result] = self._hits.get(result, 0) + 1
+
+    def _call(self, backend: CacheBackend, op: str, *args: Any, default: Any = None) -> Any:
+        """``backend.op(*args)``; si el nivel falla se cuenta y se devuelve ``default``."""
+        try:
+            return getattr(backend, op)(*args)
+        except Exception as e:
+            CACHE_ERRORS.labels(backend.name, op).inc()
+            with self._lock:
+                self._counters['errors'] += 1
+            logger.debug('Caché %s: %s(%s) falló: %s', backend.name, op, self.namespace, e)
+            return default
+
+    def _decode(self, blob: bytes) -> Optional[Tuple[Any, float]]:
+        try:
+            value, expires_at = decode_value(blob)
+        except (ValueError, KeyError, TypeError, zlib.error) as e:
+            logger.debug('Valor ilegible en la caché %s: %s', self.namespace, e)
+            return None
+        remaining = expires_at - time.time()
+        return (value, remaining) if remaining > 0 else None
+
+    def _promote(self, key: Hashable, value: Any, remaining: float, blob: bytes,
+                 upper: Sequence[CacheBackend]) -> None:
+        """Rellena la memoria y los niveles por encima del que acertó con el TTL que queda."""
+        self.memory.set(key, value, ttl=min(self.ttl, remaining))
+        for backend in upper:
+            self._call(backend, 'set', self.full_key(key), blob, remaining)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        if not self.enabled:
+            return default
+        value = self.memory.get(key, _MISSING)
+        if value is not _MISSING:
+            self._count('memory')
+            return value
+        full = self.full_key(key)
+        backends = self.backends()
+        for i, backend in enumerate(backends):
+            blob = self._call(backend, 'get', full)
+            found = self._decode(blob) if blob is not None else None
+            if found is not None:
+                self._promote(key, found[0], found[1], blob, backends[:i])
+                self._count(backend.name)
+                return found[0]
+        self._count('miss')
+        return default
+
+    def get_many(self, keys: Iterable[Hashable]) -> Dict[Hashable, Any]:
+        """Los valores encontrados de ``keys``: una consulta por nivel, no una por clave."""
+        if not self.enabled:
+            return {}
+        found: Dict[Hashable, Any] = {}
+        pending: Dict[str, Hashable] = {}
+        for key in keys:
+            value = self.memory.get(key, _MISSING)
+            if value is not _MISSING:
+                found[key] = value
+                self._count('memory')
+            else:
+                pending[self.full_key(key)] = key
+        backends = self.backends()
+        for i, backend in enumerate(backends):
+            if not pending:
+                break
+            blobs = self._call(backend, 'get_many', list(pending)) or {}
+            for full, blob in blobs.items():
+                decoded = self._decode(blob)
+                if decoded is None or full not in pending:
+                    continue
+                key = pending.pop(full)
+                self._promote(key, decoded[0], decoded[1], blob, backends[:i])
+                found[key] = decoded[0]
+                self._count(backend.name)
+        for _ in pending:
+            self._count('miss')
+        return found
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0 or value is None:
+            return
+        self.memory.set(key, value, ttl=ttl)
+        backends = self.backends()
+        if not backends:
+            return
+        try:
+            blob = encode_value(value, time.time() + ttl)
+        except (TypeError, ValueError) as e:
+            logger.warning('Valor no serializable en la caché %s: %s', self.namespace, e)
+            return
+        full = self.full_key(key)
+        for backend in backends:
+            self._call(backend, 'set', full, blob, ttl)
+
+    def delete(self, key: Hashable) -> None:
+        self.memory.delete(key)
+        full = self.full_key(key)
+        for backend in self.backends():
+            self._call(backend, 'delete', full)
+
+    def _wait_shared(self, key: Hashable, backend: CacheBackend) -> Any:
+        """Espera a que otra instancia guarde ``key`` (hasta ``lock_wait`` segundos)."""
+        deadline = time.monotonic() + self.lock_wait
+        full = self.full_key(key)
+        while time.monotonic() < deadline:
+            time.sleep(_LOCK_POLL_SECONDS)
+            blob = self._call(backend, 'get', full)
+            found = self._decode(blob) if blob is not None else None
+            if found is not None:
+                self.memory.set(key, found[0], ttl=min(self.ttl, found[1]))
+                return found[0]
+        with self._lock:
+            self._counters['lock_timeouts'] += 1
+        return _MISSING
+
+    def get_or_set(self, key: Hashable, loader: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        """Valor de la caché o, si no está, el de ``loader()`` (guardado salvo que sea ``None``)."""
+        if not self.enabled:
+            return loader()
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        with self._lock:
+            event = self._inflight.get(key)
+            owner = event is None
+            if owner:
+                event = self._inflight[key] = threading.Event()
+            else:
+                self._counters['waits'] += 1
+        if not owner:
+            # Otra petición de este proceso ya la está cargando
+            if event.wait(timeout=self.lock_wait + self.lock_seconds):
+                value = self.memory.get(key, _MISSING)
+                if value is not _MISSING:
+                    return value
+            return loader()
+        backends = self.backends()
+        shared = backends[-1] if backends else None
+        lock_key = f'{self.full_key(key)}:lock'
+        lock_token = os.urandom(16).hex().encode()
+        locked = False
+        try:
+            if shared is not None:
+                acquired = self._call(shared, 'add', lock_key, lock_token, self.lock_seconds, default=_MISSING)
+                locked = acquired is True
+                if acquired is False:
+                    # Otra instancia la está cargando: mejor esperar su resultado
+                    value = self._wait_shared(key, shared)
+                    if value is not _MISSING:
+                        return value
+            with self._lock:
+                self._counters['loads'] += 1
+            value = loader()
+            self.set(key, value, ttl)
+            return value
+        finally:
+            if locked:
+                self._call(shared, 'delete_if', lock_key, lock_token)
+            with self._lock:
+                self._inflight.pop(key, None)
+            event.set()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._counters)
+            hits_by_tier = dict(self._hits)
+        hits = sum(hits_by_tier.values())
+        served = hits + stats['misses']
+        stats.update({
+            'namespace': self.namespace,
+            'ttl': self.ttl,
+            'tiers': ['memory'] + [b.name for b in self.backends()],
+            'size': len(self.memory),
+            'maxsize': self.memory.maxsize,
+            'hits': hits,
+            'hits_by_tier': hits_by_tier,
+            'hit_ratio': round(hits / served, 4) if served else 0.0,
+        })
+        return stats
+
+
+__all__ = ["CACHE_ERRORS", "CACHE_REQUESTS", "COMPARE_AND_DELETE_SCRIPT", "CacheBackend", "CacheError", "RespBackend", "RespError",
+           "SQLiteBackend", "TieredCache", "build_backends", "cache_backends", "decode_value", "encode_value",
+           "set_cache_backends"]
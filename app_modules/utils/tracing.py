@@ -0,0 +1,272 @@
+"""Trazas en proceso: spans por petición para ver en qué se va el tiempo.
+
+Cada petición Flask abre una traza (span raíz) y todo lo que ocurre dentro —métodos de
+``QobuzDownloader``/``SpotifyHandler`` y llamadas HTTP externas— cuelga de ella como
+span hijo. El span actual viaja en una ``ContextVar``, así que ``submit_in_context``
+lo lleva también a los hilos trabajadores. Fuera de una traza ``span`` no hace nada
+(una lectura de la ``ContextVar``), lo que permite instrumentar métodos que también se
+usan en segundo plano.
+
+Las trazas terminadas quedan en un búfer circular (``/api/debug/traces``) y, si se
+configura ``export_path``, se añaden a un archivo en formato OTLP/JSON (una línea por
+traza) desde un hilo aparte.
+"""
+from __future__ import annotations
+import contextvars
+import functools
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Un span atascado en un bucle no debe hacer crecer una traza sin límite
+MAX_SPANS_PER_TRACE = 2000
+
+SPAN_KIND_INTERNAL, SPAN_KIND_SERVER, SPAN_KIND_CLIENT = 1, 2, 3
+
+
+class Span:
+    __slots__ = ('trace', 'span_id', 'parent_id', 'name', 'kind', 'start_ns', 'end_ns', 'attributes', 'error')
+
+    def __init__(self, trace: 'Trace', name: str, parent_id: Optional[str], kind: int,
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.trace = trace
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start_ns = time.perf_counter_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes: Dict[str, Any] = attributes or {}
+        self.error: Optional[str] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def duration_ms(self) -> float:
+        end = self.end_ns if self.end_ns is not None else time.perf_counter_ns()
+        return (end - self.start_ns) / 1e6
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start_ms': round((self.start_ns - self.trace.root.start_ns) / 1e6, 3),
+            'duration_ms': round(self.duration_ms(), 3),
+            'attributes': self.attributes,
+            'error': self.error,
+        }
+
+
+class Trace:
+    """Spans de una petición; el raíz marca el reloj de referencia."""
+
+    __slots__ = ('trace_id', 'root', 'spans', 'wall_start_ns', 'dropped')
+
+    def __init__(self, name: str, attributes: Optional[Dict[str, Any]] = None):
+        self.trace_id = os.urandom(16).hex()
+        self.wall_start_ns = time.time_ns()
+        self.dropped = 0
+        self.root = Span(self, name, None, SPAN_KIND_SERVER, attributes)
+        self.spans: List[Span] = [self.root]
+
+    def add(self, span: Span) -> bool:
+        if len(self.spans) >= MAX_SPANS_PER_TRACE:
+            self.dropped += 1
+            return False
+        self.spans.append(span)
+        return True
+
+    def unix_ns(self, perf_ns: int) -> int:
+        return self.wall_start_ns + (perf_ns - self.root.start_ns)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'trace_id': self.trace_id,
+            'name': self.root.name,
+            'start': self.wall_start_ns / 1e9,
+            'duration_ms': round(self.root.duration_ms(), 3),
+            'spans': len(self.spans),
+            'dropped_spans': self.dropped,
+            'error': self.root.error,
+            'attributes': self.root.attributes,
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = self.summary()
+        data['spans'] = [s.to_dict() for s in sorted(self.spans, key=lambda s: s.start_ns)]
+        return data
+
+
+_current: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar('trace_span', default=None)
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+@contextmanager
+def span(name: str, kind: int = SPAN_KIND_INTERNAL, **attributes: Any) -> Iterator[Optional[Span]]:
+    """Span hijo del actual; sin traza activa no registra nada y devuelve ``None``."""
+    parent = _current.get()
+    if parent is None:
+        yield None
+        return
+    child = Span(parent.trace, name, parent.span_id, kind, attributes)
+    if not parent.trace.add(child):
+        yield None
+        return
+    token = _current.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        child.end_ns = time.perf_counter_ns()
+        _current.reset(token)
+
+
+def traced(name: str) -> Callable[[Callable], Callable]:
+    """Decorador: ejecuta la función dentro de un span ``name`` si hay traza activa."""
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _current.get() is None:
+                return fn(*args, **kwargs)
+            with span(name):
+                return fn(*args, **kwargs)
+        wrapper.__traced__ = True
+        return wrapper
+    return decorator
+
+
+def trace_methods(prefix: str, exclude: tuple = ()) -> Callable[[type], type]:
+    """Decorador de clase: un span ``<prefix>.<método>`` por cada método propio de la clase."""
+    def decorator(cls: type) -> type:
+        for attr, value in list(vars(cls).items()):
+            if attr.startswith('__') or attr in exclude:
+                continue
+            if isinstance(value, staticmethod):
+                setattr(cls, attr, staticmethod(traced(f'{prefix}.{attr}')(value.__func__)))
+            elif isinstance(value, classmethod):
+                setattr(cls, attr, classmethod(traced(f'{prefix}.{attr}')(value.__func__)))
+            elif callable(value) and not getattr(value, '__traced__', False):
+                setattr(cls, attr, traced(f'{prefix}.{attr}')(value))
+        return cls
+    return decorator
+
+
+class Tracer:
+    """Abre/cierra las trazas de petición, guarda las recientes y las exporta opcionalmente."""
+
+    def __init__(self, buffer_size: int = 100, sample_rate: float = 1.0, export_path: Optional[str] = None,
+                 service_name: str = 'musichub'):
+        self.sample_rate = sample_rate
+        self.service_name = service_name
+        self.export_path = export_path
+        self._recent: Deque[Trace] = deque(maxlen=buffer_size)
+        self._lock = threading.Lock()
+        self._export_queue: Optional['queue.Queue'] = None
+        if export_path:
+            self._export_queue = queue.Queue(maxsize=1000)
+            threading.Thread(target=self._export_loop, name='trace-export', daemon=True).start()
+
+    def start(self, name: str, **attributes: Any):
+        """Abre la traza de la petición; devuelve el *handle* para ``finish`` o ``None`` si no se muestrea."""
+        if self.sample_rate <= 0 or (self.sample_rate < 1 and random.random() >= self.sample_rate):
+            return None
+        root = Trace(name, attributes).root
+        return _current.set(root), root
+
+    def finish(self, handle, error: Optional[str] = None) -> Optional[Trace]:
+        if handle is None:
+            return None
+        token, root = handle
+        try:
+            _current.reset(token)
+        except ValueError:  # token creado en otro contexto
+            _current.set(None)
+        root.end_ns = time.perf_counter_ns()
+        root.error = root.error or error
+        with self._lock:
+            self._recent.append(root.trace)
+        if self._export_queue is not None:
+            try:
+                self._export_queue.put_nowait(root.trace)
+            except queue.Full:
+                logger.warning("Cola de exportación de trazas llena; se descarta %s", root.trace.trace_id)
+        return root.trace
+
+    def recent(self, limit: int = 20, min_ms: float = 0.0) -> List[Dict[str, Any]]:
+        with self._lock:
+            traces = list(self._recent)
+        selected = [t.summary() for t in reversed(traces) if t.root.duration_ms() >= min_ms]
+        return selected[:limit]
+
+    def get(self, trace_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            trace = next((t for t in self._recent if t.trace_id == trace_id), None)
+        return trace.to_dict() if trace else None
+
+    def get_otlp(self, trace_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            trace = next((t for t in self._recent if t.trace_id == trace_id), None)
+        return self.to_otlp(trace) if trace else None
+
+    # --- Exportación OTLP/JSON ---
+    def to_otlp(self, trace: Trace) -> Dict[str, Any]:
+        spans = []
+        for s in trace.spans:
+            item = {
+                'traceId': trace.trace_id,
+                'spanId': s.span_id,
+                'name': s.name,
+                'kind': s.kind,
+                'startTimeUnixNano': str(trace.unix_ns(s.start_ns)),
+                'endTimeUnixNano': str(trace.unix_ns(s.end_ns if s.end_ns is not None else s.start_ns)),
+                'attributes': [_otlp_attribute(k, v) for k, v in s.attributes.items()],
+                'status': {'code': 2, 'message': s.error} if s.error else {'code': 1},
+            }
+            if s.parent_id:
+                item['parentSpanId'] = s.parent_id
+            spans.append(item)
+        return {'resourceSpans': [{
+            'resource': {'attributes': [_otlp_attribute('service.name', self.service_name)]},
+            'scopeSpans': [{'scope': {'name': 'app_modules.utils.tracing'}, 'spans': spans}],
+        }]}
+
+    def _export_loop(self) -> None:
+        while True:
+            trace = self._export_queue.get()
+            try:
+                os.makedirs(os.path.dirname(self.export_path) or '.', exist_ok=True)
+                with open(self.export_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(self.to_otlp(trace), ensure_ascii=False, default=str) + '\n')
+            except OSError as e:
+                logger.warning("No se pudo exportar la traza %s: %s", trace.trace_id, e)
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        typed = {'boolValue': value}
+    elif isinstance(value, int):
+        typed = {'intValue': str(value)}
+    elif isinstance(value, float):
+        typed = {'doubleValue': value}
+    else:
+        typed = {'stringValue': str(value)}
+    return {'key': key, 'value': typed}
+
+
+__all__ = ["Span", "Trace", "Tracer", "span", "traced", "trace_methods", "current_span",
+           "SPAN_KIND_INTERNAL", "SPAN_KIND_SERVER", "SPAN_KIND_CLIENT", "MAX_SPANS_PER_TRACE"]
@@ -0,0 +1,72 @@
+"""Escritura de archivos ZIP en streaming (sin recompresión ni archivo temporal)"""
+from __future__ import annotations
+import io
+import os
+import time
+import zipfile
+from typing import Iterator
+
+
+class _ChunkSink(io.RawIOBase):
+    """Destino no "seekable" que acumula bytes hasta que se drenan.
+
+    ``zipfile`` detecta que no puede hacer seek y escribe descriptores de datos,
+    lo que permite emitir cada entrada sin conocer el archivo completo.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._buffer += data
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+
+class ZipStream:
+    """ZIP ``stored`` que se va entregando por trozos mientras se construye."""
+
+    def __init__(self, chunk_size: int = 64 * 1024):
+        self.chunk_size = chunk_size
+        self._sink = _ChunkSink()
+        self._zip = zipfile.ZipFile(self._sink, mode='w', compression=zipfile.ZIP_STORED, allowZip64=True)
+        self.bytes_written = 0
+
+    def _drain(self) -> Iterator[bytes]:
+        data = self._sink.drain()
+        if data:
+            self.bytes_written += len(data)
+            yield data
+
+    def add_file(self, path: str, arcname: str) -> Iterator[bytes]:
+        """Añade un archivo del disco emitiendo los bytes a medida que se leen."""
+        zinfo = zipfile.ZipInfo(arcname, date_time=time.localtime(os.path.getmtime(path))[:6])
+        zinfo.compress_type = zipfile.ZIP_STORED
+        zinfo.file_size = os.path.getsize(path)
+        with open(path, 'rb') as src, self._zip.open(zinfo, mode='w') as dest:
+            while True:
+                chunk = src.read(self.chunk_size)
+                if not chunk:
+                    break
+                dest.write(chunk)
+                yield from self._drain()
+        yield from self._drain()
+
+    def add_bytes(self, arcname: str, data: bytes) -> Iterator[bytes]:
+        self._zip.writestr(arcname, data, compress_type=zipfile.ZIP_STORED)
+        yield from self._drain()
+
+    def close(self) -> Iterator[bytes]:
+        """Escribe el directorio central y entrega los últimos bytes."""
+        self._zip.close()
+        yield from self._drain()
+
+
+__all__ = ["ZipStream"]
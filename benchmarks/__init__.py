@@ -0,0 +1 @@
+"""Benchmarks de extremo a extremo con Qobuz, Genius y Spotify simulados (``python -m benchmarks.run``)."""
@@ -0,0 +1,152 @@
+"""Servidor RESP local que sustituye a Redis/Valkey en tests y benchmarks.
+
+Implementa lo que usa ``RespBackend`` (``PING``, ``AUTH``, ``SELECT``, ``GET``, ``MGET``,
+``SET`` con ``EX``/``PX``/``NX``, ``DEL``, ``DBSIZE``, ``FLUSHDB`` y el ``EVAL`` de
+``COMPARE_AND_DELETE_SCRIPT``), guarda todo en
+memoria y cuenta los comandos recibidos. Se puede parar y volver a arrancar en el mismo
+puerto para simular una caída.
+
+Uso::
+
+    with FakeRespServer() as server:
+        set_cache_backends([RespBackend(server.url)])
+        ...
+        server.commands  # Counter({'GET': 3, 'SET': 1})
+"""
+from __future__ import annotations
+import socketserver
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from app_modules.utils.shared_cache import COMPARE_AND_DELETE_SCRIPT, read_reply
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        server: FakeRespServer = self.server.owner  # type: ignore[attr-defined]
+        while True:
+            try:
+                args = read_reply(self.rfile)
+            except (ConnectionError, OSError, ValueError):
+                return
+            if not isinstance(args, list) or not args:
+                return
+            if server.latency_ms:
+                time.sleep(server.latency_ms / 1000)
+            try:
+                self.wfile.write(server.execute([a if isinstance(a, bytes) else str(a).encode() for a in args]))
+            except OSError:
+                return
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    # Con la cola por defecto (5) las conexiones simultáneas de un pool se retrasan y
+    # agotan el timeout corto de ``RespBackend``
+    request_queue_size = 128
+
+
+def _bulk(value: Optional[bytes]) -> bytes:
+    return b'$-1\r\n' if value is None else b'$%d\r\n%s\r\n' % (len(value), value)
+
+
+class FakeRespServer:
+    """Almacén clave/valor con TTL que habla RESP2 en ``127.0.0.1``."""
+
+    def __init__(self, port: int = 0, password: Optional[str] = None, latency_ms: float = 0.0):
+        self.port = port
+        self.password = password
+        self.latency_ms = latency_ms
+        self.commands: Counter = Counter()
+        self._data: Dict[bytes, Tuple[bytes, Optional[float]]] = {}
+        self._lock = threading.Lock()
+        self._server: Optional[_Server] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        auth = f':{self.password}@' if self.password else ''
+        return f'redis://{auth}127.0.0.1:{self.port}/0'
+
+    def start(self) -> 'FakeRespServer':
+        self._server = _Server(('127.0.0.1', self.port), _Handler)
+        self._server.owner = self  # type: ignore[attr-defined]
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-resp', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> 'FakeRespServer':
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def keys(self) -> List[bytes]:
+        with self._lock:
+            return [k for k in list(self._data) if self._live(k) is not None]
+
+    def _live(self, key: bytes) -> Optional[bytes]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        return value
+
+    def execute(self, args: List[bytes]) -> bytes:
+        name = args[0].decode().upper()
+        self.commands[name] += 1
+        with self._lock:
+            if name == 'PING':
+                return b'+PONG\r\n'
+            if name == 'AUTH':
+                ok = self.password is None or args[-1].decode() == self.password
+                return b'+OK\r\n' if ok else b'-WRONGPASS invalid password\r\n'
+            if name in ('SELECT', 'FLUSHDB'):
+                if name == 'FLUSHDB':
+                    self._data.clear()
+                return b'+OK\r\n'
+            if name == 'GET':
+                return _bulk(self._live(args[1]))
+            if name == 'MGET':
+                return b'*%d\r\n' % (len(args) - 1) + b''.join(_bulk(self._live(k)) for k in args[1:])
+            if name == 'SET':
+                return self._set(args[1], args[2], [a.decode().upper() for a in args[3:]])
+            if name == 'DEL':
+                removed = sum(1 for k in args[1:] if self._live(k) is not None and self._data.pop(k, None))
+                return b':%d\r\n' % removed
+            if name == 'EVAL' and args[1].decode() == COMPARE_AND_DELETE_SCRIPT:
+                key, value = args[3], args[4]
+                if self._live(key) == value:
+                    del self._data[key]
+                    return b':1\r\n'
+                return b':0\r\n'
+            if name == 'DBSIZE':
+                return b':%d\r\n' % sum(1 for k in list(self._data) if self._live(k) is not None)
+        return b'-ERR unknown command\r\n'
+
+    def _set(self, key: bytes, value: bytes, options: List[str]) -> bytes:
+        expires_at = None
+        if 'PX' in options:
+            expires_at = time.monotonic() + int(options[options.index('PX') + 1]) / 1000
+        elif 'EX' in options:
+            expires_at = time.monotonic() + int(options[options.index('EX') + 1])
+        if 'NX' in options and self._live(key) is not None:
+            return b'$-1\r\n'
+        self._data[key] = (value, expires_at)
+        return b'+OK\r\n'
+
+
+__all__ = ["FakeRespServer"]
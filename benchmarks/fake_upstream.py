@@ -0,0 +1,280 @@
+"""Servidor local que sustituye a Qobuz, Genius y Spotify durante los benchmarks.
+
+Responde con las respuestas grabadas de ``fixtures/`` (``track/search``, ``track/get``,
+``getFileUrl``, API y páginas de Genius, embed de Spotify) y genera el audio y las
+portadas. Cada ruta tiene un nombre estable —el mismo *upstream* que usan las métricas
+(``qobuz.track/get``, ``genius.page``, ``qobuz.cdn``...)— con el que se configura su
+latencia y la inyección de errores y se cuentan las llamadas recibidas.
+
+Uso::
+
+    with FakeUpstream({'qobuz': RouteBehaviour(latency_ms=40)}) as upstream:
+        set_url_overrides(upstream.url_overrides())
+        ...
+        upstream.counts()  # {'qobuz.track/search': 12, ...}
+"""
+from __future__ import annotations
+import json
+import os
+import random
+import re
+import struct
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+_FORMAT_EXT = {'5': 'mp3', '6': 'flac', '7': 'flac', '27': 'flac'}
+_FORMAT_SPEC = {'5': (None, None, 'audio/mpeg'), '6': (16, 44.1, 'audio/flac'),
+                '7': (24, 96.0, 'audio/flac'), '27': (24, 192.0, 'audio/flac')}
+
+
+@dataclass
+class RouteBehaviour:
+    """Comportamiento de una ruta: latencia fija + aleatoria y fracción de errores."""
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0
+    error_status: int = 503
+
+
+def flac_bytes(size: int) -> bytes:
+    """Un FLAC mínimo válido para mutagen (``fLaC`` + STREAMINFO) relleno hasta ``size``."""
+    # 4096 muestras por bloque, 44.1 kHz, estéreo, 16 bits; el total de muestras da igual
+    info = struct.pack('>HH', 4096, 4096) + b'\x00' * 6
+    info += ((44100 << 44) | (1 << 41) | (15 << 36) | 44100 * 180).to_bytes(8, 'big')
+    info += b'\x00' * 16  # MD5 de la señal (desconocido)
+    header = b'fLaC' + bytes([0x80]) + len(info).to_bytes(3, 'big') + info
+    return header + _filler(max(0, size - len(header)))
+
+
+def mp3_bytes(size: int) -> bytes:
+    """Tramas MPEG-1 Layer III de 320 kbps (cabecera válida, contenido de relleno)."""
+    frame = b'\xff\xfb\xe0\x64' + b'\x00' * 1040
+    return (frame * (size // len(frame) + 1))[:size]
+
+
+def _filler(size: int) -> bytes:
+    block = bytes(range(256)) * 16
+    return (block * (size // len(block) + 1))[:size]
+
+
+# JPEG diminuto: la app solo lo incrusta como portada, nunca lo decodifica
+COVER_JPEG = bytes.fromhex(
+    'ffd8ffe000104a46494600010100000100010000ffdb004300080606070605080707070909080a0c140d0c0b0b0c1912130f141d1a1f1e1d1a1c'
+    '1c20242e2720222c231c1c2837292c30313434341f27393d38323c2e333432ffc0000b080001000101011100ffc4001f0000010501010101010100'
+    '000000000000000102030405060708090a0bffc400b5100002010303020403050504040000017d01020300041105122131410613516107227114'
+    '328191a1082342b1c11552d1f02433627282090a161718191a25262728292a3435363738393a434445464748494a535455565758595a63646566'
+    '6768696a737475767778797a838485868788898a92939495969798999aa2a3a4a5a6a7a8a9aab2b3b4b5b6b7b8b9bac2c3c4c5c6c7c8c9cad2d3'
+    'd4d5d6d7d8d9dae1e2e3e4e5e6e7e8e9eaf1f2f3f4f5f6f7f8f9faffda0008010100003f00fbd3ffd9')
+
+
+class FakeUpstream:
+    """Servidor HTTP en un hilo aparte; ``behaviours`` se indexa por ruta o por servicio."""
+
+    def __init__(self, behaviours: Optional[Dict[str, RouteBehaviour]] = None, fixtures_dir: str = FIXTURES_DIR,
+                 audio_bytes: int = 2 * 1024 ** 2, host: str = '127.0.0.1', port: int = 0, seed: int = 0):
+        self.behaviours = dict(behaviours or {})
+        self.fixtures_dir = fixtures_dir
+        self.audio_bytes = audio_bytes
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self._counts: Counter = Counter()
+        self._counts_lock = threading.Lock()
+        self._last_call = 0.0
+        self._server = ThreadingHTTPServer((host, port), _make_handler(self))
+        self._server.daemon_threads = True
+        self.base_url = f'http://{host}:{self._server.server_address[1]}'
+        self._fixtures = self._load_fixtures()
+        self._audio = {'flac': flac_bytes(audio_bytes), 'mp3': mp3_bytes(audio_bytes)}
+        self._thread: Optional[threading.Thread] = None
+
+    # --- Ciclo de vida ---
+    def start(self) -> 'FakeUpstream':
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-upstream', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> 'FakeUpstream':
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def url_overrides(self) -> Dict[str, str]:
+        """Prefijos reales -> este servidor, para ``app_modules.utils.http.set_url_overrides``."""
+        return {
+            'https://www.qobuz.com/api.json/0.2': f'{self.base_url}/qobuz',
+            'https://api.genius.com': f'{self.base_url}/genius-api',
+            'https://genius.com': f'{self.base_url}/genius',
+            'https://open.spotify.com': f'{self.base_url}/spotify',
+            'https://streaming-qobuz-std.akamaized.net/file': f'{self.base_url}/cdn',
+            'https://static.qobuz.com/images/covers': f'{self.base_url}/covers',
+        }
+
+    # --- Contadores ---
+    def counts(self) -> Dict[str, int]:
+        with self._counts_lock:
+            return dict(self._counts)
+
+    def reset_counts(self) -> None:
+        with self._counts_lock:
+            self._counts.clear()
+
+    def _count(self, route: str) -> None:
+        with self._counts_lock:
+            self._counts[route] += 1
+            self._last_call = time.perf_counter()
+
+    def settle(self, quiet: float = 0.1, timeout: float = 5.0) -> Dict[str, int]:
+        """Espera a que pasen ``quiet`` segundos sin llamadas y devuelve los contadores.
+
+        La app lanza algunas peticiones en segundo plano (p.ej. la variante de preview
+        que no llegó a usarse) que pueden llegar después de responder al cliente.
+        """
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            with self._counts_lock:
+                idle = time.perf_counter() - self._last_call
+            if idle >= quiet:
+                break
+            time.sleep(quiet - idle)
+        return self.counts()
+
+    # --- Respuestas ---
+    def _load_fixtures(self) -> Dict[str, str]:
+        fixtures = {}
+        for name in os.listdir(self.fixtures_dir):
+            with open(os.path.join(self.fixtures_dir, name), encoding='utf-8') as f:
+                fixtures[name] = f.read()
+        return fixtures
+
+    def behaviour(self, route: str) -> RouteBehaviour:
+        for key in (route, route.split('.', 1)[0], '*'):
+            if key in self.behaviours:
+                return self.behaviours[key]
+        return RouteBehaviour()
+
+    def _delay_and_fail(self, route: str) -> Optional[int]:
+        """Aplica la latencia configurada; devuelve el código de error si toca inyectarlo."""
+        behaviour = self.behaviour(route)
+        with self._random_lock:
+            jitter = self._random.uniform(0, behaviour.jitter_ms) if behaviour.jitter_ms else 0.0
+            fail = behaviour.error_rate > 0 and self._random.random() < behaviour.error_rate
+        if behaviour.latency_ms or jitter:
+            time.sleep((behaviour.latency_ms + jitter) / 1000)
+        return behaviour.error_status if fail else None
+
+    def route(self, path: str, query: Dict[str, str]) -> Tuple[str, int, str, bytes]:
+        """``(ruta, estado, content-type, cuerpo)`` para una petición GET."""
+        if path.startswith('/qobuz/'):
+            endpoint = path[len('/qobuz/'):]
+            return (f'qobuz.{endpoint}',) + self._qobuz(endpoint, query)
+        if path == '/genius-api/search':
+            return 'genius.api', 200, 'application/json', self._fixtures['genius_search.json'].encode('utf-8')
+        if path == '/genius/search':
+            return 'genius.search_page', 404, 'text/html', b''
+        if path.startswith('/genius/'):
+            return 'genius.page', 200, 'text/html; charset=utf-8', self._fixtures['genius_lyrics.html'].encode('utf-8')
+        if path.startswith('/spotify/embed/track/'):
+            html = self._fixtures['spotify_embed_track.html']
+            return 'spotify.embed', 200, 'text/html; charset=utf-8', html.encode('utf-8')
+        if path.startswith('/spotify/oembed'):
+            return 'spotify.oembed', 404, 'application/json', b'{}'
+        if path.startswith('/spotify/'):
+            return 'spotify.page', 404, 'text/html', b''
+        if path.startswith('/cdn/'):
+            ext = path.rsplit('.', 1)[-1]
+            return 'qobuz.cdn', 200, 'audio/mpeg' if ext == 'mp3' else 'audio/flac', self._audio.get(ext, self._audio['flac'])
+        if path.startswith('/covers/'):
+            return 'qobuz.cover', 200, 'image/jpeg', COVER_JPEG
+        return 'unknown', 404, 'text/plain', b'not found'
+
+    def _qobuz(self, endpoint: str, query: Dict[str, str]) -> Tuple[int, str, bytes]:
+        fixture = {
+            'app/config': 'qobuz_app_config.json',
+            'app/getSecret': 'qobuz_app_secret.json',
+            'user/login': 'qobuz_user_login.json',
+            'user/info': 'qobuz_user_login.json',
+            'catalog/search': 'qobuz_track_search.json',
+            'track/search': 'qobuz_track_search.json',
+        }.get(endpoint)
+        if fixture:
+            return 200, 'application/json', self._fixtures[fixture].encode('utf-8')
+        if endpoint == 'track/get':
+            data = json.loads(self._fixtures['qobuz_track_get.json'])
+            data['id'] = int(query['track_id']) if query.get('track_id', '').isdigit() else query.get('track_id')
+            return 200, 'application/json', json.dumps(data).encode('utf-8')
+        if endpoint == 'track/getFileUrl':
+            track_id = query.get('track_id', '0')
+            format_id = query.get('format_id', '6')
+            if query.get('sample') == 'true':
+                format_id = '5'
+            ext = _FORMAT_EXT.get(format_id, 'flac')
+            bit_depth, rate, mime = _FORMAT_SPEC.get(format_id, _FORMAT_SPEC['6'])
+            data = json.loads(self._fixtures['qobuz_file_url.json'].replace('@TRACK_ID@', track_id)
+                              .replace('@FORMAT_ID@', format_id).replace('@EXT@', ext))
+            data.update({'track_id': track_id, 'format_id': int(format_id), 'mime_type': mime,
+                         'bit_depth': bit_depth, 'sampling_rate': rate})
+            if query.get('sample') == 'true':
+                data['sample'] = True
+            return 200, 'application/json', json.dumps(data).encode('utf-8')
+        return 404, 'application/json', b'{"status":"error","code":404,"message":"No route"}'
+
+
+def _make_handler(upstream: FakeUpstream):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # Cabeceras y cuerpo van en escrituras separadas: con Nagle cada respuesta
+        # esperaría al ACK retardado del cliente (~40 ms) y el benchmark mediría eso
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            parts = urlsplit(self.path)
+            query = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+            route, status, content_type, body = upstream.route(parts.path, query)
+            upstream._count(route)
+            error = upstream._delay_and_fail(route)
+            if error is not None:
+                status, content_type, body = error, 'application/json', b'{"status":"error","message":"injected"}'
+            headers = {'Content-Type': content_type}
+            if status == 200 and route == 'qobuz.cdn':
+                status, body, headers = self._apply_range(body, headers)
+            self.send_response(status)
+            for key, value in headers.items():
+                self.send_header(key, value)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _apply_range(self, body: bytes, headers: Dict[str, str]):
+            headers['Accept-Ranges'] = 'bytes'
+            match = _RANGE.match(self.headers.get('Range', ''))
+            if not match or not (match.group(1) or match.group(2)):
+                return 200, body, headers
+            size = len(body)
+            if match.group(1):
+                start = int(match.group(1))
+                end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+            else:
+                start, end = max(0, size - int(match.group(2))), size - 1
+            headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+            return 206, body[start:end + 1], headers
+
+        def log_message(self, format, *args):  # sin ruido en la salida del benchmark
+            pass
+
+    return Handler
+
+
+__all__ = ["FakeUpstream", "RouteBehaviour", "FIXTURES_DIR", "flac_bytes", "mp3_bytes"]
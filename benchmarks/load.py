@@ -0,0 +1,367 @@
+"""Pruebas de carga: barrido de concurrencia con una mezcla de peticiones.
+
+Sirve la aplicación por HTTP real (servidor WSGI con hilos de werkzeug, como ``app.py``)
+en un proceso aparte, con Qobuz/Genius/Spotify sustituidos por ``FakeUpstream``, y la
+carga con N clientes concurrentes que encadenan peticiones sin pausa durante
+``--duration`` segundos por nivel. Cada cliente elige la siguiente petición de la mezcla
+(``--mix``, por pesos) entre los escenarios de ``benchmarks.run``: búsqueda de catálogo,
+de letras, enlace de Spotify, descarga, proxy-download y preview.
+
+    python -m benchmarks.load                                   # niveles 1,2,4,8,16,32
+    python -m benchmarks.load --levels 1,4,16,64 --duration 10 --latency '*'=50
+    python -m benchmarks.load --mix search=1 --mix proxy_download=1 --audio-kb 8192
+    python -m benchmarks.load --target http://127.0.0.1:5000   # una instancia ya en marcha
+    python -m benchmarks.load --save-baseline                   # reescribe benchmarks/load_baseline.json
+
+Por nivel informa de peticiones/s, p50/p95/p99, tasa de error y llamadas a upstream por
+petición, en total y por tipo de petición. La concurrencia sostenible es el mayor nivel
+(recorriendo de menor a mayor) con p95 <= ``--max-p95-ms`` y errores <=
+``--max-error-rate``.
+
+Sale con código 1 si la concurrencia sostenible baja de ``--min-sustained`` o si, frente
+a ``load_baseline.json``, en algún nivel común el p95 sube más de ``--tolerance`` (y de
+``--min-delta-ms``), las peticiones/s bajan más de ``--tolerance``, la tasa de error sube
+más de un punto o baja la concurrencia sostenible. Como en ``benchmarks.run``, la base
+depende de la máquina.
+
+Con ``--in-process`` la app corre en el mismo proceso que los clientes: arranca antes,
+pero ambos compiten por el GIL y los números salen peor.
+"""
+from __future__ import annotations
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+
+from .fake_upstream import FakeUpstream
+from .run import SCENARIOS, _parse_pairs, _prepare_environment, build_behaviours, percentile
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'load_baseline.json')
+
+DEFAULT_LEVELS = (1, 2, 4, 8, 16, 32)
+DEFAULT_MIX = {'search': 4, 'search_lyrics': 2, 'search_spotify': 2, 'download': 1, 'proxy_download': 1}
+DEFAULT_LATENCY = ['*=20']  # sin latencia de upstream la carga solo mediría CPU
+REQUEST_TIMEOUT = 30
+
+
+class _HttpClient:
+    """Cliente HTTP con la interfaz del cliente de pruebas de Flask que usan los escenarios."""
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url.rstrip('/')
+        self.session = requests.Session()
+
+    def post(self, path: str, json: Any = None) -> requests.Response:
+        return self.session.post(self.base_url + path, json=json, timeout=REQUEST_TIMEOUT)
+
+    def get(self, path: str, query_string: Optional[Dict[str, Any]] = None) -> requests.Response:
+        return self.session.get(self.base_url + path, params=query_string, timeout=REQUEST_TIMEOUT)
+
+
+def _succeeded(response: requests.Response) -> bool:
+    if response.status_code >= 400:
+        return False
+    if 'json' in response.headers.get('Content-Type', ''):
+        try:
+            return (response.json() or {}).get('success', True) is not False
+        except ValueError:
+            return False
+    return True
+
+
+# --- Servidor de la app ---
+def _make_server(host: str, overrides: Dict[str, str]):
+    from werkzeug.serving import WSGIRequestHandler, make_server
+    from app_modules.utils.http import set_url_overrides
+    set_url_overrides(overrides)
+    from app_modules.app_factory import create_app
+
+    class QuietHandler(WSGIRequestHandler):
+        disable_nagle_algorithm = True  # ver FakeUpstream: sin esto cada respuesta espera ~40 ms
+
+        def log_request(self, *args, **kwargs):
+            pass
+
+    return make_server(host, 0, create_app(), threaded=True, request_handler=QuietHandler)
+
+
+def _serve_app(env: Dict[str, str], overrides: Dict[str, str], host: str, ready) -> None:
+    """Proceso hijo: arranca la app y comunica el puerto."""
+    os.environ.update(env)
+    server = _make_server(host, overrides)
+    ready.put(server.server_port)
+    server.serve_forever()
+
+
+class AppServer:
+    """La app servida por HTTP en un proceso hijo (o en un hilo con ``in_process``)."""
+
+    def __init__(self, overrides: Dict[str, str], in_process: bool = False, host: str = '127.0.0.1'):
+        self.overrides = overrides
+        self.in_process = in_process
+        self.host = host
+        self.base_url = ''
+        self._server = None
+        self._process = None
+
+    def start(self, timeout: float = 60.0) -> 'AppServer':
+        if self.in_process:
+            self._server = _make_server(self.host, self.overrides)
+            threading.Thread(target=self._server.serve_forever, name='load-app', daemon=True).start()
+            port = self._server.server_port
+        else:
+            context = multiprocessing.get_context('spawn')
+            ready = context.Queue()
+            self._process = context.Process(target=_serve_app, args=(dict(os.environ), self.overrides, self.host, ready),
+                                            name='load-app', daemon=True)
+            self._process.start()
+            port = ready.get(timeout=timeout)
+        self.base_url = f'http://{self.host}:{port}'
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            from app_modules.utils.http import set_url_overrides
+            self._server.shutdown()
+            self._server.server_close()
+            set_url_overrides(None)
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join(5)
+
+    def __enter__(self) -> 'AppServer':
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+# --- Carga ---
+def _summary(samples: List[Tuple[str, float, bool]], wall: float) -> Dict[str, Any]:
+    latencies = sorted(elapsed for _, elapsed, _ in samples)
+    errors = sum(1 for _, _, ok in samples if not ok)
+    return {
+        'requests': len(samples),
+        'errors': errors,
+        'error_rate': round(errors / len(samples), 4) if samples else 0.0,
+        'throughput_rps': round(len(samples) / wall, 2) if wall else 0.0,
+        'latency_ms': {
+            'p50': round(percentile(latencies, 50), 3),
+            'p95': round(percentile(latencies, 95), 3),
+            'p99': round(percentile(latencies, 99), 3),
+            'max': round(latencies[-1], 3) if latencies else 0.0,
+        },
+    }
+
+
+def run_level(base_url: str, mix: Dict[str, float], concurrency: int, duration: float, warmup: float = 1.0,
+              seed: int = 0, upstream: Optional[FakeUpstream] = None) -> Dict[str, Any]:
+    """``concurrency`` clientes en bucle cerrado; solo cuentan las peticiones iniciadas tras ``warmup``."""
+    names = [name for name, weight in mix.items() if weight > 0]
+    weights = [mix[name] for name in names]
+    started = time.perf_counter()
+    measure_from = started + warmup
+    deadline = measure_from + duration
+    before = upstream.settle(quiet=0.05) if upstream is not None else {}
+
+    def worker(index: int) -> List[Tuple[str, float, bool]]:
+        client = _HttpClient(base_url)
+        chooser = random.Random(seed * 1000 + index)
+        samples = []
+        while True:
+            begin = time.perf_counter()
+            if begin >= deadline:
+                break
+            name = chooser.choices(names, weights)[0]
+            try:
+                response = SCENARIOS[name](client)
+                ok = _succeeded(response)
+            except requests.RequestException:
+                ok = False
+            if begin >= measure_from:
+                samples.append((name, (time.perf_counter() - begin) * 1000, ok))
+        client.session.close()
+        return samples
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        samples = [s for batch in pool.map(worker, range(concurrency)) for s in batch]
+    wall = max(time.perf_counter(), deadline) - measure_from
+
+    result = {'concurrency': concurrency, **_summary(samples, wall), 'by_type': {}}
+    for name in names:
+        result['by_type'][name] = _summary([s for s in samples if s[0] == name], wall)
+    if upstream is not None:
+        after = upstream.settle(quiet=0.05)
+        calls = sum(after.values()) - sum(before.values())
+        result['upstream_calls_per_request'] = round(calls / len(samples), 3) if samples else 0.0
+    return result
+
+
+def sustained_concurrency(levels: List[Dict[str, Any]], max_p95_ms: float, max_error_rate: float) -> int:
+    """Mayor nivel que cumple los umbrales sin que falle ninguno de los anteriores (0 si ninguno)."""
+    sustained = 0
+    for level in sorted(levels, key=lambda r: r['concurrency']):
+        if level['latency_ms']['p95'] > max_p95_ms or level['error_rate'] > max_error_rate:
+            break
+        sustained = level['concurrency']
+    return sustained
+
+
+def compare_load(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float,
+                 min_delta_ms: float = 10.0, error_margin: float = 0.01) -> List[str]:
+    """Regresiones de un barrido frente a la base, en los niveles que tienen ambos."""
+    regressions = []
+    previous_levels = {level['concurrency']: level for level in baseline.get('levels', [])}
+    for current in results['levels']:
+        previous = previous_levels.get(current['concurrency'])
+        if not previous:
+            continue
+        name = f"c={current['concurrency']}"
+        p95, base_p95 = current['latency_ms']['p95'], previous['latency_ms']['p95']
+        if base_p95 and p95 > base_p95 * (1 + tolerance) and p95 - base_p95 > min_delta_ms:
+            regressions.append(f'{name}: p95 {p95:.1f} ms > {base_p95:.1f} ms (+{(p95 / base_p95 - 1) * 100:.0f}%)')
+        rps, base_rps = current['throughput_rps'], previous['throughput_rps']
+        if rps < base_rps * (1 - tolerance):
+            regressions.append(f'{name}: {rps:.1f} req/s < {base_rps:.1f} req/s ({(rps / base_rps - 1) * 100:.0f}%)')
+        if current['error_rate'] > previous['error_rate'] + error_margin:
+            regressions.append(f"{name}: errores {current['error_rate']:.1%} > {previous['error_rate']:.1%}")
+    # Solo si el barrido llega al nivel sostenible de la base (``--levels`` puede ser un subconjunto)
+    sustained, base_sustained = results.get('sustained_concurrency'), baseline.get('sustained_concurrency')
+    highest = max((level['concurrency'] for level in results['levels']), default=0)
+    if sustained is not None and base_sustained and highest >= base_sustained and sustained < base_sustained:
+        regressions.append(f'concurrencia sostenible {sustained} < {base_sustained}')
+    return regressions
+
+
+def _print_table(results: Dict[str, Any]) -> None:
+    header = f"{'clientes':>8}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'errores':>9}{'upstream':>10}"
+    print(header)
+    print('-' * len(header))
+    for r in results['levels']:
+        lat = r['latency_ms']
+        print(f"{r['concurrency']:>8}{r['throughput_rps']:>9.1f}{lat['p50']:>9.1f}{lat['p95']:>9.1f}"
+              f"{lat['p99']:>9.1f}{r['error_rate']:>9.1%}{r.get('upstream_calls_per_request', 0):>10.2f}")
+    print(f"Concurrencia sostenible: {results['sustained_concurrency']} "
+          f"(p95 <= {results['meta']['max_p95_ms']:.0f} ms, errores <= {results['meta']['max_error_rate']:.1%})")
+
+
+def _parse_levels(value: str) -> List[int]:
+    try:
+        levels = sorted({int(v) for v in value.split(',') if v.strip()})
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'Niveles no válidos: {value!r}')
+    if not levels or levels[0] < 1:
+        raise argparse.ArgumentTypeError('Los niveles de concurrencia deben ser >= 1')
+    return levels
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--levels', type=_parse_levels, default=list(DEFAULT_LEVELS),
+                        help='niveles de concurrencia separados por comas')
+    parser.add_argument('--duration', type=float, default=5.0, help='segundos medidos por nivel')
+    parser.add_argument('--warmup', type=float, default=1.0, help='segundos sin medir al empezar cada nivel')
+    parser.add_argument('--mix', action='append', metavar='ESCENARIO=PESO',
+                        help=f"peso de un tipo de petición (repetible; por defecto "
+                             f"{', '.join(f'{k}={v}' for k, v in DEFAULT_MIX.items())})")
+    parser.add_argument('--latency', action='append', metavar='RUTA=MS',
+                        help=f"latencia de una ruta o servicio simulado (por defecto {DEFAULT_LATENCY[0]})")
+    parser.add_argument('--jitter', action='append', metavar='RUTA=MS', help='latencia aleatoria adicional (0..MS)')
+    parser.add_argument('--error-rate', action='append', metavar='RUTA=FRACCIÓN', help='fracción de respuestas 503')
+    parser.add_argument('--audio-kb', type=int, default=2048, help='tamaño de los archivos de audio simulados')
+    parser.add_argument('--target', metavar='URL', help='carga una instancia ya en marcha en lugar de arrancar una')
+    parser.add_argument('--in-process', action='store_true', help='sirve la app en este mismo proceso')
+    parser.add_argument('--max-p95-ms', type=float, default=1000.0, help='p95 máximo de un nivel sostenible')
+    parser.add_argument('--max-error-rate', type=float, default=0.01, help='tasa de error máxima de un nivel sostenible')
+    parser.add_argument('--min-sustained', type=int, default=0, help='falla si la concurrencia sostenible es menor')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true', help='guarda los resultados como nueva base')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='margen relativo sobre p95 y req/s')
+    parser.add_argument('--min-delta-ms', type=float, default=10.0, help='margen absoluto sobre p95 (ms)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', metavar='ARCHIVO', help='escribe también los resultados completos en JSON')
+    args = parser.parse_args(argv)
+
+    mix = _parse_pairs(args.mix, float) if args.mix else dict(DEFAULT_MIX)
+    unknown = sorted(set(mix) - set(SCENARIOS))
+    if unknown:
+        parser.error(f"escenarios desconocidos en --mix: {', '.join(unknown)} (disponibles: {', '.join(SCENARIOS)})")
+    behaviours = build_behaviours(_parse_pairs(args.latency or DEFAULT_LATENCY, float),
+                                  _parse_pairs(args.jitter, float), _parse_pairs(args.error_rate, float))
+
+    upstream = server = None
+    if args.target:
+        base_url = args.target
+    else:
+        upstream = FakeUpstream(behaviours, audio_bytes=args.audio_kb * 1024).start()
+        _prepare_environment(tempfile.mkdtemp(prefix='musichub-load-'))
+        server = AppServer(upstream.url_overrides(), in_process=args.in_process).start()
+        base_url = server.base_url
+
+    results: Dict[str, Any] = {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'target': args.target,
+            'in_process': args.in_process,
+            'duration_s': args.duration,
+            'mix': mix,
+            'audio_kb': args.audio_kb,
+            'behaviours': {k: vars(v) for k, v in sorted(behaviours.items())} if not args.target else None,
+            'max_p95_ms': args.max_p95_ms,
+            'max_error_rate': args.max_error_rate,
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'levels': [],
+    }
+    try:
+        for concurrency in args.levels:
+            level = run_level(base_url, mix, concurrency, args.duration, args.warmup, args.seed, upstream)
+            results['levels'].append(level)
+            print(f"c={concurrency}: {level['throughput_rps']:.1f} req/s, p95 {level['latency_ms']['p95']:.1f} ms, "
+                  f"errores {level['error_rate']:.1%}", file=sys.stderr)
+    finally:
+        if server is not None:
+            server.stop()
+        if upstream is not None:
+            upstream.stop()
+    results['sustained_concurrency'] = sustained_concurrency(results['levels'], args.max_p95_ms, args.max_error_rate)
+
+    _print_table(results)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+    failures = []
+    if results['sustained_concurrency'] < args.min_sustained:
+        failures.append(f"concurrencia sostenible {results['sustained_concurrency']} < {args.min_sustained}")
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+            f.write('\n')
+        print(f'Base guardada en {args.baseline}')
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            failures += compare_load(results, json.load(f), args.tolerance, args.min_delta_ms)
+        if not failures:
+            print(f'Sin regresiones frente a {os.path.relpath(args.baseline)}')
+    else:
+        print('Sin base con la que comparar (usa --save-baseline)')
+    for line in failures:
+        print(f'REGRESIÓN {line}')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,321 @@
+"""Benchmarks de extremo a extremo contra servicios externos simulados.
+
+Arranca ``FakeUpstream``, redirige a él las URLs de Qobuz/Genius/Spotify con
+``set_url_overrides`` y lanza peticiones reales a la aplicación Flask (cliente WSGI en
+proceso, con todos los hooks de logging, métricas y trazas). Por escenario mide
+percentiles de latencia, rendimiento (peticiones/s) y llamadas a cada upstream por
+petición, y compara con ``baseline.json``.
+
+    python -m benchmarks.run                       # todos los escenarios, compara con la base
+    python -m benchmarks.run -s search -s preview -n 50 -c 8
+    python -m benchmarks.run --latency qobuz=40 --latency genius=120 --error-rate qobuz.track/getFileUrl=0.1
+    python -m benchmarks.run --save-baseline       # reescribe benchmarks/baseline.json
+    python -m benchmarks.run --record /tmp/bench.jsonl.gz
+    python -m benchmarks.run --replay /tmp/bench.jsonl.gz --time-scale 0
+
+Con ``--replay`` no se arranca el servidor simulado: las respuestas salen de una cassette
+(``app_modules.utils.cassette``) grabada con ``--record`` —contra el servidor simulado o
+en producción con ``HTTP_CASSETTE_MODE=record``— con sus tiempos originales escalados.
+Se puede reproducir cualquier subconjunto de los escenarios grabados con ``-n`` igual o
+menor que al grabar.
+Las llamadas a upstream se cuentan con la métrica de latencia por upstream de la app.
+
+Las latencias dependen de la máquina: p95 es regresión si supera la base en más de
+``--tolerance`` (25 %) y a la vez en más de ``--min-delta-ms`` (10 ms, evita falsos
+positivos en escenarios de pocos milisegundos). Las llamadas a upstream por petición no
+dependen de la máquina y cualquier aumento cuenta como regresión. Sale con código 1 si
+hay regresiones.
+"""
+from __future__ import annotations
+import argparse
+import itertools
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .fake_upstream import FakeUpstream, RouteBehaviour
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+LYRICS_QUERY = 'fold the night into paper lanterns'
+SPOTIFY_TRACK_URL = 'https://open.spotify.com/track/4bEnchMark0Fixture00001'
+CDN_URL = 'https://streaming-qobuz-std.akamaized.net/file'
+
+# Ids de pista distintos en cada petición: download/preview/proxy-download miden el
+# camino en frío (sin caché de track/get ni de URLs de preview). Un rango por escenario
+# para que una cassette grabada reproduzca cualquier subconjunto de escenarios
+_track_ids = {'download': itertools.count(200001), 'proxy_download': itertools.count(300001),
+              'preview': itertools.count(400001)}
+
+
+def _next_track_id(scenario: str) -> str:
+    return str(next(_track_ids[scenario]))
+
+
+def _search(payload: Dict[str, Any]) -> Callable:
+    return lambda client: client.post('/api/search', json=payload)
+
+
+def _download(client):
+    return client.post('/api/download', json={'track_id': _next_track_id('download'), 'quality': '6'})
+
+
+def _proxy_download(client):
+    track_id = _next_track_id('proxy_download')
+    query = {'url': f'{CDN_URL}/{track_id}-6.flac', 'filename': f'{track_id}.flac', 'track_id': track_id}
+    return client.get('/api/proxy-download', query_string=query)
+
+
+def _preview(client):
+    return client.post('/api/preview', json={'track_id': _next_track_id('preview')})
+
+
+SCENARIOS: Dict[str, Callable] = {
+    'search': _search({'query': 'paper lanterns', 'source': 'qobuz'}),
+    'search_lyrics': _search({'query': LYRICS_QUERY, 'source': 'qobuz', 'mode': 'lyrics'}),
+    'search_spotify': _search({'query': SPOTIFY_TRACK_URL, 'source': 'spotify'}),
+    'download': _download,
+    'proxy_download': _proxy_download,
+    'preview': _preview,
+}
+
+
+def _prepare_environment(data_dir: str) -> None:
+    """Variables mínimas para arrancar la app sin servicios reales ni hilos de fondo."""
+    defaults = {
+        'QOBUZ_TOKEN': 'bench-token', 'QOBUZ_USER_ID': '1', 'QOBUZ_APP_ID': '285473059',
+        'QOBUZ_APP_SECRET': 'abb21364945c0583309667d13ca3d93a', 'GENIUS_TOKEN': 'bench-genius-token',
+        'MUSICHUB_DATA_DIR': data_dir,
+        # Sin precarga ni renovación: sus llamadas de fondo ensuciarían los contadores
+        'PREFETCH_ENABLED': '0', 'RENEWAL_SCHEDULER_ENABLED': '0',
+        # Sin caché de búsquedas, letras ni Spotify: cada petición mide el camino completo
+        'SEARCH_CACHE_TTL': '0', 'LYRICS_CACHE_TTL': '0', 'SPOTIFY_CACHE_TTL': '0',
+        'LOG_LEVEL': 'WARNING', 'LOG_DEBUG_SAMPLE_RATE': '0',
+    }
+    for key, value in defaults.items():
+        os.environ.setdefault(key, value)
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Percentil por rango más cercano sobre una lista ya ordenada."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(q / 100 * len(sorted_values) + 0.5 - 1e-9)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def upstream_calls() -> Dict[str, int]:
+    """Llamadas a cada upstream hasta ahora, según la métrica de latencia de ``utils.http``."""
+    from app_modules.utils.metrics import UPSTREAM_REQUEST_SECONDS
+    totals: Counter = Counter()
+    for (upstream, _status), count in UPSTREAM_REQUEST_SECONDS.counts().items():
+        totals[upstream] += count
+    return dict(totals)
+
+
+def settle_upstream_calls(quiet: float = 0.1, timeout: float = 5.0) -> Dict[str, int]:
+    """Espera a que las llamadas en segundo plano (p.ej. la variante de preview descartada) terminen."""
+    deadline = time.perf_counter() + timeout
+    calls = upstream_calls()
+    while time.perf_counter() < deadline:
+        time.sleep(quiet)
+        current = upstream_calls()
+        if current == calls:
+            break
+        calls = current
+    return calls
+
+
+def run_scenario(name: str, client_factory: Callable, iterations: int, concurrency: int,
+                 warmup: int = 1) -> Dict[str, Any]:
+    request = SCENARIOS[name]
+    local = threading.local()
+
+    def one() -> Tuple[float, bool]:
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = client_factory()
+        started = time.perf_counter()
+        response = request(client)
+        response.get_data()  # consumir el cuerpo (streaming incluido)
+        elapsed = time.perf_counter() - started
+        ok = response.status_code < 400
+        if ok and response.is_json:
+            ok = (response.get_json(silent=True) or {}).get('success', True) is not False
+        response.close()
+        return elapsed, ok
+
+    for _ in range(warmup):
+        one()
+    before = settle_upstream_calls()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(lambda _: one(), range(iterations)))
+    wall = time.perf_counter() - started
+
+    latencies = sorted(elapsed * 1000 for elapsed, _ in outcomes)
+    after = settle_upstream_calls()
+    calls = {k: after[k] - before.get(k, 0) for k in after if after[k] > before.get(k, 0)}
+    return {
+        'requests': iterations,
+        'concurrency': concurrency,
+        'errors': sum(1 for _, ok in outcomes if not ok),
+        'latency_ms': {
+            'mean': round(sum(latencies) / len(latencies), 3),
+            'p50': round(percentile(latencies, 50), 3),
+            'p90': round(percentile(latencies, 90), 3),
+            'p95': round(percentile(latencies, 95), 3),
+            'p99': round(percentile(latencies, 99), 3),
+            'max': round(latencies[-1], 3),
+        },
+        'throughput_rps': round(iterations / wall, 2) if wall else 0.0,
+        'upstream_calls_per_request': round(sum(calls.values()) / iterations, 3),
+        'upstream_calls': dict(sorted(calls.items())),
+    }
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float,
+            min_delta_ms: float = 10.0) -> List[str]:
+    """Regresiones de ``results`` frente a ``baseline`` (lista vacía si no hay)."""
+    regressions = []
+    for name, current in results['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if not previous:
+            continue
+        p95, base_p95 = current['latency_ms']['p95'], previous['latency_ms']['p95']
+        if base_p95 and p95 > base_p95 * (1 + tolerance) and p95 - base_p95 > min_delta_ms:
+            regressions.append(f'{name}: p95 {p95:.1f} ms > {base_p95:.1f} ms (+{(p95 / base_p95 - 1) * 100:.0f}%)')
+        calls, base_calls = current['upstream_calls_per_request'], previous['upstream_calls_per_request']
+        if calls > base_calls + 1e-6:
+            regressions.append(f'{name}: {calls} llamadas a upstream por petición > {base_calls}')
+        if current['errors'] > previous['errors']:
+            regressions.append(f"{name}: {current['errors']} errores > {previous['errors']}")
+    return regressions
+
+
+def _parse_pairs(values: List[str], cast: Callable) -> Dict[str, Any]:
+    pairs = {}
+    for value in values or []:
+        key, sep, raw = value.partition('=')
+        if not sep:
+            raise argparse.ArgumentTypeError(f'Se esperaba RUTA=VALOR: {value!r}')
+        pairs[key] = cast(raw)
+    return pairs
+
+
+def build_behaviours(latency: Dict[str, float], jitter: Dict[str, float],
+                     error_rate: Dict[str, float]) -> Dict[str, RouteBehaviour]:
+    behaviours: Dict[str, RouteBehaviour] = {}
+    for key in set(latency) | set(jitter) | set(error_rate):
+        behaviours[key] = RouteBehaviour(latency_ms=latency.get(key, 0.0), jitter_ms=jitter.get(key, 0.0),
+                                         error_rate=error_rate.get(key, 0.0))
+    return behaviours
+
+
+def _print_table(results: Dict[str, Any]) -> None:
+    header = f"{'escenario':<16}{'p50':>9}{'p95':>9}{'p99':>9}{'req/s':>9}{'upstream':>10}{'errores':>9}"
+    print(header)
+    print('-' * len(header))
+    for name, r in results['scenarios'].items():
+        lat = r['latency_ms']
+        print(f"{name:<16}{lat['p50']:>9.1f}{lat['p95']:>9.1f}{lat['p99']:>9.1f}{r['throughput_rps']:>9.1f}"
+              f"{r['upstream_calls_per_request']:>10.2f}{r['errors']:>9}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('-s', '--scenario', action='append', choices=sorted(SCENARIOS),
+                        help='escenario a ejecutar (repetible; por defecto todos)')
+    parser.add_argument('-n', '--iterations', type=int, default=50)
+    parser.add_argument('-c', '--concurrency', type=int, default=4)
+    parser.add_argument('--latency', action='append', metavar='RUTA=MS',
+                        help="latencia de una ruta o servicio (p.ej. qobuz=40, genius.page=150, '*'=10)")
+    parser.add_argument('--jitter', action='append', metavar='RUTA=MS', help='latencia aleatoria adicional (0..MS)')
+    parser.add_argument('--error-rate', action='append', metavar='RUTA=FRACCIÓN', help='fracción de respuestas 503')
+    parser.add_argument('--audio-kb', type=int, default=2048, help='tamaño de los archivos de audio simulados')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true', help='guarda los resultados como nueva base')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='margen relativo sobre p95 antes de marcar regresión')
+    parser.add_argument('--min-delta-ms', type=float, default=10.0, help='margen absoluto sobre p95 (ms)')
+    parser.add_argument('--json', metavar='ARCHIVO', help='escribe también los resultados completos en JSON')
+    cassette = parser.add_mutually_exclusive_group()
+    cassette.add_argument('--record', metavar='CASSETTE', help='graba las llamadas a upstream en una cassette')
+    cassette.add_argument('--replay', metavar='CASSETTE', help='reproduce una cassette en lugar del servidor simulado')
+    parser.add_argument('--time-scale', type=float, default=1.0,
+                        help='con --replay, factor sobre los tiempos grabados (0 = sin espera)')
+    args = parser.parse_args(argv)
+
+    behaviours = build_behaviours(_parse_pairs(args.latency, float), _parse_pairs(args.jitter, float),
+                                  _parse_pairs(args.error_rate, float))
+    upstream = None if args.replay else FakeUpstream(behaviours, audio_bytes=args.audio_kb * 1024).start()
+    data_dir = tempfile.mkdtemp(prefix='musichub-bench-')
+    _prepare_environment(data_dir)
+    if args.record or args.replay:
+        os.environ.update({'HTTP_CASSETTE_MODE': 'record' if args.record else 'replay',
+                           'HTTP_CASSETTE_PATH': os.path.abspath(args.record or args.replay),
+                           'HTTP_CASSETTE_TIME_SCALE': str(args.time_scale)})
+
+    from app_modules.utils.http import set_url_overrides
+    if upstream is not None:
+        set_url_overrides(upstream.url_overrides())
+    from app_modules.app_factory import create_app, get_cassette  # la app ya apunta al servidor local
+    app = create_app()
+
+    scenarios = args.scenario or list(SCENARIOS)
+    results: Dict[str, Any] = {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'iterations': args.iterations,
+            'concurrency': args.concurrency,
+            'audio_kb': args.audio_kb,
+            'behaviours': {k: vars(v) for k, v in sorted(behaviours.items())},
+            'replay': {'cassette': args.replay, 'time_scale': args.time_scale} if args.replay else None,
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'scenarios': {},
+    }
+    try:
+        for name in scenarios:
+            results['scenarios'][name] = run_scenario(name, app.test_client, args.iterations, args.concurrency)
+    finally:
+        set_url_overrides(None)
+        if upstream is not None:
+            upstream.stop()
+        if get_cassette() is not None:
+            print(f"Cassette: {get_cassette().stats()}")
+            get_cassette().close()
+
+    _print_table(results)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+            f.write('\n')
+        print(f'Base guardada en {args.baseline}')
+        return 0
+    if not os.path.exists(args.baseline):
+        print('Sin base con la que comparar (usa --save-baseline)')
+        return 0
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance, args.min_delta_ms)
+    for line in regressions:
+        print(f'REGRESIÓN {line}')
+    if not regressions:
+        print(f'Sin regresiones frente a {os.path.relpath(args.baseline)}')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
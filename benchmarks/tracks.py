@@ -0,0 +1,185 @@
+"""Memoria y rendimiento de ``Track`` frente al JSON de Qobuz.
+
+Las pistas de ``fixtures/qobuz_track_search.json`` son mínimas; las respuestas reales
+traen además compositor, créditos, sello, derechos, fechas y ReplayGain. ``make_items``
+completa cada pista con esos campos (valores distintos por pista, como al decodificar
+JSON real) para medir lo que ocuparía una caché con miles de pistas:
+
+- memoria (``tracemalloc``) de ``n`` pistas como dicts decodificados frente a ``n``
+  ``Track`` construidos a partir de ellos (los dicts ya liberados) y frente a sus filas
+  (``as_row``), que es lo que guarda ``search_cache``;
+- pistas/s al extraer ``Track`` del JSON, al proyectar desde el JSON (lo que hace
+  ``/api/search``), al proyectar un ``Track`` ya guardado y con la proyección anterior
+  de ``/api/search`` (``legacy_result``, cadenas de ``.get()``).
+
+    python -m benchmarks.tracks                  # 1.000 y 10.000 pistas
+    python -m benchmarks.tracks -n 50000 --json
+    python -m benchmarks.tracks --max-ratio 0.3  # falla si Track ocupa más del 30 %
+
+Sale con código 1 si la proporción de memoria supera ``--max-ratio``.
+"""
+from __future__ import annotations
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+from app_modules.services.tracks import Track, track_result
+
+from .fake_upstream import FIXTURES_DIR
+
+DEFAULT_SIZES = (1000, 10000)
+
+
+def legacy_result(t: Dict[str, Any]) -> Dict[str, Any]:
+    """Proyección que repetía ``/api/search`` en cada rama antes de ``track_result``."""
+    album_info = t.get('album', {})
+    album_title = album_info.get('title', 'Unknown')
+    album_artist = album_info.get('artist', {}).get('name', '') if album_info.get('artist') else ''
+    if album_artist and album_artist != t.get('performer', {}).get('name', ''):
+        album_display = f"{album_title} - {album_artist}"
+    else:
+        album_display = album_title
+    return {
+        'id': t.get('id'),
+        'title': t.get('title'),
+        'artist': t.get('performer', {}).get('name', 'Unknown'),
+        'album': album_display,
+        'duration': t.get('duration', 0),
+        'cover': t.get('album', {}).get('image', {}).get('small', ''),
+        'source': 'qobuz'
+    }
+
+
+def _complete(base: Dict[str, Any], i: int) -> Dict[str, Any]:
+    """``base`` con los campos que añade la API real, distintos en cada pista."""
+    item = json.loads(json.dumps(base))
+    album = item['album']
+    item.update({
+        'id': 500000 + i, 'title': f"{base['title']} #{i}", 'version': 'Remastered' if i % 5 == 0 else None,
+        'copyright': f'(P) {2000 + i % 24} Bench Records {i}',
+        'composer': {'id': 70000 + i, 'name': f'Composer {i}'},
+        'performers': f"{base['performer']['name']}, MainArtist - Composer {i}, Composer, Lyricist - "
+                      f"Producer {i}, Producer - Engineer {i}, Mixer, MasteringEngineer",
+        'audio_info': {'replaygain_track_gain': -7.5 - i % 10 / 10, 'replaygain_track_peak': 0.98765},
+        'release_date_original': '2023-10-06', 'release_date_download': '2023-10-06',
+        'release_date_stream': '2023-10-06', 'purchasable_at': 1696550400, 'streamable_at': 1696550400,
+        'purchasable': True, 'previewable': True, 'sampleable': True, 'downloadable': True, 'displayable': True,
+        'article_ids': {'FLAC_HIRES_24_96': 9000000 + i, 'FLAC_LOSSLESS': 9100000 + i, 'MP3_320': 9200000 + i},
+    })
+    album.update({
+        'id': f'alb{i:07d}', 'qobuz_id': 800000 + i, 'title': f"{album['title']} {i // 12}",
+        'slug': f"night-rivers-{i // 12}", 'upc': f'{3700000000000 + i}',
+        'url': f'https://www.qobuz.com/album/night-rivers-{i // 12}/alb{i:07d}',
+        'label': {'id': 1000 + i % 50, 'name': f'Bench Records {i % 50}', 'slug': f'bench-records-{i % 50}',
+                  'albums_count': 1200, 'supplier_id': 5},
+        'tracks_count': 12, 'media_count': 1, 'duration': 2400, 'product_type': 'album',
+        'release_date_original': '2023-10-06', 'version': None, 'hires_streamable': True, 'parental_warning': False,
+    })
+    album['image'] = {size: f"https://static.qobuz.com/images/covers/alb{i:07d}_{px}.jpg"
+                      for size, px in (('small', 230), ('thumbnail', 50), ('large', 600), ('back', 600))}
+    return item
+
+
+def make_items(n: int) -> List[Dict[str, Any]]:
+    with open(os.path.join(FIXTURES_DIR, 'qobuz_track_search.json'), encoding='utf-8') as f:
+        bases = json.load(f)['tracks']['items']
+    return [_complete(bases[i % len(bases)], i) for i in range(n)]
+
+
+def measure_memory(n: int) -> Dict[str, Any]:
+    """Bytes vivos de ``n`` pistas decodificadas del JSON frente a ``n`` ``Track``."""
+    payload = json.dumps(make_items(n))
+    gc.collect()
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        raw = json.loads(payload)
+        raw_bytes = tracemalloc.get_traced_memory()[0] - base
+        del raw
+        gc.collect()
+        base = tracemalloc.get_traced_memory()[0]
+        tracks = [Track.from_qobuz(d) for d in json.loads(payload)]
+        gc.collect()
+        track_bytes = tracemalloc.get_traced_memory()[0] - base
+        count = len(tracks)
+        del tracks
+        gc.collect()
+        base = tracemalloc.get_traced_memory()[0]
+        rows = [Track.from_qobuz(d).as_row() for d in json.loads(payload)]
+        gc.collect()
+        row_bytes = tracemalloc.get_traced_memory()[0] - base
+    finally:
+        tracemalloc.stop()
+    assert count == len(rows) == n
+    return {
+        'tracks': n,
+        'raw_bytes': raw_bytes,
+        'model_bytes': track_bytes,
+        'raw_bytes_per_track': round(raw_bytes / n, 1),
+        'model_bytes_per_track': round(track_bytes / n, 1),
+        'row_bytes_per_track': round(row_bytes / n, 1),
+        'ratio': round(track_bytes / raw_bytes, 4) if raw_bytes else 0.0,
+    }
+
+
+def _rate(fn: Callable[[], Any], n: int, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return round(n / best, 1) if best else 0.0
+
+
+def measure_throughput(n: int, repeat: int = 3) -> Dict[str, float]:
+    """Pistas por segundo de cada paso (el mejor de ``repeat`` pasadas)."""
+    items = json.loads(json.dumps(make_items(n)))
+    tracks = [Track.from_qobuz(d) for d in items]
+    return {
+        'parse_per_s': _rate(lambda: [Track.from_qobuz(d) for d in items], n, repeat),
+        'project_json_per_s': _rate(lambda: [track_result(d) for d in items], n, repeat),
+        'project_model_per_s': _rate(lambda: [t.result() for t in tracks], n, repeat),
+        'legacy_project_per_s': _rate(lambda: [legacy_result(d) for d in items], n, repeat),
+    }
+
+
+def _print_table(results: List[Dict[str, Any]]) -> None:
+    print(f"{'pistas':>8} {'JSON B/pista':>13} {'Track B/pista':>14} {'fila B/pista':>13} {'ratio':>7} "
+          f"{'parse/s':>10} {'JSON->res/s':>12} {'Track->res/s':>13} {'anterior/s':>11}")
+    print('-' * 109)
+    for r in results:
+        m, t = r['memory'], r['throughput']
+        print(f"{m['tracks']:>8} {m['raw_bytes_per_track']:>13.0f} {m['model_bytes_per_track']:>14.0f} "
+              f"{m['row_bytes_per_track']:>13.0f} {m['ratio']:>7.3f} {t['parse_per_s']:>10.0f} {t['project_json_per_s']:>12.0f} "
+              f"{t['project_model_per_s']:>13.0f} {t['legacy_project_per_s']:>11.0f}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-n', '--tracks', type=int, action='append', help='Pistas por medición (repetible)')
+    parser.add_argument('--repeat', type=int, default=3, help='Pasadas de rendimiento (se toma la mejor)')
+    parser.add_argument('--max-ratio', type=float, default=None,
+                        help='Memoria máxima de Track frente al JSON (p.ej. 0.3)')
+    parser.add_argument('--json', action='store_true', help='Resultados en JSON')
+    args = parser.parse_args(argv)
+
+    results = [{'memory': measure_memory(n), 'throughput': measure_throughput(n, args.repeat)}
+               for n in (args.tracks or DEFAULT_SIZES)]
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        _print_table(results)
+    failed = [r['memory'] for r in results if args.max_ratio is not None and r['memory']['ratio'] > args.max_ratio]
+    for m in failed:
+        print(f"REGRESIÓN {m['tracks']} pistas: Track ocupa {m['ratio']:.1%} del JSON > {args.max_ratio:.1%}",
+              file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -2,6 +2,7 @@
 let currentTab = 'qobuz';
 let searchResults = [];
 let isSearching = false;
+let trackDetails = {};
 
 // Variables para preview
 let currentAudio = null;
@@ -191,6 +192,7 @@ async function performSearch() {
             searchResults = [...byLyrics, ...rest];
             console.log('Ordenados (lyrics primero):', searchResults.map(r => ({title: r.title, found_by_lyrics: r.found_by_lyrics, source: r.source})).slice(0, 3));
             displayResults(searchResults);
+            prefetchTrackDetails(searchResults);
         } else {
             showError(data.error || 'Error en la búsqueda');
         }
@@ -291,6 +293,25 @@ function displayResults(results) {
     }
 }
 
+// Precargar metadatos (calidad máxima, etc.) de toda la página en una sola petición
+async function prefetchTrackDetails(results) {
+    const ids = (results || []).filter(r => r.id && r.source !== 'genius').map(r => String(r.id));
+    if (ids.length === 0) return;
+    try {
+        const response = await fetch('/api/tracks/batch', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ track_ids: ids })
+        });
+        const data = await response.json();
+        if (data.success) {
+            (data.tracks || []).forEach(t => { trackDetails[String(t.id)] = t; });
+        }
+    } catch (error) {
+        console.warn('No se pudieron precargar los detalles de las pistas:', error);
+    }
+}
+
 // Función para cargar más resultados
 function loadMoreResults() {
     // Por ahora solo muestra un mensaje, se puede implementar paginación real
@@ -329,6 +350,10 @@ function openDownloadModal(resultIndex) {
     // Mostrar calidad seleccionada
     const selectedQuality = qualitySelect.options[qualitySelect.selectedIndex].text;
     downloadQuality.textContent = `Calidad: ${selectedQuality}`;
+    const details = trackDetails[String(result.id)];
+    if (details && details.maximum_bit_depth && details.maximum_sampling_rate) {
+        downloadQuality.textContent += ` (máx. disponible: ${details.maximum_bit_depth}-bit/${details.maximum_sampling_rate}kHz)`;
+    }
     
     // Configurar modal para descarga
     modal.dataset.resultIndex = resultIndex;
@@ -379,8 +404,11 @@ async function downloadSong(result) {
                 document.getElementById('progressFill').style.width = '60%';
             }
             
-            // Crear nombre de archivo
-            const ext = quality === '5' ? '.mp3' : '.flac';
+            // Crear nombre de archivo (el servidor indica el formato que se entrega realmente)
+            const ext = (data.format && data.format.ext) || (quality === '5' ? '.mp3' : '.flac');
+            if (data.format && data.format.format_id !== String(quality)) {
+                progressText.textContent = `Iniciando descarga (${data.quality})...`;
+            }
             const filename = `${result.artist} - ${result.title}${ext}`;
             
             // Crear enlace de descarga
@@ -646,8 +674,8 @@ async function togglePreview(resultIndex, trackId) {
         const data = await response.json();
         
         if (data.success && data.preview_url) {
-            // Crear y configurar audio
-            currentAudio = new Audio(data.preview_url);
+            // Crear y configurar audio (el proxy sirve el segmento cacheado en el servidor)
+            currentAudio = new Audio(data.stream_url || data.preview_url);
             currentPlayingIndex = resultIndex;
             
             // Configurar eventos del audio
@@ -977,6 +1005,31 @@ function updateAutoRenewalUI(status) {
     }
 }
 
+// La renovación se ejecuta en segundo plano: esperar a que termine la pasada programada
+function waitForRenewalResult(previousCheck, timeoutMs = 180000) {
+    const deadline = Date.now() + timeoutMs;
+    return new Promise((resolve, reject) => {
+        const poll = () => {
+            fetch('/api/auto-renewal/status')
+                .then(response => response.json())
+                .then(data => {
+                    const scheduler = data.scheduler || {};
+                    const finished = scheduler.last_check && scheduler.last_check !== previousCheck;
+                    if (finished && !scheduler.running && !scheduler.pending) {
+                        updateAutoRenewalUI(data);
+                        resolve(scheduler.last_result || {});
+                    } else if (Date.now() > deadline) {
+                        reject(new Error('La renovación sigue en curso'));
+                    } else {
+                        setTimeout(poll, 2000);
+                    }
+                })
+                .catch(reject);
+        };
+        setTimeout(poll, 1000);
+    });
+}
+
 function checkRenewal() {
     const checkBtn = document.getElementById('checkRenewalBtn');
     checkBtn.disabled = true;
@@ -984,6 +1037,7 @@ function checkRenewal() {
     
     fetch('/api/auto-renewal/check')
         .then(response => response.json())
+        .then(data => data.success ? waitForRenewalResult((data.scheduler || {}).last_check) : data)
         .then(data => {
             if (data.success) {
                 showNotification(data.message, 'success');
@@ -1015,6 +1069,7 @@ function forceRenewal() {
         method: 'POST'
     })
         .then(response => response.json())
+        .then(data => data.success ? waitForRenewalResult((data.scheduler || {}).last_check) : data)
         .then(data => {
             if (data.success) {
                 showNotification(data.message, 'success');
@@ -0,0 +1,61 @@
+import io
+import os
+import tempfile
+import zipfile
+
+from app_modules.services.album import AlbumDownloader, safe_filename
+from app_modules.utils.zipstream import ZipStream
+
+
+class _StubDownloader:
+    quality_map = {'6': {'name': 'FLAC 16-bit/44.1kHz', 'ext': '.flac'}}
+
+
+def _write_temp(data: bytes) -> str:
+    fd, path = tempfile.mkstemp()
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    return path
+
+
+def test_zipstream_produces_stored_archive():
+    """El ZIP emitido por trozos debe ser válido y sin compresión."""
+    path = _write_temp(b'a' * 200_000)
+    try:
+        stream = ZipStream(chunk_size=4096)
+        chunks = list(stream.add_file(path, 'uno.flac'))
+        chunks += list(stream.add_bytes('dos.txt', b'hola'))
+        chunks += list(stream.close())
+    finally:
+        os.remove(path)
+
+    assert len(chunks) > 2, "Se esperaba que el archivo se emitiera en varios trozos"
+    with zipfile.ZipFile(io.BytesIO(b''.join(chunks))) as zf:
+        assert zf.testzip() is None
+        assert [i.compress_type for i in zf.infolist()] == [zipfile.ZIP_STORED] * 2
+        assert zf.read('uno.flac') == b'a' * 200_000
+        assert zf.read('dos.txt') == b'hola'
+
+
+def test_album_zip_keeps_track_order_and_reports_failures():
+    """Las pistas salen en orden de álbum aunque terminen en otro orden; las fallidas van a ERRORES.txt."""
+    album = AlbumDownloader(_StubDownloader(), max_workers=2)
+    tracks = [{'id': i, 'title': f'T{i}', 'track_number': i, 'performer': {'name': 'A'}} for i in range(1, 6)]
+    prepared = {'album': {'title': 'X', 'media_count': 1}, 'tracks': tracks, 'urls': {}, 'cover_data': None, 'quality': '6'}
+
+    def fake_download(prep, track):
+        if track['id'] == 3:
+            raise ValueError('sin url')
+        return _write_temp(str(track['id']).encode())
+
+    album._download_track = fake_download
+    data = b''.join(album.iter_zip(prepared))
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        names = zf.namelist()
+        assert names == ['01. A - T1.flac', '02. A - T2.flac', '04. A - T4.flac', '05. A - T5.flac', 'ERRORES.txt']
+        assert b'T3' in zf.read('ERRORES.txt')
+
+
+def test_safe_filename_strips_invalid_chars():
+    assert safe_filename('AC/DC: Back?') == 'AC_DC_ Back_'
+    assert safe_filename('...') == 'track'
@@ -0,0 +1,75 @@
+import requests
+
+from app_modules.utils.http import set_url_overrides, upstream_get
+from benchmarks.fake_upstream import FakeUpstream, RouteBehaviour
+from benchmarks.load import AppServer, compare_load, run_level, sustained_concurrency
+from benchmarks.run import compare, percentile
+
+
+def test_overrides_send_calls_to_fake_upstream_and_count_them():
+    """Las URLs reales se redirigen al servidor local, que cuenta las llamadas por ruta."""
+    with FakeUpstream({'qobuz.track/getFileUrl': RouteBehaviour(error_rate=1.0)}, audio_bytes=4096) as upstream:
+        set_url_overrides(upstream.url_overrides())
+        try:
+            search = upstream_get('qobuz.track/search', 'https://www.qobuz.com/api.json/0.2/track/search',
+                                  params={'query': 'x'})
+            track = upstream_get('qobuz.track/get', 'https://www.qobuz.com/api.json/0.2/track/get',
+                                 params={'track_id': '42'})
+            failed = upstream_get('qobuz.track/getFileUrl', 'https://www.qobuz.com/api.json/0.2/track/getFileUrl')
+            page = upstream_get('genius.page', 'https://genius.com/Local-echo-paper-lanterns-lyrics')
+        finally:
+            set_url_overrides(None)
+        assert search.json()['tracks']['items'][0]['album']['image']['small'].startswith('https://static.qobuz.com/')
+        assert track.json()['id'] == 42
+        assert failed.status_code == 503
+        assert 'data-lyrics-container' in page.text
+        # El audio admite Range como el CDN real
+        audio = requests.get(f'{upstream.base_url}/cdn/42-6.flac', headers={'Range': 'bytes=0-3'})
+        assert audio.status_code == 206 and audio.content == b'fLaC'
+        assert upstream.settle(quiet=0.01) == {'qobuz.track/search': 1, 'qobuz.track/get': 1,
+                                               'qobuz.track/getFileUrl': 1, 'genius.page': 1, 'qobuz.cdn': 1}
+
+
+def test_compare_flags_slower_p95_and_extra_upstream_calls():
+    def result(p95, calls, errors=0):
+        return {'scenarios': {'search': {'latency_ms': {'p95': p95}, 'upstream_calls_per_request': calls,
+                                         'errors': errors}}}
+
+    baseline = result(100.0, 1.0)
+    assert compare(result(120.0, 1.0), baseline, tolerance=0.25) == []
+    # Por encima del margen relativo pero no del absoluto: ruido de escenarios rápidos
+    assert compare(result(5.0, 1.0), result(3.0, 1.0), tolerance=0.25) == []
+    regressions = compare(result(140.0, 2.0, errors=1), baseline, tolerance=0.25)
+    assert len(regressions) == 3
+    assert percentile([1.0, 2.0, 3.0, 4.0], 50) == 2.0 and percentile([1.0, 2.0, 3.0, 4.0], 99) == 4.0
+
+
+def test_load_sweep_serves_the_mix_over_http():
+    """Un barrido corto contra la app servida por HTTP con los upstream simulados."""
+    with FakeUpstream(audio_bytes=4096) as upstream, AppServer(upstream.url_overrides(), in_process=True) as app:
+        mix = {'search': 1, 'download': 1}
+        levels = [run_level(app.base_url, mix, concurrency, duration=0.3, warmup=0.05, upstream=upstream)
+                  for concurrency in (1, 2)]
+    for level in levels:
+        assert level['requests'] > 0 and level['errors'] == 0
+        assert set(level['by_type']) <= set(mix) and level['upstream_calls_per_request'] >= 1
+    assert sustained_concurrency(levels, max_p95_ms=60_000, max_error_rate=0.0) == 2
+
+
+def test_load_thresholds_and_regressions():
+    def level(concurrency, p95, rps, error_rate=0.0):
+        return {'concurrency': concurrency, 'latency_ms': {'p95': p95}, 'throughput_rps': rps,
+                'error_rate': error_rate}
+
+    baseline = {'levels': [level(1, 50.0, 20.0), level(8, 200.0, 80.0)], 'sustained_concurrency': 8}
+    # Un nivel lento corta la concurrencia sostenible aunque los siguientes cumplan
+    assert sustained_concurrency([level(1, 50.0, 20.0), level(4, 900.0, 5.0), level(8, 100.0, 80.0)],
+                                 max_p95_ms=500.0, max_error_rate=0.01) == 1
+    same = {'levels': [level(1, 55.0, 19.0), level(8, 210.0, 78.0), level(32, 5000.0, 90.0)],
+            'sustained_concurrency': 8}
+    assert compare_load(same, baseline, tolerance=0.25) == []
+    worse = {'levels': [level(1, 50.0, 12.0), level(8, 400.0, 80.0, error_rate=0.05)], 'sustained_concurrency': 4}
+    assert len(compare_load(worse, baseline, tolerance=0.25)) == 4
+    # Un barrido parcial que no llega al nivel sostenible de la base no lo compara
+    partial = {'levels': [level(1, 50.0, 20.0)], 'sustained_concurrency': 1}
+    assert compare_load(partial, baseline, tolerance=0.25) == []
@@ -0,0 +1,97 @@
+import gzip
+import json
+import time
+
+import pytest
+import requests
+
+from app_modules.services.auto_renewal import CredentialExtractor
+from app_modules.utils.cassette import Cassette, CassetteMiss
+from app_modules.utils.http import set_cassette, upstream_get
+
+TOKEN = 'Xk29fPq81LmZ0aB7cD4eF6gH8iJ0kL2mN4oP6qR8sT0uV2wX4yZ6aB8cD0eF2gH4iJ6kL8mN0oP2'
+PAGE = f'<html><body><code>app_id: 798273057\ntoken: {TOKEN}</code></body></html>'
+
+
+def _response(url, status=200, body=b'', content_type='application/json'):
+    response = requests.Response()
+    response.status_code = status
+    response.headers['Content-Type'] = content_type
+    response._content = body
+    response.url = url
+    return response
+
+
+class _Upstream:
+    """Sesión falsa con las respuestas que daría la red."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+
+    def get(self, url, params=None, **kwargs):
+        self.calls += 1
+        time.sleep(self.delay)
+        if 'user/login' in url:
+            body = {'user': {'id': 7, 'email': 'real.person@example.com'}, 'user_auth_token': TOKEN,
+                    'file': 'https://cdn.example/file/1.flac?etsp=1&hmac=9f8e7d6c5b4a'}
+            return _response(url, body=json.dumps(body).encode('utf-8'))
+        if 'rentry' in url:
+            return _response(url, body=PAGE.encode('utf-8'), content_type='text/html; charset=utf-8')
+        return _response(url, body=b'fLaC' + bytes(range(256)) * 4, content_type='audio/flac')
+
+
+@pytest.fixture(autouse=True)
+def _no_cassette():
+    yield
+    set_cassette(None)
+
+
+def test_recorded_calls_replay_without_network_and_without_secrets(tmp_path):
+    """Se graba con una cuenta y se reproduce con otra; los secretos no llegan al archivo."""
+    path = str(tmp_path / 'upstream.jsonl.gz')
+    network = _Upstream()
+    recorder = Cassette(path, mode='record')
+    set_cassette(recorder)
+    login = upstream_get('qobuz.user/login', 'https://www.qobuz.com/api.json/0.2/user/login', session=network,
+                         params={'user_auth_token': TOKEN, 'app_id': '1'})
+    assert login.json()['user_auth_token'] == TOKEN  # la app recibe la respuesta real
+    page = upstream_get('renewal.page', 'https://rentry.org/raw/abc', session=network)
+    cdn = upstream_get('qobuz.cdn', login.json()['file'], session=network, stream=True)
+    assert b''.join(cdn.iter_content(100)).startswith(b'fLaC')
+    recorder.close()
+
+    raw = gzip.open(path, 'rt', encoding='utf-8').read()
+    assert TOKEN not in raw and 'real.person' not in raw and '9f8e7d6c5b4a' not in raw
+
+    set_cassette(Cassette(path, mode='replay', time_scale=0))
+    network.calls = 0
+    replayed = upstream_get('qobuz.user/login', 'https://www.qobuz.com/api.json/0.2/user/login', session=network,
+                            params={'user_auth_token': 'otra-cuenta', 'app_id': '1'}).json()
+    assert replayed['user']['id'] == 7 and len(replayed['user_auth_token']) == len(TOKEN)
+    # La URL firmada seudonimizada de la respuesta casa con la descarga grabada
+    with upstream_get('qobuz.cdn', replayed['file'], session=network, stream=True) as audio:
+        assert b''.join(audio.iter_content(64)) == b'fLaC' + bytes(range(256)) * 4
+    # El scraper de renovación sigue encontrando un token con la misma forma
+    text = upstream_get('renewal.page', 'https://rentry.org/raw/abc', session=network).text
+    found = CredentialExtractor().extract(text)
+    assert found['app_id'] == '798273057' and len(found['token']) == len(TOKEN) and found['token'] != TOKEN
+    assert page.text == PAGE and network.calls == 0
+    with pytest.raises(requests.ConnectionError):
+        upstream_get('qobuz.track/get', 'https://www.qobuz.com/api.json/0.2/track/get', session=network)
+
+
+def test_replay_scales_recorded_timings(tmp_path):
+    path = str(tmp_path / 'timings.jsonl')
+    recorder = Cassette(path, mode='record')
+    set_cassette(recorder)
+    upstream_get('genius.api', 'https://api.genius.com/search?q=x', session=_Upstream(delay=0.05))
+    recorder.close()
+
+    for scale, low, high in ((1.0, 0.045, 1.0), (0.0, 0.0, 0.02)):
+        set_cassette(Cassette(path, mode='replay', time_scale=scale))
+        started = time.perf_counter()
+        upstream_get('genius.api', 'https://api.genius.com/search?q=x')
+        assert low <= time.perf_counter() - started < high
+    with pytest.raises(CassetteMiss):
+        upstream_get('genius.api', 'https://api.genius.com/search?q=y')
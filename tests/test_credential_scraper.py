@@ -0,0 +1,84 @@
+import time
+
+from app_modules.services import auto_renewal
+from app_modules.services.auto_renewal import ArlDeemixScraper
+
+TOKEN = 'A' * 20 + 'b9_-' * 10 + 'Zz' * 10
+OTHER_TOKEN = 'B' * 60
+
+
+def test_single_pass_extractor_finds_all_fields():
+    text = (f"app_id: 798273057\napp_secret: 0123456789abcdef0123456789abcdef\n"
+            f"Token ➠{TOKEN}\nUser ID ➠ 12345678\n")
+    assert ArlDeemixScraper().extract_credentials_from_text(text) == {
+        'app_id': '798273057', 'app_secret': '0123456789abcdef0123456789abcdef',
+        'token': TOKEN, 'user_id': '12345678',
+    }
+    # Secreto publicado justo detrás del app_id, sin etiqueta
+    found = ArlDeemixScraper().extract_credentials_from_text('798273057 / 0123456789abcdef0123456789abcdef')
+    assert found['app_secret'] == '0123456789abcdef0123456789abcdef'
+
+
+
+def test_labels_are_never_part_of_the_token():
+    """El patrón genérico no se traga la etiqueta ni impide ver la etiquetada."""
+    token = 'Qz' * 45
+    scraper = ArlDeemixScraper()
+    assert scraper.extract_credentials_from_text(f'user_auth_token={token}') == {'token': token}
+    assert scraper.extract_credentials_from_text(f'key={token}') == {'token': token}
+    assert scraper.extract_credentials_from_text(f'notas {token}== fin') == {'token': token + '=='}
+    assert scraper.extract_credentials_from_text(f'user_auth_token={token} user_id=1234567 key=value') == {
+        'token': token, 'user_id': '1234567'}
+
+def test_rentry_pages_fetched_in_parallel_and_first_valid_token_wins(monkeypatch):
+    """Las páginas se piden a la vez; un token inválido no impide encontrar el válido."""
+    pages = {
+        'https://www.arldeemix.com/2024/12/qobuzdownloaderx-arl-premium-nueva.html':
+            '<a href="https://rentry.org/one">1</a> <a href="https://rentry.org/two">2</a> rentry.org/three',
+        'https://rentry.org/raw/one': f'token: {OTHER_TOKEN}',
+        'https://rentry.org/raw/two': f'token: {TOKEN}',
+        'https://rentry.org/raw/three': f'token: {OTHER_TOKEN}',
+    }
+    scraper = ArlDeemixScraper()
+
+    def fake_fetch(url, timeout=10):
+        if 'raw' in url:
+            time.sleep(0.2)
+        return pages[url]
+
+    monkeypatch.setattr(scraper, 'fetch', fake_fetch)
+    validated = []
+
+    def validate(token):
+        validated.append(token)
+        return token == TOKEN
+
+    start = time.perf_counter()
+    credentials = scraper.extract_from_arldeemix(validate=validate)
+    assert credentials['token'] == TOKEN
+    assert time.perf_counter() - start < 0.5
+    assert validated.count(OTHER_TOKEN) <= 1
+
+
+def test_pages_are_revalidated_with_etag(monkeypatch):
+    class _Resp:
+        def __init__(self, status, text='', headers=None):
+            self.status_code, self.text, self.headers = status, text, headers or {}
+
+        def raise_for_status(self):
+            pass
+
+    sent = []
+
+    def fake_get(url, headers=None, timeout=None):
+        sent.append(headers)
+        if headers.get('If-None-Match') == '"v1"':
+            return _Resp(304)
+        return _Resp(200, 'cuerpo', {'ETag': '"v1"'})
+
+    monkeypatch.setattr(auto_renewal._session, 'get', fake_get)
+    auto_renewal._page_cache.clear()
+    scraper = ArlDeemixScraper()
+    assert scraper.fetch('https://rentry.org/raw/x') == 'cuerpo'
+    assert scraper.fetch('https://rentry.org/raw/x') == 'cuerpo'
+    assert 'If-None-Match' not in sent[0] and sent[1]['If-None-Match'] == '"v1"'
@@ -0,0 +1,115 @@
+from app_modules.services.credentials import Credential, CredentialPool
+from app_modules.services.qobuz import QobuzDownloader
+
+
+class _Resp:
+    def __init__(self, status, headers=None):
+        self.status_code = status
+        self.headers = headers or {}
+
+
+def _pool(cooldown=300):
+    return CredentialPool([Credential('a', 'tok-a', '1', 's'), Credential('b', 'tok-b', '1', 's')], cooldown=cooldown)
+
+
+def test_least_loaded_credential_is_chosen():
+    pool = _pool()
+    with pool.acquire() as first:
+        with pool.acquire() as second:
+            assert {first.name, second.name} == {'a', 'b'}
+    # Sin carga en vuelo se alterna por turno
+    names = []
+    for _ in range(4):
+        with pool.acquire() as c:
+            names.append(c.name)
+    assert names.count('a') == names.count('b') == 2
+
+
+def test_rate_limited_credential_is_ejected_and_readmitted_after_cooldown():
+    pool = _pool(cooldown=0.05)
+    a = pool.credentials[0]
+    assert pool.report(a, 429)
+    for _ in range(3):
+        with pool.acquire() as c:
+            assert c.name == 'b'
+    assert pool.stats()['healthy'] == 1
+    import time
+    time.sleep(0.06)
+    assert pool.stats()['healthy'] == 2
+
+
+def test_api_get_retries_with_another_account_on_401():
+    """Un 401 expulsa la cuenta y la misma petición se repite con la siguiente."""
+    q = QobuzDownloader.__new__(QobuzDownloader)
+    q.pool = _pool()
+    seen = []
+
+    class _Session:
+        def get(self, url, params=None, timeout=None):
+            seen.append(params['user_auth_token'])
+            return _Resp(401 if len(seen) == 1 else 200)
+
+    q.session = _Session()
+    r = q._api_get('track/get', {'track_id': '1'})
+    assert r.status_code == 200
+    assert len(set(seen)) == 2
+    assert q.pool.stats()['healthy'] == 1
+
+
+def test_hot_reload_swaps_snapshot_without_touching_in_flight_requests(monkeypatch):
+    """Las peticiones en vuelo terminan con la credencial antigua; las nuevas usan la nueva."""
+    from app_modules import config
+    from app_modules.utils.cache import SWRCache, TTLCache
+
+    monkeypatch.setattr(config, '_live_credentials', {})
+
+    q = QobuzDownloader.__new__(QobuzDownloader)
+    q.token, q.app_id, q.app_secret, q.user_id = 'old-token', '1', 's', '9'
+    q.pool = CredentialPool([Credential('primary', 'old-token', '1', 's')])
+    q.preview_cache, q.track_cache = TTLCache(), TTLCache()
+    q.user_info_cache = SWRCache(ttl=60)
+    q.preview_cache.set('t1', 'http://signed-with-old')
+    q.track_cache.set('t1', {'id': 't1'})
+
+    with q.pool.acquire() as in_flight:
+        installed = q.install_credentials({'token': 'new-token'})
+        assert in_flight.token == 'old-token'
+    assert installed['version'] == 2
+    with q.pool.acquire() as fresh:
+        assert fresh.token == 'new-token' and fresh.app_secret == 's'
+    assert 't1' not in q.preview_cache
+    assert 't1' in q.track_cache
+    assert config.get_current_token() == 'new-token'
+
+
+
+def test_new_credential_set_replaces_the_previous_one(monkeypatch):
+    """Un juego nuevo sin user_id no hereda el del token anterior ni el de entorno."""
+    from app_modules import config
+
+    monkeypatch.setattr(config, '_live_credentials', {})
+    monkeypatch.setattr(config, 'QOBUZ_USER_ID', 'env-user')
+    assert config.get_current_user_id() == 'env-user'
+    config.set_live_credentials({'token': 'tok-1', 'app_id': '1', 'app_secret': 's', 'user_id': '9'})
+    config.set_live_credentials({'token': 'tok-2', 'app_id': '1', 'app_secret': 's', 'user_id': None})
+    assert config.get_current_token() == 'tok-2'
+    assert config.get_current_user_id() == ''
+
+def test_require_admin_checks_token(monkeypatch):
+    from flask import Flask
+    from app_modules import config
+    from app_modules.utils.auth import require_admin
+
+    app = Flask(__name__)
+
+    @app.route('/x')
+    @require_admin
+    def view():
+        return 'ok'
+
+    client = app.test_client()
+    monkeypatch.setattr(config, 'ADMIN_TOKEN', '')
+    assert client.get('/x').status_code == 403
+    monkeypatch.setattr(config, 'ADMIN_TOKEN', 'secret')
+    assert client.get('/x', headers={'X-Admin-Token': 'nope'}).status_code == 401
+    assert client.get('/x', headers={'Authorization': 'Bearer secret'}).status_code == 200
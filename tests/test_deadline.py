@@ -0,0 +1,69 @@
+import time
+
+import pytest
+
+from app_modules import config
+from app_modules.utils.deadline import BudgetExhausted, has_time_for, optional_stage, request_budget
+from app_modules.utils.http import set_url_overrides, upstream_get
+from benchmarks.fake_upstream import FakeUpstream, RouteBehaviour
+from benchmarks.run import LYRICS_QUERY
+
+
+class _Session:
+    """Sesión falsa que apunta el timeout con el que se la llama."""
+
+    def __init__(self):
+        self.timeouts = []
+
+    def get(self, url, timeout=None, **kwargs):
+        self.timeouts.append(timeout)
+        return type('Response', (), {'status_code': 200})()
+
+
+def test_calls_get_the_remaining_time_and_stop_when_the_budget_runs_out():
+    session = _Session()
+    with request_budget(2.0, max_calls=3, reserve=1.5) as budget:
+        upstream_get('genius.api', 'https://api.genius.com/search', session=session, timeout=10)
+        upstream_get('genius.page', 'https://genius.com/x', session=session, timeout=(3, 0.5))
+        with optional_stage():  # no puede gastar la reserva
+            upstream_get('genius.page', 'https://genius.com/y', session=session)
+        with pytest.raises(BudgetExhausted):
+            upstream_get('qobuz.track/search', 'https://www.qobuz.com/api.json/0.2/track/search', session=session)
+        assert not has_time_for('lyrics.candidate', 1.0)
+    assert 1.9 < session.timeouts[0] <= 2.0
+    assert 1.9 < session.timeouts[1][0] <= 2.0 and session.timeouts[1][1] == 0.5
+    assert 0.4 < session.timeouts[2] <= 0.5
+    assert budget.calls == 3 and budget.partial
+    assert budget.skipped == ['qobuz.track/search', 'lyrics.candidate']
+    # Fuera de un presupuesto nada cambia
+    upstream_get('genius.api', 'https://api.genius.com/search', session=session, timeout=10)
+    assert session.timeouts[-1] == 10 and has_time_for('lyrics.candidate', 100.0)
+
+
+def test_expired_deadline_refuses_calls_without_touching_the_network():
+    session = _Session()
+    with request_budget(0.01):
+        time.sleep(0.02)
+        with pytest.raises(BudgetExhausted):
+            upstream_get('spotify.embed', 'https://open.spotify.com/embed/track/x', session=session, timeout=15)
+    assert session.timeouts == []
+
+
+def test_lyrics_search_returns_partial_results_when_time_is_short(monkeypatch):
+    """Sin tiempo para las páginas de Genius se devuelve la búsqueda normal marcada como parcial."""
+    monkeypatch.setattr(config, 'REQUEST_DEADLINE_SECONDS', 2.0)
+    monkeypatch.setattr(config, 'REQUEST_DEADLINE_RESERVE', 1.0)
+    with FakeUpstream({'genius.page': RouteBehaviour(latency_ms=2000)}, audio_bytes=4096) as upstream:
+        set_url_overrides(upstream.url_overrides())
+        try:
+            from app_modules.app_factory import create_app
+            client = create_app().test_client()
+            started = time.perf_counter()
+            data = client.post('/api/search', json={'query': LYRICS_QUERY, 'source': 'qobuz', 'mode': 'lyrics'}).get_json()
+            elapsed = time.perf_counter() - started
+        finally:
+            set_url_overrides(None)
+        counts = upstream.settle(quiet=0.01)
+    assert data['success'] and data['partial'] and data['skipped'] == ['lyrics.candidate']
+    assert data['total'] == 15 and elapsed < 2.0
+    assert 'genius.page' not in counts and counts['genius.api'] == 1
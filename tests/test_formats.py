@@ -0,0 +1,39 @@
+from app_modules.services.formats import FormatSelector, best_format
+from app_modules.services.qobuz import QobuzDownloader
+from app_modules.utils.cache import TTLCache
+
+CD_TRACK = {'id': '1', 'maximum_bit_depth': 16, 'maximum_sampling_rate': 44.1, 'hires_streamable': False}
+HIRES_96 = {'id': '2', 'maximum_bit_depth': 24, 'maximum_sampling_rate': 96, 'hires_streamable': True}
+HIRES_192 = {'id': '3', 'maximum_bit_depth': 24, 'maximum_sampling_rate': 192, 'hires_streamable': True}
+
+
+def test_best_format_respects_track_capabilities_and_ceiling():
+    assert best_format(CD_TRACK, '27') == '6'
+    assert best_format(HIRES_96, '27') == '7'
+    assert best_format(HIRES_192, '27') == '27'
+    assert best_format(HIRES_192, '6') == '6'
+    assert best_format(CD_TRACK, '5') == '5'
+    # Sin metadatos no se adivina: se pide lo solicitado
+    assert best_format({'id': '4'}, '7') == '7'
+
+
+def test_resolve_download_uses_single_call_and_counts_avoided_retries():
+    q = QobuzDownloader.__new__(QobuzDownloader)
+    q.quality_map = {'5': {'name': 'MP3', 'ext': '.mp3'}, '6': {'name': 'FLAC 16', 'ext': '.flac'},
+                     '7': {'name': 'FLAC 24/96', 'ext': '.flac'}, '27': {'name': 'FLAC 24/192', 'ext': '.flac'}}
+    q.formats = FormatSelector(q.quality_map)
+    q.track_cache = TTLCache()
+    q.track_cache.set('1', CD_TRACK)
+    requested = []
+
+    def fake_request(track_id, quality, sample=False):
+        requested.append(quality)
+        return {'url': 'http://cdn/1', 'format_id': int(quality), 'bit_depth': 16, 'sampling_rate': 44.1}
+
+    q._request_file_info = fake_request
+    resolved = q.resolve_download('1', '27')
+
+    assert requested == ['6']
+    assert resolved['format_id'] == '6' and resolved['ext'] == '.flac' and resolved['requested'] == '27'
+    stats = q.formats.stats()
+    assert stats['avoided_retries'] == 2 and stats['downgraded'] == 1 and stats['resolved'] == 1
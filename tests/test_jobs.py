@@ -0,0 +1,111 @@
+import time
+
+from app_modules.services import jobs as jobs_module
+from app_modules.services.downloads import DownloadCache
+from app_modules.services.jobs import JobManager, JobStore
+from app_modules.services.spotify import SpotifyHandler
+from app_modules.services.tracks import Track
+
+
+class _StubDownloader:
+    quality_map = {'6': {'name': 'FLAC 16-bit/44.1kHz', 'ext': '.flac'}}
+
+    def __init__(self):
+        self.url_calls = 0
+
+    def get_track_info(self, track_id):
+        return {'id': track_id, 'title': f'Song {track_id}', 'performer': {'name': 'Art'}, 'album': {'id': 'a1', 'title': 'Alb'}}
+
+    def get_tracks_info_batch(self, track_ids):
+        return {tid: None if tid == 'gone' else self.get_track_info(tid) for tid in track_ids}
+
+    def get_album_info(self, album_id):
+        items = [{'id': str(i), 'title': f'T{i}', 'track_number': i, 'performer': {'name': 'Art'}} for i in range(1, 4)]
+        return {'id': album_id, 'title': 'Alb', 'artist': {'name': 'Art'}, 'tracks': {'items': items}}
+
+    def _get_file_url(self, track_id, quality):
+        self.url_calls += 1
+        return f'http://cdn.local/{track_id}'
+
+
+def _wait_finished(manager, job_id, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = manager.get(job_id)
+        if job['status'] in jobs_module.FINISHED_STATUSES:
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"El trabajo no terminó: {manager.get(job_id)}")
+
+
+def test_album_job_completes_and_repeated_job_hits_cache(tmp_path, monkeypatch):
+    """Un trabajo de álbum descarga todas las pistas; repetirlo reutiliza la caché en disco."""
+    def fake_download(url, path, chunk_size=0, on_chunk=None, should_stop=None):
+        with open(path, 'wb') as f:
+            f.write(b'x' * 1000)
+        if on_chunk:
+            on_chunk(1000, 1000)
+        return 1000
+
+    monkeypatch.setattr(jobs_module, 'download_to_file', fake_download)
+    monkeypatch.setattr(jobs_module, 'fetch_cover', lambda url: None)
+    downloader = _StubDownloader()
+    manager = JobManager(downloader, JobStore(str(tmp_path / 'jobs.db')), DownloadCache(str(tmp_path / 'cache')), runners=1, download_workers=2)
+
+    first = _wait_finished(manager, manager.submit('album', {'album_id': 'a1', 'quality': '6'})['id'])
+    assert first['status'] == 'completed'
+    assert first['items_done'] == 3 and first['progress'] == 1.0
+    assert [f['cached'] for f in first['files']] == [False, False, False]
+    assert len(manager.result_files(first['id'])) == 3
+
+    second = _wait_finished(manager, manager.submit('album', {'album_id': 'a1', 'quality': '6'})['id'])
+    assert [f['cached'] for f in second['files']] == [True, True, True]
+    assert downloader.url_calls == 3, "La segunda ejecución no debe pedir nuevas URLs"
+
+
+class _StubImporter:
+    def load(self, playlist_id):
+        return {'name': 'Mix', 'tracks': [{'name': 'a'}, {'name': 'b'}, {'name': 'c'}]}
+
+    def map_all(self, tracks):
+        matches = [Track('7', 'Song 7', 'Art'), None, Track('gone', 'Retirada', 'Art')]
+        return [{'index': i, 'spotify': t, 'match': m} for i, (t, m) in enumerate(zip(tracks, matches))]
+
+
+def test_playlist_job_fetches_full_metadata_for_matched_tracks(tmp_path):
+    """El mapeo solo trae ``Track``: para etiquetar se pide el JSON completo de cada pista."""
+    downloader = _StubDownloader()
+    downloader.spotify = SpotifyHandler.__new__(SpotifyHandler)
+    manager = JobManager(downloader, JobStore(str(tmp_path / 'jobs.db')), DownloadCache(str(tmp_path / 'cache')),
+                         playlist_importer=_StubImporter())
+    title, tracks = manager._collect_tracks({'kind': 'playlist', 'params': {'url': 'https://open.spotify.com/playlist/p1'}})
+    assert title == 'Mix'
+    assert tracks == [(downloader.get_track_info('7'), {'id': 'a1', 'title': 'Alb'})]
+
+
+def test_queued_job_can_be_cancelled(tmp_path):
+    store = JobStore(str(tmp_path / 'jobs.db'))
+    manager = JobManager(_StubDownloader(), store, DownloadCache(str(tmp_path / 'cache')))
+    job = store.create('track', {'track_id': '1', 'quality': '6'})  # sin arrancar runners
+    assert manager.cancel(job['id'])['status'] == 'cancelled'
+
+
+def test_shared_store_only_recovers_abandoned_jobs(tmp_path):
+    """Con la base compartida entre workers solo se reencola lo que no tiene latido."""
+    store = JobStore(str(tmp_path / 'jobs.db'))
+    cache = DownloadCache(str(tmp_path / 'cache'))
+    other = JobManager(_StubDownloader(), store, cache, stale_after=30)
+    alive, dead, cancelled = (store.create('track', {'track_id': str(i)})['id'] for i in range(3))
+    for job_id in (alive, dead, cancelled):
+        assert store.claim(job_id, other.owner)
+    assert not store.claim(alive, 'otro-worker')  # ya reclamado
+    store.update(dead, heartbeat_at=time.time() - 120)
+    store.update(cancelled, heartbeat_at=time.time() - 120, cancel_requested=1)
+
+    manager = JobManager(_StubDownloader(), store, cache, stale_after=30)
+    assert manager._requeue_stale() == [dead]
+    assert [store.get(j)['status'] for j in (alive, dead, cancelled)] == ['running', 'queued', 'cancelled']
+    assert store.claim(dead, manager.owner) and store.get(dead)['owner'] == manager.owner
+    # La cancelación pedida desde otro worker llega al dueño con el latido
+    manager.cancel(alive)
+    assert store.heartbeat(other.owner) == [alive]
@@ -0,0 +1,74 @@
+import json
+import logging
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from app_modules.utils import logs
+
+
+def _record(level, msg, **extra):
+    record = logging.LogRecord('app_modules.test', level, __file__, 1, msg, (), None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_debug_is_dropped_unless_request_is_sampled(monkeypatch):
+    """Por debajo del nivel solo pasan los registros de peticiones muestreadas, con su request_id."""
+    monkeypatch.setitem(logs._state, 'level', logging.INFO)
+    monkeypatch.setitem(logs._state, 'sample_rate', 0.0)
+    context_filter = logs.ContextFilter()
+
+    def run(sample_rate):
+        logs._state['sample_rate'] = sample_rate
+        request_id = logs.bind_request('abc-123')
+        debug, info = _record(logging.DEBUG, 'detalle'), _record(logging.INFO, 'resumen')
+        return request_id, context_filter.filter(debug), context_filter.filter(info), info.request_id
+
+    # El contexto se ejecuta aislado para no dejar el request_id en el hilo del test
+    import contextvars
+    assert contextvars.copy_context().run(run, 0.0) == ('abc-123', False, True, 'abc-123')
+    assert contextvars.copy_context().run(run, 1.0)[1] is True
+    # Un X-Request-ID no válido se sustituye por uno nuevo
+    assert contextvars.copy_context().run(logs.bind_request, 'no valido\n') != 'no valido\n'
+
+
+def test_structured_formatter_includes_extra_fields():
+    record = _record(logging.INFO, 'hola %s', request_id='r1', upstream='qobuz')
+    record.args = ('mundo',)
+    data = json.loads(logs.StructuredFormatter('json').format(record))
+    assert data['msg'] == 'hola mundo' and data['request_id'] == 'r1' and data['upstream'] == 'qobuz'
+    text = logs.StructuredFormatter('text').format(record)
+    assert '[r1] hola mundo' in text and "upstream='qobuz'" in text
+
+
+def test_queue_handler_never_blocks_when_full():
+    handler = logs.NonBlockingQueueHandler(queue.Queue(maxsize=1))
+    handler.handle(_record(logging.INFO, 'uno'))
+    handler.handle(_record(logging.INFO, 'dos'))
+    assert handler.queue.qsize() == 1 and handler.dropped == 1
+
+
+def test_capture_is_per_request_and_follows_worker_threads():
+    """Cada petición ve solo sus registros, también los emitidos desde el pool de hilos."""
+    logs.setup_logging('WARNING', debug_sample_rate=0.0)
+    log = logging.getLogger('app_modules.test_capture')
+    pool = ThreadPoolExecutor(max_workers=2)
+    barrier = threading.Barrier(2)
+    captured = {}
+
+    def request(name):
+        with logs.capture_logs() as buffer:
+            barrier.wait()
+            log.debug('inicio %s', name)
+            logs.submit_in_context(pool, log.debug, 'hilo %s', name).result()
+        captured[name] = list(buffer)
+
+    threads = [threading.Thread(target=request, args=(n,)) for n in ('a', 'b')]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    pool.shutdown()
+    assert [line.split(': ')[1] for line in captured['a']] == ['inicio a', 'hilo a']
+    assert [line.split(': ')[1] for line in captured['b']] == ['inicio b', 'hilo b']
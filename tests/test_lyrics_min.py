@@ -20,7 +20,7 @@ if __name__ == "__main__":
             {
                 'id': r.get('id'),
                 'title': r.get('title'),
-                'artist': (r.get('performer') or {}).get('name',''),
+                'artist': r.get('artist'),
                 'source': r.get('source'),
                 'genius_match': r.get('genius_match'),
                 'genius_url': r.get('genius_url')
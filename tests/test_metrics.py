@@ -0,0 +1,106 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from flask import Flask
+
+from app_modules.app_factory import _install_request_metrics
+from app_modules.utils.http import upstream_get
+from app_modules.utils.logs import submit_in_context
+from app_modules.utils.metrics import (HTTP_REQUEST_SECONDS, CountingExecutor, MetricsRegistry, UPSTREAM_REQUEST_SECONDS,
+                                      cache_families, executor_families)
+
+
+def test_histogram_and_counter_render_in_exposition_format():
+    """Buckets acumulados con ``+Inf``, ``_sum``/``_count`` y etiquetas escapadas."""
+    registry = MetricsRegistry()
+    hist = registry.histogram('t_latency_seconds', 'Latencia', ('upstream',), buckets=(0.1, 1.0))
+    hist.labels('qobuz').observe(0.05)
+    hist.labels('qobuz').observe(0.5)
+    hist.labels('qobuz').observe(3)
+    registry.counter('t_bytes_total', 'Bytes', ('kind',)).labels('a"b').inc(10)
+    registry.register_collector('c', lambda: cache_families({'track': {'hits': 3, 'misses': 1, 'hit_ratio': 0.75, 'size': 2}}))
+
+    text = registry.render()
+    assert '# TYPE t_latency_seconds histogram' in text
+    assert 't_latency_seconds_bucket{upstream="qobuz",le="0.1"} 1' in text
+    assert 't_latency_seconds_bucket{upstream="qobuz",le="1"} 2' in text
+    assert 't_latency_seconds_bucket{upstream="qobuz",le="+Inf"} 3' in text
+    assert 't_latency_seconds_count{upstream="qobuz"} 3' in text
+    assert 't_bytes_total{kind="a\\"b"} 10' in text
+    assert 'musichub_cache_hit_ratio{cache="track"} 0.75' in text
+    with pytest.raises(ValueError):
+        registry.counter('t_latency_seconds', 'otro tipo')
+
+
+def test_upstream_get_records_status_and_errors():
+    """Cada llamada externa queda en el histograma con su código o ``error``."""
+    class _Resp:
+        status_code = 429
+
+    class _Session:
+        def get(self, url, **kwargs):
+            if 'down' in url:
+                raise ConnectionError('sin red')
+            return _Resp()
+
+    child = UPSTREAM_REQUEST_SECONDS.labels('test.api', '429')
+    before = child.count
+    assert upstream_get('test.api', 'http://x/ok', session=_Session()).status_code == 429
+    assert child.count == before + 1
+    with pytest.raises(ConnectionError):
+        upstream_get('test.api', 'http://x/down', session=_Session())
+    assert UPSTREAM_REQUEST_SECONDS.labels('test.api', 'error').count >= 1
+
+
+def test_route_latency_uses_rule_template():
+    """Se etiqueta con la plantilla de la ruta, no con la URL concreta."""
+    app = Flask(__name__)
+    _install_request_metrics(app)
+
+    @app.route('/t/<item_id>')
+    def item(item_id):
+        return item_id
+
+    client = app.test_client()
+    client.get('/t/1')
+    client.get('/t/2')
+    assert HTTP_REQUEST_SECONDS.labels('GET', '/t/<item_id>', '200').count == 2
+
+
+def test_observation_overhead_is_microseconds():
+    """Observar una latencia no debe añadir más que unos pocos microsegundos."""
+    child = MetricsRegistry().histogram('t_overhead_seconds', 'x', ('a',)).labels('b')
+    n = 20000
+    start = time.perf_counter()
+    for _ in range(n):
+        child.observe(0.02)
+    assert (time.perf_counter() - start) / n < 20e-6
+
+
+def test_counting_executor_reports_active_and_queued_work():
+    """Lo enviado con ``submit_in_context`` se cuenta sin mirar dentro del ejecutor."""
+    pool = CountingExecutor(ThreadPoolExecutor(max_workers=1), max_workers=1)
+    release = threading.Event()
+    running = submit_in_context(pool, release.wait, 5)
+    waiting = submit_in_context(pool, lambda: 'hecho')
+    cancelled = pool.submit(lambda: None)
+    deadline = time.time() + 2
+    while pool.stats()['active'] < 1 and time.time() < deadline:
+        time.sleep(0.01)
+    assert pool.stats() == {'submitted': 3, 'queued': 2, 'active': 1, 'max_workers': 1}
+    assert cancelled.cancel()
+    assert pool.stats()['queued'] == 1
+
+    release.set()
+    assert running.result(timeout=2) is True and waiting.result(timeout=2) == 'hecho'
+    pool.shutdown(wait=True)
+    assert pool.stats() == {'submitted': 3, 'queued': 0, 'active': 0, 'max_workers': 1}
+
+    registry = MetricsRegistry()
+    registry.register_collector('pools', lambda: executor_families({'io': pool.stats()}))
+    text = registry.render()
+    assert 'musichub_executor_submitted_total{pool="io"} 3' in text
+    assert 'musichub_executor_queue_depth{pool="io"} 0' in text
+    assert 'musichub_executor_max_workers{pool="io"} 1' in text
@@ -0,0 +1,127 @@
+import json
+import threading
+import time
+
+from app_modules.routes import api as api_module
+from app_modules.services.playlist import SpotifyPlaylistImporter
+from app_modules.services.spotify import SpotifyHandler
+from app_modules.services.tracks import Track
+
+
+def _playlist(n):
+    tracks = [{'name': f'Song {i}', 'artist': f'Artist {i}', 'album': '', 'duration': 200, 'artists': [f'Artist {i}'],
+               'spotify_id': f'sp{i}'} for i in range(n)]
+    return {'name': 'Night Drive', 'owner': 'someone', 'tracks': tracks}
+
+
+class _StubSpotify(SpotifyHandler):
+    def __init__(self, playlist):
+        self.playlist = playlist
+
+    def get_playlist_tracks_by_scraping(self, playlist_id):
+        return self.playlist
+
+
+class _StubDownloader:
+    """Mapea ``Song N`` a una pista de Qobuz; ``Song 1`` no tiene equivalente y ``Song 2`` falla."""
+
+    def __init__(self, playlist, delay=0.0):
+        self.spotify = _StubSpotify(playlist)
+        self.delay = delay
+        self.searched = []
+        self.active = self.max_active = 0
+        self._lock = threading.Lock()
+
+    def search_track_from_spotify_info(self, sp_info, rate_limiter=None, fallback_best_match=False):
+        if rate_limiter is not None:
+            rate_limiter.acquire()
+        with self._lock:
+            self.searched.append(sp_info['name'])
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(self.delay)
+            if sp_info['name'] == 'Song 1':
+                return None
+            if sp_info['name'] == 'Song 2':
+                raise RuntimeError('Qobuz caído')
+            n = sp_info['spotify_id'][2:]
+            return Track(f'q{n}', sp_info['name'], sp_info['artist'], 'Album', 'Various Artists', 200, 'c.jpg')
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+class _StubPrefetcher:
+    def schedule(self, track_ids):
+        pass
+
+
+def test_embed_playlist_is_parsed_into_track_infos(monkeypatch):
+    entity = {'type': 'playlist', 'name': 'Night Drive', 'subtitle': 'someone', 'trackList': [
+        {'title': ' Paper Lanterns ', 'subtitle': 'Ana, Bea', 'duration': 201500, 'uri': 'spotify:track:abc'},
+        {'title': 'Sin artista', 'subtitle': ''},
+        {'title': 'Corta', 'subtitle': 'Ceci', 'duration': 0},
+    ]}
+    handler = SpotifyHandler.__new__(SpotifyHandler)
+    monkeypatch.setattr(handler, '_fetch_embed_entity', lambda kind, spotify_id: entity if kind == 'playlist' else None)
+    playlist = handler._scrape_playlist('pl1')
+    assert playlist['name'] == 'Night Drive' and playlist['owner'] == 'someone'
+    assert playlist['tracks'] == [
+        {'name': 'Paper Lanterns', 'artist': 'Ana', 'album': '', 'duration': 201, 'artists': ['Ana', 'Bea'],
+         'spotify_id': 'abc'},
+        {'name': 'Corta', 'artist': 'Ceci', 'album': '', 'duration': 0, 'artists': ['Ceci'], 'spotify_id': None},
+    ]
+    assert handler.extract_spotify_id('https://open.spotify.com/intl-es/playlist/pl1?si=x') == ('playlist', 'pl1')
+
+
+def test_importer_maps_in_parallel_within_the_shared_rate(monkeypatch):
+    downloader = _StubDownloader(_playlist(12), delay=0.02)
+    importer = SpotifyPlaylistImporter(downloader, max_workers=4, rate_per_second=40)
+    started = time.perf_counter()
+    mapped = importer.map_all(downloader.spotify.playlist['tracks'])
+    elapsed = time.perf_counter() - started
+    # Ráfaga inicial de 4 fichas y después 40/s: las 8 restantes tardan al menos 0,2 s
+    assert elapsed >= 0.18
+    assert downloader.max_active <= 4 and len(downloader.searched) == 12
+    assert [m['index'] for m in mapped] == list(range(12))
+    assert mapped[1]['match'] is None and mapped[2]['match'] is None  # sin equivalente y con error
+    assert mapped[0]['match'].id == 'q0' and mapped[0]['spotify']['name'] == 'Song 0'
+
+
+def test_playlist_stream_emits_ndjson_per_track(monkeypatch):
+    from app_modules.app_factory import create_app
+    downloader = _StubDownloader(_playlist(4))
+    monkeypatch.setattr(api_module, 'downloader', downloader)
+    client = create_app().test_client()
+
+    response = client.post('/api/spotify/playlist', json={'url': 'https://open.spotify.com/playlist/pl1'})
+    assert response.mimetype == 'application/x-ndjson'
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert lines[0] == {'type': 'playlist', 'id': 'pl1', 'name': 'Night Drive', 'owner': 'someone', 'total': 4}
+    tracks = sorted((l for l in lines if l['type'] == 'track'), key=lambda l: l['index'])
+    assert [t['index'] for t in tracks] == [0, 1, 2, 3]
+    assert tracks[0]['result'] == {'id': 'q0', 'title': 'Song 0', 'artist': 'Artist 0', 'album': 'Album - Various Artists',
+                                   'duration': 200, 'cover': 'c.jpg', 'source': 'qobuz', 'mapped_from_spotify': True}
+    assert tracks[1]['result'] is None and tracks[2]['result'] is None
+    assert tracks[3]['spotify'] == {'name': 'Song 3', 'artist': 'Artist 3', 'duration': 200}
+    assert lines[-1]['type'] == 'done' and lines[-1]['matched'] == 2 and lines[-1]['total'] == 4
+
+    bad = client.post('/api/spotify/playlist', json={'url': 'https://open.spotify.com/track/t1'})
+    assert bad.status_code == 400
+
+
+def test_search_maps_only_the_head_of_a_long_playlist(monkeypatch):
+    from app_modules.app_factory import create_app
+    downloader = _StubDownloader(_playlist(30))
+    monkeypatch.setattr(api_module, 'downloader', downloader)
+    monkeypatch.setattr(api_module, 'prefetcher', _StubPrefetcher())
+    monkeypatch.setattr(api_module, 'SEARCH_PLAYLIST_MAX_TRACKS', 5)
+    client = create_app().test_client()
+
+    data = client.post('/api/search', json={'query': 'https://open.spotify.com/playlist/pl1',
+                                            'source': 'spotify'}).get_json()
+    assert data['success'] and len(downloader.searched) == 5
+    assert [r['id'] for r in data['results']] == ['q0', 'q3', 'q4']
+    assert data['playlist'] == {'id': 'pl1', 'name': 'Night Drive', 'total': 30, 'mapped': 5, 'truncated': True,
+                                'stream_url': '/api/spotify/playlist'}
@@ -0,0 +1,53 @@
+import time
+
+from app_modules.services.prefetch import Prefetcher
+from app_modules.utils.cache import TTLCache
+
+
+class _StubDownloader:
+    def __init__(self):
+        self.preview_cache = TTLCache()
+        self.calls = []
+
+    def get_tracks_info_batch(self, track_ids):
+        self.calls.extend(('track', t) for t in track_ids)
+        return {t: {'id': t} for t in track_ids}
+
+    def resolve_preview_urls(self, track_ids):
+        self.calls.extend(('preview', t) for t in track_ids)
+        for t in track_ids:
+            self.preview_cache.set(t, f'http://cdn/{t}')
+        return {t: self.preview_cache.get(t) for t in track_ids}
+
+
+def _wait_idle(prefetcher, timeout=2.0):
+    deadline = time.time() + timeout
+    while prefetcher.stats()['pending'] and time.time() < deadline:
+        time.sleep(0.01)
+
+
+def test_prefetch_warms_top_n_and_records_hits_by_rank():
+    downloader = _StubDownloader()
+    prefetcher = Prefetcher(downloader, top_n=2, rate_per_second=100)
+    prefetcher.schedule(['a', 'b', 'c', 'd'])
+    _wait_idle(prefetcher)
+
+    assert {tid for kind, tid in downloader.calls if kind == 'preview'} == {'a', 'b'}
+    prefetcher.record_use('b')
+    prefetcher.record_use('d')
+    prefetcher.record_use('zzz')
+
+    stats = prefetcher.stats()
+    assert stats['hits_by_rank'] == {2: 1}
+    assert stats['misses_by_rank'] == {4: 1}
+    assert stats['uses'] == {'hits': 1, 'misses': 1, 'unranked': 1}
+    assert stats['hit_rate'] == 0.5
+
+
+def test_disabled_prefetcher_only_tracks_ranks():
+    downloader = _StubDownloader()
+    prefetcher = Prefetcher(downloader, enabled=False)
+    prefetcher.schedule(['a'])
+    prefetcher.record_use('a')
+    assert downloader.calls == []
+    assert prefetcher.stats()['misses_by_rank'] == {1: 1}
@@ -0,0 +1,71 @@
+import threading
+import time
+
+import requests
+
+from app_modules.services import preview_audio as preview_module
+from app_modules.services.preview_audio import PreviewAudioCache
+from app_modules.utils.cache import TTLCache
+
+
+class _StubDownloader:
+    def __init__(self):
+        self.preview_cache = TTLCache()
+        self.resolved = 0
+
+    def resolve_preview_url(self, track_id):
+        url = self.preview_cache.get(track_id)
+        if not url:
+            self.resolved += 1
+            url = f'http://cdn.local/{track_id}/{self.resolved}'
+            self.preview_cache.set(track_id, url)
+        return url
+
+
+def test_concurrent_requests_download_segment_once(tmp_path, monkeypatch):
+    """Varias peticiones simultáneas de la misma preview comparten una única descarga."""
+    fetched = []
+
+    def fake_download(url, path, chunk_size=0, on_chunk=None, should_stop=None, max_bytes=None):
+        fetched.append((url, max_bytes))
+        time.sleep(0.05)
+        with open(path, 'wb') as f:
+            f.write(b'\xff\xfb' * 100)
+        return 200
+
+    monkeypatch.setattr(preview_module, 'download_to_file', fake_download)
+    cache = PreviewAudioCache(_StubDownloader(), str(tmp_path), segment_seconds=10)
+    paths = []
+    threads = [threading.Thread(target=lambda: paths.append(cache.get_segment('42'))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(fetched) == 1
+    assert fetched[0][1] == cache.segment_bytes
+    assert len(set(paths)) == 1 and paths[0] is not None
+    assert cache.stats()['misses'] == 1 and cache.stats()['hits'] == 4
+    assert not list(tmp_path.glob('*.part'))
+
+
+def test_expired_url_is_resolved_again(tmp_path, monkeypatch):
+    """Un 403 del CDN (URL firmada caducada) descarta la URL y reintenta con otra nueva."""
+    downloader = _StubDownloader()
+    calls = []
+
+    def fake_download(url, path, chunk_size=0, on_chunk=None, should_stop=None, max_bytes=None):
+        calls.append(url)
+        if len(calls) == 1:
+            resp = requests.Response()
+            resp.status_code = 403
+            raise requests.HTTPError(response=resp)
+        with open(path, 'wb') as f:
+            f.write(b'data')
+        return 4
+
+    monkeypatch.setattr(preview_module, 'download_to_file', fake_download)
+    cache = PreviewAudioCache(downloader, str(tmp_path))
+    assert cache.get_segment('7') is not None
+    assert calls == ['http://cdn.local/7/1', 'http://cdn.local/7/2']
+    assert cache.stats()['url_refreshed'] == 1
@@ -0,0 +1,85 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from app_modules.services.credentials import Credential, CredentialPool
+from app_modules.services.qobuz import QobuzDownloader
+from app_modules.utils.cache import TTLCache
+
+
+class _Resp:
+    def __init__(self, status, data):
+        self.status_code = status
+        self._data = data
+        self.headers = {}
+
+    def json(self):
+        return self._data
+
+
+class _FakeSession:
+    """Simula track/get y track/getFileUrl registrando cada llamada."""
+
+    def __init__(self, sample_ok=True, known=True):
+        self.sample_ok = sample_ok
+        self.known = known
+        self.calls = []
+
+    def get(self, url, params=None, timeout=None, **kwargs):
+        params = params or {}
+        endpoint = url.rsplit('/', 2)[-2] + '/' + url.rsplit('/', 1)[-1]
+        self.calls.append((endpoint, params.get('sample')))
+        if endpoint == 'track/get':
+            if not self.known:
+                return _Resp(404, {})
+            return _Resp(200, {'id': params['track_id'], 'title': 'T'})
+        if params.get('sample') and not self.sample_ok:
+            return _Resp(400, {})
+        kind = 'sample' if params.get('sample') else 'full'
+        return _Resp(200, {'url': f"http://cdn/{params['track_id']}/{kind}"})
+
+
+def _downloader(session):
+    """Instancia sin __init__ para no hacer llamadas de red reales."""
+    q = QobuzDownloader.__new__(QobuzDownloader)
+    q.session = session
+    q.pool = CredentialPool([Credential('primary', 't', '1', 's')])
+    q.track_cache = TTLCache()
+    q.preview_cache = TTLCache()
+    q._io_pool = ThreadPoolExecutor(max_workers=4)
+    return q
+
+
+def test_preview_prefers_sample_and_is_cached():
+    session = _FakeSession(sample_ok=True)
+    q = _downloader(session)
+    assert q.resolve_preview_url('42') == 'http://cdn/42/sample'
+    q._io_pool.shutdown(wait=True)
+    # track/get y la muestra a la vez; con muestra no se pide el stream completo
+    assert sorted(session.calls, key=str) == [('track/get', None), ('track/getFileUrl', 'true')]
+    session.calls.clear()
+    assert q.resolve_preview_url('42') == 'http://cdn/42/sample'
+    assert session.calls == []
+
+
+def test_preview_falls_back_to_full_stream_without_refetching_metadata():
+    session = _FakeSession(sample_ok=False)
+    q = _downloader(session)
+    q.track_cache.set('7', {'id': '7'})
+    assert q.resolve_preview_url('7') == 'http://cdn/7/full'
+    q._io_pool.shutdown(wait=True)
+    assert [c[0] for c in session.calls].count('track/get') == 0
+    assert len(session.calls) == 2
+
+
+def test_unknown_track_never_requests_the_full_stream():
+    session = _FakeSession(known=False)
+    q = _downloader(session)
+    assert q.resolve_preview_url('404') is None
+    q._io_pool.shutdown(wait=True)
+    # Como mucho la muestra que ya estaba en vuelo; nunca el stream completo
+    assert ('track/getFileUrl', None) not in session.calls and len(session.calls) <= 2
+    session.calls.clear()
+    # Con los metadatos ya comprobados (como hace /api/preview) solo se pide la muestra
+    session.known = True
+    q = _downloader(session)
+    assert q.resolve_preview_url('9', {'id': '9'}) == 'http://cdn/9/sample'
+    assert session.calls == [('track/getFileUrl', 'true')]
@@ -0,0 +1,82 @@
+import time
+
+from flask import Flask
+
+from app_modules.utils.profiling import RequestProfiler, sign_profile_token, verify_profile_token
+
+
+def _slow_normalize(text):
+    total = 0
+    for _ in range(20000):
+        total += len(text.lower())
+    return total
+
+
+def test_signed_header_is_required_and_expires():
+    token = sign_profile_token('secreto', ttl=60, now=1000)
+    assert verify_profile_token('secreto', token, now=1030)
+    assert not verify_profile_token('secreto', token, now=1061)
+    assert not verify_profile_token('otro', token, now=1030)
+    assert not verify_profile_token('secreto', token.replace('.', '.0'), now=1030)
+    assert not verify_profile_token('', token, now=1030)
+
+
+def test_sampling_profiles_one_in_n_and_keeps_latest(tmp_path):
+    """Con muestreo 1 de cada 2 se guardan la mitad; solo se conservan los ``keep`` últimos."""
+    profiler = RequestProfiler(str(tmp_path), sample_every=2, keep=2)
+    saved = []
+    for i in range(6):
+        active = profiler.start()
+        if active is not None:
+            _slow_normalize('Canción')
+            saved.append(profiler.stop(active, route='/api/search', turn=i)['id'])
+    assert [p['turn'] for p in profiler.list()] == [5, 3] and len(set(saved)) == 3
+    assert [p['id'] for p in profiler.list()] == [saved[2], saved[1]]
+    assert sorted(f.name for f in tmp_path.iterdir()) == sorted(f'{i}.prof' for i in saved[1:])
+
+
+def test_top_functions_point_at_hot_code(tmp_path):
+    profiler = RequestProfiler(str(tmp_path), secret='s')
+    active = profiler.start(sign_profile_token('s'))
+    assert active is not None and active.reason == 'header'
+    # Un segundo perfil concurrente se descarta en vez de esperar
+    assert profiler.start(sign_profile_token('s')) is None and profiler.skipped_busy == 1
+    _slow_normalize('Canción')
+    profile_id = profiler.stop(active)['id']
+
+    top = profiler.top(profile_id, sort='cumulative', limit=10)
+    assert any('_slow_normalize' in row['function'] for row in top)
+    assert profiler.top('missing') is None
+    assert any('_slow_normalize' in row['function'] for row in profiler.top_overall(limit=50))
+
+
+def test_flask_hook_saves_profile_under_server_generated_id(tmp_path, monkeypatch):
+    """El id del archivo y de ``X-Profile-ID`` lo genera el servidor; la traza queda en el índice."""
+    from app_modules import app_factory
+    from app_modules.utils.tracing import Tracer
+    monkeypatch.setattr(app_factory, '_profiler', RequestProfiler(str(tmp_path), secret='s'))
+    monkeypatch.setattr(app_factory, '_tracer', Tracer())
+    app = Flask(__name__)
+    app_factory._install_request_logging(app)
+    app_factory._install_request_tracing(app)
+    app_factory._install_request_profiling(app)
+
+    @app.route('/work')
+    def work():
+        time.sleep(0.001)
+        return 'ok'
+
+    client = app.test_client()
+    assert 'X-Profile-ID' not in client.get('/work').headers
+    response = client.get('/work', headers={'X-Profile': sign_profile_token('s')})
+    profile_id = response.headers['X-Profile-ID']
+    assert (tmp_path / f'{profile_id}.prof').exists()
+    assert app_factory._profiler.list()[0]['trace_id'] == response.headers['X-Trace-ID']
+
+    # Un id elegido por el cliente (aunque sea válido como request id) no decide el archivo
+    stored = app_factory._profiler.stop(app_factory._profiler.start(sign_profile_token('s')))['id']
+    for request_id in (stored, 'con.punto'):
+        response = client.get('/work', headers={'X-Profile': sign_profile_token('s'), 'X-Request-ID': request_id})
+        assert response.headers['X-Profile-ID'] not in (stored, 'con.punto')
+        assert (tmp_path / f"{response.headers['X-Profile-ID']}.prof").exists()
+    assert [p['id'] for p in app_factory._profiler.list()].count(stored) == 1
@@ -0,0 +1,82 @@
+import json
+import threading
+import time
+
+from app_modules.services.renewal_scheduler import RenewalScheduler
+
+
+def _scheduler(tmp_path, **kwargs):
+    return RenewalScheduler(str(tmp_path / 'state.json'), str(tmp_path / 'renewal.lock'),
+                            interval=3600, initial_delay=0, **kwargs)
+
+
+def test_request_check_returns_immediately_and_status_is_cached(tmp_path):
+    """El endpoint solo programa el trabajo; el resultado aparece después en el estado."""
+    release = threading.Event()
+
+    def slow_check(threshold_days):
+        release.wait(2)
+        return {'success': True, 'message': 'ok'}
+
+    scheduler = _scheduler(tmp_path, check=slow_check)
+    start = time.perf_counter()
+    status = scheduler.request_check()
+    assert time.perf_counter() - start < 0.1
+    assert status['pending'] or status['running']
+    release.set()
+    deadline = time.time() + 2
+    while 'last_result' not in scheduler.status() and time.time() < deadline:
+        time.sleep(0.01)
+    assert scheduler.status()['last_result']['message'] == 'ok'
+
+
+def test_only_leader_renews_and_followers_install_result(tmp_path):
+    """Con dos workers solo uno hace la renovación; el otro instala las credenciales nuevas."""
+    renewals, installs = [], []
+    entered, release = threading.Event(), threading.Event()
+
+    def renew():
+        renewals.append(1)
+        entered.set()
+        release.wait(2)
+        return {'success': True, 'new_credentials': {'app_id': '1'}}
+
+    leader = _scheduler(tmp_path, renew=renew)
+    follower = _scheduler(tmp_path, renew=renew, install=lambda: installs.append(1))
+    leader._pending_force = leader._pending_check = True
+    worker = threading.Thread(target=leader.run_once)
+    worker.start()
+    assert entered.wait(2)
+
+    follower._pending_force = follower._pending_check = True
+    assert follower.run_once() is None  # cerrojo ocupado por el líder
+    release.set()
+    worker.join()
+
+    assert renewals == [1]
+    follower._follow()
+    assert installs == [1]
+    follower._follow()
+    assert installs == [1]
+
+
+def test_status_never_exposes_renewed_credentials(tmp_path):
+    """El estado compartido y ``status()`` solo llevan el resumen; el resultado completo queda en memoria."""
+    token, secret = 'T0k' * 30, 'S3cr3t' * 6
+
+    def renew():
+        return {'success': True, 'message': 'ok', 'is_vercel': True,
+                'vercel_instructions': f'QOBUZ_TOKEN={token}\nQOBUZ_APP_SECRET={secret}',
+                'local_storage_data': {'token': token, 'app_secret': secret},
+                'new_credentials': {'app_id': '1', 'user_id': '2', 'token_preview': token[:20] + '...'}}
+
+    scheduler = _scheduler(tmp_path, renew=renew)
+    scheduler._pending_force = scheduler._pending_check = True
+    scheduler.run_once()
+    status = json.dumps(scheduler.status())
+    with open(tmp_path / 'state.json', encoding='utf-8') as f:
+        stored = f.read()
+    for text in (status, stored, json.dumps(_scheduler(tmp_path).status())):
+        assert token[:20] not in text and secret not in text
+    assert scheduler.status()['last_result']['new_credentials']['token_preview'] == token[:6] + '…'
+    assert scheduler.last_full_result()['local_storage_data']['token'] == token
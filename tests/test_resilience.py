@@ -0,0 +1,141 @@
+import threading
+import time
+
+import pytest
+import requests
+
+from app_modules.utils.http import set_resilience, upstream_get
+from app_modules.utils.metrics import UPSTREAM_REQUEST_SECONDS
+from app_modules.utils.resilience import CircuitBreaker, CircuitOpen, LatencyWindow, Resilience
+from benchmarks.fake_upstream import FakeUpstream, RouteBehaviour
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class _Response:
+    def __init__(self, status_code=200, label=''):
+        self.status_code = status_code
+        self.label = label
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def test_breaker_opens_on_errors_or_slow_calls_and_probes_once():
+    clock = _Clock()
+    breaker = CircuitBreaker('qobuz.track/get', failure_rate=0.5, window=10, min_calls=4,
+                             slow_call_seconds=1.0, open_seconds=30, clock=clock)
+    for ok, elapsed in ((True, 0.1), (False, 0.1), (True, 0.1)):
+        breaker.record(ok, elapsed)
+    assert breaker.allow() and breaker.state == 'closed'
+    breaker.record(True, 2.5)  # lenta: cuenta como mala -> 2 de 4
+    assert breaker.state == 'open' and not breaker.allow()
+    clock.now = 31
+    assert breaker.allow() and not breaker.allow()  # una sola prueba en half_open
+    breaker.record(False, 0.1)
+    assert breaker.state == 'open'
+    clock.now = 62
+    assert breaker.allow()
+    breaker.record(True, 0.1)
+    assert breaker.state == 'closed' and breaker.stats()['opened'] == 2 and breaker.stats()['rejected'] == 2
+
+
+def test_open_circuit_fails_fast_and_client_errors_do_not_count():
+    resilience = Resilience(min_calls=2, window=2, hedge_upstreams=())
+    calls = []
+
+    def send(status):
+        calls.append(status)
+        return _Response(status)
+
+    for _ in range(3):
+        assert resilience.call('genius.api', lambda: send(404)).status_code == 404
+    assert resilience.breaker('genius.api').state == 'closed'
+    resilience.call('genius.api', lambda: send(503))  # 1 de las 2 últimas: se abre
+    with pytest.raises(CircuitOpen):
+        resilience.call('genius.api', lambda: send(200))
+    assert calls == [404, 404, 404, 503]
+
+
+def test_hedge_fires_after_observed_p95_and_takes_the_fastest_answer():
+    resilience = Resilience(hedge_upstreams=['qobuz.track/search'], hedge_min_delay=0.02, hedge_min_samples=20)
+    for _ in range(20):
+        resilience.latency('qobuz.track/search').observe(0.03)
+    attempts = []
+    lock = threading.Lock()
+    slow = _Response(label='first')
+
+    def send():
+        with lock:
+            attempts.append(len(attempts))
+            first = len(attempts) == 1
+        if first:
+            time.sleep(0.5)  # el primer intento se queda colgado
+            return slow
+        return _Response(label='hedge')
+
+    started = time.perf_counter()
+    response = resilience.call('qobuz.track/search', send)
+    assert response.label == 'hedge' and time.perf_counter() - started < 0.3
+    assert resilience.hedge_delay('qobuz.track/search') == pytest.approx(0.03)
+    time.sleep(0.6)
+    assert slow.closed and len(attempts) == 2
+    # Sin cobertura para upstreams no configurados
+    assert resilience.hedge_delay('qobuz.user/login') is None
+    window = LatencyWindow(size=4)
+    assert window.quantile(0.95, min_samples=2) is None
+
+
+def test_breaker_stops_calls_to_a_failing_fake_upstream():
+    with FakeUpstream({'qobuz.track/search': RouteBehaviour(error_rate=1.0)}) as upstream:
+        set_resilience(Resilience(min_calls=3, window=3, hedge_upstreams=()))
+        try:
+            url = f'{upstream.base_url}/qobuz/track/search'
+            statuses = [upstream_get('qobuz.track/search', url).status_code for _ in range(3)]
+            with pytest.raises(CircuitOpen):
+                upstream_get('qobuz.track/search', url)
+        finally:
+            set_resilience(None)
+        assert statuses == [503, 503, 503] and upstream.settle(quiet=0.01) == {'qobuz.track/search': 3}
+    assert UPSTREAM_REQUEST_SECONDS.counts()[('qobuz.track/search', 'circuit_open')] >= 1
+
+
+def test_timeouts_follow_observed_latency_within_bounds():
+    resilience = Resilience(timeout_multiplier=3.0, timeout_min=1.0, timeout_max=30.0, connect_timeout_max=3.05,
+                            timeout_min_samples=20)
+    assert resilience.timeout_for('qobuz.track/get', 8) == 8  # sin muestras: el de la llamada
+    for _ in range(20):
+        resilience.latency('qobuz.track/get').observe(0.2)
+        resilience.latency('qobuz.cdn').observe(4.0)
+        resilience.latency('genius.page').observe(20.0)
+    assert resilience.timeout_for('qobuz.track/get', 8) == (1.0, 1.0)  # rápido: falla pronto
+    assert resilience.timeout_for('qobuz.cdn', 10) == (3.05, 12.0)
+    # En streaming la lectura no baja de lo pedido: no se corta una descarga lenta pero sana
+    assert resilience.timeout_for('qobuz.cdn', 30, stream=True) == (3.05, 30.0)
+    assert resilience.timeout_for('genius.page', (5, 10)) == (3.05, 30.0)
+    assert Resilience(adaptive_timeouts=False).timeout_for('qobuz.track/get', 8) == 8
+
+
+def test_adaptive_timeout_fails_fast_and_widens_when_the_upstream_slows_down():
+    with FakeUpstream({'qobuz.track/get': RouteBehaviour(latency_ms=400)}) as upstream:
+        resilience = Resilience(hedge_upstreams=(), timeout_min=0.2, timeout_min_samples=20)
+        for _ in range(20):
+            resilience.latency('qobuz.track/get').observe(0.01)
+        set_resilience(resilience)
+        try:
+            url = f'{upstream.base_url}/qobuz/track/get'
+            started = time.perf_counter()
+            with pytest.raises(requests.Timeout):
+                upstream_get('qobuz.track/get', url, timeout=10)
+            assert time.perf_counter() - started < 0.35
+            # El timeout cuenta como muestra: el siguiente intento ya espera lo suficiente
+            assert upstream_get('qobuz.track/get', url, timeout=10).status_code == 200
+        finally:
+            set_resilience(None)
@@ -2,6 +2,7 @@ import os
 import pytest
 
 from app_modules.services.qobuz import QobuzDownloader
+from app_modules.services.tracks import Track
 
 
 PHRASE = "y si te digo que es para toda la vida pero no como esos"
@@ -17,6 +18,26 @@ def test_cleaner_keeps_phrase_unchanged():
     assert cleaned == PHRASE
 
 
+def test_genius_matches_are_projected_from_tracks(monkeypatch):
+    """Los candidatos de Genius se mapean a ``Track`` de la búsqueda y salen ya proyectados."""
+    q = QobuzDownloader.__new__(QobuzDownloader)
+    candidates = [{'title': 'Toda la vida', 'artist': 'Ana', 'url': 'https://genius.com/a'},
+                  {'title': 'Sin Qobuz', 'artist': 'Bea', 'url': 'https://genius.com/b'}]
+    found = {'Toda la vida Ana': [Track(9, 'Toda la vida (Live)', 'Ana'), Track(5, 'Toda la vida', 'Ana', 'Alb', 'Varios')]}
+    monkeypatch.setattr(q, '_search_genius_api', lambda query, limit=10: candidates)
+    monkeypatch.setattr(q, '_fetch_genius_lyrics', lambda url: PHRASE)
+    monkeypatch.setattr(q, 'search_tracks_with_locale', lambda query, limit=15, force_latin=True: found.get(query, []))
+
+    res = q.search_by_lyrics(PHRASE, limit=2)
+    marks = {'found_by_lyrics': True, 'lyrics_fragment': PHRASE, 'matched_fragment': PHRASE}
+    assert res == [
+        dict(Track(5, 'Toda la vida', 'Ana', 'Alb', 'Varios').result(genius_match=True, genius_url='https://genius.com/a'),
+             **marks),
+        {'id': None, 'title': 'Sin Qobuz', 'artist': 'Bea', 'album': 'Unknown', 'duration': 0, 'cover': '',
+         'source': 'genius', 'genius_match': True, 'genius_url': 'https://genius.com/b', **marks},
+    ]
+
+
 @pytest.mark.skipif(
     os.getenv("RUN_ONLINE_TESTS") != "1",
     reason="Prueba de integración con red (Genius/Qobuz). Establece RUN_ONLINE_TESTS=1 para ejecutarla.",
@@ -0,0 +1,136 @@
+import threading
+import time
+
+from app_modules.services.qobuz import QobuzDownloader
+from app_modules.utils.shared_cache import RespBackend, SQLiteBackend, TieredCache, set_cache_backends
+from benchmarks.fake_cache import FakeRespServer
+
+
+class _Response:
+    def __init__(self, data):
+        self.status_code = 200
+        self._data = data
+
+    def json(self):
+        return self._data
+
+
+def test_lower_tiers_refill_upper_ones_on_a_cold_instance(tmp_path):
+    lyrics = 'Fold the night into paper lanterns\n' * 60  # grande: se guarda comprimido
+    with FakeRespServer() as server:
+        first = TieredCache('lyrics', ttl=60, backends=[SQLiteBackend(str(tmp_path / 'a.sqlite3')),
+                                                         RespBackend(server.url)])
+        first.set('https://genius.com/x', lyrics)
+        first.set('ñandú', {'title': 'Canción', 'n': 1})
+        # Otra instancia: memoria y disco vacíos, la red compartida
+        disk = SQLiteBackend(str(tmp_path / 'b.sqlite3'))
+        cold = TieredCache('lyrics', ttl=60, backends=[disk, RespBackend(server.url)])
+        assert cold.get('https://genius.com/x') == lyrics
+        assert cold.get('https://genius.com/x') == lyrics
+        assert cold.get_many(['ñandú', 'falta']) == {'ñandú': {'title': 'Canción', 'n': 1}}
+        assert disk.stats()['entries'] == 2  # rellenado desde la red
+        assert cold.stats()['hits_by_tier'] == {'memory': 1, 'resp': 2} and cold.stats()['misses'] == 1
+        assert server.commands['MGET'] == 1
+        keys = server.keys()
+        assert len(keys) == 2 and all(k.startswith(b'musichub:lyrics:v1:') for k in keys)
+        # Con otra versión del formato no se leen los valores anteriores
+        assert TieredCache('lyrics', ttl=60, version=2, backends=[RespBackend(server.url)]).get('ñandú') is None
+    # Un proceso nuevo en la misma máquina encuentra el disco
+    restarted = TieredCache('lyrics', ttl=60, backends=[SQLiteBackend(str(tmp_path / 'b.sqlite3'))])
+    assert restarted.get('https://genius.com/x') == lyrics
+
+
+def test_concurrent_misses_load_once_across_threads_and_instances():
+    loads = []
+
+    def loader():
+        loads.append(1)
+        time.sleep(0.2)
+        return {'id': '42'}
+
+    with FakeRespServer() as server:
+        instances = [TieredCache('track', ttl=60, backends=[RespBackend(server.url)]) for _ in range(2)]
+        results = []
+        threads = [threading.Thread(target=lambda c=c: results.append(c.get_or_set('42', loader)))
+                   for c in instances for _ in range(6)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert results == [{'id': '42'}] * 12 and len(loads) == 1
+        assert sum(c.stats()['loads'] for c in instances) == 1
+        assert server.keys() == [b'musichub:track:v1:42']  # el candado ya no está
+        # ``None`` no se guarda: el siguiente intento vuelve a cargar
+        assert instances[0].get_or_set('43', lambda: None) is None
+        assert instances[0].get_or_set('43', lambda: 'ok') == 'ok'
+
+
+
+def test_slow_load_does_not_release_a_lock_taken_by_another_instance(tmp_path):
+    """Si la carga dura más que el candado, al terminar no se borra el que tomó otra instancia."""
+    with FakeRespServer() as server:
+        for backend in (RespBackend(server.url), SQLiteBackend(str(tmp_path / 'c.sqlite3'))):
+            cache = TieredCache('track', ttl=60, backends=[backend], lock_seconds=0.05)
+            lock_key = f"{cache.full_key('7')}:lock"
+
+            def slow_loader():
+                time.sleep(0.1)  # el candado ya caducó
+                assert backend.add(lock_key, b'otra-instancia', 5)
+                return {'id': '7'}
+
+            assert cache.get_or_set('7', slow_loader) == {'id': '7'}
+            assert backend.get(lock_key) == b'otra-instancia'
+            assert not backend.delete_if(lock_key, b'ajeno') and backend.delete_if(lock_key, b'otra-instancia')
+            assert backend.get(lock_key) is None
+
+def test_unreachable_network_tier_degrades_to_misses_without_waiting():
+    with FakeRespServer() as server:
+        url = server.url
+    backend = RespBackend(url, timeout=0.1)
+    cache = TieredCache('search', ttl=60, backends=[backend])
+    started = time.perf_counter()
+    for i in range(5):
+        assert cache.get_or_set(f'q{i}', lambda: ['track']) == ['track']
+    assert time.perf_counter() - started < 1.0  # sin esperas por el candado
+    assert cache.get('q0') == ['track']  # sigue sirviendo desde memoria
+    assert backend.breaker.state == 'open' and cache.stats()['errors'] >= 3
+    # Desactivada (TTL 0) siempre carga
+    calls = []
+    disabled = TieredCache('search', ttl=0, backends=[backend])
+    disabled.get_or_set('q', lambda: calls.append(1) or ['x'])
+    disabled.get_or_set('q', lambda: calls.append(1) or ['x'])
+    assert calls == [1, 1]
+
+
+def test_instances_share_track_metadata_and_searches():
+    calls = []
+
+    def downloader():
+        q = QobuzDownloader.__new__(QobuzDownloader)
+        q.track_cache = TieredCache('track', ttl=60)
+        q.search_cache = TieredCache('search', ttl=60)
+
+        def api_get(endpoint, params=None, timeout=10, sign=None):
+            calls.append(endpoint)
+            if endpoint == 'track/get':
+                return _Response({'id': params['track_id'], 'title': 'Paper Lanterns'})
+            return _Response({'tracks': {'items': [{'id': '1', 'title': 'Paper Lanterns'}]}})
+
+        q._api_get = api_get
+        return q
+
+    with FakeRespServer() as server:
+        set_cache_backends([RespBackend(server.url)])
+        try:
+            first, second = downloader(), downloader()
+            assert first.get_track_info('1')['title'] == 'Paper Lanterns'
+            assert second.get_track_info('1')['title'] == 'Paper Lanterns'
+            found = first.search_tracks_with_locale('paper lanterns')
+            assert found == second.search_tracks_with_locale('paper lanterns')
+            assert [(t.id, t.title) for t in found] == [('1', 'Paper Lanterns')]
+            first.get_track_info('2')
+            batch = downloader().get_tracks_info_batch(['1', '2'])
+        finally:
+            set_cache_backends([])
+    assert calls == ['track/get', 'track/search', 'track/get']
+    assert batch['1']['id'] == '1' and batch['2']['id'] == '2'
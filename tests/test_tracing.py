@@ -0,0 +1,77 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app_modules.utils.http import upstream_get
+from app_modules.utils.logs import submit_in_context
+from app_modules.utils.tracing import Tracer, current_span, span, trace_methods
+
+
+@trace_methods('svc')
+class _Service:
+    def __init__(self, session):
+        self.session = session
+
+    def search(self, query):
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            return submit_in_context(pool, self.fetch, query).result()
+
+    def fetch(self, query):
+        return upstream_get('test.page', f'http://upstream/search?q={query}', session=self.session).status_code
+
+    @staticmethod
+    def clean(text):
+        return text.strip()
+
+
+class _Session:
+    def get(self, url, **kwargs):
+        time.sleep(0.002)
+        return type('R', (), {'status_code': 200})()
+
+
+def test_spans_nest_across_methods_threads_and_upstream_calls():
+    """Métodos, hilos del pool y llamadas HTTP cuelgan del span de la petición."""
+    tracer = Tracer(buffer_size=5)
+    service = _Service(_Session())
+    handle = tracer.start('GET /api/search')
+    assert service.search('x') == 200
+    assert _Service.clean(' a ') == 'a'
+    trace = tracer.finish(handle)
+
+    spans = {s.name: s for s in trace.spans}
+    assert set(spans) == {'GET /api/search', 'svc.search', 'svc.fetch', 'http test.page', 'svc.clean'}
+    assert spans['svc.search'].parent_id == trace.root.span_id
+    assert spans['svc.fetch'].parent_id == spans['svc.search'].span_id
+    assert spans['http test.page'].parent_id == spans['svc.fetch'].span_id
+    # La query string no se guarda (puede llevar tokens o firmas)
+    assert spans['http test.page'].attributes['http.url'] == 'http://upstream/search'
+    assert spans['http test.page'].attributes['http.status_code'] == '200'
+    assert current_span() is None
+    assert tracer.recent()[0]['trace_id'] == trace.trace_id
+
+
+def test_without_active_trace_nothing_is_recorded():
+    with span('suelto') as s:
+        assert s is None
+    assert _Service(_Session()).fetch('y') == 200
+
+
+def test_otlp_export_writes_one_line_per_trace(tmp_path):
+    path = tmp_path / 'traces.jsonl'
+    tracer = Tracer(export_path=str(path))
+    handle = tracer.start('GET /api/preview', **{'http.route': '/api/preview'})
+    with span('qobuz.resolve_preview_url', track_id=42):
+        pass
+    trace = tracer.finish(handle, error=None)
+
+    deadline = time.time() + 2
+    while not path.exists() and time.time() < deadline:
+        time.sleep(0.01)
+    exported = json.loads(path.read_text().splitlines()[0])
+    spans = exported['resourceSpans'][0]['scopeSpans'][0]['spans']
+    assert {s['traceId'] for s in spans} == {trace.trace_id}
+    child = next(s for s in spans if s['name'] == 'qobuz.resolve_preview_url')
+    assert child['parentSpanId'] == trace.root.span_id
+    assert {'key': 'track_id', 'value': {'intValue': '42'}} in child['attributes']
+    assert int(child['endTimeUnixNano']) >= int(child['startTimeUnixNano'])
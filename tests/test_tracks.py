@@ -0,0 +1,41 @@
+import copy
+import json
+
+from app_modules.services.tracks import Track, track_result
+from benchmarks.tracks import legacy_result, make_items, measure_memory
+
+
+def _variants():
+    base = make_items(1)[0]
+    guest = copy.deepcopy(base)
+    guest['album']['artist'] = {'id': 1, 'name': 'Various Artists'}
+    bare = {'id': 7, 'title': 'Sin álbum', 'performer': {}, 'album': {}}
+    return make_items(15) + [guest, bare]
+
+
+def test_track_result_matches_the_previous_search_projection():
+    for item in _variants():
+        assert track_result(item) == legacy_result(item)
+        assert track_result(Track.from_qobuz(item)) == legacy_result(item)
+    guest = _variants()[-2]
+    assert track_result(guest, mapped_from_spotify=True)['album'].endswith(' - Various Artists')
+    assert track_result(guest, mapped_from_spotify=True)['mapped_from_spotify'] is True
+    assert Track.from_qobuz({'id': 7, 'title': 'x', 'album': {}}).compact() == {
+        'id': 7, 'title': 'x', 'artist': 'Unknown', 'album': '', 'duration': 0, 'cover': '',
+        'maximum_bit_depth': None, 'maximum_sampling_rate': None}
+
+
+def test_slotted_track_keeps_a_fraction_of_the_json():
+    track = Track.from_qobuz(make_items(1)[0])
+    assert not hasattr(track, '__dict__')
+    assert track == Track.from_qobuz(make_items(1)[0])
+    memory = measure_memory(1000)
+    assert memory['ratio'] < 0.3 and memory['raw_bytes_per_track'] > 2000
+
+
+def test_cache_rows_round_trip_through_json():
+    """``search_cache`` guarda filas: al volver del nivel compartido reconstruyen el mismo ``Track``."""
+    for item in _variants():
+        track = Track.from_qobuz(item)
+        assert Track.from_row(json.loads(json.dumps(track.as_row()))) == track
+    assert Track.from_qobuz(make_items(1)[0]).streamable is True
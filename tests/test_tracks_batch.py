@@ -0,0 +1,74 @@
+import threading
+import time
+
+from app_modules.routes import api as api_module
+from app_modules.services.qobuz import QobuzDownloader
+from app_modules.utils.cache import TTLCache
+
+
+class _Resp:
+    def __init__(self, status, data=None):
+        self.status_code = status
+        self._data = data
+
+    def json(self):
+        return self._data
+
+
+def _downloader(delay=0.0):
+    """Instancia sin __init__: ``track/get`` simulado que registra cada id pedido."""
+    q = QobuzDownloader.__new__(QobuzDownloader)
+    q.track_cache = TTLCache()
+    q.requested = []
+    lock = threading.Lock()
+
+    def api_get(endpoint, params=None, timeout=10, sign=None):
+        assert endpoint == 'track/get'
+        with lock:
+            q.requested.append(params['track_id'])
+        time.sleep(delay)
+        if params['track_id'].startswith('x'):
+            return _Resp(404, {})
+        return _Resp(200, {'id': params['track_id'], 'title': f"Song {params['track_id']}",
+                           'performer': {'name': 'Ana'}, 'album': {'title': 'Alb', 'image': {'small': 'c.jpg'}},
+                           'maximum_bit_depth': 24, 'maximum_sampling_rate': 96})
+
+    q._api_get = api_get
+    return q
+
+
+def test_batch_deduplicates_and_only_fetches_uncached_ids_in_parallel():
+    q = _downloader(delay=0.1)
+    q.track_cache.set('2', {'id': '2', 'title': 'En caché'})
+    started = time.perf_counter()
+    infos = q.get_tracks_info_batch(['1', 2, '2', '1', '', None, '3', 'x9', '4'])
+    elapsed = time.perf_counter() - started
+    assert list(infos) == ['1', '2', '3', 'x9', '4']
+    assert infos['2'] == {'id': '2', 'title': 'En caché'} and infos['x9'] is None
+    assert sorted(q.requested) == ['1', '3', '4', 'x9']
+    assert elapsed < 0.3  # cuatro track/get de 0,1 s a la vez
+    # Segunda ronda: lo encontrado sale de caché; lo no encontrado se vuelve a pedir
+    q.requested.clear()
+    assert q.get_tracks_info_batch(['4', '1', 'x9'])['1']['id'] == '1'
+    assert q.requested == ['x9']
+
+
+def test_batch_endpoint_keeps_request_order_and_limits_size(monkeypatch):
+    from app_modules.app_factory import create_app
+    q = _downloader()
+    q.track_cache.set('7', {'id': '7', 'title': 'Primero en caché', 'album': {}})
+    monkeypatch.setattr(api_module, 'downloader', q)
+    client = create_app().test_client()
+
+    data = client.post('/api/tracks/batch', json={'track_ids': ['5', 'x1', '7', '5', '6']}).get_json()
+    assert data['success']
+    assert [t['id'] for t in data['tracks']] == ['5', '7', '6']
+    assert data['not_found'] == ['x1']
+    assert data['tracks'][0] == {'id': '5', 'title': 'Song 5', 'artist': 'Ana', 'album': 'Alb', 'duration': 0,
+                                 'cover': 'c.jpg', 'maximum_bit_depth': 24, 'maximum_sampling_rate': 96}
+
+    too_many = client.post('/api/tracks/batch', json={'track_ids': [str(i) for i in range(101)]})
+    assert too_many.status_code == 400 and 'Máximo 100' in too_many.get_json()['error']
+    assert client.post('/api/tracks/batch', json={'track_ids': '5'}).status_code == 400
+    assert client.post('/api/tracks/batch', json={}).status_code == 400
+    assert sorted(q.requested) == ['5', '6', 'x1']
@@ -0,0 +1,70 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app_modules.services.qobuz import QobuzDownloader
+from app_modules.utils.cache import SWRCache
+
+
+def test_stale_value_is_served_while_refreshing_in_background():
+    """Entre ``refresh_after`` y ``ttl`` se devuelve el valor guardado sin esperar la recarga."""
+    pool = ThreadPoolExecutor(max_workers=1)
+    cache = SWRCache(ttl=10, refresh_after=0.05, executor=pool)
+    calls = []
+    release = threading.Event()
+
+    def loader():
+        calls.append(1)
+        if len(calls) > 1:
+            release.wait(1)
+        return len(calls)
+
+    assert cache.get('k', loader) == 1
+    time.sleep(0.06)
+    start = time.perf_counter()
+    assert cache.get('k', loader) == 1  # valor antiguo, recarga en segundo plano
+    assert time.perf_counter() - start < 0.05
+    release.set()
+    pool.shutdown(wait=True)
+    assert cache.get('k', loader) == 2
+    stats = cache.stats()
+    assert stats['stale_hits'] == 1 and stats['refreshes'] == 1 and stats['misses'] == 1
+
+
+def test_concurrent_misses_share_one_load():
+    cache = SWRCache(ttl=10)
+    calls = []
+
+    def loader():
+        calls.append(1)
+        time.sleep(0.05)
+        return {'id': 1}
+
+    threads = [threading.Thread(target=cache.get, args=('k', loader)) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+
+
+def test_user_info_races_login_and_info_endpoints():
+    """El endpoint que responde bien gana aunque el otro sea lento o falle."""
+    q = QobuzDownloader.__new__(QobuzDownloader)
+    q.app_id = '1'
+    q._io_pool = ThreadPoolExecutor(max_workers=2)
+    q.user_info_cache = SWRCache(ttl=60, executor=q._io_pool)
+
+    def fake_request(endpoint, token, app_id):
+        if endpoint == 'user/login':
+            time.sleep(0.5)
+            return None
+        return {'id': 7, 'email': 'a@b.c'}
+
+    q._request_user_info = fake_request
+    start = time.perf_counter()
+    assert q.get_user_info('tok')['id'] == 7
+    assert time.perf_counter() - start < 0.4
+    start = time.perf_counter()
+    assert q.get_user_info('tok')['id'] == 7
+    assert time.perf_counter() - start < 0.01